@@ -0,0 +1,152 @@
+"""This module extracts the results of a query as an Arrow table, column by
+column, instead of the rows of Python objects `pd.read_sql` builds its
+dataframe from. With arrow-odbc installed the ODBC driver writes the result
+set straight into Arrow record batches, otherwise the rows of the DB-API
+cursor are fetched in batches and converted to Arrow arrays a column at a
+time, which is slower than `pd.read_sql`. The table is handed to pandas with
+the dtypes of the job schema."""
+
+from typing import Iterator, Union
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from frame_schema import FrameSchema
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.frame_schema import FrameSchema
+    from carhartt_pbi_automate.get_logger import get_logger
+
+# arrow-odbc reads the result sets without creating a Python object per value,
+# it is used when it is installed
+try:
+    import arrow_odbc
+except ImportError:
+    arrow_odbc = None
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# The ways a job can extract the EDW data: `pd.read_sql`, or Arrow
+EXTRACT_BACKENDS = ("pandas", "arrow")
+DEFAULT_EXTRACT_BACKEND = "pandas"
+
+# Rows fetched at a time, every batch becomes an Arrow record batch
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def extract_frame(
+    connection,
+    query: str,
+    schema: FrameSchema,
+    backend: str = DEFAULT_EXTRACT_BACKEND,
+    connection_string: str = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> pd.DataFrame:
+    """Run a query and return its results with the dtypes of a job schema.
+    Args:
+        connection: The connection to the database, passed to `pd.read_sql`
+        or read with a DB-API cursor.
+        query (str): The SQL query.
+        schema (FrameSchema): The schema of the job.
+        backend (str): "pandas" to read the results with `pd.read_sql`,
+        "arrow" to read them as an Arrow table.
+        connection_string (str): The ODBC connection string of the database.
+        With the arrow backend and arrow-odbc installed the query runs on its
+        own ODBC connection instead of `connection`.
+        batch_size (int): Rows fetched at a time by the arrow backend.
+    Returns:
+        pd.DataFrame: The results, with the columns of the schema."""
+    if backend == "pandas":
+        return schema.apply(pd.read_sql(query, connection))
+    if backend == "arrow":
+        if connection_string and arrow_odbc is not None:
+            connection = connection_string
+        return schema.from_arrow(read_arrow(connection, query, batch_size))
+    raise ValueError(
+        f"backend must be one of {EXTRACT_BACKENDS}. Not {backend}"
+    )
+
+
+def read_arrow(
+    connection: Union[str, object],
+    query: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> pa.Table:
+    """Run a query and return its results as an Arrow table.
+    Args:
+        connection (Union[str, object]): An ODBC connection string, read with
+        arrow-odbc, or a DB-API or SQLAlchemy connection.
+        query (str): The SQL query.
+        batch_size (int): Rows fetched at a time.
+    Returns:
+        pa.Table: The results of the query."""
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be 1 or greater. Not {batch_size}")
+    if isinstance(connection, str):
+        if arrow_odbc is None:
+            raise ImportError(
+                "arrow-odbc is required to read from an ODBC connection string."
+            )
+        reader = arrow_odbc.read_arrow_batches_from_odbc(
+            query=query,
+            connection_string=connection,
+            batch_size=batch_size,
+        )
+        table = pa.Table.from_batches(reader, reader.schema)
+    else:
+        cursor = dbapi_connection(connection).cursor()
+        try:
+            cursor.execute(query)
+            names = [column[0] for column in cursor.description]
+            tables = [
+                pa.Table.from_batches([batch])
+                for batch in iter_record_batches(cursor, names, batch_size)
+            ]
+        finally:
+            cursor.close()
+        if tables:
+            # A column can be all NULL in a batch, or its decimals have a
+            # different scale, the types of the batches are unified
+            table = pa.concat_tables(tables, promote_options="permissive")
+        else:
+            table = pa.table(
+                [pa.array([], pa.null()) for _ in names], names=names
+            )
+    log.debug(
+        "Extracted %s rows as %s Arrow record batches.",
+        table.num_rows,
+        len(table.to_batches()),
+    )
+    return table
+
+
+def iter_record_batches(
+    cursor, names: list, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """Fetch the rows of a cursor in batches and convert every batch to an
+    Arrow record batch, a column at a time.
+    Args:
+        cursor: A DB-API cursor that has run a query.
+        names (list): The names of the columns.
+        batch_size (int): Rows fetched at a time.
+    Yields:
+        pa.RecordBatch: The rows of a batch."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        columns = zip(*rows)
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column) for column in columns], names=names
+        )
+
+
+def dbapi_connection(connection):
+    """Return the DB-API connection of a SQLAlchemy connection, e.g. the one
+    returned by `connector.get_edw_connection`, or the connection itself."""
+    if hasattr(connection, "exec_driver_sql"):
+        return connection.connection
+    return connection
@@ -0,0 +1,339 @@
+"""This module finds the rows whose keys are only on one side of a comparison
+without holding both sides in memory. The keys of each side are streamed into
+a Bloom filter, a NumPy bit array of a few bits per key, and the rows of the
+other side are probed against it: a row whose key is not in the filter is
+certainly one-sided and is only counted and sampled, the other rows are the
+candidates compared exactly. A false positive of the filter only makes a
+one-sided row a candidate, where the exact comparison reports it.
+
+The first side is read twice, to fill its filter and to be probed: a side is
+a dataframe or a function returning its chunks, e.g. reading a Parquet file
+or running a query again."""
+
+import math
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from comparison_report import DEFAULT_SAMPLE_SIZE, ComparisonSummary
+    from get_logger import get_logger
+    from spill_compare import spill_compare
+    from tolerance_compare import (
+        compare_with_tolerance,
+        duplicated_keys,
+        normalise_frame,
+    )
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import (
+        DEFAULT_SAMPLE_SIZE,
+        ComparisonSummary,
+    )
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.spill_compare import spill_compare
+    from carhartt_pbi_automate.tolerance_compare import (
+        compare_with_tolerance,
+        duplicated_keys,
+        normalise_frame,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Duplicated one-sided keys named in the error
+DUPLICATED_KEYS_SHOWN = 5
+
+# Keys a filter is sized for when the number of rows of a side is unknown,
+# about 12 MB at the default error rate
+DEFAULT_BLOOM_CAPACITY = 10_000_000
+DEFAULT_ERROR_RATE = 0.01
+
+Side = Union[pd.DataFrame, Callable[[], Iterable[pd.DataFrame]]]
+
+
+class BloomFilter:
+    """This class is a Bloom filter of key hashes, stored as a packed NumPy
+    bit array. Every hash sets `hash_count` bits, derived from its two 32-bit
+    halves by double hashing."""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_BLOOM_CAPACITY,
+        error_rate: float = DEFAULT_ERROR_RATE,
+    ):
+        """Initialize an empty filter.
+        Args:
+            capacity (int): Number of keys the filter is sized for.
+            error_rate (float): The false positive rate once the filter holds
+            `capacity` keys.
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be 1 or greater. Not {capacity}")
+        if not 0 < error_rate < 1:
+            raise ValueError(
+                f"error_rate must be between 0 and 1. Not {error_rate}"
+            )
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(
+            1, round(self.bit_count / capacity * math.log(2))
+        )
+        self.bits = np.zeros(-(-self.bit_count // 8), dtype="uint8")
+        self.count = 0
+
+    def add(self, hashes: np.ndarray):
+        """Add key hashes to the filter.
+        Args:
+            hashes (np.ndarray): The uint64 hashes of the keys, see
+            `key_hashes`.
+        """
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(
+            self.bits,
+            positions >> 3,
+            np.left_shift(1, positions & 7).astype("uint8"),
+        )
+        self.count += len(hashes)
+
+    def might_contain(self, hashes: np.ndarray) -> np.ndarray:
+        """Probe key hashes.
+        Args:
+            hashes (np.ndarray): The uint64 hashes of the keys.
+        Returns:
+            np.ndarray: A boolean array, False where the key is certainly
+            not in the filter."""
+        positions = self._positions(hashes)
+        bits = (self.bits[positions >> 3] >> (positions & 7)) & 1
+        return bits.all(axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the bit array in bytes."""
+        return self.bits.nbytes
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        """Return the bits of every hash, one row per hash."""
+        hashes = np.asarray(hashes, dtype="uint64")
+        low = hashes & np.uint64(0xFFFFFFFF)
+        # An odd step visits different bits for every hash of the key
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype="uint64")
+        positions = low[:, None] + steps[None, :] * high[:, None]
+        return (positions % np.uint64(self.bit_count)).astype("int64")
+
+    def __repr__(self) -> str:
+        return (
+            f"BloomFilter(capacity={self.capacity}, "
+            f"error_rate={self.error_rate}, count={self.count})"
+        )
+
+
+def key_hashes(frame: pd.DataFrame, join_columns: List[str]) -> np.ndarray:
+    """Return the hash of the keys of every row. The keys are normalised like
+    the compared values, so the same key has the same hash on both sides
+    whatever its original dtype.
+    Args:
+        frame (pd.DataFrame): The rows.
+        join_columns (List[str]): The key columns.
+    Returns:
+        np.ndarray: The uint64 hashes."""
+    keys = normalise_frame(frame[join_columns])
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def bloom_compare(
+    side1: Side,
+    side2: Side,
+    join_columns: List[str],
+    capacity: int = None,
+    error_rate: float = DEFAULT_ERROR_RATE,
+    memory_budget: int = None,
+    **compare_kwargs,
+) -> ComparisonSummary:
+    """Compare two results joined on their key columns, holding only the
+    rows whose key may be on both sides. The result is the same as the
+    result of `compare_with_tolerance`, except for the order of the sampled
+    rows.
+    Args:
+        side1 (Side): The first result, or a function returning its chunks.
+        side2 (Side): The second result, or a function returning its chunks.
+        join_columns (List[str]): The key columns used to join the rows.
+        capacity (int): Number of keys of every filter. Defaults to the rows
+        of a dataframe, or `DEFAULT_BLOOM_CAPACITY`.
+        error_rate (float): The false positive rate of the filters.
+        memory_budget (int): Bytes the exact comparison of the candidates may
+        use, see `spill_compare`. Without it they are compared in memory.
+        compare_kwargs: The other arguments of `compare_with_tolerance`.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    lower = compare_kwargs.get("cast_column_names_lower", True)
+    sample_size = compare_kwargs.get("sample_size", DEFAULT_SAMPLE_SIZE)
+
+    filter1 = BloomFilter(_capacity(side1, capacity), error_rate)
+    for chunk in _iter_chunks(side1, join_columns, lower):
+        filter1.add(key_hashes(chunk, _keys(join_columns, lower)))
+
+    # The second side fills its own filter while it is probed
+    filter2 = BloomFilter(_capacity(side2, capacity), error_rate)
+    candidates2, unique2 = _probe(
+        side2,
+        filter1,
+        join_columns,
+        lower,
+        sample_size,
+        compare_kwargs.get("df2_name", "EDW"),
+        build=filter2,
+    )
+    candidates1, unique1 = _probe(
+        side1,
+        filter2,
+        join_columns,
+        lower,
+        sample_size,
+        compare_kwargs.get("df1_name", "PowerBI"),
+    )
+    for bloom in (filter1, filter2):
+        if bloom.count > bloom.capacity:
+            log.warning(
+                "%s keys were added to a filter sized for %s, its false "
+                "positive rate is higher than %s.",
+                bloom.count,
+                bloom.capacity,
+                bloom.error_rate,
+            )
+    log.debug(
+        "Filters of %s bytes: %s and %s candidate rows, %s and %s one-sided "
+        "rows.",
+        filter1.nbytes + filter2.nbytes,
+        len(candidates1),
+        len(candidates2),
+        unique1[0],
+        unique2[0],
+    )
+
+    if memory_budget:
+        exact = spill_compare(
+            candidates1,
+            candidates2,
+            join_columns,
+            memory_budget,
+            **compare_kwargs,
+        )
+    else:
+        exact = compare_with_tolerance(
+            candidates1, candidates2, join_columns, **compare_kwargs
+        )
+    one_sided = ComparisonSummary(
+        df1_name=exact.df1_name,
+        df2_name=exact.df2_name,
+        key_columns=exact.key_columns,
+        df1_rows=unique1[0],
+        df2_rows=unique2[0],
+        column_stats=exact.column_stats.iloc[:0],
+        df1_unique_count=unique1[0],
+        df2_unique_count=unique2[0],
+        df1_unique_sample=unique1[1],
+        df2_unique_sample=unique2[1],
+        sample_size=exact.sample_size,
+    )
+    return ComparisonSummary.merge([exact, one_sided])
+
+
+def _probe(
+    side: Side,
+    bloom: BloomFilter,
+    join_columns: List[str],
+    lower: bool,
+    sample_size: int,
+    name: str,
+    build: BloomFilter = None,
+) -> Tuple[pd.DataFrame, Tuple[int, pd.DataFrame]]:
+    """Split the rows of a side into the candidates, whose key may be in the
+    filter, and the one-sided rows, counted and sampled. The keys of the
+    one-sided rows are not joined, they are checked for duplicates like the
+    one to one join of the candidates checks theirs."""
+    join_columns = _keys(join_columns, lower)
+    candidates = []
+    unique_keys = []
+    unique_count = 0
+    unique_samples = []
+    template = None
+    for chunk in _iter_chunks(side, join_columns, lower):
+        template = chunk.iloc[:0] if template is None else template
+        hashes = key_hashes(chunk, join_columns)
+        if build is not None:
+            build.add(hashes)
+        found = bloom.might_contain(hashes)
+        candidates.append(chunk[found])
+        unique_keys.append(chunk.loc[~found, join_columns])
+        unique_count += int(np.count_nonzero(~found))
+        sampled = sum(len(sample) for sample in unique_samples)
+        if sampled < sample_size:
+            unique_samples.append(
+                normalise_frame(chunk[~found].head(sample_size - sampled))
+            )
+    # The copies of a key have the same hash, they are all one-sided or all
+    # candidates
+    duplicated = duplicated_keys(
+        pd.concat(unique_keys, ignore_index=True), join_columns
+    )
+    if len(duplicated):
+        examples = duplicated.head(DUPLICATED_KEYS_SHOWN).to_dict("records")
+        raise pd.errors.MergeError(
+            f"Merge keys are not unique in the {name} dataset; not a "
+            f"one-to-one merge: {examples}"
+        )
+    candidates = [chunk for chunk in candidates if len(chunk)] or [template]
+    unique_sample = (
+        pd.concat(unique_samples, ignore_index=True)
+        if unique_samples
+        else template.iloc[:0]
+    )
+    return (
+        pd.concat(candidates, ignore_index=True),
+        (unique_count, unique_sample),
+    )
+
+
+def _iter_chunks(
+    side: Side, join_columns: List[str], lower: bool
+) -> Iterator[pd.DataFrame]:
+    """Yield the chunks of a side, with the column names in lower case when
+    the comparison is."""
+    chunks = [side] if isinstance(side, pd.DataFrame) else side()
+    empty = True
+    for chunk in chunks:
+        empty = False
+        if lower:
+            chunk = chunk.rename(columns=lambda column: str(column).lower())
+        for column in _keys(join_columns, lower):
+            if column not in chunk.columns:
+                raise ValueError(
+                    f"Join column {column} not found in both sides."
+                )
+        yield chunk
+    if empty:
+        raise ValueError("A side of the comparison has no chunks.")
+
+
+def _keys(join_columns: List[str], lower: bool) -> List[str]:
+    """Return the key columns, in lower case when the comparison is."""
+    return (
+        [column.lower() for column in join_columns]
+        if lower
+        else list(join_columns)
+    )
+
+
+def _capacity(side: Side, capacity: int = None) -> int:
+    """Return the capacity of the filter of a side."""
+    if capacity:
+        return capacity
+    if isinstance(side, pd.DataFrame):
+        return max(1, len(side))
+    return DEFAULT_BLOOM_CAPACITY
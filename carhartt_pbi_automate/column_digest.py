@@ -0,0 +1,276 @@
+"""This module localises the differences of two results before comparing
+them cell by cell. The rows of both sides are partitioned by a hash of their
+key columns, and every column gets a digest per partition: the sum of a hash
+of the key and the value of each of its rows. The sum does not depend on the
+order of the rows, so both sides are digested without being joined. Only the
+columns and partitions whose digests differ are compared with
+`compare_with_tolerance`, the cost of the comparison grows with the
+differences rather than with the size of the results.
+
+Numeric values are rounded to the absolute tolerance of their column before
+they are hashed, two values further apart than the tolerance never round to
+the same value. Values within the tolerance may still round apart, their
+partition is then compared and found to match. A column with a relative
+tolerance but no absolute tolerance cannot be rounded, it is compared in
+every partition."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from comparison_report import DEFAULT_SAMPLE_SIZE, ComparisonSummary
+    from get_logger import get_logger
+    from tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+        compare_with_tolerance,
+        normalise_frame,
+    )
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import (
+        DEFAULT_SAMPLE_SIZE,
+        ComparisonSummary,
+    )
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+        compare_with_tolerance,
+        normalise_frame,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+DEFAULT_DIGEST_PARTITIONS = 64
+
+# The digest of the keys of every partition, next to the digests of the
+# columns
+KEYS_DIGEST = "__keys__"
+
+# Odd multiplier mixing the hash of the key into the hash of the value
+_KEY_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def column_digests(
+    frame: pd.DataFrame,
+    join_columns: List[str],
+    partitions: int = DEFAULT_DIGEST_PARTITIONS,
+    steps: Dict[str, float] = None,
+) -> pd.DataFrame:
+    """Return the digest of every column of a normalised result per partition
+    of its keys.
+    Args:
+        frame (pd.DataFrame): The result, normalised with `normalise_frame`.
+        join_columns (List[str]): The key columns.
+        partitions (int): Number of partitions of the keys.
+        steps (Dict[str, float]): The step the values of a numeric column are
+        rounded to. Columns not listed are hashed as they are.
+    Returns:
+        pd.DataFrame: One row per partition, the uint64 digest of the keys in
+        the `KEYS_DIGEST` column and the digest of every other column."""
+    if partitions < 1:
+        raise ValueError(f"partitions must be 1 or greater. Not {partitions}")
+    steps = steps or {}
+    key_hashes = _key_hashes(frame, join_columns)
+    partition = _partitions(key_hashes, partitions)
+    # The key is mixed into every value, so swapped values change the digest
+    mixed_keys = key_hashes * _KEY_MULTIPLIER
+
+    digests = {
+        KEYS_DIGEST: _sum_by_partition(key_hashes, partition, partitions)
+    }
+    for column in frame.columns:
+        if column in join_columns:
+            continue
+        values = frame[column].to_numpy()
+        step = steps.get(column)
+        if step and values.dtype.kind == "f":
+            # Adding zero turns the negative zeros into zeros
+            values = np.round(values / step) + 0.0
+        cells = pd.util.hash_array(
+            pd.util.hash_array(values, categorize=False) ^ mixed_keys
+        )
+        digests[column] = _sum_by_partition(cells, partition, partitions)
+    return pd.DataFrame(
+        digests, index=pd.RangeIndex(partitions, name="partition")
+    )
+
+
+def digest_compare(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    join_columns: List[str],
+    partitions: int = DEFAULT_DIGEST_PARTITIONS,
+    tolerances: Dict[str, Tuple[float, float]] = None,
+    abs_tol: float = DEFAULT_ABS_TOL,
+    rel_tol: float = DEFAULT_REL_TOL,
+    df1_name: str = "PowerBI",
+    df2_name: str = "EDW",
+    cast_column_names_lower: bool = True,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ComparisonSummary:
+    """Compare two dataframes joined on their key columns, comparing cell by
+    cell only the columns and partitions whose digests differ. The counts and
+    samples are the ones of `compare_with_tolerance`, the `max_diff` of a
+    column only covers the compared partitions.
+    Args:
+        df1 (pd.DataFrame): The first dataframe.
+        df2 (pd.DataFrame): The second dataframe.
+        join_columns (List[str]): The key columns used to join the rows.
+        partitions (int): Number of partitions of the keys.
+        tolerances (Dict[str, Tuple[float, float]]): The (absolute, relative)
+        tolerances of each column. Columns not listed use the defaults.
+        abs_tol (float): The default absolute tolerance.
+        rel_tol (float): The default relative tolerance.
+        df1_name (str): The name of the first dataframe.
+        df2_name (str): The name of the second dataframe.
+        cast_column_names_lower (bool): Whether to compare the column names
+        in lower case.
+        sample_size (int): The maximum number of rows kept per sample.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    tolerances = dict(tolerances or {})
+    df1 = normalise_frame(df1)
+    df2 = normalise_frame(df2)
+    if cast_column_names_lower:
+        df1.columns = [str(column).lower() for column in df1.columns]
+        df2.columns = [str(column).lower() for column in df2.columns]
+        join_columns = [column.lower() for column in join_columns]
+        tolerances = {
+            column.lower(): value for column, value in tolerances.items()
+        }
+    for column in join_columns:
+        if column not in df1.columns or column not in df2.columns:
+            raise ValueError(f"Join column {column} not found in both frames.")
+    # Identical duplicated rows have the same digests on both sides, the keys
+    # are checked like the one to one join of `compare_with_tolerance`
+    for name, frame in ((df1_name, df1), (df2_name, df2)):
+        if frame.duplicated(join_columns).any():
+            raise pd.errors.MergeError(
+                f"Merge keys are not unique in the {name} dataset; not a "
+                "one-to-one merge"
+            )
+    columns = [
+        column
+        for column in df1.columns
+        if column in df2.columns and column not in join_columns
+    ]
+
+    # Rounding to the absolute tolerance absorbs the noise it allows
+    steps = {}
+    always_compared = []
+    for column in columns:
+        column_abs_tol, column_rel_tol = tolerances.get(
+            column, (abs_tol, rel_tol)
+        )
+        if column_abs_tol > 0:
+            steps[column] = column_abs_tol
+        elif column_rel_tol > 0:
+            always_compared.append(column)
+
+    digests1 = column_digests(
+        df1[join_columns + columns], join_columns, partitions, steps
+    )
+    digests2 = column_digests(
+        df2[join_columns + columns], join_columns, partitions, steps
+    )
+    differs = digests1 != digests2
+    differs[always_compared] = True
+    # A partition whose keys differ has rows on one side only, they are
+    # reported with all their columns
+    keys_differ = differs.pop(KEYS_DIGEST).to_numpy()
+    flagged_columns = [
+        column for column in columns if differs[column][~keys_differ].any()
+    ]
+    flagged = differs[flagged_columns].to_numpy().any(axis=1) & ~keys_differ
+    log.debug(
+        "%s of %s partitions have different keys, %s of %s columns differ "
+        "in %s other partitions.",
+        int(keys_differ.sum()),
+        partitions,
+        len(flagged_columns),
+        len(columns),
+        int(flagged.sum()),
+    )
+
+    partition1 = _partitions(_key_hashes(df1, join_columns), partitions)
+    partition2 = _partitions(_key_hashes(df2, join_columns), partitions)
+    keys_rows1 = keys_differ[partition1]
+    keys_rows2 = keys_differ[partition2]
+    flagged_rows1 = flagged[partition1]
+    flagged_rows2 = flagged[partition2]
+    compare_kwargs = {
+        "tolerances": tolerances,
+        "abs_tol": abs_tol,
+        "rel_tol": rel_tol,
+        "df1_name": df1_name,
+        "df2_name": df2_name,
+        "cast_column_names_lower": False,
+        "sample_size": sample_size,
+    }
+
+    # The rows of the other partitions are on both sides and match
+    matching_rows = int(np.count_nonzero(~(keys_rows1 | flagged_rows1)))
+    summaries = [
+        ComparisonSummary(
+            df1_name=df1_name,
+            df2_name=df2_name,
+            key_columns=join_columns,
+            df1_rows=matching_rows,
+            df2_rows=matching_rows,
+            intersect_rows=matching_rows,
+            column_stats=pd.DataFrame(
+                {
+                    "mismatch_count": np.zeros(len(columns), dtype="int64"),
+                    "max_diff": np.zeros(len(columns)),
+                },
+                index=pd.Index(columns, name="column"),
+            ),
+            sample_size=sample_size,
+        )
+    ]
+    if keys_rows1.any() or keys_rows2.any():
+        summaries.append(
+            compare_with_tolerance(
+                df1[keys_rows1],
+                df2[keys_rows2],
+                join_columns,
+                **compare_kwargs,
+            )
+        )
+    if flagged_rows1.any():
+        selected = join_columns + flagged_columns
+        summaries.append(
+            compare_with_tolerance(
+                df1.loc[flagged_rows1, selected],
+                df2.loc[flagged_rows2, selected],
+                join_columns,
+                **compare_kwargs,
+            )
+        )
+    return ComparisonSummary.merge(summaries)
+
+
+def _key_hashes(frame: pd.DataFrame, join_columns: List[str]) -> np.ndarray:
+    """Return the hash of the keys of every row."""
+    return pd.util.hash_pandas_object(
+        frame[join_columns], index=False
+    ).to_numpy()
+
+
+def _partitions(key_hashes: np.ndarray, partitions: int) -> np.ndarray:
+    """Return the partition of the hash of every key."""
+    return (key_hashes % np.uint64(partitions)).astype("int64")
+
+
+def _sum_by_partition(
+    hashes: np.ndarray, partition: np.ndarray, partitions: int
+) -> np.ndarray:
+    """Return the sum of the hashes of every partition, modulo 2^64."""
+    sums = np.zeros(partitions, dtype="uint64")
+    np.add.at(sums, partition, hashes)
+    return sums
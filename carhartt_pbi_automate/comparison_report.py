@@ -0,0 +1,454 @@
+"""This module builds bounded comparison reports. The full report is streamed
+to disk one section at a time, and a compact digest is built separately to be
+sent in the Microsoft Teams message."""
+
+import html
+from pathlib import Path
+from typing import Iterator, List, Tuple, Union
+
+import datacompy
+import numpy as np
+import pandas as pd
+
+
+# Maximum number of mismatching rows kept per column in the report
+DEFAULT_SAMPLE_SIZE = 10
+
+# Maximum number of characters of the digest sent to Microsoft Teams
+DEFAULT_DIGEST_CHARS = 4000
+
+
+class ComparisonSummary:
+    """This class holds the bounded result of a data comparison: row counts,
+    per-column statistics and capped samples of the differences."""
+
+    def __init__(
+        self,
+        df1_name: str = "PowerBI",
+        df2_name: str = "EDW",
+        key_columns: List[str] = None,
+        df1_rows: int = 0,
+        df2_rows: int = 0,
+        intersect_rows: int = 0,
+        column_stats: pd.DataFrame = None,
+        mismatch_sample: pd.DataFrame = None,
+        df1_unique_count: int = 0,
+        df2_unique_count: int = 0,
+        df1_unique_sample: pd.DataFrame = None,
+        df2_unique_sample: pd.DataFrame = None,
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        mismatch_rows: int = 0,
+    ):
+        """Initialize the summary.
+        Args:
+            df1_name (str): The name of the first dataframe.
+            df2_name (str): The name of the second dataframe.
+            key_columns (List[str]): The columns used to join the rows.
+            df1_rows (int): The number of rows in the first dataframe.
+            df2_rows (int): The number of rows in the second dataframe.
+            intersect_rows (int): The number of rows found in both dataframes.
+            column_stats (pd.DataFrame): One row per compared column with the
+            `mismatch_count` and `max_diff` columns.
+            mismatch_sample (pd.DataFrame): The mismatching values, one row per
+            key and column, capped at `sample_size` rows per column.
+            df1_unique_count (int): The number of rows only in the first
+            dataframe.
+            df2_unique_count (int): The number of rows only in the second
+            dataframe.
+            df1_unique_sample (pd.DataFrame): Sample of the rows only in the
+            first dataframe.
+            df2_unique_sample (pd.DataFrame): Sample of the rows only in the
+            second dataframe.
+            sample_size (int): The maximum number of rows kept in the samples.
+            mismatch_rows (int): The number of rows found in both dataframes
+            with at least one mismatching value.
+        """
+        if sample_size < 0:
+            raise ValueError(
+                f"sample_size must be zero or greater. Not {sample_size}"
+            )
+        self.df1_name = df1_name
+        self.df2_name = df2_name
+        self.key_columns = list(key_columns) if key_columns else []
+        self.df1_rows = df1_rows
+        self.df2_rows = df2_rows
+        self.intersect_rows = intersect_rows
+        self.mismatch_rows = mismatch_rows
+        self.sample_size = sample_size
+
+        if column_stats is None:
+            column_stats = pd.DataFrame(
+                {"mismatch_count": pd.Series(dtype="int64"),
+                 "max_diff": pd.Series(dtype="float64")}
+            )
+        self.column_stats = column_stats
+
+        if mismatch_sample is None:
+            mismatch_sample = pd.DataFrame(
+                columns=self.key_columns + ["column", df1_name, df2_name]
+            )
+        self.mismatch_sample = mismatch_sample
+
+        self.df1_unique_count = df1_unique_count
+        self.df2_unique_count = df2_unique_count
+        self.df1_unique_sample = (
+            pd.DataFrame() if df1_unique_sample is None else df1_unique_sample
+        )
+        self.df2_unique_sample = (
+            pd.DataFrame() if df2_unique_sample is None else df2_unique_sample
+        )
+
+    @property
+    def mismatch_count(self) -> int:
+        """Return the total number of mismatching values."""
+        return int(self.column_stats["mismatch_count"].sum())
+
+    @property
+    def mismatched_columns(self) -> List[str]:
+        """Return the columns with at least one mismatching value."""
+        stats = self.column_stats
+        return stats.index[stats["mismatch_count"] > 0].tolist()
+
+    def matches(self) -> bool:
+        """Return True if both dataframes contain the same rows and values."""
+        return (
+            self.mismatch_count == 0
+            and self.df1_unique_count == 0
+            and self.df2_unique_count == 0
+        )
+
+    @classmethod
+    def merge(cls, summaries: List["ComparisonSummary"]) -> "ComparisonSummary":
+        """Merge the summaries of several partitions into one summary.
+        Args:
+            summaries (List[ComparisonSummary]): The partial summaries. They
+            must have been produced with the same columns and names.
+        Returns:
+            ComparisonSummary: The merged summary."""
+        if not summaries:
+            raise ValueError("summaries must contain at least one summary.")
+        first = summaries[0]
+        sample_size = first.sample_size
+
+        # Counts are added, the largest difference wins
+        stats = pd.concat([summary.column_stats for summary in summaries])
+        column_stats = stats.groupby(level=0, sort=False).agg(
+            {"mismatch_count": "sum", "max_diff": "max"}
+        )
+
+        samples = [
+            summary.mismatch_sample
+            for summary in summaries
+            if not summary.mismatch_sample.empty
+        ]
+        mismatch_sample = first.mismatch_sample
+        if samples:
+            mismatch_sample = (
+                pd.concat(samples, ignore_index=True)
+                .groupby("column", sort=False)
+                .head(sample_size)
+                .reset_index(drop=True)
+            )
+
+        return cls(
+            df1_name=first.df1_name,
+            df2_name=first.df2_name,
+            key_columns=first.key_columns,
+            df1_rows=sum(summary.df1_rows for summary in summaries),
+            df2_rows=sum(summary.df2_rows for summary in summaries),
+            intersect_rows=sum(summary.intersect_rows for summary in summaries),
+            mismatch_rows=sum(summary.mismatch_rows for summary in summaries),
+            column_stats=column_stats,
+            mismatch_sample=mismatch_sample,
+            df1_unique_count=sum(s.df1_unique_count for s in summaries),
+            df2_unique_count=sum(s.df2_unique_count for s in summaries),
+            df1_unique_sample=_concat_head(
+                [s.df1_unique_sample for s in summaries], sample_size
+            ),
+            df2_unique_sample=_concat_head(
+                [s.df2_unique_sample for s in summaries], sample_size
+            ),
+            sample_size=sample_size,
+        )
+
+
+def summarise_compare(
+    compare: datacompy.Compare, sample_size: int = DEFAULT_SAMPLE_SIZE
+) -> ComparisonSummary:
+    """Summarise a datacompy comparison without rendering its full report.
+    Args:
+        compare (datacompy.Compare): The comparison to summarise.
+        sample_size (int): The maximum number of rows kept per sample.
+    Returns:
+        ComparisonSummary: The bounded summary of the comparison."""
+    rows = compare.intersect_rows
+    key_columns = list(compare.join_columns)
+    columns = [
+        column
+        for column in compare.intersect_columns()
+        if column not in key_columns
+    ]
+
+    # When the comparison is done on the index there are no key columns, the
+    # row index is used to identify the rows in the samples instead.
+    if key_columns:
+        keys = rows[key_columns].reset_index(drop=True)
+    else:
+        keys = pd.DataFrame({"index": rows.index.to_numpy()})
+
+    df1_values = {}
+    df2_values = {}
+    match_masks = {}
+    for column in columns:
+        df1_values[column] = rows[f"{column}_df1"].to_numpy()
+        df2_values[column] = rows[f"{column}_df2"].to_numpy()
+        match_masks[column] = rows[f"{column}_match"].to_numpy(dtype=bool)
+
+    return summarise_values(
+        keys,
+        df1_values,
+        df2_values,
+        match_masks,
+        df1_name=compare.df1_name,
+        df2_name=compare.df2_name,
+        df1_rows=len(compare.df1),
+        df2_rows=len(compare.df2),
+        df1_unique=compare.df1_unq_rows,
+        df2_unique=compare.df2_unq_rows,
+        sample_size=sample_size,
+    )
+
+
+def summarise_values(
+    keys: pd.DataFrame,
+    df1_values: dict,
+    df2_values: dict,
+    match_masks: dict,
+    df1_name: str = "PowerBI",
+    df2_name: str = "EDW",
+    df1_rows: int = None,
+    df2_rows: int = None,
+    df1_unique: pd.DataFrame = None,
+    df2_unique: pd.DataFrame = None,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ComparisonSummary:
+    """Build a summary from the aligned values of the rows found on both sides.
+    Args:
+        keys (pd.DataFrame): The key columns of the aligned rows.
+        df1_values (dict): Column name to the array of values of the first
+        dataframe, aligned with `keys`.
+        df2_values (dict): Column name to the array of values of the second
+        dataframe, aligned with `keys`.
+        match_masks (dict): Column name to a boolean array, True where the
+        values are considered equal.
+        df1_name (str): The name of the first dataframe.
+        df2_name (str): The name of the second dataframe.
+        df1_rows (int): The number of rows in the first dataframe. Defaults to
+        the aligned rows plus the unique rows.
+        df2_rows (int): The number of rows in the second dataframe. Defaults to
+        the aligned rows plus the unique rows.
+        df1_unique (pd.DataFrame): The rows only in the first dataframe.
+        df2_unique (pd.DataFrame): The rows only in the second dataframe.
+        sample_size (int): The maximum number of rows kept per sample.
+    Returns:
+        ComparisonSummary: The bounded summary."""
+    df1_unique = pd.DataFrame() if df1_unique is None else df1_unique
+    df2_unique = pd.DataFrame() if df2_unique is None else df2_unique
+    columns = list(match_masks)
+
+    # Vectorised statistics, one reduction per column over the whole array
+    mismatch_counts = [
+        int(np.count_nonzero(~match_masks[column])) for column in columns
+    ]
+    max_diffs = [
+        _max_abs_diff(df1_values[column], df2_values[column])
+        for column in columns
+    ]
+    column_stats = pd.DataFrame(
+        {"mismatch_count": mismatch_counts, "max_diff": max_diffs},
+        index=pd.Index(columns, name="column"),
+    )
+    matching_rows = np.ones(len(keys), dtype=bool)
+    for column in columns:
+        matching_rows &= np.asarray(match_masks[column], dtype=bool)
+
+    # Keep only the first `sample_size` mismatches of every column
+    samples = []
+    for column, count in zip(columns, mismatch_counts):
+        if not count:
+            continue
+        positions = np.flatnonzero(~match_masks[column])[:sample_size]
+        sample = keys.iloc[positions].reset_index(drop=True)
+        sample["column"] = column
+        sample[df1_name] = df1_values[column][positions]
+        sample[df2_name] = df2_values[column][positions]
+        samples.append(sample)
+    if samples:
+        mismatch_sample = pd.concat(samples, ignore_index=True)
+    else:
+        mismatch_sample = None
+
+    return ComparisonSummary(
+        df1_name=df1_name,
+        df2_name=df2_name,
+        key_columns=list(keys.columns),
+        df1_rows=len(keys) + len(df1_unique) if df1_rows is None else df1_rows,
+        df2_rows=len(keys) + len(df2_unique) if df2_rows is None else df2_rows,
+        intersect_rows=len(keys),
+        mismatch_rows=int(np.count_nonzero(~matching_rows)),
+        column_stats=column_stats,
+        mismatch_sample=mismatch_sample,
+        df1_unique_count=len(df1_unique),
+        df2_unique_count=len(df2_unique),
+        df1_unique_sample=df1_unique.head(sample_size),
+        df2_unique_sample=df2_unique.head(sample_size),
+        sample_size=sample_size,
+    )
+
+
+def write_report(
+    summary: ComparisonSummary, report_file: Union[Path, str]
+) -> Path:
+    """Write the full comparison report to a file, one section at a time. The
+    report is written as HTML when the file suffix is `.html`, and as plain
+    text otherwise.
+    Args:
+        summary (ComparisonSummary): The comparison summary.
+        report_file (Union[Path, str]): The report file path.
+    Returns:
+        Path: The report file path."""
+    report_file = Path(report_file)
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    as_html = report_file.suffix.lower() in (".html", ".htm")
+
+    with open(report_file, "w", encoding="utf-8") as file:
+        if as_html:
+            file.write("<html><body>\n")
+        for title, body in iter_report_sections(summary):
+            if as_html:
+                file.write(f"<h2>{html.escape(title)}</h2>\n")
+                file.write(f"<pre>{html.escape(body)}</pre>\n")
+            else:
+                file.write(f"{title}\n{'-' * len(title)}\n{body}\n\n")
+        if as_html:
+            file.write("</body></html>\n")
+
+    return report_file
+
+
+def iter_report_sections(
+    summary: ComparisonSummary,
+) -> Iterator[Tuple[str, str]]:
+    """Yield the sections of the comparison report as (title, body) tuples.
+    Args:
+        summary (ComparisonSummary): The comparison summary.
+    Returns:
+        Iterator[Tuple[str, str]]: The report sections."""
+    yield "Summary", _overview(summary)
+
+    stats = summary.column_stats
+    if stats.empty:
+        yield "Column Statistics", "No columns compared."
+    else:
+        yield "Column Statistics", stats.to_string()
+
+    # One section per mismatching column, with a capped sample of values
+    sample = summary.mismatch_sample
+    for column in summary.mismatched_columns:
+        column_sample = sample[sample["column"] == column].drop(
+            columns="column"
+        )
+        count = int(stats.at[column, "mismatch_count"])
+        title = (
+            f"Sample Mismatches for Column {column} "
+            f"({len(column_sample)} of {count})"
+        )
+        yield title, column_sample.to_string(index=False)
+
+    for name, count, unique_sample in (
+        (summary.df1_name, summary.df1_unique_count, summary.df1_unique_sample),
+        (summary.df2_name, summary.df2_unique_count, summary.df2_unique_sample),
+    ):
+        if count:
+            title = f"Sample Rows Only in {name} ({len(unique_sample)} of {count})"
+            yield title, unique_sample.to_string(index=False)
+
+
+def build_digest(
+    summary: ComparisonSummary, max_chars: int = DEFAULT_DIGEST_CHARS
+) -> str:
+    """Build a compact text digest of the comparison to be sent to Teams.
+    Args:
+        summary (ComparisonSummary): The comparison summary.
+        max_chars (int): The maximum number of characters of the digest.
+    Returns:
+        str: The digest, never longer than `max_chars`."""
+    lines = _overview(summary).splitlines()
+
+    mismatched = summary.column_stats.loc[summary.mismatched_columns]
+    if not mismatched.empty:
+        mismatched = mismatched.sort_values("mismatch_count", ascending=False)
+        lines.append("")
+        lines.extend(mismatched.to_string().splitlines())
+
+    return truncate_lines(lines, max_chars)
+
+
+def truncate_lines(lines: List[str], max_chars: int) -> str:
+    """Join the lines, dropping the trailing ones that do not fit.
+    Args:
+        lines (List[str]): The lines to join.
+        max_chars (int): The maximum number of characters of the result.
+    Returns:
+        str: The joined lines, with a note about the omitted lines."""
+    text = "\n".join(lines)
+    if len(text) <= max_chars:
+        return text
+
+    kept = []
+    size = 0
+    for position, line in enumerate(lines):
+        note = f"... {len(lines) - position} more lines omitted"
+        if size + len(line) + 1 + len(note) > max_chars:
+            return "\n".join(kept + [note])[:max_chars]
+        kept.append(line)
+        size += len(line) + 1
+    return "\n".join(kept)[:max_chars]
+
+
+def _overview(summary: ComparisonSummary) -> str:
+    """Return the row counts of the comparison as text."""
+    lines = [
+        f"{summary.df1_name} rows: {summary.df1_rows}",
+        f"{summary.df2_name} rows: {summary.df2_rows}",
+        f"Rows in common: {summary.intersect_rows}",
+        f"Rows only in {summary.df1_name}: {summary.df1_unique_count}",
+        f"Rows only in {summary.df2_name}: {summary.df2_unique_count}",
+        f"Columns with differences: {len(summary.mismatched_columns)}",
+        f"Values with differences: {summary.mismatch_count}",
+    ]
+    return "\n".join(lines)
+
+
+def _max_abs_diff(values1: np.ndarray, values2: np.ndarray) -> float:
+    """Return the largest absolute difference of two numeric arrays, or NaN
+    when the values are not numeric."""
+    try:
+        array1 = np.asarray(values1, dtype="float64")
+        array2 = np.asarray(values2, dtype="float64")
+    except (TypeError, ValueError):
+        return np.nan
+    if not array1.size:
+        return 0.0
+    diff = np.abs(array1 - array2)
+    if np.isnan(diff).all():
+        return np.nan
+    return float(np.nanmax(diff))
+
+
+def _concat_head(frames: List[pd.DataFrame], size: int) -> pd.DataFrame:
+    """Concatenate the non-empty frames and keep the first `size` rows."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).head(size)
@@ -16,6 +16,19 @@ def get_edw_connection(args: dict) -> adodbapi.Connection:
     return engine.connect()
 
 
+def get_edw_odbc_connection_string(args: dict) -> str:
+    """Returns the ODBC connection string of the CarharttDw database, used by
+    arrow-odbc to read the results as Arrow record batches.
+    Args:
+        args (dict): The arguments for the connection.
+    Returns:
+        str: The ODBC connection string."""
+    return (
+        f"Driver={{{args["driver"]}}};Server={args["server"]};"
+        f"Database={args["database"]};Trusted_Connection=yes;"
+    )
+
+
 def get_bi_connection(
     server: str = "powerbi://api.powerbi.com/v1.0/myorg/BI-WIP Data Quality & Support",
     database: str = "Data Flow Metrics",
@@ -75,9 +75,13 @@ class Database:
         columns = ", ".join(columns)
         values_placeholders = ", ".join(["?" for _ in range(len(values))])
         sql = f"INSERT INTO {table_name} ({columns}) VALUES ({values_placeholders})"
-        self.cursor.execute(sql, values)
-        self.conn.commit()
-        self.close()
+        try:
+            self.cursor.execute(sql, values)
+            self.conn.commit()
+        finally:
+            # A failed insert, e.g. a duplicate key, must not keep the
+            # database locked
+            self.close()
 
     def select(self, table_name: str, columns: List[str], where: str = None):
         """Select rows from the database."""
@@ -97,16 +101,19 @@ class Database:
         columns: List[str],
         values: List[str],
         where: str = None,
-    ):
-        """Update rows in the database."""
+    ) -> int:
+        """Update rows in the database and return the number of rows
+        updated."""
         self.open()
         columns = ", ".join([f"{col} = ?" for col in columns])
         sql = f"UPDATE {table_name} SET {columns}"
         if where:
             sql += f" WHERE {where}"
         self.cursor.execute(sql, values)
+        updated = self.cursor.rowcount
         self.conn.commit()
         self.close()
+        return updated
 
     def delete(self, table_name: str, where: str = None):
         """Delete rows from the database."""
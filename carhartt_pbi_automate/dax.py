@@ -1,7 +1,16 @@
 """This module contains functions to help parsing and transforming the DAX
 query"""
 
-from typing import Dict
+import re
+from typing import Dict, List
+
+_DAX_CORE_PATTERN = r"\bVAR\s+{name}\s*=(.*?)(?=\bVAR\b|\bEVALUATE\b)"
+_DAX_EVALUATE_PATTERN = re.compile(r"\bEVALUATE\s+(\w+)", re.IGNORECASE)
+_DAX_VAR_PATTERN = re.compile(r"\bVAR\s+(\w+)\s*=", re.IGNORECASE)
+_DAX_GROUP_COLUMN_PATTERN = re.compile(
+    r"^\s*'([^']+)'\[([^\]]+)\]\s*,", re.MULTILINE
+)
+_DAX_MEASURE_PATTERN = re.compile(r'"([^"]+)"\s*,\s*\'')
 
 
 def pass_args_to_dax_query(dax_query: str, args: Dict[str, str]) -> str:
@@ -29,3 +38,63 @@ def pass_args_to_dax_query(dax_query: str, args: Dict[str, str]) -> str:
             dax_query = dax_query.replace(f"@{key}", f'"{str(value)}"')
 
     return dax_query
+
+
+def parse_dax_columns(query: str) -> List[str]:
+    """Returns the names Power BI gives to the columns of a DAX query: the
+    group by columns of the variable it evaluates, `__DS0Core` in the queries
+    of Power BI, e.g. `Dates[Year/Period/Month]`, and its measures, e.g.
+    `[Sales_Demand_Units]`. A variable wrapping another one, e.g. the
+    `TOPN` of `__DS0PrimaryWindowed` copied from Power BI, has the columns
+    of the variable it wraps.
+    Args:
+        query (str): The DAX query.
+    Returns:
+        List[str]: The column names, in order.
+    """
+    evaluated = _DAX_EVALUATE_PATTERN.search(query)
+    name = evaluated[1] if evaluated else "__DS0Core"
+    variables = {
+        variable.lower(): variable
+        for variable in _DAX_VAR_PATTERN.findall(query)
+    }
+    followed = set()
+    body = query
+    while name.lower() not in followed:
+        followed.add(name.lower())
+        core = re.search(
+            _DAX_CORE_PATTERN.format(name=re.escape(name)),
+            query,
+            re.IGNORECASE | re.DOTALL,
+        )
+        if not core:
+            break
+        body = core[1]
+        if re.search(r"\bSUMMARIZECOLUMNS\b", body, re.IGNORECASE):
+            break
+        # Follow the first variable the body refers to
+        wrapped = [
+            variables[word.lower()]
+            for word in re.findall(r"\b\w+\b", body)
+            if word.lower() in variables
+        ]
+        if not wrapped:
+            break
+        name = wrapped[0]
+    columns = [
+        f"{table}[{column}]"
+        for table, column in _DAX_GROUP_COLUMN_PATTERN.findall(body)
+    ]
+    columns += [f"[{name}]" for name in _DAX_MEASURE_PATTERN.findall(body)]
+    return columns
+
+
+def strip_brackets(column: str) -> str:
+    """Returns the column name used in the dataframes, the Power BI column
+    name without brackets, e.g. `DatesYear/Period/Month`.
+    Args:
+        column (str): The Power BI column name.
+    Returns:
+        str: The column name without brackets.
+    """
+    return column.replace("[", "").replace("]", "")
@@ -0,0 +1,112 @@
+"""This module runs the DAX queries of several validation jobs on the same
+dataset as a single request: the definitions of the queries are merged in one
+`DEFINE` block, their variables renamed so they do not collide, followed by
+one `EVALUATE` statement per query. The result sets are split back with
+`cursor.nextset()`, so N validations cost one round trip to the Power BI
+service instead of N.
+
+The jobs running at the same time submit their query to a `DaxBatcher`, see
+`query_batcher`."""
+
+import re
+from typing import List, Tuple
+
+try:
+    from dax import strip_brackets
+    from query_batcher import DEFAULT_BATCH_WINDOW, QueryBatcher
+except ImportError:
+    from carhartt_pbi_automate.dax import strip_brackets
+    from carhartt_pbi_automate.query_batcher import (
+        DEFAULT_BATCH_WINDOW,
+        QueryBatcher,
+    )
+
+_DEFINE_PATTERN = re.compile(r"\bDEFINE\b", re.IGNORECASE)
+_EVALUATE_PATTERN = re.compile(r"\bEVALUATE\b", re.IGNORECASE)
+_VAR_PATTERN = re.compile(r"\bVAR\s+(\w+)", re.IGNORECASE)
+
+
+def batch_dax_queries(queries: List[str]) -> str:
+    """Combine DAX queries into a single query with one `EVALUATE` statement
+    per query, in order.
+    Args:
+        queries (List[str]): The DAX queries, with their parameters already
+        passed. Every query has a single `EVALUATE` statement.
+    Returns:
+        str: The combined query."""
+    definitions = []
+    statements = []
+    for index, query in enumerate(queries):
+        parts = _EVALUATE_PATTERN.split(query)
+        if len(parts) != 2:
+            raise ValueError(
+                f"Query {index} must have one EVALUATE statement. "
+                f"Not {len(parts) - 1}"
+            )
+        head, statement = parts
+        define = _DEFINE_PATTERN.search(head)
+        head = head[define.end() :] if define else ""
+
+        # The variables of every query get the suffix of the query, e.g.
+        # `__DS0Core` becomes `__DS0Core_1`
+        for name in set(_VAR_PATTERN.findall(head)):
+            variable = re.compile(rf"\b{re.escape(name)}\b")
+            head = variable.sub(f"{name}_{index}", head)
+            statement = variable.sub(f"{name}_{index}", statement)
+        definitions.append(head.strip())
+        statements.append(f"EVALUATE {statement.strip()}")
+
+    define_block = "\n\n".join(
+        definition for definition in definitions if definition
+    )
+    batch = "\n\n".join(statements)
+    return f"DEFINE\n{define_block}\n\n{batch}\n" if define_block else batch
+
+
+def execute_batch(
+    connection, queries: List[str]
+) -> List[Tuple[List[str], list]]:
+    """Run DAX queries as a single request and split the result sets.
+    Args:
+        connection: The connection to the Power BI dataset.
+        queries (List[str]): The DAX queries, see `batch_dax_queries`.
+    Returns:
+        List[Tuple[List[str], list]]: The column names, without brackets, and
+        the rows of every query."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(batch_dax_queries(queries))
+        results = []
+        for index in range(len(queries)):
+            if index and not cursor.nextset():
+                raise ValueError(
+                    f"The batch returned {index} result sets, "
+                    f"{len(queries)} were expected."
+                )
+            names = [
+                strip_brackets(column[0]) for column in cursor.description
+            ]
+            results.append((names, cursor.fetchall()))
+    finally:
+        cursor.close()
+    return results
+
+
+class DaxBatcher(QueryBatcher):
+    """This class runs the DAX queries of the jobs running at the same time
+    as batches, see `QueryBatcher`."""
+
+    def __init__(
+        self,
+        expected_queries: int = 1,
+        window_seconds: float = DEFAULT_BATCH_WINDOW,
+    ):
+        """Initialize the batcher.
+        Args:
+            expected_queries (int): Number of queries that run the batch as
+            soon as they are submitted, usually the number of jobs running at
+            a time.
+            window_seconds (float): Seconds the first query of a batch waits
+            for the other queries.
+        """
+        super().__init__(execute_batch, expected_queries, window_seconds)
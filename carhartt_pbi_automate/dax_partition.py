@@ -0,0 +1,225 @@
+"""This module splits a DAX query on the values of one of its `TREATAS`
+filters, e.g. the month offsets of `'Dates'[Current Month Offset]`, and runs
+the slices concurrently, each on its own MSOLAP session of a pool. The pool,
+and the governor shared by the pools of every job, cap the sessions opened at
+a time so the capacity of the Power BI dataset is not throttled. The rows of
+the slices are merged into a single dataframe.
+
+The filtered column must determine the group of every row of the results,
+otherwise a group would be split between two slices."""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import pandas as pd
+
+try:
+    from dax import strip_brackets
+    from frame_schema import FrameSchema
+    from get_logger import get_logger
+    from partitioned_extract import (
+        DEFAULT_MAX_SESSIONS,
+        DEFAULT_SLICES,
+        ConnectionPool,
+    )
+except ImportError:
+    from carhartt_pbi_automate.dax import strip_brackets
+    from carhartt_pbi_automate.frame_schema import FrameSchema
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.partitioned_extract import (
+        DEFAULT_MAX_SESSIONS,
+        DEFAULT_SLICES,
+        ConnectionPool,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# The column the month offsets of the Supply queries are filtered on
+DEFAULT_DAX_PARTITION_COLUMN = "'Dates'[Current Month Offset]"
+
+
+class DaxPartitionSpec:
+    """This class describes how the DAX query of a job is split: the column
+    of a `TREATAS` filter, whose values are divided into slices."""
+
+    def __init__(
+        self,
+        column: str = DEFAULT_DAX_PARTITION_COLUMN,
+        slices: int = DEFAULT_SLICES,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ):
+        """Initialize the partition.
+        Args:
+            column (str): The column of the `TREATAS` filter, as written in
+            the query, e.g. "'Dates'[Current Month Offset]".
+            slices (int): Number of slices. There are fewer slices when the
+            filter has fewer values.
+            max_sessions (int): Maximum number of slices run at a time.
+        """
+        if not column:
+            raise ValueError("column must not be empty.")
+        if slices < 1 or max_sessions < 1:
+            raise ValueError(
+                "slices and max_sessions must be 1 or greater. "
+                f"Not {slices} and {max_sessions}"
+            )
+        self.column = column
+        self.slices = slices
+        self.max_sessions = max_sessions
+
+    def queries(self, dax_query: str) -> List[str]:
+        """Return the query of every slice.
+        Args:
+            dax_query (str): The DAX query of the job.
+        Returns:
+            List[str]: The query filtered on the values of every slice."""
+        return split_treatas(dax_query, self.column, self.slices)
+
+    def __repr__(self) -> str:
+        return f"DaxPartitionSpec({self.column!r}, slices={self.slices})"
+
+
+def split_treatas(dax_query: str, column: str, slices: int) -> List[str]:
+    """Rewrite the `TREATAS` filter of a column into one query per slice of
+    its values.
+    Args:
+        dax_query (str): The DAX query.
+        column (str): The column of the filter, e.g.
+        "'Dates'[Current Month Offset]".
+        slices (int): Number of slices.
+    Returns:
+        List[str]: The queries, filtered on consecutive values."""
+    match, values = _find_treatas(dax_query, column)
+    start, end = match.span("values")
+    return [
+        f"{dax_query[:start]}{', '.join(chunk)}{dax_query[end:]}"
+        for chunk in _chunks(values, slices)
+    ]
+
+
+def treatas_values(dax_query: str, column: str) -> List[str]:
+    """Return the values of the `TREATAS` filter of a column, as written in
+    the query, e.g. ["-1", "0", "BLANK()"]."""
+    return _find_treatas(dax_query, column)[1]
+
+
+def extract_dax_partitioned(
+    pool: ConnectionPool,
+    dax_query: str,
+    schema: FrameSchema,
+    partition: DaxPartitionSpec,
+) -> pd.DataFrame:
+    """Run the slices of a DAX query concurrently and return the results with
+    the dtypes of a job schema.
+    Args:
+        pool (ConnectionPool): The Power BI sessions the slices run on.
+        dax_query (str): The DAX query, with its parameters already passed.
+        schema (FrameSchema): The schema of the job.
+        partition (DaxPartitionSpec): How the query is split.
+    Returns:
+        pd.DataFrame: The results of every slice."""
+    queries = partition.queries(dax_query)
+
+    def _run(slice_query: str) -> Tuple[List[str], list]:
+        """Run a slice on a session of the pool."""
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(slice_query)
+                rows = cursor.fetchall()
+                names = [
+                    strip_brackets(column[0]) for column in cursor.description
+                ]
+            finally:
+                cursor.close()
+        return names, rows
+
+    workers = min(len(queries), partition.max_sessions, pool.max_sessions)
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="DaxSlice"
+    ) as executor:
+        results = list(executor.map(_run, queries))
+    log.debug(
+        "Ran %s slices of %s on %s sessions.",
+        len(results),
+        partition.column,
+        pool.opened,
+    )
+
+    names = results[0][0]
+    rows = []
+    for slice_names, slice_rows in results:
+        if slice_names != names:
+            raise ValueError(
+                f"The slices return different columns: {names} and "
+                f"{slice_names}"
+            )
+        rows.extend(slice_rows)
+    frame = schema.from_rows(rows, names)
+    if frame.duplicated(schema.key_columns).any():
+        raise ValueError(
+            f"The partition column {partition.column} splits the groups of "
+            "the query, choose a column that determines the key columns."
+        )
+    return frame
+
+
+def _find_treatas(dax_query: str, column: str) -> Tuple[re.Match, List[str]]:
+    """Return the match of the `TREATAS` filter of a column and its values."""
+    pattern = re.compile(
+        r"\bTREATAS\s*\(\s*\{(?P<values>[^{}]*)\}\s*,\s*"
+        + re.escape(column)
+        + r"\s*\)",
+        re.IGNORECASE,
+    )
+    matches = list(pattern.finditer(dax_query))
+    if len(matches) != 1:
+        raise ValueError(
+            f"The DAX query must filter {column} with one TREATAS. "
+            f"Found {len(matches)}"
+        )
+    values = _split_values(matches[0]["values"])
+    if not values:
+        raise ValueError(f"The TREATAS filter of {column} has no values.")
+    return matches[0], values
+
+
+def _split_values(text: str) -> List[str]:
+    """Split the values of a table constructor on the commas outside of
+    strings and parentheses."""
+    values = []
+    depth = 0
+    quoted = False
+    start = 0
+    for index, char in enumerate(text):
+        if char == '"':
+            # Quotes in strings are doubled, "" toggles twice
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            values.append(text[start:index].strip())
+            start = index + 1
+    values.append(text[start:].strip())
+    return [value for value in values if value]
+
+
+def _chunks(values: List[str], slices: int) -> List[List[str]]:
+    """Divide values into consecutive chunks of sizes differing by one at
+    most."""
+    slices = min(slices, len(values))
+    size, extra = divmod(len(values), slices)
+    chunks = []
+    start = 0
+    for index in range(slices):
+        stop = start + size + (1 if index < extra else 0)
+        chunks.append(values[start:stop])
+        start = stop
+    return chunks
@@ -0,0 +1,442 @@
+"""This module provides local stand-ins for the backends of the pipeline, so it
+can run and be profiled without the EDW, Power BI or Microsoft Teams: a SQLite
+database with synthetic planning tables that runs the T-SQL queries, a Power
+BI connection that answers DAX queries, and an HTTP server that records the
+cards posted to it."""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from dax import parse_dax_columns
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.dax import parse_dax_columns
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Database and schema names removed from the T-SQL queries, the tables of the
+# stand-in live in a single SQLite database
+TSQL_QUALIFIERS = ("CarharttDw", "planning", "Dimensions")
+
+# Measure columns of the SizedWeeklyCombinedPlans table
+PLAN_MEASURES = (
+    "BeginningInventoryUnitsActual",
+    "EndingInventoryUnitsActual",
+    "TargetWeeksOfCoverageUnits",
+    "SafetyStockUnits",
+    "ConstrainedReceiptPlanUnits",
+    "CurrentTotalReceiptPlanUnits",
+    "PlannedProductionUnits",
+    "WorkInProgressUnits",
+    "InTransitUnits",
+    "SalesForecastUnits",
+)
+
+_QUALIFIER_PATTERN = re.compile(
+    r"\[(?:" + "|".join(TSQL_QUALIFIERS) + r")\]\.", re.IGNORECASE
+)
+_DECLARE_PATTERN = re.compile(r"\bDECLARE\s+@\w+\s+[^;]*;", re.IGNORECASE)
+_NOCOUNT_PATTERN = re.compile(r"\bSET\s+NOCOUNT\s+(?:ON|OFF)\s*;", re.I)
+_COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_SET_PATTERN = re.compile(
+    r"\bSET\s+(@\w+)\s*=\s*(.+?);", re.IGNORECASE | re.DOTALL
+)
+_DAX_PARAMETER_PATTERN = re.compile(r"@[A-Za-z_]\w*")
+_DAX_EVALUATE_PATTERN = re.compile(r"\bEVALUATE\b", re.IGNORECASE)
+
+
+class FakeEdwCursor(sqlite3.Cursor):
+    """Cursor of the EDW stand-in, the T-SQL statements are translated to
+    SQLite before they run. A batch of several statements returns one result
+    set per statement, `nextset` runs the next one."""
+
+    def execute(self, sql: str, parameters=()):  # pylint: disable=W0221
+        """Translate the statements and execute the first one."""
+        statements = split_statements(translate_tsql(sql))
+        self._statements = statements[1:]
+        return super().execute(statements[0], parameters)
+
+    def nextset(self) -> bool:
+        """Execute the next statement of the batch.
+        Returns:
+            bool: True, None when there is no other statement."""
+        if not getattr(self, "_statements", None):
+            return None
+        super().execute(self._statements.pop(0))
+        return True
+
+
+class FakeEdwConnection(sqlite3.Connection):
+    """Connection to the EDW stand-in. It can be passed to `pd.read_sql` in
+    place of the connection returned by `connector.get_edw_connection`."""
+
+    def cursor(self, factory=FakeEdwCursor):  # pylint: disable=W0221
+        """Return a cursor translating the T-SQL statements."""
+        return super().cursor(factory)
+
+
+class FakeBiCursor:
+    """Cursor of the Power BI stand-in. It answers a DAX query with a
+    dataframe and names the columns the way Power BI does, e.g.
+    `Dates[Year/Period/Month]` for a group by column and
+    `[Sales_Demand_Units]` for a measure. A query with several `EVALUATE`
+    statements returns one result set per statement, `nextset` moves to the
+    next one."""
+
+    def __init__(self, connection: "FakeBiConnection"):
+        """Initialize the cursor.
+        Args:
+            connection (FakeBiConnection): The connection of the cursor."""
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+        self._position = 0
+        self._result_sets = []
+
+    def execute(self, query: str):
+        """Run a DAX query.
+        Args:
+            query (str): The DAX query, with its parameters already passed."""
+        parameter = _DAX_PARAMETER_PATTERN.search(query)
+        if parameter:
+            raise ValueError(
+                f"The DAX query has a parameter without value: {parameter[0]}"
+            )
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+
+        # Every statement is answered as a query of its own, made of the
+        # definitions of the batch and the statement
+        parts = _DAX_EVALUATE_PATTERN.split(query)
+        if len(parts) > 2:
+            statements = [
+                f"{parts[0]}EVALUATE{statement}" for statement in parts[1:]
+            ]
+        else:
+            statements = [query]
+
+        results = self.connection.results
+        self._result_sets = []
+        for statement in statements:
+            frame = results(statement) if callable(results) else results
+            columns = parse_dax_columns(statement)
+            if len(columns) != len(frame.columns):
+                raise ValueError(
+                    f"The DAX query returns {len(columns)} columns, "
+                    f"the results have {len(frame.columns)}."
+                )
+            self._result_sets.append(
+                (columns, list(frame.itertuples(index=False, name=None)))
+            )
+        self.nextset()
+
+    def nextset(self) -> bool:
+        """Move to the next result set.
+        Returns:
+            bool: True, None when there is no other result set."""
+        if not self._result_sets:
+            return None
+        columns, self._rows = self._result_sets.pop(0)
+        self.description = tuple(
+            (column, None, None, None, None, None, None) for column in columns
+        )
+        self._position = 0
+        self.rowcount = len(self._rows)
+        return True
+
+    def fetchone(self) -> tuple:
+        """Return the next row, or None when every row was fetched."""
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: int = 1) -> List[tuple]:
+        """Return the next `size` rows."""
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self) -> List[tuple]:
+        """Return the rows not fetched yet."""
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self):
+        """Release the rows of the cursor."""
+        self._rows = []
+        self._result_sets = []
+
+
+class FakeBiConnection:
+    """Connection to the Power BI stand-in. It can be used in place of the
+    connection returned by `connector.get_bi_connection`."""
+
+    def __init__(
+        self,
+        results: Union[pd.DataFrame, Callable[[str], pd.DataFrame]],
+        latency: float = 0.0,
+    ):
+        """Initialize the connection.
+        Args:
+            results (Union[pd.DataFrame, Callable[[str], pd.DataFrame]]): The
+            results of every DAX query, or a function receiving the DAX query
+            and returning its results. The columns are in the order of the
+            columns of the query.
+            latency (float): Seconds every query waits before it returns, to
+            simulate the round trip to the Power BI service.
+        """
+        self.results = results
+        self.latency = latency
+
+    def cursor(self) -> FakeBiCursor:
+        """Return a new cursor."""
+        return FakeBiCursor(self)
+
+    def close(self):
+        """Close the connection, nothing to release."""
+
+
+class _WebhookSinkHandler(BaseHTTPRequestHandler):
+    """Request handler that records the posted cards and answers like the
+    Microsoft Teams incoming webhook."""
+
+    def do_POST(self):  # pylint: disable=C0103
+        """Record the posted card."""
+        sink = self.server.sink
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        if sink.latency:
+            time.sleep(sink.latency)
+        sink.requests.append(
+            {
+                "size": length,
+                "payload": json.loads(body) if sink.keep_payloads else None,
+            }
+        )
+        self.send_response(sink.status_code)
+        self.send_header("Content-Type", "text/plain")
+        self.end_headers()
+        self.wfile.write(b"1")
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        """Silence the request logs."""
+
+
+class WebhookSink:
+    """Local HTTP server standing in for a Microsoft Teams incoming webhook.
+    The posted cards are recorded in `requests`, set `status_code` to
+    simulate webhook failures."""
+
+    def __init__(
+        self,
+        status_code: int = 200,
+        latency: float = 0.0,
+        keep_payloads: bool = True,
+    ):
+        """Initialize the sink.
+        Args:
+            status_code (int): The status code of the answers.
+            latency (float): Seconds to wait before answering.
+            keep_payloads (bool): Whether to keep the posted payloads, or
+            only their size.
+        """
+        self.status_code = status_code
+        self.latency = latency
+        self.keep_payloads = keep_payloads
+        self.requests = []
+        self.url = None
+        self._server = None
+        self._thread = None
+
+    def start(self) -> "WebhookSink":
+        """Start listening on a free local port."""
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), _WebhookSinkHandler
+        )
+        self._server.sink = self
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/webhook"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="WebhookSink", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "WebhookSink":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def build_warehouse(
+    rows: int,
+    database: Union[Path, str] = ":memory:",
+    products: int = None,
+    seed: int = 0,
+    today: date = None,
+) -> FakeEdwConnection:
+    """Create the EDW stand-in with synthetic `Days`, `Products` and
+    `SizedWeeklyCombinedPlans` tables.
+    Args:
+        rows (int): Number of rows of the SizedWeeklyCombinedPlans table.
+        database (Union[Path, str]): The SQLite database file.
+        products (int): Number of products. Defaults to one product every 20
+        plan rows.
+        seed (int): Seed of the random generator, the same seed generates the
+        same tables.
+        today (date): The date whose day offset is 0. Defaults to today.
+    Returns:
+        FakeEdwConnection: The connection to the stand-in."""
+    if rows < 1:
+        raise ValueError(f"rows must be 1 or greater. Not {rows}")
+    products = products or max(10, rows // 20)
+    rng = np.random.default_rng(seed)
+    days = _days_table(today or date.today())
+    today_key = days.loc[days["CurrentDayOffset"] == 0, "DateKey"].iloc[0]
+    yesterday_key = days.loc[days["CurrentDayOffset"] == -1, "DateKey"].iloc[0]
+    week_keys = days.loc[days["DayOfWeek"] == 0, "DateKey"].to_numpy()
+
+    product_table = pd.DataFrame(
+        {
+            "ProductKey": np.arange(1, products + 1),
+            "Licensed": rng.choice(
+                np.array(["N", "Y", None], dtype=object),
+                products,
+                p=[0.8, 0.1, 0.1],
+            ),
+        }
+    )
+    plans = pd.DataFrame(
+        {
+            "PlanType": np.where(rng.random(rows) < 0.9, "NIGHTLY", "WEEKLY"),
+            "VersionDateKey": np.where(
+                rng.random(rows) < 0.9, today_key, yesterday_key
+            ),
+            "FiscalWeekDateKey": rng.choice(week_keys, rows),
+            "ProductKey": rng.integers(1, products + 1, rows),
+            "InventorySegment": np.where(
+                rng.random(rows) < 0.1, "ALL", "STANDARD"
+            ),
+        }
+    )
+    # Whole units, so the sums do not depend on the order of the rows
+    for measure in PLAN_MEASURES:
+        plans[measure] = rng.integers(0, 1000, rows).astype("float64")
+
+    connection = sqlite3.connect(
+        database, factory=FakeEdwConnection, check_same_thread=False
+    )
+    days.to_sql("Days", connection, if_exists="replace", index=False)
+    product_table.to_sql(
+        "Products", connection, if_exists="replace", index=False
+    )
+    plans.to_sql(
+        "SizedWeeklyCombinedPlans",
+        connection,
+        if_exists="replace",
+        index=False,
+        chunksize=100_000,
+    )
+    connection.executescript("""
+        CREATE INDEX IF NOT EXISTS DaysDateKey ON Days (DateKey);
+        CREATE INDEX IF NOT EXISTS ProductsProductKey ON Products (ProductKey);
+        """)
+    connection.commit()
+    log.debug("EDW stand-in built with %s plan rows.", rows)
+    return connection
+
+
+def translate_tsql(query: str) -> str:
+    """Translate the T-SQL of the EDW queries to SQLite. The database and
+    schema names are removed, and the variables declared with `DECLARE` and
+    set with `SET @name = (...)` are replaced by their value.
+    Args:
+        query (str): The T-SQL query.
+    Returns:
+        str: The SQLite query."""
+    query = _QUALIFIER_PATTERN.sub("", query)
+    query = _NOCOUNT_PATTERN.sub("", query)
+    query = _DECLARE_PATTERN.sub("", query)
+    variables = {}
+
+    def _set(match: re.Match) -> str:
+        variables[match[1]] = match[2].strip()
+        return ""
+
+    query = _SET_PATTERN.sub(_set, query)
+    for name, value in variables.items():
+        query = re.sub(
+            re.escape(name) + r"\b", lambda _, value=value: f"({value})", query
+        )
+    return query
+
+
+def split_statements(query: str) -> List[str]:
+    """Split SQLite statements on the semicolons ending them, leaving out the
+    statements made only of comments.
+    Args:
+        query (str): The SQLite statements.
+    Returns:
+        List[str]: The statements, at least one."""
+    statements = []
+    start = 0
+    for match in re.finditer(";", query):
+        if sqlite3.complete_statement(query[start : match.end()]):
+            statements.append(query[start : match.end()])
+            start = match.end()
+    statements.append(query[start:])
+    statements = [
+        statement
+        for statement in statements
+        if _COMMENT_PATTERN.sub("", statement).strip(" \t\r\n;")
+    ]
+    return statements or [query]
+
+
+def _days_table(today: date) -> pd.DataFrame:
+    """Return a calendar from two months before to seven months after the
+    month of `today`, with the offset columns relative to `today`."""
+    month = pd.Period(today, freq="M")
+    days = pd.date_range(
+        (month - 2).start_time, (month + 7).end_time.normalize(), freq="D"
+    )
+    today = pd.Timestamp(today)
+    return pd.DataFrame(
+        {
+            "DateKey": days.strftime("%Y%m%d").astype(int),
+            "YearPeriodMonth": days.strftime("%Y/%m"),
+            "WeekOfYear": (days.dayofyear - 1) // 7 + 1,
+            "DayOfWeek": days.dayofweek,
+            "CurrentDayOffset": (days - today).days,
+            "CurrentMonthOffset": (days.year - today.year) * 12
+            + days.month
+            - today.month,
+            "CurrentSeasonOffset": (days.year - today.year) * 2
+            + (days.month - 1) // 6
+            - (today.month - 1) // 6,
+            "CurrentYearOffset": days.year - today.year,
+        }
+    )
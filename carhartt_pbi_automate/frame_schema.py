@@ -0,0 +1,178 @@
+"""This module converts the extracted results to compact dtypes once, when they
+are loaded: the keys become categoricals, the measures float64 or Int64
+instead of object columns of `Decimal` values, and only the compared columns
+are kept."""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    from dax import parse_dax_columns, strip_brackets
+except ImportError:
+    from carhartt_pbi_automate.dax import parse_dax_columns, strip_brackets
+
+
+DEFAULT_MEASURE_DTYPE = "float64"
+
+# Dtypes a measure can be loaded as
+MEASURE_DTYPES = ("float64", "Int64")
+
+
+class FrameSchema:
+    """This class describes the columns of the results of a job: the key
+    columns and the measure columns with their dtype."""
+
+    def __init__(self, key_columns: List[str], measures: Dict[str, str]):
+        """Initialize the schema.
+        Args:
+            key_columns (List[str]): The key columns, loaded as categoricals.
+            measures (Dict[str, str]): The dtype of every measure column,
+            "float64" or "Int64".
+        """
+        if not key_columns:
+            raise ValueError("key_columns must contain at least one column.")
+        for measure, dtype in measures.items():
+            if dtype not in MEASURE_DTYPES:
+                raise ValueError(
+                    f"The dtype of {measure} must be one of {MEASURE_DTYPES}. "
+                    f"Not {dtype}"
+                )
+        self.key_columns = list(key_columns)
+        self.measures = dict(measures)
+
+    @classmethod
+    def from_dax(
+        cls,
+        dax_query: str,
+        measure_dtypes: Dict[str, str] = None,
+    ) -> "FrameSchema":
+        """Build the schema of a job from its DAX query: the group by columns
+        are the keys and the measures are loaded as float64.
+        Args:
+            dax_query (str): The DAX query of the job.
+            measure_dtypes (Dict[str, str]): The dtype of the measures that
+            are not float64, e.g. {"Sales_Demand_Units": "Int64"}.
+        Returns:
+            FrameSchema: The schema of the job."""
+        measure_dtypes = measure_dtypes or {}
+        key_columns = []
+        measures = {}
+        for column in parse_dax_columns(dax_query):
+            name = strip_brackets(column)
+            if column.startswith("["):
+                measures[name] = measure_dtypes.get(
+                    name, DEFAULT_MEASURE_DTYPE
+                )
+            else:
+                key_columns.append(name)
+        return cls(key_columns, measures)
+
+    @property
+    def columns(self) -> List[str]:
+        """Return the key columns followed by the measure columns."""
+        return self.key_columns + list(self.measures)
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Keep the columns of the schema and convert them to their dtypes.
+        Measures missing in the frame are left out, so both sides can be
+        compared on the columns they have.
+        Args:
+            frame (pd.DataFrame): The extracted results.
+        Returns:
+            pd.DataFrame: A new dataframe with the converted columns."""
+        self._check_keys(frame.columns)
+        columns = {
+            name: self._convert(name, frame[name])
+            for name in self.columns
+            if name in frame.columns
+        }
+        return pd.DataFrame(columns)
+
+    def from_rows(
+        self, rows: Sequence[tuple], column_names: List[str]
+    ) -> pd.DataFrame:
+        """Build a dataframe from the rows fetched from a cursor, converting
+        every column once instead of building an object dataframe first.
+        Args:
+            rows (Sequence[tuple]): The fetched rows.
+            column_names (List[str]): The names of the columns of the rows.
+        Returns:
+            pd.DataFrame: The dataframe with the columns of the schema."""
+        self._check_keys(column_names)
+        values = np.array(list(rows), dtype=object)
+        values = values.reshape(len(values), len(column_names))
+        positions = {name: index for index, name in enumerate(column_names)}
+        columns = {
+            name: self._convert(name, pd.Series(values[:, positions[name]]))
+            for name in self.columns
+            if name in positions
+        }
+        return pd.DataFrame(columns)
+
+    def from_arrow(self, table: pa.Table) -> pd.DataFrame:
+        """Build a dataframe from an Arrow table. The columns are converted in
+        Arrow, the keys dictionary encoded and the measures cast, so pandas
+        receives the numeric columns without a copy.
+        Args:
+            table (pa.Table): The extracted results.
+        Returns:
+            pd.DataFrame: The dataframe with the columns of the schema."""
+        self._check_keys(table.column_names)
+        names = [name for name in self.columns if name in table.column_names]
+        arrays = []
+        for name in names:
+            column = table.column(name)
+            if name in self.measures:
+                column = column.cast(
+                    pa.int64()
+                    if self.measures[name] == "Int64"
+                    else pa.float64()
+                )
+            else:
+                if pa.types.is_string(column.type) or pa.types.is_large_string(
+                    column.type
+                ):
+                    column = pc.utf8_trim_whitespace(column)
+                column = column.dictionary_encode()
+            arrays.append(column)
+        frame = pa.table(arrays, names=names).to_pandas(
+            types_mapper={pa.int64(): pd.Int64Dtype()}.get,
+            split_blocks=True,
+            self_destruct=True,
+        )
+        # Arrow keeps the categories in the order they appear, pandas sorts
+        # them, both sides of the comparison must have the same order
+        for name in self.key_columns:
+            if name in frame.columns:
+                categories = frame[name].cat.categories
+                frame[name] = frame[name].cat.set_categories(
+                    categories.sort_values()
+                )
+        return frame
+
+    def _check_keys(self, column_names: Sequence[str]):
+        """Raise a ValueError if a key column is missing."""
+        missing = [
+            name for name in self.key_columns if name not in column_names
+        ]
+        if missing:
+            raise ValueError(
+                f"Key columns not found in the results: {missing}"
+            )
+
+    def _convert(self, name: str, column: pd.Series) -> pd.Series:
+        """Convert a column to the dtype of the schema."""
+        if name in self.measures:
+            if column.dtype == object:
+                column = pd.to_numeric(column)
+            return column.astype(self.measures[name])
+        # Object columns of numbers, e.g. the product keys fetched from a
+        # cursor, get the dtype they would get in a dataframe
+        column = column.infer_objects()
+        if column.dtype == object:
+            column = column.str.strip()
+        return column.astype("category")
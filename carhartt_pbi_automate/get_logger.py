@@ -1,8 +1,158 @@
-"""This module contains functions that create and return a logger object."""
+"""This module contains functions that create and return a logger object.
 
+The log files are pipe-delimited text by default. With the `LOG_FORMAT`
+environment variable set to `json` they are newline-delimited JSON instead,
+one object per record with the run id, job, stage and duration of the
+`log_context` and `log_stage` blocks, so they can be shipped and queried
+without parsing the lines.
+
+Each named logger is configured once. The loggers writing to the same file
+share its handler, and the records are written by a single background
+thread, fed by a queue, so logging does not block the calling thread on the
+disk or the console."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Union
+from typing import Any, Dict, Iterator, List, Tuple, Union
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+# orjson serialises several times faster than the json module, it is used
+# when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# The environment variable selecting the format of the log files
+LOG_FORMAT_ENV = "LOG_FORMAT"
+
+# The attributes every LogRecord has, the other ones are passed in `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+# The fields added to the records logged inside `log_context` blocks
+_log_context: ContextVar[Dict[str, Any]] = ContextVar(
+    "log_context", default={}
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """This class formats a record as a single line of JSON. The fields
+    passed in `extra` or set by `log_context` are added to the object, a
+    callable value is called only when the record is formatted, as is the
+    formatting of the stack trace of `exc_info`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value() if callable(value) else value
+        if record.exc_info:
+            # The stack trace is formatted once, for every handler
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return dumps(entry)
+
+
+class ContextFilter(logging.Filter):
+    """This class adds the fields of the current `log_context` to the
+    records. It runs in the thread logging the record, so each job of the
+    scheduler keeps its own run id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+# A single filter, `addFilter` does not add it twice to a logger
+CONTEXT_FILTER = ContextFilter()
+
+
+class QueueRoutingHandler(QueueHandler):
+    """This class puts the records of a logger on the logging queue, with
+    the handlers that write them. The background thread hands each record to
+    those handlers only, so the loggers keep their own files and levels."""
+
+    def __init__(
+        self, log_queue: queue.Queue, handlers: List[logging.Handler]
+    ):
+        """Initialize the handler.
+        Args:
+            log_queue (queue.Queue): The logging queue.
+            handlers (List[logging.Handler]): The handlers writing the
+            records.
+        """
+        super().__init__(log_queue)
+        self.handlers = list(handlers)
+        # Records no handler would write are dropped in the calling thread
+        self.setLevel(min(handler.level for handler in self.handlers))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Return a copy of the record with its message merged, since the
+        arguments could change before the record is written. The stack trace
+        is kept, it is formatted by the background thread."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record._handlers = self.handlers  # pylint: disable=protected-access
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """Put the record on the queue, or write it now when the background
+        thread is not running in this process, e.g. in a forked process or
+        once logging has been stopped."""
+        if _listener is None or _listener_pid != os.getpid():
+            _dispatch(record)
+        else:
+            self.queue.put_nowait(record)
+
+
+class RoutingQueueListener(QueueListener):
+    """This class writes the records of the logging queue with the handlers
+    they carry."""
+
+    def handle(self, record: logging.LogRecord):
+        _dispatch(record)
+
+
+# The registry of the loggers: the loggers configured by `get_logger`, the
+# handlers of the log files by path and format, and the logging queue
+_registry_lock = threading.RLock()
+_loggers: Dict[str, logging.Logger] = {}
+_file_handlers: Dict[Tuple[str, str], logging.FileHandler] = {}
+_file_handler_users: Dict[Tuple[str, str], int] = {}
+_console_handler: logging.Handler = None
+_log_queue: queue.Queue = queue.Queue()
+_listener: RoutingQueueListener = None
+_listener_pid: int = None
 
 
 def get_logger(
@@ -10,54 +160,204 @@ def get_logger(
     logfile: Union[Path, str] = None,
     level: int = logging.DEBUG,
     console_output: bool = True,
+    structured: bool = None,
 ) -> logging.Logger:
     """
-    Get a logger object.
+    Get a logger object. A logger is configured by the first call with its
+    name, the next calls return it as it is.
     Args:
         name (str): The name of the logger.
         logfile (Union[Path, str], optional): The logfile path. Defaults to None.
         level (int, optional): The logging level. Defaults to logging.DEBUG.
         console_output (bool, optional): Whether to output logs to the console.
+        structured (bool, optional): Whether to write the logfile as JSON
+        lines, with the `.jsonl` suffix. Defaults to the `LOG_FORMAT`
+        environment variable.
     Returns:
         logging.Logger: The logger object.
     """
-    # Initialize the logfile if it is not provided
-    if not logfile:
-        logfile = f"{name}.log"
+    with _registry_lock:
+        if name in _loggers:
+            return _loggers[name]
+
+        # Initialize the logfile if it is not provided
+        if not logfile:
+            logfile = f"{name}.log"
+        if structured is None:
+            structured = os.environ.get(LOG_FORMAT_ENV, "").lower() == "json"
 
-    # create a logger object
-    created_logger = logging.getLogger(name)
+        # create a logger object
+        created_logger = logging.getLogger(name)
 
-    # set the logging level
-    created_logger.setLevel(level)
+        # set the logging level
+        created_logger.setLevel(level)
 
-    # create a formatter
-    format_string = "%(asctime)s|%(name)s|%(levelname)s|%(message)s"
-    formatter = logging.Formatter(format_string)
+        # Add the fields of the log context to the records
+        created_logger.addFilter(CONTEXT_FILTER)
 
-    # Create the file if it does not exist, and write the column names
-    touch_file(logfile, format_string)
+        # create a formatter
+        if structured:
+            formatter = JsonFormatter()
+            logfile = Path(logfile).with_suffix(".jsonl")
+            Path(logfile).parent.mkdir(parents=True, exist_ok=True)
+        else:
+            format_string = "%(asctime)s|%(name)s|%(levelname)s|%(message)s"
+            formatter = logging.Formatter(format_string)
 
-    # create a file handler
-    file_handler = logging.FileHandler(logfile)
+            # Create the file if it does not exist, and write the column names
+            touch_file(logfile, format_string)
 
-    # set the formatter
-    file_handler.setFormatter(formatter)
+        # Get the file handler, shared with the loggers of the same file, and
+        # set its logging level
+        file_handler = shared_file_handler(logfile, formatter)
+        file_handler.setLevel(logging.DEBUG)
+        handlers = [file_handler]
 
-    # set the logging level for the file handler
-    file_handler.setLevel(logging.DEBUG)
+        # If console_output is True, add the console handler
+        if console_output:
+            handlers.append(_get_console_handler())
 
-    # If console_output is True, create a console handler
-    if console_output:
-        console_handler = logging.StreamHandler()
-        console_formatter = logging.Formatter("%(message)s")
-        console_handler.setFormatter(console_formatter)
-        console_handler.setLevel(logging.INFO)
-        created_logger.addHandler(console_handler)
+        # The records are written by the background thread
+        created_logger.addHandler(routing_handler(handlers))
+        _loggers[name] = created_logger
+        return created_logger
 
-    # add the file handler to the logger
-    created_logger.addHandler(file_handler)
-    return created_logger
+
+def shared_file_handler(
+    logfile: Union[Path, str], formatter: logging.Formatter
+) -> logging.FileHandler:
+    """Return the handler writing a log file with a formatter. The loggers
+    writing to the same file share its handler, so the file is opened once
+    and the lines of two loggers do not interleave. Every call must be
+    matched by a `release_file_handler` call, the file is closed by the last
+    one.
+    Args:
+        logfile (Union[Path, str]): The logfile path.
+        formatter (logging.Formatter): The formatter of the lines.
+    Returns:
+        logging.FileHandler: The file handler."""
+    key = (
+        str(Path(logfile).resolve()),
+        f"{type(formatter).__name__}:{formatter._fmt}",  # pylint: disable=W0212
+    )
+    with _registry_lock:
+        if key not in _file_handlers:
+            Path(logfile).parent.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.FileHandler(logfile, encoding="utf-8")
+            file_handler.setFormatter(formatter)
+            _file_handlers[key] = file_handler
+            _file_handler_users[key] = 0
+        _file_handler_users[key] += 1
+        return _file_handlers[key]
+
+
+def release_file_handler(file_handler: logging.Handler):
+    """Release a handler returned by `shared_file_handler`. The records on
+    the logging queue are written, and the file is closed once no other
+    logger writes to it.
+    Args:
+        file_handler (logging.Handler): The file handler."""
+    with _registry_lock:
+        for key, handler in list(_file_handlers.items()):
+            if handler is not file_handler:
+                continue
+            _file_handler_users[key] -= 1
+            if _file_handler_users[key] == 0:
+                flush_logs()
+                handler.close()
+                del _file_handlers[key]
+                del _file_handler_users[key]
+            return
+
+
+def routing_handler(handlers: List[logging.Handler]) -> QueueRoutingHandler:
+    """Return a handler putting the records of a logger on the logging
+    queue, written by the background thread with the given handlers.
+    Args:
+        handlers (List[logging.Handler]): The handlers writing the records.
+    Returns:
+        QueueRoutingHandler: The handler to add to the logger."""
+    _start_listener()
+    return QueueRoutingHandler(_log_queue, handlers)
+
+
+def get_handlers(logger: logging.Logger) -> List[logging.Handler]:
+    """Return the handlers writing the records of a logger, including the
+    ones behind its queue handler."""
+    handlers = []
+    for handler in logger.handlers:
+        if isinstance(handler, QueueRoutingHandler):
+            handlers.extend(handler.handlers)
+        else:
+            handlers.append(handler)
+    return handlers
+
+
+def flush_logs():
+    """Wait until the records on the logging queue are written, and flush
+    the log files."""
+    if _listener is not None and _listener_pid == os.getpid():
+        _log_queue.join()
+    with _registry_lock:
+        handlers = list(_file_handlers.values())
+    for handler in handlers:
+        handler.flush()
+
+
+def close_logger(name: str):
+    """Remove a logger from the registry, the next `get_logger` call with its
+    name configures it again. The log files no other logger writes to are
+    closed.
+    Args:
+        name (str): The name of the logger."""
+    with _registry_lock:
+        created_logger = _loggers.pop(name, None)
+        if created_logger is None:
+            return
+        for handler in list(created_logger.handlers):
+            if isinstance(handler, QueueRoutingHandler):
+                created_logger.removeHandler(handler)
+                for routed in handler.handlers:
+                    release_file_handler(routed)
+
+
+def stop_logging():
+    """Write the records left on the logging queue and stop the background
+    thread. The records logged afterwards are written by the calling thread.
+    It runs when the interpreter exits."""
+    global _listener  # pylint: disable=global-statement
+    with _registry_lock:
+        listener, _listener = _listener, None
+    if listener is not None and _listener_pid == os.getpid():
+        listener.stop()
+
+
+def _start_listener():
+    """Start the background thread writing the records of this process."""
+    global _listener, _listener_pid  # pylint: disable=global-statement
+    if _listener is None or _listener_pid != os.getpid():
+        if _listener_pid is None:
+            atexit.register(stop_logging)
+        _listener = RoutingQueueListener(_log_queue)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def _get_console_handler() -> logging.Handler:
+    """Return the console handler shared by the loggers."""
+    global _console_handler  # pylint: disable=global-statement
+    if _console_handler is None:
+        _console_handler = logging.StreamHandler()
+        _console_handler.setFormatter(logging.Formatter("%(message)s"))
+        _console_handler.setLevel(logging.INFO)
+    return _console_handler
+
+
+def _dispatch(record: logging.LogRecord):
+    """Write a record with the handlers it carries."""
+    for handler in record._handlers:  # pylint: disable=protected-access
+        if record.levelno >= handler.level:
+            handler.handle(record)
 
 
 def touch_file(filepath: Union[Path, str], columns: str) -> str:
@@ -80,6 +380,57 @@ def touch_file(filepath: Union[Path, str], columns: str) -> str:
     return filepath
 
 
+@contextmanager
+def log_context(**fields) -> Iterator[Dict[str, Any]]:
+    """Add fields, e.g. the run id and the job, to the records logged in the
+    block, in the current thread.
+    Args:
+        **fields: The fields and their values.
+    Yields:
+        Dict[str, Any]: The fields of the context."""
+    context = {**_log_context.get(), **fields}
+    token = _log_context.set(context)
+    try:
+        yield context
+    finally:
+        _log_context.reset(token)
+
+
+@contextmanager
+def log_stage(logger: logging.Logger, stage: str, **fields) -> Iterator[None]:
+    """Add the stage to the records logged in the block, and log its duration
+    when it ends.
+    Args:
+        logger (logging.Logger): The logger of the duration.
+        stage (str): The name of the stage, e.g. `extract_edw`.
+        **fields: Other fields of the records of the stage."""
+    start = time.perf_counter()
+    with log_context(stage=stage, **fields):
+        try:
+            yield
+        finally:
+            duration = round(time.perf_counter() - start, 3)
+            logger.debug(
+                "Stage %s took %s seconds.",
+                stage,
+                duration,
+                extra={"duration": duration},
+            )
+
+
+def new_run_id() -> str:
+    """Return a new id for a run of a job."""
+    return uuid.uuid4().hex[:12]
+
+
+def dumps(entry: Dict[str, Any]) -> str:
+    """Serialise a log entry to JSON, with orjson when it is installed. The
+    values JSON does not support are written as strings."""
+    if orjson is not None:
+        return orjson.dumps(entry, default=str).decode("utf-8")
+    return json.dumps(entry, default=str, ensure_ascii=False)
+
+
 if __name__ == "__main__":
     # Send log messages
     logger = get_logger("test", "logs/test.log")
@@ -0,0 +1,448 @@
+"""This module loads the job manifest, a TOML file listing the validation jobs
+with their query files, parameters, tolerances, schedules and priorities. The
+manifest replaces one Windows Task Scheduler task per job: the jobs are run
+by the scheduler of `run_jobs.py`, in a single process.
+
+Example:
+    [scheduler]
+    max_concurrent = 2
+
+    [defaults]
+    schedule = "0 9 * * *"
+
+    [[jobs]]
+    name = "Supply - Inventory Demand Sales"
+    daxfile = "queries/Supply - Inventory Demand Sales.msdax"
+    sqlfile = "queries/Supply - Inventory Demand Sales.sql"
+    priority = 10
+    memory_budget = "4GB"
+
+    [jobs.parameters]
+    plan_versions = "NIGHTLY-{now.month}/{now.day}/{now.year}"
+
+    [jobs.tolerances]
+    In_Transit_Units = { abs = 0.5 }
+
+    [jobs.readiness]
+    edw_probe = "queries/readiness/EDW nightly plans.sql"
+    power_bi_probe = "queries/readiness/Power BI nightly plan.msdax"
+
+    [jobs.partition]
+    column = "[DT].[CurrentMonthOffset]"
+    start = -1
+    stop = 6
+    slices = 4
+
+    [jobs.dax_partition]
+    column = "'Dates'[Current Month Offset]"
+    max_sessions = 2
+
+    [jobs.sample]
+    sql_column = "[SCP].[ProductKey]"
+    dax_column = "'Products'[Product Key]"
+    rate = 0.01
+"""
+
+import tomllib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+try:
+    from arrow_extract import DEFAULT_EXTRACT_BACKEND, EXTRACT_BACKENDS
+    from dax_partition import DaxPartitionSpec
+    from partitioned_extract import PartitionSpec
+    from readiness import ReadinessGate
+    from sampling import SampleSpec
+    from spill_compare import parse_memory_budget
+    from tolerance_compare import DEFAULT_ABS_TOL, DEFAULT_REL_TOL
+except ImportError:
+    from carhartt_pbi_automate.arrow_extract import (
+        DEFAULT_EXTRACT_BACKEND,
+        EXTRACT_BACKENDS,
+    )
+    from carhartt_pbi_automate.dax_partition import DaxPartitionSpec
+    from carhartt_pbi_automate.partitioned_extract import PartitionSpec
+    from carhartt_pbi_automate.readiness import ReadinessGate
+    from carhartt_pbi_automate.sampling import SampleSpec
+    from carhartt_pbi_automate.spill_compare import parse_memory_budget
+    from carhartt_pbi_automate.tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+    )
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# The manifest read by `run_jobs.py` when none is given
+DEFAULT_MANIFEST = ROOT_DIR / "jobs.toml"
+
+# Every day at 09:00, the schedule of the former Task Scheduler tasks
+DEFAULT_SCHEDULE = "0 9 * * *"
+
+# Settings of the scheduler, read from the `[scheduler]` table
+DEFAULT_MAX_CONCURRENT = 1
+DEFAULT_POLL_SECONDS = 30.0
+
+# Keys a job can have, a typo in the manifest is an error rather than a
+# setting silently ignored
+JOB_KEYS = (
+    "name",
+    "daxfile",
+    "sqlfile",
+    "schedule",
+    "priority",
+    "enabled",
+    "parameters",
+    "abs_tol",
+    "rel_tol",
+    "tolerances",
+    "measure_dtypes",
+    "compare_workers",
+    "extract_backend",
+    "memory_budget",
+    "digest_partitions",
+    "bloom",
+    "merge",
+    "partition",
+    "dax_partition",
+    "sample",
+    "readiness",
+)
+
+# Keys of the `readiness` table of a job
+READINESS_KEYS = (
+    "edw_probe",
+    "power_bi_probe",
+    "timeout",
+    "base_delay",
+    "max_delay",
+)
+
+# Keys of the `partition` table of a job
+PARTITION_KEYS = ("column", "start", "stop", "slices", "max_sessions")
+
+# Keys of the `dax_partition` table of a job
+DAX_PARTITION_KEYS = ("column", "slices", "max_sessions")
+
+# Keys of the `sample` table of a job
+SAMPLE_KEYS = (
+    "sql_column",
+    "dax_column",
+    "rate",
+    "confidence",
+    "buckets",
+    "min_rows",
+)
+
+
+class JobSpec:
+    """This class describes a validation job: the queries it compares, how it
+    compares them, and when it runs."""
+
+    def __init__(
+        self,
+        name: str,
+        daxfile: Union[Path, str],
+        sqlfile: Union[Path, str],
+        schedule: str = DEFAULT_SCHEDULE,
+        priority: int = 0,
+        enabled: bool = True,
+        parameters: Dict[str, str] = None,
+        abs_tol: float = DEFAULT_ABS_TOL,
+        rel_tol: float = DEFAULT_REL_TOL,
+        tolerances: Dict[str, Tuple[float, float]] = None,
+        measure_dtypes: Dict[str, str] = None,
+        compare_workers: int = 1,
+        extract_backend: str = DEFAULT_EXTRACT_BACKEND,
+        memory_budget: Union[int, str] = None,
+        digest_partitions: int = None,
+        bloom: bool = False,
+        merge: bool = False,
+        partition: PartitionSpec = None,
+        dax_partition: DaxPartitionSpec = None,
+        sample: SampleSpec = None,
+        readiness: ReadinessGate = None,
+    ):
+        """Initialize the job.
+        Args:
+            name (str): The name of the job, shown in the notifications.
+            daxfile (Union[Path, str]): The DAX query run on Power BI.
+            sqlfile (Union[Path, str]): The SQL query run on the EDW.
+            schedule (str): The cron expression of the job.
+            priority (int): Jobs due at the same time start by the highest
+            priority.
+            enabled (bool): Whether the scheduler runs the job.
+            parameters (Dict[str, str]): The parameters of the DAX query. The
+            values are formatted with `now`, the time the job starts.
+            abs_tol (float): The default absolute tolerance.
+            rel_tol (float): The default relative tolerance.
+            tolerances (Dict[str, Tuple[float, float]]): The (absolute,
+            relative) tolerances of some columns.
+            measure_dtypes (Dict[str, str]): The dtype of the measures that
+            are not loaded as float64.
+            compare_workers (int): Number of processes comparing the results.
+            extract_backend (str): How the EDW data is extracted, "pandas"
+            with `pd.read_sql` or "arrow" as an Arrow table.
+            memory_budget (Union[int, str]): Bytes the comparison may use,
+            e.g. "4GB". Larger results are spilled to disk and compared one
+            partition at a time. Without it the results are compared in
+            memory.
+            digest_partitions (int): Number of partitions of the keys whose
+            column digests are compared first, only the columns and
+            partitions with different digests are then compared cell by
+            cell. Without it every cell is compared.
+            bloom (bool): Whether the keys of each side are put in a Bloom
+            filter first, the rows whose key is only on one side are counted
+            without being joined. Both queries are read in chunks, the DAX
+            query twice, and only the other rows are held and compared,
+            within the `memory_budget`.
+            merge (bool): Whether the rows are compared as they are read from
+            the cursors of both queries, a chunk at a time, instead of being
+            extracted first. Both queries must sort their rows on the key
+            columns, the text keys of the SQL query with `COLLATE
+            Latin1_General_BIN2`, see `merge_compare`.
+            partition (PartitionSpec): Splits the SQL query into slices read
+            in parallel. Without it the query is read on one connection.
+            dax_partition (DaxPartitionSpec): Splits the DAX query into slices
+            run concurrently. Without it the query runs on one session.
+            sample (SampleSpec): Compares a sample of the keys first, the
+            full data is only compared when the sample has discrepancies.
+            readiness (ReadinessGate): Holds the job back until the data is
+            ready. Without it the job runs as soon as it is due.
+        """
+        if not name:
+            raise ValueError("name must not be empty.")
+        if compare_workers < 1:
+            raise ValueError(
+                f"compare_workers must be 1 or greater. Not {compare_workers}"
+            )
+        if digest_partitions is not None and digest_partitions < 1:
+            raise ValueError(
+                "digest_partitions must be 1 or greater. "
+                f"Not {digest_partitions}"
+            )
+        if bloom and (
+            digest_partitions is not None
+            or partition is not None
+            or dax_partition is not None
+        ):
+            raise ValueError(
+                "bloom cannot be set with digest_partitions, partition or "
+                "dax_partition on the same job."
+            )
+        if merge and (
+            bloom
+            or digest_partitions is not None
+            or partition is not None
+            or dax_partition is not None
+        ):
+            raise ValueError(
+                "merge cannot be set with bloom, digest_partitions, partition "
+                "or dax_partition on the same job."
+            )
+        if extract_backend not in EXTRACT_BACKENDS:
+            raise ValueError(
+                f"extract_backend must be one of {EXTRACT_BACKENDS}. "
+                f"Not {extract_backend}"
+            )
+        self.name = name
+        self.daxfile = Path(daxfile)
+        self.sqlfile = Path(sqlfile)
+        self.schedule = schedule
+        self.priority = priority
+        self.enabled = enabled
+        self.parameters = dict(parameters or {})
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+        self.tolerances = dict(tolerances or {})
+        self.measure_dtypes = dict(measure_dtypes or {})
+        self.compare_workers = compare_workers
+        self.extract_backend = extract_backend
+        if memory_budget is not None:
+            memory_budget = parse_memory_budget(memory_budget)
+        self.memory_budget = memory_budget
+        self.digest_partitions = digest_partitions
+        self.bloom = bloom
+        self.merge = merge
+        self.partition = partition
+        self.dax_partition = dax_partition
+        self.sample = sample
+        self.readiness = readiness
+
+    def render_parameters(self, now: datetime = None) -> Dict[str, str]:
+        """Return the parameters of the DAX query for a run of the job.
+        Args:
+            now (datetime): The time the job starts. Defaults to now.
+        Returns:
+            Dict[str, str]: The parameters, formatted with `now`."""
+        now = now or datetime.now()
+        return {
+            name: str(value).format(now=now)
+            for name, value in self.parameters.items()
+        }
+
+    def __repr__(self) -> str:
+        return f"JobSpec({self.name!r}, schedule={self.schedule!r})"
+
+
+class JobManifest:
+    """This class holds the jobs of a manifest and the settings of the
+    scheduler."""
+
+    def __init__(
+        self,
+        jobs: List[JobSpec],
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+    ):
+        """Initialize the manifest.
+        Args:
+            jobs (List[JobSpec]): The jobs.
+            max_concurrent (int): Maximum number of jobs running at a time.
+            poll_seconds (float): Seconds between two checks of the due jobs.
+        """
+        if max_concurrent < 1:
+            raise ValueError(
+                f"max_concurrent must be 1 or greater. Not {max_concurrent}"
+            )
+        names = [job.name for job in jobs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate job names: {duplicates}")
+        self.jobs = list(jobs)
+        self.max_concurrent = max_concurrent
+        self.poll_seconds = poll_seconds
+
+    def get(self, name: str) -> JobSpec:
+        """Return the job with the given name.
+        Args:
+            name (str): The name of the job.
+        Returns:
+            JobSpec: The job."""
+        for job in self.jobs:
+            if job.name == name:
+                return job
+        raise KeyError(f"Job {name} not found in the manifest.")
+
+
+def load_manifest(path: Union[Path, str] = DEFAULT_MANIFEST) -> JobManifest:
+    """Load a job manifest. The query files are relative to the directory of
+    the manifest, the `[defaults]` table applies to every job.
+    Args:
+        path (Union[Path, str]): The TOML manifest.
+    Returns:
+        JobManifest: The jobs and the settings of the scheduler."""
+    path = Path(path)
+    with open(path, "rb") as file:
+        document = tomllib.load(file)
+    return parse_manifest(document, path.resolve().parent)
+
+
+def parse_manifest(document: dict, base_dir: Path) -> JobManifest:
+    """Build a manifest from a parsed TOML document.
+    Args:
+        document (dict): The parsed manifest.
+        base_dir (Path): The directory the query files are relative to.
+    Returns:
+        JobManifest: The jobs and the settings of the scheduler."""
+    defaults = document.get("defaults", {})
+    scheduler = document.get("scheduler", {})
+    if not document.get("jobs"):
+        raise ValueError("The manifest must list at least one job.")
+    jobs = [
+        _parse_job({**defaults, **entry}, base_dir)
+        for entry in document["jobs"]
+    ]
+    return JobManifest(
+        jobs,
+        max_concurrent=scheduler.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+        poll_seconds=scheduler.get("poll_seconds", DEFAULT_POLL_SECONDS),
+    )
+
+
+def _parse_job(entry: dict, base_dir: Path) -> JobSpec:
+    """Build a job from its entry in the manifest."""
+    unknown = sorted(set(entry) - set(JOB_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown keys in job {entry.get('name')}: {unknown}")
+    for key in ("name", "daxfile", "sqlfile"):
+        if key not in entry:
+            raise ValueError(f"Job {entry.get('name')} has no {key}.")
+    options = dict(entry)
+    options["daxfile"] = base_dir / entry["daxfile"]
+    options["sqlfile"] = base_dir / entry["sqlfile"]
+    options["tolerances"] = {
+        column: (
+            tolerance.get("abs", entry.get("abs_tol", DEFAULT_ABS_TOL)),
+            tolerance.get("rel", entry.get("rel_tol", DEFAULT_REL_TOL)),
+        )
+        for column, tolerance in entry.get("tolerances", {}).items()
+    }
+    if "readiness" in entry:
+        options["readiness"] = _parse_readiness(entry, base_dir)
+    if "partition" in entry:
+        options["partition"] = _parse_partition(entry)
+    if "dax_partition" in entry:
+        options["dax_partition"] = _parse_dax_partition(entry)
+    if "sample" in entry:
+        options["sample"] = _parse_sample(entry)
+    return JobSpec(**options)
+
+
+def _parse_readiness(entry: dict, base_dir: Path) -> ReadinessGate:
+    """Build the readiness gate of a job from its entry in the manifest."""
+    options = dict(entry["readiness"])
+    unknown = sorted(set(options) - set(READINESS_KEYS))
+    if unknown:
+        raise ValueError(
+            f"Unknown readiness keys in job {entry.get('name')}: {unknown}"
+        )
+    for key in ("edw_probe", "power_bi_probe"):
+        if key in options:
+            options[key] = base_dir / options[key]
+    return ReadinessGate(**options)
+
+
+def _parse_partition(entry: dict) -> PartitionSpec:
+    """Build the partition of a job from its entry in the manifest."""
+    options = dict(entry["partition"])
+    unknown = sorted(set(options) - set(PARTITION_KEYS))
+    if unknown:
+        raise ValueError(
+            f"Unknown partition keys in job {entry.get('name')}: {unknown}"
+        )
+    for key in ("column", "start", "stop"):
+        if key not in options:
+            raise ValueError(
+                f"The partition of job {entry.get('name')} has no {key}."
+            )
+    return PartitionSpec(**options)
+
+
+def _parse_dax_partition(entry: dict) -> DaxPartitionSpec:
+    """Build the partition of the DAX query of a job from its entry in the
+    manifest."""
+    options = dict(entry["dax_partition"])
+    unknown = sorted(set(options) - set(DAX_PARTITION_KEYS))
+    if unknown:
+        raise ValueError(
+            f"Unknown dax_partition keys in job {entry.get('name')}: {unknown}"
+        )
+    return DaxPartitionSpec(**options)
+
+
+def _parse_sample(entry: dict) -> SampleSpec:
+    """Build the sample of a job from its entry in the manifest."""
+    options = dict(entry["sample"])
+    unknown = sorted(set(options) - set(SAMPLE_KEYS))
+    if unknown:
+        raise ValueError(
+            f"Unknown sample keys in job {entry.get('name')}: {unknown}"
+        )
+    for key in ("sql_column", "dax_column"):
+        if key not in options:
+            raise ValueError(
+                f"The sample of job {entry.get('name')} has no {key}."
+            )
+    return SampleSpec(**options)
@@ -0,0 +1,284 @@
+"""This module runs the jobs of the job manifest on their cron schedules, in a
+single process. The due jobs are started by priority on a pool of threads,
+which limits the number of jobs running at a time, and a job still running
+when it is due again is not started twice."""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Set
+
+try:
+    from get_logger import get_logger
+    from job_manifest import (
+        DEFAULT_MAX_CONCURRENT,
+        DEFAULT_POLL_SECONDS,
+        JobSpec,
+    )
+except ImportError:
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.job_manifest import (
+        DEFAULT_MAX_CONCURRENT,
+        DEFAULT_POLL_SECONDS,
+        JobSpec,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# The fields of a cron expression: name, first and last value
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),
+)
+
+# Cron expressions that never match are detected after this many days
+MAX_SEARCH_DAYS = 366 * 5
+
+
+class CronSchedule:
+    """This class parses a cron expression, `minute hour day-of-month month
+    day-of-week`, with the usual `*`, `*/n`, `a-b`, `a-b/n` and `a,b`
+    fields. The day of the week is 0 to 7, 0 and 7 are Sunday. As in cron,
+    when both days are restricted a day matching either of them matches."""
+
+    def __init__(self, expression: str):
+        """Initialize the schedule.
+        Args:
+            expression (str): The cron expression, e.g. "0 9 * * 1-5".
+        """
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(
+                f"A cron expression must have {len(CRON_FIELDS)} fields. "
+                f"Not {expression!r}"
+            )
+        self.expression = expression
+        values = [
+            _parse_field(field, name, first, last)
+            for field, (name, first, last) in zip(fields, CRON_FIELDS)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # Python counts the days of the week from Monday, cron from Sunday
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def matches(self, moment: datetime) -> bool:
+        """Return whether the schedule is due at the minute of `moment`."""
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and self._matches_day(moment)
+        )
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first time the schedule is due after `moment`.
+        Args:
+            moment (datetime): The time to start from, excluded.
+        Returns:
+            datetime: The next due time, on a whole minute."""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=MAX_SEARCH_DAYS)
+        while moment < limit:
+            if not self._matches_day(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"The schedule {self.expression!r} is never due.")
+
+    def _matches_day(self, moment: datetime) -> bool:
+        """Return whether the schedule is due on the day of `moment`."""
+        if moment.month not in self.months:
+            return False
+        day = moment.day in self.days
+        weekday = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+
+class JobScheduler:
+    """This class starts the jobs when they are due. The jobs due at the same
+    time form a batch, started by priority and then by name."""
+
+    def __init__(
+        self,
+        jobs: List[JobSpec],
+        run_job: Callable[[JobSpec, datetime, int], None],
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        """Initialize the scheduler.
+        Args:
+            jobs (List[JobSpec]): The jobs, the disabled ones are ignored.
+            run_job (Callable[[JobSpec, datetime, int], None]): Runs a job. It
+            is called with the job, the time the job was due and the number
+            of jobs due at that time.
+            max_concurrent (int): Maximum number of jobs running at a time.
+            poll_seconds (float): Seconds between two checks of the due jobs.
+            clock (Callable[[], datetime]): Returns the current time.
+        """
+        if max_concurrent < 1:
+            raise ValueError(
+                f"max_concurrent must be 1 or greater. Not {max_concurrent}"
+            )
+        self.jobs = [job for job in jobs if job.enabled]
+        self.schedules = {
+            job.name: CronSchedule(job.schedule) for job in self.jobs
+        }
+        self.run_job = run_job
+        self.max_concurrent = max_concurrent
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self.last_check = clock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="JobScheduler"
+        )
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def due_jobs(
+        self, since: datetime, until: datetime
+    ) -> Dict[datetime, List[JobSpec]]:
+        """Return the jobs due after `since` and up to `until`, by due time.
+        A job due several times in the interval is returned once, at its last
+        due time.
+        Args:
+            since (datetime): The start of the interval, excluded.
+            until (datetime): The end of the interval, included.
+        Returns:
+            Dict[datetime, List[JobSpec]]: The batches of jobs, by due time,
+            every batch sorted by priority."""
+        batches: Dict[datetime, List[JobSpec]] = {}
+        for job in self.jobs:
+            schedule = self.schedules[job.name]
+            due_at = None
+            moment = schedule.next_after(since)
+            while moment <= until:
+                due_at = moment
+                moment = schedule.next_after(moment)
+            if due_at is not None:
+                batches.setdefault(due_at, []).append(job)
+        for batch in batches.values():
+            batch.sort(key=lambda job: (-job.priority, job.name))
+        return dict(sorted(batches.items()))
+
+    def run_pending(self) -> List[Future]:
+        """Start the jobs due since the previous check.
+        Returns:
+            List[Future]: The futures of the started jobs."""
+        now = self.clock()
+        batches = self.due_jobs(self.last_check, now)
+        self.last_check = now
+        futures = []
+        for due_at, batch in batches.items():
+            for job in batch:
+                future = self._submit(job, due_at, len(batch))
+                if future is not None:
+                    futures.append(future)
+        return futures
+
+    def run_now(self, jobs: List[JobSpec] = None) -> List[Future]:
+        """Start jobs immediately, whatever their schedule.
+        Args:
+            jobs (List[JobSpec]): The jobs to start. Defaults to every job.
+        Returns:
+            List[Future]: The futures of the started jobs."""
+        jobs = sorted(
+            self.jobs if jobs is None else jobs,
+            key=lambda job: (-job.priority, job.name),
+        )
+        now = self.clock().replace(second=0, microsecond=0)
+        futures = [self._submit(job, now, len(jobs)) for job in jobs]
+        return [future for future in futures if future is not None]
+
+    def run_forever(self):
+        """Start the due jobs until `stop` is called."""
+        log.info("Scheduler started with %s jobs.", len(self.jobs))
+        while not self._stopping.is_set():
+            self.run_pending()
+            self._stopping.wait(self.poll_seconds)
+        log.info("Scheduler stopped.")
+
+    def stop(self):
+        """Stop `run_forever` after the current check."""
+        self._stopping.set()
+
+    def close(self, wait: bool = True):
+        """Stop the scheduler and its threads.
+        Args:
+            wait (bool): Whether to wait for the running jobs to finish."""
+        self.stop()
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def running_jobs(self) -> List[str]:
+        """Return the names of the jobs started and not finished yet."""
+        with self._lock:
+            return sorted(self._running)
+
+    def _submit(
+        self, job: JobSpec, due_at: datetime, batch_size: int
+    ) -> Future:
+        """Start a job unless it is still running."""
+        with self._lock:
+            if job.name in self._running:
+                log.warning(
+                    "%s is still running, the run due at %s is skipped.",
+                    job.name,
+                    due_at,
+                )
+                return None
+            self._running.add(job.name)
+        log.info("Starting %s, due at %s.", job.name, due_at)
+        return self._executor.submit(self._run, job, due_at, batch_size)
+
+    def _run(self, job: JobSpec, due_at: datetime, batch_size: int):
+        """Run a job in a thread of the pool. A failing job is logged and
+        does not stop the scheduler."""
+        try:
+            self.run_job(job, due_at, batch_size)
+        except Exception as error:  # pylint: disable=broad-except
+            log.exception("%s failed: %s", job.name, error)
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+
+
+def _parse_field(field: str, name: str, first: int, last: int) -> Set[int]:
+    """Return the values of a field of a cron expression."""
+    values = set()
+    for part in field.split(","):
+        span, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if span == "*":
+                start, stop = first, last
+            elif "-" in span:
+                start, stop = (int(value) for value in span.split("-", 1))
+            else:
+                start = stop = int(span)
+                if step > 1:
+                    stop = last
+        except ValueError as error:
+            raise ValueError(f"Invalid {name} field: {field!r}") from error
+        if step < 1 or not first <= start <= stop <= last:
+            raise ValueError(
+                f"The {name} field must be between {first} and {last}. "
+                f"Not {field!r}"
+            )
+        values.update(range(start, stop + 1, step))
+    return values
@@ -0,0 +1,355 @@
+"""This module compares two results already sorted on their key columns, e.g.
+by the `ORDER BY` of the queries, without loading them in memory. The rows of
+both sides are walked in lockstep, like a merge join: every step reads the
+side with the smallest key, so a single row per side is held to pair them. The
+paired and one-sided rows are compared in chunks of a bounded number of rows,
+and the summaries of the chunks are merged as they are produced.
+
+Both sides must be sorted in the same order, the order Python compares the
+keys in, and have unique keys: the keys are checked as they are read, an
+unsorted side raises an error instead of reporting false differences. The
+queries must sort on every key column, e.g. the month and the product key.
+
+Text keys are compared by code point, the order of the binary collations of
+SQL Server, not the order of its default case-insensitive collation, which
+sorts "a" before "B". The SQL query must sort its text keys with a binary
+collation, e.g. `ORDER BY [DT].[YearPeriodMonth] COLLATE Latin1_General_BIN2`.
+The `ORDER BY` of a DAX query has no collation, Power BI sorts text with the
+case-insensitive collation of the dataset: a side read from a DAX query suits
+keys that are numbers, dates or text sorted the same by both collations, e.g.
+"2024/01" months. Keys sorted in another order stop the comparison."""
+
+import argparse
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+try:
+    from comparison_report import (
+        DEFAULT_SAMPLE_SIZE,
+        ComparisonSummary,
+        summarise_values,
+        write_report,
+    )
+    from tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+        normalise_frame,
+        values_match,
+    )
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import (
+        DEFAULT_SAMPLE_SIZE,
+        ComparisonSummary,
+        summarise_values,
+        write_report,
+    )
+    from carhartt_pbi_automate.tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+        normalise_frame,
+        values_match,
+    )
+
+
+# Rows of both sides compared at a time, and rows read at a time per side
+DEFAULT_MERGE_CHUNK_ROWS = 100_000
+DEFAULT_FETCH_ROWS = 10_000
+
+# The SQL Server collation sorting text keys in the order they are compared in
+BINARY_COLLATION = "Latin1_General_BIN2"
+
+
+def merge_join(
+    rows1: Iterable[tuple],
+    rows2: Iterable[tuple],
+    key_positions1: List[int],
+    key_positions2: List[int],
+    df1_name: str = "PowerBI",
+    df2_name: str = "EDW",
+) -> Iterator[Tuple[Optional[tuple], Optional[tuple]]]:
+    """Pair the rows of two sides sorted on their keys.
+    Args:
+        rows1 (Iterable[tuple]): The rows of the first side.
+        rows2 (Iterable[tuple]): The rows of the second side.
+        key_positions1 (List[int]): The positions of the key columns in the
+        rows of the first side.
+        key_positions2 (List[int]): The positions of the key columns in the
+        rows of the second side, in the same order.
+        df1_name (str): The name of the first side, used in the errors.
+        df2_name (str): The name of the second side, used in the errors.
+    Returns:
+        Iterator[Tuple[Optional[tuple], Optional[tuple]]]: The rows of both
+        sides with the same key, or a row and None when its key is only on
+        one side, in key order."""
+    side1 = _sorted_keys(rows1, key_positions1, df1_name)
+    side2 = _sorted_keys(rows2, key_positions2, df2_name)
+    item1 = next(side1, None)
+    item2 = next(side2, None)
+    while item1 is not None or item2 is not None:
+        if item2 is None or (item1 is not None and _less(item1[0], item2[0])):
+            yield item1[1], None
+            item1 = next(side1, None)
+        elif item1 is None or _less(item2[0], item1[0]):
+            yield None, item2[1]
+            item2 = next(side2, None)
+        else:
+            yield item1[1], item2[1]
+            item1 = next(side1, None)
+            item2 = next(side2, None)
+
+
+def merge_compare(
+    rows1: Iterable[tuple],
+    names1: List[str],
+    rows2: Iterable[tuple],
+    names2: List[str],
+    join_columns: List[str],
+    tolerances: dict = None,
+    abs_tol: float = DEFAULT_ABS_TOL,
+    rel_tol: float = DEFAULT_REL_TOL,
+    df1_name: str = "PowerBI",
+    df2_name: str = "EDW",
+    cast_column_names_lower: bool = True,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    chunk_rows: int = DEFAULT_MERGE_CHUNK_ROWS,
+) -> ComparisonSummary:
+    """Compare two sides sorted on their key columns, with the rules of
+    `compare_with_tolerance`, holding at most `chunk_rows` rows in memory.
+    Args:
+        rows1 (Iterable[tuple]): The rows of the first side.
+        names1 (List[str]): The column names of the first side.
+        rows2 (Iterable[tuple]): The rows of the second side.
+        names2 (List[str]): The column names of the second side.
+        join_columns (List[str]): The key columns the sides are sorted on.
+        chunk_rows (int): Number of rows compared at a time.
+        The other arguments are the ones of `compare_with_tolerance`.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be 1 or greater. Not {chunk_rows}")
+    names1 = [str(name) for name in names1]
+    names2 = [str(name) for name in names2]
+    join_columns = list(join_columns)
+    tolerances = dict(tolerances or {})
+    if cast_column_names_lower:
+        names1 = [name.lower() for name in names1]
+        names2 = [name.lower() for name in names2]
+        join_columns = [column.lower() for column in join_columns]
+        tolerances = {
+            column.lower(): value for column, value in tolerances.items()
+        }
+    for column in join_columns:
+        if column not in names1 or column not in names2:
+            raise ValueError(f"Join column {column} not found in both sides.")
+
+    columns = [
+        name for name in names1 if name in names2 and name not in join_columns
+    ]
+
+    def _summarise(pairs: list, unique1: list, unique2: list):
+        """Compare the rows of a chunk."""
+        both1 = _frame([pair[0] for pair in pairs], names1)
+        both2 = _frame([pair[1] for pair in pairs], names2)
+        df1_values = {}
+        df2_values = {}
+        match_masks = {}
+        for column in columns:
+            column_abs_tol, column_rel_tol = tolerances.get(
+                column, (abs_tol, rel_tol)
+            )
+            df1_values[column] = both1[column].to_numpy()
+            df2_values[column] = both2[column].to_numpy()
+            match_masks[column] = values_match(
+                df1_values[column],
+                df2_values[column],
+                column_abs_tol,
+                column_rel_tol,
+            )
+        return summarise_values(
+            both1[join_columns],
+            df1_values,
+            df2_values,
+            match_masks,
+            df1_name=df1_name,
+            df2_name=df2_name,
+            df1_unique=_frame(unique1, names1),
+            df2_unique=_frame(unique2, names2),
+            sample_size=sample_size,
+        )
+
+    summary = None
+    pairs, unique1, unique2 = [], [], []
+    for row1, row2 in merge_join(
+        rows1,
+        rows2,
+        [names1.index(column) for column in join_columns],
+        [names2.index(column) for column in join_columns],
+        df1_name,
+        df2_name,
+    ):
+        if row2 is None:
+            unique1.append(row1)
+        elif row1 is None:
+            unique2.append(row2)
+        else:
+            pairs.append((row1, row2))
+        if len(pairs) + len(unique1) + len(unique2) >= chunk_rows:
+            chunk = _summarise(pairs, unique1, unique2)
+            summary = _merge(summary, chunk)
+            pairs, unique1, unique2 = [], [], []
+    if summary is None or pairs or unique1 or unique2:
+        summary = _merge(summary, _summarise(pairs, unique1, unique2))
+    return summary
+
+
+def iter_cursor_rows(
+    cursor, fetch_rows: int = DEFAULT_FETCH_ROWS
+) -> Iterator[tuple]:
+    """Read the rows of an executed DB-API cursor, `fetch_rows` at a time.
+    Args:
+        cursor: The cursor, after `execute`.
+        fetch_rows (int): Number of rows fetched at a time.
+    Returns:
+        Iterator[tuple]: The rows of the cursor."""
+    while True:
+        rows = cursor.fetchmany(fetch_rows)
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row)
+
+
+def iter_parquet_rows(
+    path, fetch_rows: int = DEFAULT_FETCH_ROWS
+) -> Iterator[tuple]:
+    """Read the rows of a Parquet file, `fetch_rows` at a time.
+    Args:
+        path: The path of the Parquet file.
+        fetch_rows (int): Number of rows read at a time.
+    Returns:
+        Iterator[tuple]: The rows of the file."""
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=fetch_rows):
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+def parquet_names(path) -> List[str]:
+    """Return the column names of a Parquet file."""
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+def main():
+    """Compare two Parquet files sorted on their key columns and write the
+    report."""
+    parser = argparse.ArgumentParser(
+        description="Compare two Parquet files sorted on their key columns."
+    )
+    parser.add_argument("pbi_file", type=Path, help="The Power BI results.")
+    parser.add_argument("edw_file", type=Path, help="The EDW results.")
+    parser.add_argument(
+        "--key",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The key columns the files are sorted on.",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=Path("merge_compare_report.txt"),
+        help="The report file, HTML when its suffix is .html.",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_MERGE_CHUNK_ROWS,
+        help="Number of rows compared at a time.",
+    )
+    args = parser.parse_args()
+
+    summary = merge_compare(
+        iter_parquet_rows(args.pbi_file),
+        parquet_names(args.pbi_file),
+        iter_parquet_rows(args.edw_file),
+        parquet_names(args.edw_file),
+        args.key,
+        chunk_rows=args.chunk_rows,
+    )
+    write_report(summary, args.report)
+    print(
+        f"{summary.intersect_rows} rows in both files, "
+        f"{summary.mismatch_count} mismatching values, "
+        f"{summary.df1_unique_count} + {summary.df2_unique_count} rows in "
+        f"one file only. Report: {args.report}"
+    )
+
+
+def _sorted_keys(
+    rows: Iterable[tuple], key_positions: List[int], name: str
+) -> Iterator[Tuple[tuple, tuple]]:
+    """Yield the key and the row of every row, checking the keys are
+    strictly increasing."""
+    previous = None
+    for row in rows:
+        key = tuple(_key_value(row[position]) for position in key_positions)
+        if previous is not None and not _less(previous, key):
+            if key == previous:
+                raise ValueError(
+                    f"The rows of {name} are duplicated on their keys: "
+                    f"{_display(key)} follows {_display(previous)}."
+                )
+            raise ValueError(
+                f"The rows of {name} are not sorted on their keys: "
+                f"{_display(key)} follows {_display(previous)}. Text keys "
+                "must be sorted by code point, e.g. with ORDER BY ... COLLATE "
+                f"{BINARY_COLLATION}."
+            )
+        previous = key
+        yield key, row
+
+
+def _key_value(value) -> tuple:
+    """Return a sortable key value, the missing values first and the strings
+    without their leading and trailing spaces, like `normalise_frame`."""
+    if value is None or (isinstance(value, float) and value != value):
+        return (0,)
+    if isinstance(value, str):
+        return (1, value.strip())
+    return (1, value)
+
+
+def _less(key1: tuple, key2: tuple) -> bool:
+    """Return whether a key sorts before another one."""
+    try:
+        return key1 < key2
+    except TypeError as error:
+        raise ValueError(
+            f"The keys {_display(key1)} and {_display(key2)} cannot be "
+            "compared, the key columns must have the same types."
+        ) from error
+
+
+def _display(key: tuple) -> tuple:
+    """Return the values of a key, None for the missing values."""
+    return tuple(value[1] if len(value) > 1 else None for value in key)
+
+
+def _frame(rows: list, names: List[str]) -> pd.DataFrame:
+    """Return the normalised dataframe of rows."""
+    return normalise_frame(pd.DataFrame.from_records(rows, columns=names))
+
+
+def _merge(
+    summary: Optional[ComparisonSummary], chunk: ComparisonSummary
+) -> ComparisonSummary:
+    """Add the summary of a chunk to the summary of the previous ones."""
+    return (
+        chunk if summary is None else ComparisonSummary.merge([summary, chunk])
+    )
+
+
+if __name__ == "__main__":
+    main()
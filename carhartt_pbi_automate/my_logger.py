@@ -5,6 +5,11 @@ from pathlib import Path
 from typing import Union
 
 from carhartt_pbi_automate.database import Database
+from carhartt_pbi_automate.get_logger import (
+    release_file_handler,
+    routing_handler,
+    shared_file_handler,
+)
 from carhartt_pbi_automate.sqlite_handler import SqliteHandler
 
 
@@ -27,16 +32,21 @@ class MyLogger(logging.Logger):
         self.log_file = log_file
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # Create a file handler to write to the log file
+        # Get the file handler of the log file, shared with the other loggers
+        # writing to it. Its level is left alone, the level of the logger
+        # filters the records. Like the loggers of `get_logger`, the records
+        # are written to it by the background thread of the logging queue.
         self.file_handler = None
+        self.queue_handler = None
         if log_to_file:
-            self.file_handler = logging.FileHandler(self.log_file)
-            self.file_handler.setLevel(level)
             self.file_formatter = logging.Formatter(
                 "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
             )
-            self.file_handler.setFormatter(self.file_formatter)
-            self.addHandler(self.file_handler)
+            self.file_handler = shared_file_handler(
+                self.log_file, self.file_formatter
+            )
+            self.queue_handler = routing_handler([self.file_handler])
+            self.addHandler(self.queue_handler)
             self.info("File logging enabled")
 
         # Create a stream handler to print to stdout
@@ -121,9 +131,10 @@ class MyLogger(logging.Logger):
     def close(self):
         """Close the logger."""
         if self.file_handler:
-            # Close the file to free it up for other processes
-            self.file_handler.close()
-            self.removeHandler(self.file_handler)
+            # Close the file to free it up for other processes, once no other
+            # logger writes to it
+            self.removeHandler(self.queue_handler)
+            release_file_handler(self.file_handler)
         if self.stream_handler:
             self.stream_handler.close()
             self.removeHandler(self.stream_handler)
@@ -0,0 +1,245 @@
+"""This module coalesces the notifications of several validation jobs. The
+results of the jobs of a run window are collected in the notification outbox
+database, and once every job has reported a single summary card is sent for
+the whole window, plus the cards of the failing jobs only."""
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Union
+
+try:
+    from database import Database
+    from get_logger import get_logger
+    from notification_dispatcher import (
+        NotificationDispatcher,
+        OUTBOX_DATABASE,
+        OUTBOX_SQL_SCRIPT,
+    )
+    from send_teams_message import build_header, build_payloads
+except ImportError:
+    from carhartt_pbi_automate.database import Database
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.notification_dispatcher import (
+        NotificationDispatcher,
+        OUTBOX_DATABASE,
+        OUTBOX_SQL_SCRIPT,
+    )
+    from carhartt_pbi_automate.send_teams_message import (
+        build_header,
+        build_payloads,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+RESULT_TABLE = "job_result"
+
+
+class NotificationCoalescer:
+    """This class collects the results of the jobs of a run window and sends
+    one summary card per window instead of one card per job."""
+
+    def __init__(
+        self,
+        dispatcher: NotificationDispatcher,
+        webhook_url: str,
+        expected_jobs: int = 1,
+        database: Union[Database, Path, str] = None,
+    ):
+        """Initialize the coalescer.
+        Args:
+            dispatcher (NotificationDispatcher): Delivers the cards.
+            webhook_url (str): The incoming webhook URL of the Teams channel.
+            expected_jobs (int): Number of jobs reporting in every run window.
+            database (Union[Database, Path, str]): The database where the
+            results are collected. Defaults to the outbox database.
+        """
+        if expected_jobs < 1:
+            raise ValueError(
+                f"expected_jobs must be 1 or greater. Not {expected_jobs}"
+            )
+        if database is None:
+            database = OUTBOX_DATABASE
+        if isinstance(database, Database):
+            self.database = database
+        elif isinstance(database, (Path, str)):
+            self.database = Database(Path(database), OUTBOX_SQL_SCRIPT)
+        else:
+            raise TypeError(
+                f"database must be a Database, Path or str. Not {type(database)}"
+            )
+        self.dispatcher = dispatcher
+        self.webhook_url = webhook_url
+        self.expected_jobs = expected_jobs
+
+    def add_result(
+        self,
+        run_window: str,
+        job_name: str,
+        passed: bool,
+        summary: str,
+        payloads: List[Dict],
+    ):
+        """Record the result of a job. A job reporting twice in the same
+        window replaces its previous result.
+        Args:
+            run_window (str): The run window of the job.
+            job_name (str): The name of the job.
+            passed (bool): Whether the data matched.
+            summary (str): One line describing the result.
+            payloads (List[Dict]): The cards of the job, sent on their own
+            when the job fails or when it is alone in its window.
+        """
+        where = (
+            f"{_window_where(run_window)} AND job_name = '{_quote(job_name)}'"
+        )
+        self.database.delete(RESULT_TABLE, where)
+        self.database.insert(
+            RESULT_TABLE,
+            [
+                "run_window",
+                "job_name",
+                "passed",
+                "summary",
+                "payloads",
+                "recorded_at",
+            ],
+            [
+                run_window,
+                job_name,
+                int(passed),
+                summary,
+                json.dumps(payloads),
+                time.time(),
+            ],
+        )
+        log.debug("Result of %s recorded in window %s.", job_name, run_window)
+
+    def has_result(self, run_window: str, job_name: str) -> bool:
+        """Return True when a job has reported in the window."""
+        return any(
+            row["job_name"] == job_name for row in self._results(run_window)
+        )
+
+    def ready(self, run_window: str) -> bool:
+        """Return True when every expected job has reported in the window."""
+        return len(self._results(run_window)) >= self.expected_jobs
+
+    def flush(self, run_window: str) -> int:
+        """Add the cards of the window to the outbox. A window with several
+        jobs gets one summary card with a row per job, plus the cards of the
+        failing jobs. A window with a single job gets the cards of that job.
+        Args:
+            run_window (str): The run window to flush.
+        Returns:
+            int: The number of cards added to the outbox."""
+        results = [
+            row for row in self._results(run_window) if not row["flushed"]
+        ]
+        if not results:
+            return 0
+
+        # The summary cards are identified by their content, the cards of a
+        # job by the time its result was recorded, so a job run again in the
+        # same window is notified again.
+        cards = []
+        if len(results) > 1:
+            for payload in build_summary_payloads(run_window, results):
+                cards.append((None, payload))
+        for row in results:
+            if len(results) > 1 and row["passed"]:
+                continue
+            key = f"{run_window}|{row['job_name']}|{row['recorded_at']!r}"
+            payloads = json.loads(row["payloads"])
+            for page, payload in enumerate(payloads, start=1):
+                cards.append((f"{key}|{page}", payload))
+
+        for key, payload in cards:
+            self.dispatcher.enqueue(self.webhook_url, payload, key)
+        # Only the results queued are marked, a result recorded meanwhile is
+        # queued by the next flush
+        queued = " OR ".join(
+            f"(job_name = '{_quote(row['job_name'])}' "
+            f"AND recorded_at = {row['recorded_at']!r})"
+            for row in results
+        )
+        self.database.update(
+            RESULT_TABLE,
+            ["flushed"],
+            [1],
+            where=f"{_window_where(run_window)} AND ({queued})",
+        )
+        log.info(
+            "%s card(s) queued for %s job(s) of window %s.",
+            len(cards),
+            len(results),
+            run_window,
+        )
+        return len(cards)
+
+    def flush_stale(self, current_window: str) -> int:
+        """Flush the windows, other than the current one, whose jobs never all
+        reported, e.g. because a job crashed.
+        Args:
+            current_window (str): The run window still collecting results.
+        Returns:
+            int: The number of cards added to the outbox."""
+        rows = self.database.select(
+            RESULT_TABLE,
+            ["run_window"],
+            where=f"flushed = 0 AND run_window <> '{_quote(current_window)}'",
+        )
+        windows = sorted({row["run_window"] for row in rows})
+        return sum(self.flush(window) for window in windows)
+
+    def _results(self, run_window: str) -> list:
+        """Return the results recorded in the window, ordered by job name."""
+        rows = self.database.select(
+            RESULT_TABLE,
+            [
+                "job_name",
+                "passed",
+                "summary",
+                "payloads",
+                "recorded_at",
+                "flushed",
+            ],
+            where=_window_where(run_window),
+        )
+        return sorted(rows, key=lambda row: row["job_name"])
+
+
+def build_summary_payloads(run_window: str, results: list) -> List[Dict]:
+    """Build the summary card of a run window, with one row per job.
+    Args:
+        run_window (str): The run window.
+        results (list): The rows of the job results.
+    Returns:
+        List[Dict]: The card payloads of the summary."""
+    passed = sum(1 for row in results if row["passed"])
+    table = ["| Job | Status | Details |", "| --- | --- | --- |"]
+    for row in results:
+        status = "✔" if row["passed"] else "❌"
+        details = (row["summary"] or "").replace("|", "\\|").replace("\n", " ")
+        table.append(f"| {row['job_name']} | {status} | {details} |")
+
+    header = build_header(
+        {
+            "color": "00FF00" if passed == len(results) else "FF0000",
+            "notification_title": f"Validation summary {run_window}",
+            "message": f"{passed} of {len(results)} validations passed.",
+        }
+    )
+    return build_payloads(header, [("Validations", "\n".join(table))])
+
+
+def _window_where(run_window: str) -> str:
+    """Return the WHERE clause selecting the results of a window."""
+    return f"run_window = '{_quote(run_window)}'"
+
+
+def _quote(value: str) -> str:
+    """Escape a value to be used inside a SQL string literal."""
+    return value.replace("'", "''")
@@ -0,0 +1,272 @@
+"""This module delivers Microsoft Teams cards in the background. Cards are
+stored in an outbox table of a SQLite database before they are sent, and are
+retried with exponential backoff until they are delivered."""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Union
+
+import requests
+
+try:
+    from database import Database
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.database import Database
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# The outbox database and the script that creates its table
+ROOT_DIR = Path(__file__).resolve().parent.parent
+OUTBOX_DATABASE = ROOT_DIR / "database" / "notification_outbox.db"
+OUTBOX_SQL_SCRIPT = ROOT_DIR / "database" / "notification_outbox.sql"
+
+OUTBOX_TABLE = "notification_outbox"
+
+
+class NotificationDispatcher:
+    """This class delivers the cards stored in the outbox, retrying failed
+    deliveries with exponential backoff. A single HTTP session is reused for
+    every delivery to keep the connection to the webhook alive."""
+
+    def __init__(
+        self,
+        database: Union[Database, Path, str] = None,
+        max_attempts: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        poll_interval: float = 1.0,
+        http_timeout: float = 30.0,
+        session: requests.Session = None,
+    ):
+        """Initialize the dispatcher.
+        Args:
+            database (Union[Database, Path, str]): The outbox database, or the
+            path to its file. Defaults to `database/notification_outbox.db`.
+            max_attempts (int): Delivery attempts before a card is marked as
+            failed.
+            base_delay (float): Seconds to wait after the first failure, the
+            delay doubles after every failure.
+            max_delay (float): Maximum seconds to wait between two attempts.
+            poll_interval (float): Seconds between two checks of the outbox
+            while running in the background.
+            http_timeout (float): Seconds to wait for the webhook to answer.
+            session (requests.Session): The HTTP session used to deliver the
+            cards. A new session is created if none is provided.
+        """
+        if database is None:
+            database = OUTBOX_DATABASE
+        if isinstance(database, Database):
+            self.database = database
+        elif isinstance(database, (Path, str)):
+            self.database = Database(Path(database), OUTBOX_SQL_SCRIPT)
+        else:
+            raise TypeError(
+                f"database must be a Database, Path or str. Not {type(database)}"
+            )
+
+        if max_attempts < 1:
+            raise ValueError(
+                f"max_attempts must be 1 or greater. Not {max_attempts}"
+            )
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.http_timeout = http_timeout
+        self.session = session or requests.Session()
+
+        # The Database object keeps a single connection attribute, the lock
+        # serializes its use between the caller and the background thread.
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def enqueue(
+        self,
+        webhook_url: str,
+        payload: Dict,
+        idempotency_key: str = None,
+    ) -> bool:
+        """Store a card in the outbox to be delivered.
+        Args:
+            webhook_url (str): The incoming webhook URL.
+            payload (Dict): The card payload.
+            idempotency_key (str): Identifies the card. Defaults to a hash of
+            the webhook URL and the payload.
+        Returns:
+            bool: True if the card was stored, False if a card with the same
+            idempotency key was already in the outbox."""
+        payload_json = json.dumps(payload)
+        if idempotency_key is None:
+            idempotency_key = hashlib.sha256(
+                (webhook_url + payload_json).encode("utf-8")
+            ).hexdigest()
+        escaped_key = idempotency_key.replace("'", "''")
+
+        now = time.time()
+        with self._lock:
+            existing = self.database.select(
+                OUTBOX_TABLE,
+                ["id"],
+                where=f"idempotency_key = '{escaped_key}'",
+            )
+            if existing:
+                log.debug("Card %s is already in the outbox.", idempotency_key)
+                return False
+            self.database.insert(
+                OUTBOX_TABLE,
+                [
+                    "idempotency_key",
+                    "webhook_url",
+                    "payload",
+                    "next_attempt_at",
+                    "created_at",
+                ],
+                [idempotency_key, webhook_url, payload_json, now, now],
+            )
+
+        log.debug("Card %s added to the outbox.", idempotency_key)
+        self._wake_up.set()
+        return True
+
+    def deliver_due(self, now: float = None) -> int:
+        """Deliver the pending cards whose next attempt is due.
+        Args:
+            now (float): The current time, as returned by time.time().
+        Returns:
+            int: The number of cards delivered."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self.database.select(
+                OUTBOX_TABLE,
+                ["id", "webhook_url", "payload", "attempts"],
+                where=f"status = 'pending' AND next_attempt_at <= {now!r}",
+            )
+
+        delivered = 0
+        for row in sorted(rows, key=lambda row: row["id"]):
+            if self._stopping.is_set():
+                break
+            attempts = row["attempts"] + 1
+            try:
+                response = self.session.post(
+                    row["webhook_url"],
+                    data=row["payload"],
+                    headers={"Content-Type": "application/json"},
+                    timeout=self.http_timeout,
+                )
+                if not 200 <= response.status_code < 300:
+                    raise requests.HTTPError(
+                        f"{response.status_code}: {response.text}"
+                    )
+            except requests.RequestException as error:
+                self._record_failure(row["id"], attempts, error, now)
+                continue
+
+            with self._lock:
+                self.database.update(
+                    OUTBOX_TABLE,
+                    ["status", "attempts", "sent_at", "last_error"],
+                    ["sent", attempts, time.time(), None],
+                    where=f"id = {int(row['id'])}",
+                )
+            delivered += 1
+
+        return delivered
+
+    def pending_count(self) -> int:
+        """Return the number of cards waiting to be delivered."""
+        with self._lock:
+            rows = self.database.select(
+                OUTBOX_TABLE, ["id"], where="status = 'pending'"
+            )
+        return len(rows)
+
+    def start(self):
+        """Start delivering the cards in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="NotificationDispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the background thread. The cards not delivered yet remain in
+        the outbox and are delivered the next time the dispatcher runs.
+        Args:
+            timeout (float): Seconds to wait for the thread to finish."""
+        self._stopping.set()
+        self._wake_up.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until the outbox is empty or the timeout expires.
+        Args:
+            timeout (float): Maximum seconds to wait.
+        Returns:
+            bool: True if every card was delivered or marked as failed."""
+        deadline = time.monotonic() + timeout
+        while self.pending_count():
+            if time.monotonic() >= deadline:
+                return False
+            self._wake_up.set()
+            time.sleep(min(self.poll_interval, 0.1))
+        return True
+
+    def close(self):
+        """Stop the background thread and close the HTTP session."""
+        self.stop()
+        self.session.close()
+
+    def _run(self):
+        """Deliver the due cards until the dispatcher is stopped."""
+        while not self._stopping.is_set():
+            self._wake_up.clear()
+            try:
+                self.deliver_due()
+            except Exception as error:  # pylint: disable=broad-except
+                log.error("Error delivering notifications: %s", error)
+            self._wake_up.wait(self.poll_interval)
+
+    def _record_failure(
+        self, row_id: int, attempts: int, error: Exception, now: float
+    ):
+        """Schedule the next attempt of a card, or mark it as failed."""
+        if attempts >= self.max_attempts:
+            status = "failed"
+            log.error(
+                "Card %s failed after %s attempts: %s", row_id, attempts, error
+            )
+        else:
+            status = "pending"
+            log.warning(
+                "Card %s failed, attempt %s of %s: %s",
+                row_id,
+                attempts,
+                self.max_attempts,
+                error,
+            )
+
+        # Exponential backoff with jitter, so retries do not arrive together
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        with self._lock:
+            self.database.update(
+                OUTBOX_TABLE,
+                ["status", "attempts", "next_attempt_at", "last_error"],
+                [status, attempts, now + delay, str(error)],
+                where=f"id = {int(row_id)}",
+            )
@@ -0,0 +1,180 @@
+"""This module compares two large dataframes on several cores. Both frames are
+partitioned by a hash of their key columns, written once to Arrow IPC files
+and memory-mapped by the worker processes, so the frames are never pickled.
+Every worker compares one partition and the partial summaries are merged
+into one summary."""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from comparison_report import ComparisonSummary
+    from get_logger import get_logger
+    from tolerance_compare import compare_with_tolerance, normalise_frame
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import ComparisonSummary
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.tolerance_compare import (
+        compare_with_tolerance,
+        normalise_frame,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Below this number of rows the frames are compared in the current process,
+# starting the workers would take longer than the comparison itself
+DEFAULT_MIN_PARALLEL_ROWS = 500_000
+
+# Partitions per worker, more partitions than workers balance the load when
+# some partitions are slower than others
+PARTITIONS_PER_WORKER = 2
+
+
+def parallel_compare_with_tolerance(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    join_columns: List[str],
+    max_workers: int = None,
+    partitions: int = None,
+    min_rows: int = DEFAULT_MIN_PARALLEL_ROWS,
+    work_dir: Union[Path, str] = None,
+    **compare_kwargs,
+) -> ComparisonSummary:
+    """Compare two dataframes joined on their key columns, one partition of
+    the keys per worker process. The result is the same as the result of
+    `compare_with_tolerance`, except for the order of the sampled rows.
+    Args:
+        df1 (pd.DataFrame): The first dataframe.
+        df2 (pd.DataFrame): The second dataframe.
+        join_columns (List[str]): The key columns used to join the rows.
+        max_workers (int): Number of worker processes. Defaults to the number
+        of cores, 1 compares in the current process.
+        partitions (int): Number of partitions. Defaults to two per worker.
+        min_rows (int): Frames smaller than this are compared in the current
+        process.
+        work_dir (Union[Path, str]): Directory of the temporary Arrow files.
+        Defaults to the temporary directory of the system.
+        compare_kwargs: The other arguments of `compare_with_tolerance`.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers < 2 or max(len(df1), len(df2)) < min_rows:
+        return compare_with_tolerance(df1, df2, join_columns, **compare_kwargs)
+    partitions = partitions or max_workers * PARTITIONS_PER_WORKER
+
+    # The keys are normalised before they are hashed, so the same key gets
+    # the same hash on both sides whatever its original dtype
+    df1 = normalise_frame(df1)
+    df2 = normalise_frame(df2)
+    if compare_kwargs.get("cast_column_names_lower", True):
+        df1.columns = [str(column).lower() for column in df1.columns]
+        df2.columns = [str(column).lower() for column in df2.columns]
+        join_columns = [column.lower() for column in join_columns]
+    for column in join_columns:
+        if column not in df1.columns or column not in df2.columns:
+            raise ValueError(f"Join column {column} not found in both frames.")
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        df1_file = Path(directory) / "df1.arrow"
+        df2_file = Path(directory) / "df2.arrow"
+        df1_bounds = write_partitions(df1, join_columns, partitions, df1_file)
+        df2_bounds = write_partitions(df2, join_columns, partitions, df2_file)
+        del df1, df2
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _compare_partition,
+                    df1_file,
+                    (df1_bounds[index], df1_bounds[index + 1]),
+                    df2_file,
+                    (df2_bounds[index], df2_bounds[index + 1]),
+                    join_columns,
+                    compare_kwargs,
+                )
+                for index in range(partitions)
+            ]
+            summaries = [future.result() for future in futures]
+
+    log.debug("%s partitions compared by %s workers.", partitions, max_workers)
+    return ComparisonSummary.merge(summaries)
+
+
+def write_partitions(
+    frame: pd.DataFrame,
+    join_columns: List[str],
+    partitions: int,
+    path: Path,
+) -> np.ndarray:
+    """Order the rows of a frame by the partition of their keys and write
+    them to an Arrow IPC file.
+    Args:
+        frame (pd.DataFrame): The frame to write.
+        join_columns (List[str]): The key columns.
+        partitions (int): Number of partitions.
+        path (Path): The Arrow IPC file.
+    Returns:
+        np.ndarray: The `partitions + 1` bounds of the partitions, the rows of
+        partition `i` are the rows `bounds[i]` to `bounds[i + 1]`."""
+    if partitions < 1:
+        raise ValueError(f"partitions must be 1 or greater. Not {partitions}")
+    partition = partition_keys(frame, join_columns, partitions)
+    order = np.argsort(partition, kind="stable")
+    bounds = np.zeros(partitions + 1, dtype="int64")
+    np.cumsum(np.bincount(partition, minlength=partitions), out=bounds[1:])
+
+    table = pa.Table.from_pandas(
+        frame.iloc[order].reset_index(drop=True), preserve_index=False
+    )
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return bounds
+
+
+def partition_keys(
+    frame: pd.DataFrame, join_columns: List[str], partitions: int
+) -> np.ndarray:
+    """Return the partition of every row, from a hash of its keys."""
+    hashes = pd.util.hash_pandas_object(frame[join_columns], index=False)
+    return (hashes.to_numpy() % np.uint64(partitions)).astype("int64")
+
+
+def read_partition(path: Path, bounds: Tuple[int, int]) -> pd.DataFrame:
+    """Read the rows of a partition from a memory-mapped Arrow IPC file.
+    Args:
+        path (Path): The Arrow IPC file written by `write_partitions`.
+        bounds (Tuple[int, int]): The first row and the row after the last
+        row of the partition.
+    Returns:
+        pd.DataFrame: The rows of the partition."""
+    start, stop = bounds
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        return table.slice(start, stop - start).to_pandas()
+
+
+def _compare_partition(
+    df1_file: Path,
+    df1_bounds: Tuple[int, int],
+    df2_file: Path,
+    df2_bounds: Tuple[int, int],
+    join_columns: List[str],
+    compare_kwargs: dict,
+) -> ComparisonSummary:
+    """Compare one partition, in a worker process."""
+    return compare_with_tolerance(
+        read_partition(df1_file, df1_bounds),
+        read_partition(df2_file, df2_bounds),
+        join_columns,
+        **compare_kwargs,
+    )
@@ -1,6 +1,28 @@
 """This module contains functions to help parsing script arguments."""
 
 import argparse
+from pathlib import Path
+
+try:
+    from arrow_extract import DEFAULT_EXTRACT_BACKEND, EXTRACT_BACKENDS
+    from spill_compare import parse_memory_budget
+    from tolerance_compare import DEFAULT_ABS_TOL, DEFAULT_REL_TOL
+except ImportError:
+    from carhartt_pbi_automate.arrow_extract import (
+        DEFAULT_EXTRACT_BACKEND,
+        EXTRACT_BACKENDS,
+    )
+    from carhartt_pbi_automate.spill_compare import parse_memory_budget
+    from carhartt_pbi_automate.tolerance_compare import (
+        DEFAULT_ABS_TOL,
+        DEFAULT_REL_TOL,
+    )
+
+
+# The queries compared when no query files are given
+QUERIES_DIR = Path(__file__).resolve().parent.parent / "queries"
+DEFAULT_DAX_FILE = QUERIES_DIR / "supply.dax"
+DEFAULT_SQL_FILE = QUERIES_DIR / "supply.sql"
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -9,14 +31,62 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--daxfile",
         type=str,
-        default=r"C:\Users\rescobar\OneDrive - Carhartt Inc\Documents\git\powerbi-automate\queries\supply.dax",
+        default=str(DEFAULT_DAX_FILE),
         help="File path to DAX query",
     )
     parser.add_argument(
         "--sqlfile",
         type=str,
-        default=r"C:\Users\rescobar\OneDrive - Carhartt Inc\Documents\git\powerbi-automate\queries\supply.sql",
+        default=str(DEFAULT_SQL_FILE),
         help="File path to SQL query")
+    parser.add_argument(
+        "--run-window",
+        type=str,
+        default=None,
+        help="Jobs of the same run window are notified together. Defaults to the current date",
+    )
+    parser.add_argument(
+        "--expected-jobs",
+        type=int,
+        default=1,
+        help="Number of jobs notified together in a run window",
+    )
+    parser.add_argument(
+        "--abs-tol",
+        type=float,
+        default=DEFAULT_ABS_TOL,
+        help="Absolute tolerance when comparing numeric values",
+    )
+    parser.add_argument(
+        "--rel-tol",
+        type=float,
+        default=DEFAULT_REL_TOL,
+        help="Relative tolerance when comparing numeric values",
+    )
+    parser.add_argument(
+        "--compare-workers",
+        type=int,
+        default=1,
+        help="Number of processes comparing large results",
+    )
+    parser.add_argument(
+        "--extract-backend",
+        type=str,
+        choices=EXTRACT_BACKENDS,
+        default=DEFAULT_EXTRACT_BACKEND,
+        help="Extract the EDW data with pd.read_sql or as an Arrow table",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_memory_budget,
+        default=None,
+        help="Memory the comparison may use, e.g. 4GB. Larger results are spilled to disk",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run the job again even if the same run is completed",
+    )
 
     args = parser.parse_args()
     if args.daxfile is None or args.sqlfile is None:
@@ -0,0 +1,322 @@
+"""This module splits a large EDW query into slices of a partition column,
+e.g. the month offset, the fiscal week or a range of product keys, and runs
+the slices in parallel, each on its own connection of a pool. A semaphore caps
+the number of EDW sessions the pool opens, and can be shared by the pools of
+every job to cap the sessions of the process. The slices are read as Arrow
+tables and concatenated without copying the data.
+
+The partition column must determine the group of every row of the results,
+otherwise a group would be split between two slices."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Empty, SimpleQueue
+from typing import Callable, Iterator, List, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from arrow_extract import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_EXTRACT_BACKEND,
+        arrow_odbc,
+        read_arrow,
+    )
+    from frame_schema import FrameSchema
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.arrow_extract import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_EXTRACT_BACKEND,
+        arrow_odbc,
+        read_arrow,
+    )
+    from carhartt_pbi_automate.frame_schema import FrameSchema
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Number of slices of a query, and of EDW sessions reading them at a time
+DEFAULT_SLICES = 4
+DEFAULT_MAX_SESSIONS = 4
+
+
+class PartitionSpec:
+    """This class describes how the query of a job is split: an integer
+    column of the query and the inclusive range of its values, divided into
+    slices of consecutive values."""
+
+    def __init__(
+        self,
+        column: str,
+        start: int,
+        stop: int,
+        slices: int = DEFAULT_SLICES,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ):
+        """Initialize the partition.
+        Args:
+            column (str): The partition column, as written in the query, e.g.
+            "[DT].[CurrentMonthOffset]".
+            start (int): The first value of the column.
+            stop (int): The last value of the column, included.
+            slices (int): Number of slices. There are fewer slices when the
+            range has fewer values.
+            max_sessions (int): Maximum number of slices read at a time.
+        """
+        if not column:
+            raise ValueError("column must not be empty.")
+        if stop < start:
+            raise ValueError(
+                f"stop must be greater than or equal to start. Not {stop}"
+            )
+        if slices < 1 or max_sessions < 1:
+            raise ValueError(
+                "slices and max_sessions must be 1 or greater. "
+                f"Not {slices} and {max_sessions}"
+            )
+        self.column = column
+        self.start = int(start)
+        self.stop = int(stop)
+        self.slices = slices
+        self.max_sessions = max_sessions
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """Return the inclusive ranges of values of the slices."""
+        values = self.stop - self.start + 1
+        slices = min(self.slices, values)
+        size, extra = divmod(values, slices)
+        ranges = []
+        first = self.start
+        for index in range(slices):
+            last = first + size - 1 + (1 if index < extra else 0)
+            ranges.append((first, last))
+            first = last + 1
+        return ranges
+
+    def queries(self, query: str) -> List[str]:
+        """Return the query of every slice.
+        Args:
+            query (str): The query of the job.
+        Returns:
+            List[str]: The query filtered on the range of every slice."""
+        return [
+            add_partition_filter(
+                query, f"{self.column} BETWEEN {first} AND {last}"
+            )
+            for first, last in self.ranges()
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f"PartitionSpec({self.column!r}, {self.start}, {self.stop}, "
+            f"slices={self.slices})"
+        )
+
+
+class ConnectionPool:
+    """This class lends connections to the threads reading the slices. The
+    connections are opened when they are first needed and reused, and the
+    number of connections lent at a time is capped by a semaphore, plus an
+    optional governor shared with other pools."""
+
+    def __init__(
+        self,
+        connect: Callable,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        governor: threading.Semaphore = None,
+    ):
+        """Initialize the pool.
+        Args:
+            connect (Callable): Opens a new connection.
+            max_sessions (int): Maximum number of connections of the pool.
+            governor (threading.Semaphore): Caps the connections lent by
+            every pool sharing it.
+        """
+        if max_sessions < 1:
+            raise ValueError(
+                f"max_sessions must be 1 or greater. Not {max_sessions}"
+            )
+        self.connect = connect
+        self.max_sessions = max_sessions
+        self.governor = governor
+        self._sessions = threading.BoundedSemaphore(max_sessions)
+        self._idle: SimpleQueue = SimpleQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """Lend a connection, waiting while the pool or the governor has no
+        session left.
+        Yields:
+            The connection, returned to the pool at the end of the block."""
+        with self.session():
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                connection = self.connect()
+                with self._lock:
+                    self._opened.append(connection)
+            try:
+                yield connection
+            finally:
+                self._idle.put(connection)
+
+    @contextmanager
+    def session(self) -> Iterator:
+        """Count a session opened outside of the pool, e.g. by arrow-odbc,
+        waiting while the pool or the governor has no session left. No
+        connection of the pool is opened."""
+        with self._sessions:
+            if self.governor is not None:
+                self.governor.acquire()
+            try:
+                yield
+            finally:
+                if self.governor is not None:
+                    self.governor.release()
+
+    @property
+    def opened(self) -> int:
+        """Return the number of connections opened by the pool."""
+        with self._lock:
+            return len(self._opened)
+
+    def close(self):
+        """Close the connections of the pool."""
+        with self._lock:
+            connections, self._opened = self._opened, []
+        for connection in connections:
+            connection.close()
+        self._idle = SimpleQueue()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def extract_partitioned(
+    pool: ConnectionPool,
+    query: str,
+    schema: FrameSchema,
+    partition: PartitionSpec,
+    backend: str = DEFAULT_EXTRACT_BACKEND,
+    connection_string: str = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> pd.DataFrame:
+    """Run the slices of a query in parallel and return the results with the
+    dtypes of a job schema.
+    Args:
+        pool (ConnectionPool): The connections the slices run on.
+        query (str): The SQL query.
+        schema (FrameSchema): The schema of the job.
+        partition (PartitionSpec): How the query is split.
+        backend (str): "pandas" or "arrow", see `arrow_extract`.
+        connection_string (str): The ODBC connection string read by
+        arrow-odbc, when it is installed, with the arrow backend.
+        batch_size (int): Rows fetched at a time by the arrow backend.
+    Returns:
+        pd.DataFrame: The results of every slice."""
+    queries = partition.queries(query)
+
+    def _read(slice_query: str):
+        """Read a slice on a connection of the pool."""
+        if backend == "arrow" and connection_string and arrow_odbc is not None:
+            # arrow-odbc opens its own session, the pool only counts it
+            with pool.session():
+                return read_arrow(connection_string, slice_query, batch_size)
+        with pool.connection() as connection:
+            if backend == "pandas":
+                return pd.read_sql(slice_query, connection)
+            return read_arrow(connection, slice_query, batch_size)
+
+    workers = min(len(queries), partition.max_sessions, pool.max_sessions)
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="EdwSlice"
+    ) as executor:
+        parts = list(executor.map(_read, queries))
+    log.debug(
+        "Read %s slices of %s on %s connections.",
+        len(parts),
+        partition.column,
+        pool.opened,
+    )
+
+    if backend == "pandas":
+        frame = schema.apply(pd.concat(parts, ignore_index=True))
+    else:
+        # The record batches of the slices become the chunks of a single
+        # table, nothing is copied until the table is handed to pandas
+        table = pa.concat_tables(parts, promote_options="permissive")
+        frame = schema.from_arrow(table)
+    if frame.duplicated(schema.key_columns).any():
+        raise ValueError(
+            f"The partition column {partition.column} splits the groups of "
+            "the query, choose a column that determines the key columns."
+        )
+    return frame
+
+
+def add_partition_filter(query: str, predicate: str) -> str:
+    """Add a predicate to the WHERE clause of the last statement of a query,
+    the last WHERE outside of parentheses, comments and strings.
+    Args:
+        query (str): The SQL query.
+        predicate (str): The predicate, e.g. "[DT].[CurrentMonthOffset]
+        BETWEEN -1 AND 0".
+    Returns:
+        str: The query with the predicate."""
+    position = _find_outer_where(query)
+    if position is None:
+        raise ValueError("The query has no WHERE clause to partition.")
+    end = position + len("WHERE")
+    return f"{query[:end]} ({predicate}) AND{query[end:]}"
+
+
+def _find_outer_where(query: str) -> int:
+    """Return the position of the last WHERE keyword at the top level of a
+    query, None if there is none."""
+    position = None
+    depth = 0
+    index = 0
+    length = len(query)
+    while index < length:
+        char = query[index]
+        if query.startswith("--", index):
+            index = query.find("\n", index)
+            index = length if index < 0 else index
+        elif query.startswith("/*", index):
+            index = query.find("*/", index + 2)
+            index = length if index < 0 else index + 2
+        elif char == "'":
+            # Quotes in strings are doubled, '' is skipped as two strings
+            index = query.find("'", index + 1)
+            index = length if index < 0 else index + 1
+        elif char == "(":
+            depth += 1
+            index += 1
+        elif char == ")":
+            depth -= 1
+            index += 1
+        else:
+            if (
+                depth == 0
+                and query[index : index + 5].upper() == "WHERE"
+                and (index == 0 or not _is_word(query[index - 1]))
+                and (index + 5 == length or not _is_word(query[index + 5]))
+            ):
+                position = index
+            index += 1
+    return position
+
+
+def _is_word(char: str) -> bool:
+    """Return whether a character can be part of an identifier."""
+    return char.isalnum() or char in "_@#$"
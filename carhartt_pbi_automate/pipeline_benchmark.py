@@ -0,0 +1,214 @@
+"""This module measures the throughput of the stages of the validation
+pipeline, extract, compare, report and notify, against the local stand-ins of
+the EDW, Power BI and Microsoft Teams.
+
+Usage:
+    python pipeline_benchmark.py --rows 1000 100000"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+try:
+    from arrow_extract import (
+        DEFAULT_EXTRACT_BACKEND,
+        EXTRACT_BACKENDS,
+        extract_frame,
+    )
+    from comparison_report import build_digest, write_report
+    from database import Database
+    from dax import pass_args_to_dax_query, strip_brackets
+    from fake_backends import FakeBiConnection, WebhookSink, build_warehouse
+    from frame_schema import FrameSchema
+    from notification_dispatcher import (
+        NotificationDispatcher,
+        OUTBOX_SQL_SCRIPT,
+    )
+    from send_teams_message import build_fail_payloads
+    from tolerance_compare import compare_with_tolerance
+except ImportError:
+    from carhartt_pbi_automate.arrow_extract import (
+        DEFAULT_EXTRACT_BACKEND,
+        EXTRACT_BACKENDS,
+        extract_frame,
+    )
+    from carhartt_pbi_automate.comparison_report import (
+        build_digest,
+        write_report,
+    )
+    from carhartt_pbi_automate.database import Database
+    from carhartt_pbi_automate.dax import (
+        pass_args_to_dax_query,
+        strip_brackets,
+    )
+    from carhartt_pbi_automate.fake_backends import (
+        FakeBiConnection,
+        WebhookSink,
+        build_warehouse,
+    )
+    from carhartt_pbi_automate.frame_schema import FrameSchema
+    from carhartt_pbi_automate.notification_dispatcher import (
+        NotificationDispatcher,
+        OUTBOX_SQL_SCRIPT,
+    )
+    from carhartt_pbi_automate.send_teams_message import build_fail_payloads
+    from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+
+# The queries of the benchmark, at product grain so the number of compared
+# rows grows with the number of plan rows
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BENCHMARK_QUERIES_DIR = ROOT_DIR / "queries" / "benchmark"
+BENCHMARK_SQL_FILE = (
+    BENCHMARK_QUERIES_DIR / "Supply - Inventory Demand Sales by Product.sql"
+)
+BENCHMARK_DAX_FILE = (
+    BENCHMARK_QUERIES_DIR / "Supply - Inventory Demand Sales by Product.msdax"
+)
+
+STAGES = ("extract", "compare", "report", "notify")
+
+
+def run_benchmark(
+    rows: int,
+    work_dir: Path,
+    discrepancy_rate: float = 0.001,
+    seed: int = 0,
+    extract_backend: str = DEFAULT_EXTRACT_BACKEND,
+) -> List[Dict]:
+    """Run the pipeline once against the stand-ins and time every stage.
+    Args:
+        rows (int): Number of rows of the synthetic plans table.
+        work_dir (Path): Directory for the report and the outbox database.
+        discrepancy_rate (float): Fraction of the Power BI values changed so
+        the comparison finds differences.
+        seed (int): Seed of the random generator.
+        extract_backend (str): How the EDW data is extracted, "pandas" or
+        "arrow".
+    Returns:
+        List[Dict]: The `stage`, `rows`, `seconds` and `rows_per_second` of
+        every stage. The extract stage counts the plan rows read, the other
+        stages the compared rows."""
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    sql_query = BENCHMARK_SQL_FILE.read_text(encoding="utf-8")
+    dax_query = BENCHMARK_DAX_FILE.read_text(encoding="utf-8")
+    job_schema = FrameSchema.from_dax(dax_query)
+    dax_query = pass_args_to_dax_query(
+        dax_query, {"plan_versions": "NIGHTLY-BENCHMARK"}
+    )
+    rng = np.random.default_rng(seed)
+    edw = build_warehouse(rows, seed=seed)
+
+    def _power_bi_results(_: str) -> pd.DataFrame:
+        """Answer the DAX query with the EDW data, slightly changed."""
+        frame = pd.read_sql(sql_query, edw)
+        measures = frame.columns[2:]
+        changed = rng.random((len(frame), len(measures))) < discrepancy_rate
+        frame[measures] = frame[measures] + changed
+        return frame
+
+    timings = []
+    stage_start = time.perf_counter()
+
+    def _record(stage: str, stage_rows: int):
+        """Record the duration of a stage and restart the clock."""
+        nonlocal stage_start
+        seconds = time.perf_counter() - stage_start
+        timings.append(
+            {
+                "stage": stage,
+                "rows": stage_rows,
+                "seconds": seconds,
+                "rows_per_second": stage_rows / seconds if seconds else 0.0,
+            }
+        )
+        stage_start = time.perf_counter()
+
+    # Extract, the same way run_supply.py builds both dataframes
+    df_edw = extract_frame(edw, sql_query, job_schema, extract_backend)
+    cursor = FakeBiConnection(_power_bi_results).cursor()
+    cursor.execute(dax_query)
+    column_names = [strip_brackets(column[0]) for column in cursor.description]
+    df_pbi = job_schema.from_rows(cursor.fetchall(), column_names)
+    cursor.close()
+    _record("extract", rows)
+
+    summary = compare_with_tolerance(
+        df_pbi, df_edw, join_columns=list(df_edw.columns[:2])
+    )
+    _record("compare", len(df_edw))
+
+    write_report(summary, work_dir / "comparison_result.html")
+    digest = build_digest(summary)
+    _record("report", len(df_edw))
+
+    outbox = Database(work_dir / "notification_outbox.db", OUTBOX_SQL_SCRIPT)
+    dispatcher = NotificationDispatcher(outbox)
+    with WebhookSink(keep_payloads=False) as sink:
+        payloads = build_fail_payloads(
+            {
+                "teams_webhook_url": sink.url,
+                "color": "FF0000",
+                "notification_title": "Benchmark",
+                "message": "Benchmark of the notification stage.",
+                "compare_report": digest,
+            }
+        )
+        for payload in payloads:
+            dispatcher.enqueue(sink.url, payload)
+        dispatcher.deliver_due()
+        _record("notify", len(df_edw))
+    dispatcher.close()
+    edw.close()
+    return timings
+
+
+def main():
+    """Run the benchmark for every requested size and print the results."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline against local stand-ins."
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[1_000, 100_000],
+        help="Number of plan rows of every run.",
+    )
+    parser.add_argument(
+        "--discrepancy-rate",
+        type=float,
+        default=0.001,
+        help="Fraction of the Power BI values changed.",
+    )
+    parser.add_argument(
+        "--extract-backend",
+        type=str,
+        choices=EXTRACT_BACKENDS,
+        default=DEFAULT_EXTRACT_BACKEND,
+        help="How the EDW data is extracted.",
+    )
+    args = parser.parse_args()
+
+    table = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for timing in run_benchmark(
+                rows,
+                Path(work_dir),
+                args.discrepancy_rate,
+                extract_backend=args.extract_backend,
+            ):
+                table.append(dict(size=rows, **timing))
+    print(tabulate(table, headers="keys", floatfmt=",.3f"))
+
+
+if __name__ == "__main__":
+    main()
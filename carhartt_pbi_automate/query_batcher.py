@@ -0,0 +1,110 @@
+"""This module collects the queries submitted by the jobs running at the same
+time and runs them as batches, one round trip to the database per batch. The
+first job submitting a query waits for the others during a short window and
+runs the batch on its own connection, the results are handed to every job.
+The batches themselves are built by `dax_batch` and `sql_batch`."""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+try:
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Seconds the first query of a batch waits for the queries of the other jobs
+DEFAULT_BATCH_WINDOW = 2.0
+
+
+class QueryBatcher:
+    """This class collects the queries submitted by the jobs running at the
+    same time and runs them as batches."""
+
+    def __init__(
+        self,
+        run_batch: Callable,
+        expected_queries: int = 1,
+        window_seconds: float = DEFAULT_BATCH_WINDOW,
+    ):
+        """Initialize the batcher.
+        Args:
+            run_batch (Callable): Runs a list of queries on a connection as a
+            single request and returns the result of every query.
+            expected_queries (int): Number of queries that run the batch as
+            soon as they are submitted, usually the number of jobs running at
+            a time.
+            window_seconds (float): Seconds the first query of a batch waits
+            for the other queries.
+        """
+        if expected_queries < 1:
+            raise ValueError(
+                f"expected_queries must be 1 or greater. Not {expected_queries}"
+            )
+        self.run_batch = run_batch
+        self.expected_queries = expected_queries
+        self.window_seconds = window_seconds
+        self._pending: List[Tuple[str, Future]] = []
+        self._collecting = False
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def execute(self, connection, query: str) -> Tuple[List[str], list]:
+        """Run a query in a batch with the queries submitted by the other
+        jobs.
+        Args:
+            connection: The connection of the job. It runs the batch if the
+            query is the first one of the batch.
+            query (str): The query.
+        Returns:
+            Tuple[List[str], list]: The column names and the rows of the
+            query."""
+        future = Future()
+        with self._lock:
+            self._pending.append((query, future))
+            leader = not self._collecting
+            self._collecting = True
+            if len(self._pending) >= self.expected_queries:
+                self._full.set()
+
+        if leader:
+            self._full.wait(self.window_seconds)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._collecting = False
+                self._full.clear()
+            self._run(connection, batch)
+        return future.result()
+
+    def _run(self, connection, batch: List[Tuple[str, Future]]):
+        """Run a batch and hand the results to the jobs that submitted it."""
+        queries = [query for query, _ in batch]
+        try:
+            results = self.run_batch(connection, queries)
+            log.debug("Ran %s queries in one request.", len(queries))
+        except Exception as error:  # pylint: disable=broad-except
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                return
+            # A query failing fails the whole batch, the queries are run
+            # one by one so only the jobs of the failing queries fail
+            log.warning(
+                "The batch of %s queries failed, running them one by "
+                "one: %s",
+                len(queries),
+                error,
+            )
+            for query, future in batch:
+                try:
+                    future.set_result(self.run_batch(connection, [query])[0])
+                except (
+                    Exception
+                ) as query_error:  # pylint: disable=broad-except
+                    future.set_exception(query_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
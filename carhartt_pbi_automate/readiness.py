@@ -0,0 +1,177 @@
+"""This module holds a job back until the data it compares is ready. Cheap probe
+queries are run on the EDW and on Power BI, with exponential backoff, until
+both return the version of the data loaded, e.g. the `VersionDateKey` of the
+nightly plans in the EDW and the `NIGHTLY-m/d/yyyy` plan version in the Supply
+dataset. The data version identifies the run of the job in the run
+registry."""
+
+import math
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import pandas as pd
+
+try:
+    from dax import pass_args_to_dax_query
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.dax import pass_args_to_dax_query
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Seconds to wait for the data before the job gives up, and between two
+# checks of the probes
+DEFAULT_TIMEOUT = 4 * 60 * 60.0
+DEFAULT_BASE_DELAY = 60.0
+DEFAULT_MAX_DELAY = 15 * 60.0
+
+
+class ReadinessGate:
+    """This class runs the readiness probes of a job until the EDW and Power
+    BI both return a data version. A probe is a query returning a single
+    value: NULL, blank or no rows while the data is not ready, otherwise a
+    value identifying the data loaded."""
+
+    def __init__(
+        self,
+        edw_probe: Union[Path, str] = None,
+        power_bi_probe: Union[Path, str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the gate.
+        Args:
+            edw_probe (Union[Path, str]): The SQL probe run on the EDW.
+            power_bi_probe (Union[Path, str]): The DAX probe run on Power BI,
+            it receives the parameters of the DAX query of the job.
+            timeout (float): Seconds to wait for the data.
+            base_delay (float): Seconds to wait after the first check, the
+            delay doubles after every check.
+            max_delay (float): Maximum seconds to wait between two checks.
+            sleep (Callable[[float], None]): Waits the given seconds.
+            clock (Callable[[], float]): Returns the current time in seconds.
+        """
+        if edw_probe is None and power_bi_probe is None:
+            raise ValueError("At least one probe must be provided.")
+        if base_delay <= 0 or max_delay < base_delay:
+            raise ValueError(
+                "base_delay must be greater than 0 and max_delay at least "
+                f"base_delay. Not {base_delay} and {max_delay}"
+            )
+        self.edw_probe = Path(edw_probe) if edw_probe else None
+        self.power_bi_probe = Path(power_bi_probe) if power_bi_probe else None
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.clock = clock
+
+    def probe(
+        self, conn_edw, conn_bi, parameters: Dict[str, str] = None
+    ) -> Dict[str, Optional[str]]:
+        """Run the probes once.
+        Args:
+            conn_edw: The connection to the EDW.
+            conn_bi: The connection to Power BI.
+            parameters (Dict[str, str]): The parameters of the DAX probe.
+        Returns:
+            Dict[str, Optional[str]]: The data version returned by every
+            probe, None when the data is not ready."""
+        versions = {}
+        if self.edw_probe:
+            query = self.edw_probe.read_text(encoding="utf-8")
+            versions["edw"] = _run_probe(
+                "EDW", fetch_sql_value, conn_edw, query
+            )
+        if self.power_bi_probe:
+            query = pass_args_to_dax_query(
+                self.power_bi_probe.read_text(encoding="utf-8"),
+                parameters or {},
+            )
+            versions["power_bi"] = _run_probe(
+                "Power BI", fetch_cursor_value, conn_bi, query
+            )
+        return versions
+
+    def wait(
+        self, conn_edw, conn_bi, parameters: Dict[str, str] = None
+    ) -> Optional[str]:
+        """Run the probes until the data is ready on both sides or the
+        timeout expires.
+        Args:
+            conn_edw: The connection to the EDW.
+            conn_bi: The connection to Power BI.
+            parameters (Dict[str, str]): The parameters of the DAX probe.
+        Returns:
+            Optional[str]: The data version, e.g.
+            `edw=20240523;power_bi=NIGHTLY-5/23/2024`, None if the data was
+            not ready before the timeout."""
+        deadline = self.clock() + self.timeout
+        checks = 0
+        while True:
+            versions = self.probe(conn_edw, conn_bi, parameters)
+            checks += 1
+            if all(version is not None for version in versions.values()):
+                data_version = ";".join(
+                    f"{side}={version}" for side, version in versions.items()
+                )
+                log.info(
+                    "Data ready after %s checks: %s", checks, data_version
+                )
+                return data_version
+
+            waiting = [
+                side for side, version in versions.items() if not version
+            ]
+            delay = min(self.max_delay, self.base_delay * 2 ** (checks - 1))
+            delay *= random.uniform(0.5, 1.0)
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                log.warning("Data not ready before the timeout: %s", waiting)
+                return None
+            log.info(
+                "Waiting for %s, next check in %.0f seconds.", waiting, delay
+            )
+            self.sleep(min(delay, remaining))
+
+
+def fetch_sql_value(connection, query: str):
+    """Return the first value returned by a SQL query, None if it returns no
+    rows. The connection is the one passed to `pd.read_sql`."""
+    frame = pd.read_sql(query, connection)
+    return None if frame.empty else frame.iat[0, 0]
+
+
+def fetch_cursor_value(connection, query: str):
+    """Return the first value returned by a query run on a DB-API cursor,
+    None if it returns no rows."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return None if row is None else row[0]
+
+
+def _run_probe(
+    side: str, fetch: Callable, connection, query: str
+) -> Optional[str]:
+    """Run a probe, an error counts as data not ready."""
+    try:
+        value = fetch(connection, query)
+    except Exception as error:  # pylint: disable=broad-except
+        log.warning("The %s probe failed: %s", side, error)
+        return None
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
@@ -0,0 +1,16 @@
+@echo off
+@REM The project directory is the parent of the directory of this script
+set "DIR=%~dp0.."
+
+@REM Change the directory to the project directory
+cd /d "%DIR%"
+
+@REM Activate the virtual environment, run the script, and deactivate the virtual environment
+call venv\Scripts\activate
+
+@REM Run the scheduler, it runs the jobs of jobs.toml until it is stopped
+python "%DIR%\carhartt_pbi_automate\run_jobs.py" --manifest "%DIR%\jobs.toml" %*
+
+@REM Deactivate the virtual environment
+call venv\Scripts\deactivate
+exit
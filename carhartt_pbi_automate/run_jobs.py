@@ -0,0 +1,156 @@
+"""This module runs the validation jobs of the job manifest on their cron
+schedules, in a single process, instead of one Windows Task Scheduler task
+per job. The jobs due at the same time are notified together.
+
+Usage:
+    python run_jobs.py --manifest jobs.toml
+    python run_jobs.py --run-now "Supply - Inventory Demand Sales"
+"""
+
+import argparse
+import sys
+from concurrent.futures import wait
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+import pythoncom
+
+from dax_batch import DaxBatcher
+from get_logger import get_logger
+from job_manifest import DEFAULT_MANIFEST, JobSpec, load_manifest
+from job_scheduler import JobScheduler
+from notification_coalescer import NotificationCoalescer
+from notification_dispatcher import NotificationDispatcher
+from run_registry import RunRegistry
+from sql_batch import SqlBatcher
+from run_supply import (
+    LOGS_DIR,
+    TEAMS_WEBHOOK_URL,
+    finish_notifications,
+    run_job,
+)
+
+# Log name
+LOG_NAME = "run_jobs"
+
+# Create a logger object
+log = get_logger(LOG_NAME, (LOGS_DIR / LOG_NAME).with_suffix(".log"))
+
+
+def parse_job_arguments() -> argparse.Namespace:
+    """Parses the arguments of the scheduler."""
+    parser = argparse.ArgumentParser(
+        description="Run the validation jobs of the job manifest."
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=str(DEFAULT_MANIFEST),
+        help="File path to the job manifest",
+    )
+    parser.add_argument(
+        "--run-now",
+        type=str,
+        nargs="*",
+        default=None,
+        metavar="JOB",
+        help="Run the given jobs, or every job, once and exit",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=None,
+        help="Maximum number of jobs running at a time",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run the jobs again even if the same runs are completed",
+    )
+    return parser.parse_args()
+
+
+def run_scheduled_job(
+    job: JobSpec,
+    due_at: datetime,
+    batch_size: int,
+    dispatcher: NotificationDispatcher,
+    run_registry: RunRegistry,
+    force: bool = False,
+    dax_batcher: DaxBatcher = None,
+    sql_batcher: SqlBatcher = None,
+):
+    """Run a job in a thread of the scheduler. The jobs due at the same time
+    share a run window, so they are notified together, and the DAX and SQL
+    queries of the jobs running at the same time are sent in single
+    requests."""
+    # The ADO connections are COM objects, COM must be initialised in every
+    # thread using them
+    pythoncom.CoInitialize()
+    try:
+        coalescer = NotificationCoalescer(
+            dispatcher, TEAMS_WEBHOOK_URL, expected_jobs=batch_size
+        )
+        run_window = due_at.strftime("%Y-%m-%d %H:%M")
+        if not run_job(
+            job,
+            coalescer,
+            run_window,
+            run_registry=run_registry,
+            force=force,
+            dax_batcher=dax_batcher,
+            sql_batcher=sql_batcher,
+        ):
+            log.error(
+                "%s failed, see the logs for more information.", job.name
+            )
+    finally:
+        pythoncom.CoUninitialize()
+
+
+def main():
+    """Run the jobs of the manifest until the process is interrupted."""
+    try:
+        args = parse_job_arguments()
+        manifest = load_manifest(Path(args.manifest))
+    except (argparse.ArgumentError, OSError, ValueError) as error:
+        log.error("Error: %s", error, exc_info=True)
+        log.critical("Failed to load the job manifest. Exiting the program.")
+        sys.exit(1)
+
+    # Deliver the notifications in the background for the whole life of the
+    # process
+    dispatcher = NotificationDispatcher()
+    dispatcher.start()
+
+    # A batch runs as soon as every job running at a time submitted its query
+    max_concurrent = args.max_concurrent or manifest.max_concurrent
+    scheduler = JobScheduler(
+        manifest.jobs,
+        partial(
+            run_scheduled_job,
+            dispatcher=dispatcher,
+            run_registry=RunRegistry(),
+            force=args.force,
+            dax_batcher=DaxBatcher(expected_queries=max_concurrent),
+            sql_batcher=SqlBatcher(expected_queries=max_concurrent),
+        ),
+        max_concurrent=max_concurrent,
+        poll_seconds=manifest.poll_seconds,
+    )
+    try:
+        if args.run_now is None:
+            scheduler.run_forever()
+        else:
+            jobs = [manifest.get(name) for name in args.run_now] or None
+            wait(scheduler.run_now(jobs))
+    except KeyboardInterrupt:
+        log.info("Interrupted, waiting for the running jobs to finish.")
+    finally:
+        scheduler.close()
+        finish_notifications(dispatcher)
+
+
+if __name__ == "__main__":
+    main()
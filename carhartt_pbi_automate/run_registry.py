@@ -0,0 +1,289 @@
+"""This module keeps a registry of the runs of the validation jobs in a SQLite
+database. A run is identified by its job, the parameters of its queries and the
+version of the data it compares. Its row is the lock of the run while it is
+running, and holds its outcome once it is completed, so a task retried or
+launched twice returns the outcome of the first run instead of extracting the
+data again."""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    from database import Database
+    from get_logger import get_logger
+except ImportError:
+    from carhartt_pbi_automate.database import Database
+    from carhartt_pbi_automate.get_logger import get_logger
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# The database of the job runs and the script that creates its table
+ROOT_DIR = Path(__file__).resolve().parent.parent
+JOB_RUNS_DATABASE = ROOT_DIR / "database" / "job_runs.db"
+JOB_RUNS_SQL_SCRIPT = ROOT_DIR / "database" / "job_runs.sql"
+
+RUN_TABLE = "job_run"
+
+RUN_COLUMNS = [
+    "run_key",
+    "job_name",
+    "parameters",
+    "data_version",
+    "status",
+    "owner",
+    "started_at",
+    "expires_at",
+    "finished_at",
+    "passed",
+    "summary",
+    "results_path",
+]
+
+# Seconds a run keeps its lock. A run still running after that is considered
+# crashed and can be taken over.
+DEFAULT_LEASE_SECONDS = 2 * 60 * 60.0
+
+
+class RunRecord:
+    """This class holds a row of the registry."""
+
+    def __init__(self, row: Dict):
+        """Initialize the record.
+        Args:
+            row (Dict): The row of the registry.
+        """
+        self.run_key = row["run_key"]
+        self.job_name = row["job_name"]
+        self.parameters = json.loads(row["parameters"])
+        self.data_version = row["data_version"]
+        self.status = row["status"]
+        self.owner = row["owner"]
+        self.started_at = row["started_at"]
+        self.expires_at = row["expires_at"]
+        self.finished_at = row["finished_at"]
+        self.passed = None if row["passed"] is None else bool(row["passed"])
+        self.summary = row["summary"]
+        self.results_path = row["results_path"]
+
+    @property
+    def completed(self) -> bool:
+        """Return whether the run compared the data."""
+        return self.status == "completed"
+
+    def __repr__(self) -> str:
+        return f"RunRecord({self.job_name!r}, status={self.status!r})"
+
+
+class RunRegistry:
+    """This class locks the runs of the jobs and records their outcome."""
+
+    def __init__(
+        self,
+        database: Union[Database, Path, str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        """Initialize the registry.
+        Args:
+            database (Union[Database, Path, str]): The database of the job
+            runs. Defaults to `database/job_runs.db`.
+            lease_seconds (float): Seconds a run keeps its lock.
+        """
+        if database is None:
+            database = JOB_RUNS_DATABASE
+        if isinstance(database, Database):
+            self.database = database
+        elif isinstance(database, (Path, str)):
+            self.database = Database(Path(database), JOB_RUNS_SQL_SCRIPT)
+        else:
+            raise TypeError(
+                f"database must be a Database, Path or str. Not {type(database)}"
+            )
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        # The Database object keeps a single connection attribute, the lock
+        # serializes its use between the threads of the scheduler. Between
+        # processes the runs are locked by the database itself.
+        self._lock = threading.Lock()
+
+    def acquire(
+        self,
+        job_name: str,
+        parameters: Dict[str, str],
+        data_version: str = None,
+        force: bool = False,
+    ) -> Tuple[bool, RunRecord]:
+        """Lock a run. A run is locked unless the same run is completed or
+        still running, failed runs and runs whose lock expired are run again.
+        Args:
+            job_name (str): The name of the job.
+            parameters (Dict[str, str]): The parameters of the DAX query.
+            data_version (str): The version of the data, if it is known.
+            force (bool): Lock the run even if it is completed.
+        Returns:
+            Tuple[bool, RunRecord]: Whether the run was locked, and the run.
+            When it was not locked the run is the completed or running one.
+        """
+        run_key = make_run_key(job_name, parameters, data_version)
+        now = time.time()
+        values = {
+            "run_key": run_key,
+            "job_name": job_name,
+            "parameters": json.dumps(parameters, sort_keys=True),
+            "data_version": data_version,
+            "status": "running",
+            "owner": self.owner,
+            "started_at": now,
+            "expires_at": now + self.lease_seconds,
+            "finished_at": None,
+            "passed": None,
+            "summary": None,
+            "results_path": None,
+        }
+        with self._lock:
+            try:
+                self.database.insert(
+                    RUN_TABLE, list(values), list(values.values())
+                )
+                acquired = True
+            except sqlite3.IntegrityError:
+                # The UPDATE is atomic, of two processes taking over the same
+                # run only one updates the row
+                takeover = f"status = 'failed' OR expires_at < {now!r}"
+                if force:
+                    takeover += " OR status = 'completed'"
+                acquired = bool(
+                    self.database.update(
+                        RUN_TABLE,
+                        list(values),
+                        list(values.values()),
+                        where=f"{_key_where(run_key)} AND ({takeover})",
+                    )
+                )
+        record = self.get(run_key)
+        if acquired:
+            log.debug("Run of %s locked: %s", job_name, run_key)
+        else:
+            log.info(
+                "Run of %s is already %s, started by %s.",
+                job_name,
+                record.status,
+                record.owner,
+            )
+        return acquired, record
+
+    def find(
+        self, job_name: str, parameters: Dict[str, str], since: float = None
+    ) -> Optional[RunRecord]:
+        """Return a run of a job with the same parameters, whatever the
+        version of its data, that is still running or was completed since a
+        time. The registry is checked before connecting to the sources, the
+        version of the data is only known once the readiness probes ran.
+        Args:
+            job_name (str): The name of the job.
+            parameters (Dict[str, str]): The parameters of the DAX query.
+            since (float): The time the completed runs must have finished
+            after. Without it no completed run is returned.
+        Returns:
+            Optional[RunRecord]: The latest such run, None if there is none.
+        """
+        now = time.time()
+        found = f"status = 'running' AND expires_at >= {now!r}"
+        if since is not None:
+            found += f" OR status = 'completed' AND finished_at >= {since!r}"
+        parameters = json.dumps(parameters, sort_keys=True)
+        with self._lock:
+            rows = self.database.select(
+                RUN_TABLE,
+                RUN_COLUMNS,
+                where=(
+                    f"job_name = '{_quote(job_name)}' "
+                    f"AND parameters = '{_quote(parameters)}' AND ({found})"
+                ),
+            )
+        if not rows:
+            return None
+        return RunRecord(max(rows, key=lambda row: row["started_at"]))
+
+    def complete(
+        self,
+        run_key: str,
+        passed: bool,
+        summary: str,
+        results_path: Union[Path, str] = None,
+    ):
+        """Record the outcome of a run that compared the data.
+        Args:
+            run_key (str): The key of the run.
+            passed (bool): Whether the data matched.
+            summary (str): One line describing the result.
+            results_path (Union[Path, str]): The folder of the results.
+        """
+        self._finish(
+            run_key,
+            "completed",
+            int(passed),
+            summary,
+            None if results_path is None else str(results_path),
+        )
+
+    def fail(self, run_key: str, summary: str):
+        """Record that a run failed, so it can be run again.
+        Args:
+            run_key (str): The key of the run.
+            summary (str): The error of the run.
+        """
+        self._finish(run_key, "failed", None, summary, None)
+
+    def get(self, run_key: str) -> RunRecord:
+        """Return a run, None if it is not in the registry."""
+        with self._lock:
+            rows = self.database.select(
+                RUN_TABLE, RUN_COLUMNS, where=_key_where(run_key)
+            )
+        return RunRecord(rows[0]) if rows else None
+
+    def _finish(
+        self,
+        run_key: str,
+        status: str,
+        passed: int,
+        summary: str,
+        results_path: str,
+    ):
+        """Record the end of a run."""
+        with self._lock:
+            self.database.update(
+                RUN_TABLE,
+                ["status", "finished_at", "passed", "summary", "results_path"],
+                [status, time.time(), passed, summary, results_path],
+                where=_key_where(run_key),
+            )
+        log.debug("Run %s %s.", run_key, status)
+
+
+def make_run_key(
+    job_name: str, parameters: Dict[str, str], data_version: str = None
+) -> str:
+    """Return the key identifying a run of a job."""
+    identity = json.dumps([job_name, parameters, data_version], sort_keys=True)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def _key_where(run_key: str) -> str:
+    """Return the WHERE clause selecting a run."""
+    return f"run_key = '{run_key}'"
+
+
+def _quote(value: str) -> str:
+    """Escape a value to be used inside a SQL string literal."""
+    return value.replace("'", "''")
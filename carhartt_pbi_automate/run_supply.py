@@ -1,30 +1,55 @@
 """This module contains the main code for the Carhartt Power BI Automation
 project. This script extracts data from the EDW and Power BI databases,
-compares the supply data"""
+compares the supply data. The jobs of the job manifest are run with the same
+code by `run_jobs.py`."""
 
 import os
 import sys
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
-import traceback
 import argparse
 
 import pandas as pd
-import datacompy
 import pymsteams
 import adodbapi
 from dotenv import load_dotenv
 
-from connector import get_edw_connection, get_bi_connection
+from connector import (
+    get_edw_connection,
+    get_edw_odbc_connection_string,
+    get_bi_connection,
+)
 from popup import detect_popup_window
-from get_logger import get_logger
-from dax import pass_args_to_dax_query
+from get_logger import get_logger, log_context, log_stage, new_run_id
+from dax import pass_args_to_dax_query, strip_brackets
 from parse_arguments import parse_arguments
 from get_formated_duration import get_formated_duration
-from send_teams_message import send_ok_teams_message, send_fail_teams_message
+from send_teams_message import (
+    build_ok_payloads,
+    build_fail_payloads,
+    MAX_PAYLOAD_BYTES,
+)
+from notification_dispatcher import NotificationDispatcher
+from notification_coalescer import NotificationCoalescer
+from comparison_report import ComparisonSummary, write_report, build_digest
+from parallel_compare import parallel_compare_with_tolerance
+from spill_compare import spill_compare
+from column_digest import digest_compare
+from bloom_filter import bloom_compare
+from merge_compare import iter_cursor_rows, merge_compare
+from tolerance_compare import duplicated_keys
+from sampling import SampleCheck
+from arrow_extract import dbapi_connection, extract_frame
+from partitioned_extract import ConnectionPool, extract_partitioned
+from dax_partition import extract_dax_partitioned
+from dax_batch import DaxBatcher
+from sql_batch import SqlBatcher
+from frame_schema import FrameSchema
+from job_manifest import JobSpec
+from run_registry import RunRecord, RunRegistry
 
 
 # Constants
@@ -65,6 +90,20 @@ PBI_ARGS = {
     "database": "Supply",
 }
 
+# Seconds to wait for the notifications to be delivered before the process
+# ends. Notifications not delivered by then stay in the outbox and are
+# delivered on the next run.
+NOTIFICATION_DRAIN_SECONDS = 30
+
+# Duplicated keys named in the card of a job whose rows cannot be joined
+DUPLICATED_KEYS_SHOWN = 5
+
+# Rows fetched at a time by the chunked readers of a Bloom filter job
+BLOOM_CHUNK_ROWS = 100_000
+
+# The parameters of the DAX queries, formatted with the time the job starts
+DEFAULT_PARAMETERS = {"plan_versions": "NIGHTLY-{now.month}/{now.day}/{now.year}"}
+
 # Detect the pop-up window titles
 POPUP_WINDOW_TITLES = [
     ".*Sign in to your account.*",
@@ -74,26 +113,28 @@ POPUP_WINDOW_TITLES = [
 # Load environment variables from .env file
 load_dotenv()
 
-# Define a global variable to store the connection to Power BI
-# To be accessed from a thread.
-conn_BI_result: List[adodbapi.Connection] = [None]
+# Define the webhook URL for Microsoft Teams
+TEAMS_WEBHOOK_URL = os.environ.get("TEAMS_WEBHOOK_URL")
+
+# Maximum size of each card sent to Microsoft Teams, larger messages are split
+TEAMS_MAX_PAYLOAD_BYTES = int(
+    os.environ.get("TEAMS_MAX_PAYLOAD_BYTES", MAX_PAYLOAD_BYTES)
+)
 
-# Parse script arguments
-try:
-    script_args = parse_arguments()
-    log.debug("Script arguments: %s", script_args)
-    log.debug("DAX file path: %s", script_args.daxfile)
-    log.debug("SQL file path: %s", script_args.sqlfile)
-except argparse.ArgumentError as error:
-    STACK_TRACE = traceback.format_exc()
-    log.error("Error: %s", error)
-    log.error("Stack trace: %s", STACK_TRACE)
-    log.critical("Failed to parse script arguments. Exiting the program.")
-    sys.exit(1)
+# Maximum number of EDW sessions opened at a time by the partitioned reads of
+# every job running in the process
+MAX_EDW_SESSIONS = int(os.environ.get("MAX_EDW_SESSIONS", 8))
+EDW_GOVERNOR = threading.BoundedSemaphore(MAX_EDW_SESSIONS)
+
+# Maximum number of Power BI sessions opened at a time by the partitioned DAX
+# queries of every job, the capacity throttles the queries beyond that
+MAX_PBI_SESSIONS = int(os.environ.get("MAX_PBI_SESSIONS", 4))
+PBI_GOVERNOR = threading.BoundedSemaphore(MAX_PBI_SESSIONS)
 
 
 # Define a function that wraps get_bi_connection.
 def get_connection(
+    conn_bi_result: List[adodbapi.Connection],
     server: str = "powerbi://api.powerbi.com/v1.0/myorg/BI-Datasets",
     database: str = "Supply",
 ):
@@ -103,337 +144,1297 @@ def get_connection(
     returned.
     """
     # Save the result in the list
-    conn_BI_result[0] = get_bi_connection(server, database)
+    conn_bi_result[0] = get_bi_connection(server, database)
+
+
+def connect_edw():
+    """Connect to the EDW database, trying again until the connection is
+    established."""
+    log.info("Connecting to EDW...")
+    while True:
+        try:
+            conn_edw = get_edw_connection(EDW_ARGS)
+            log.info("Connection to EDW has been established!")
+            return conn_edw
+        except Exception as error:  # pylint: disable=broad-except
+            log.error("Error: %s", error, exc_info=True)
+            log.info("Trying to connect again...")
+            continue
 
 
-script_start_time = datetime.now()
-log.debug(
-    "Starting the process %s", script_start_time.strftime("%Y-%m-%d %H:%M:%S")
-)
+def connect_power_bi() -> adodbapi.Connection:
+    """Connect to the Power BI database, signing in when the pop-up window
+    appears.
+    Returns:
+        adodbapi.Connection: The connection, None if it failed after three
+        retries."""
+    # Store the connection made by the thread
+    conn_bi_result: List[adodbapi.Connection] = [None]
+    is_powerbi_logged_in = False
+    retry_count = 3
+    while True:
+        try:
+            # Create a thread for get_connection
+            thread1 = threading.Thread(
+                target=get_connection, args=(conn_bi_result,), kwargs=PBI_ARGS
+            )
 
-# Connect to the EDW database.
-log.info("Connecting to EDW...")
-while True:
-    try:
-        conn_EDW = get_edw_connection(EDW_ARGS)
-        log.info("Connection to EDW has been established!")
-        break
-    except Exception as error:  # pylint: disable=broad-except
-        STACK_TRACE = traceback.format_exc()
-        log.error("Error: %s", error)
-        log.error("Stack trace: %s", STACK_TRACE)
-        log.info("Trying to connect again...")
-        continue
-
-# Connect to Power BI database.
-IS_POWERBI_LOGGED_IN = False
-RETRY_COUNT = 3
-while True:
-    try:
-        # Create a thread for get_connection
-        thread1 = threading.Thread(target=get_connection, kwargs=PBI_ARGS)
+            # Start the thread
+            thread1.start()
+
+            # Wait for the pop-up to appear (adjust as needed)
+            log.info("Waiting for the pop-up to appear...")
+            time.sleep(4)
+
+            # Check if the pop-up window has been detected
+            printed_once = False
+            while not is_powerbi_logged_in:
+                try:
+                    # Check if the connection has been established
+                    if conn_bi_result[0] is not None:
+                        break
+                    # Call detect_popup_window while get_connection is running in the other thread
+                    detect_popup_window(POPUP_WINDOW_TITLES)
+                    is_powerbi_logged_in = True
+                except Exception as error:  # pylint: disable=broad-except
+                    time.sleep(2)
+                    if printed_once:
+                        break
+                    else:
+                        log.error("Error: %s", error, exc_info=True)
+                        log.info("Trying to log in again...")
+                        printed_once = True
+
+            # Wait for the thread to finish
+            thread1.join()
+
+            # Get the connection from the list
+            log.info("Connection to Power BI has been established!")
+            return conn_bi_result[0]
+        except (pymsteams.TeamsWebhookException, adodbapi.DatabaseError) as error:
+            log.error("Error: %s", error, exc_info=True)
+            if retry_count:
+                log.info("Trying to connect again...")
+                retry_count -= 1
+                continue
+            else:
+                log.critical(
+                    "Failed to connect. Please check the logs for more information.",
+                    exc_info=True,
+                )
+                return None
+
+
+def report_result(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    passed: bool,
+    summary: str,
+    payloads: List[dict],
+):
+    """Record the result of a job. Once every job of the run window has
+    reported, the cards of the window are stored in the notification outbox
+    and delivered in the background by the dispatcher."""
+    coalescer.add_result(run_window, job_name, passed, summary, payloads)
+    coalescer.flush_stale(run_window)
+    if coalescer.ready(run_window):
+        coalescer.flush(run_window)
+    else:
+        log.info("Waiting for the other jobs of %s to report.", run_window)
 
-        # Start the thread
-        thread1.start()
 
-        # Wait for the pop-up to appear (adjust as needed)
-        log.info("Waiting for the pop-up to appear...")
-        time.sleep(4)
+def report_outage(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    source: str,
+    error: Exception,
+):
+    """Report that the data could not be extracted from the EDW or Power BI.
+    """
+    # Send a message to Teams
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(f"Error: {error}")
+    teams_message.text(
+        f"""<font color='red'>Error: {error}</font><br>
+        There could be an outage in the {source} database.<br>
+        Please check the logs for more information.<br>
+        """
+    )
+    report_result(
+        coalescer,
+        run_window,
+        job_name,
+        False,
+        f"Error: {error}",
+        [teams_message.payload],
+    )
 
-        # Check if the pop-up window has been detected
-        printed_once = False  # pylint: disable=invalid-name
-        while not IS_POWERBI_LOGGED_IN:
-            try:
-                # Check if the connection has been established
-                if conn_BI_result[0] is not None:
-                    break
-                # Call detect_popup_window while get_connection is running in the other thread
-                detect_popup_window(POPUP_WINDOW_TITLES)
-                IS_POWERBI_LOGGED_IN = True
-            except Exception as error:  # pylint: disable=broad-except
-                time.sleep(2)
-                if printed_once:
-                    break
-                else:
-                    STACK_TRACE = traceback.format_exc()
-                    log.error("Error: %s", error)
-                    log.error("Stack trace: %s", STACK_TRACE)
-                    log.info("Trying to log in again...")
-                    printed_once = True
-
-        # Wait for the thread to finish
-        thread1.join()
-
-        # Get the connection from the list
-        conn_bi = conn_BI_result[0]  # pylint: disable=invalid-name
-        break
-    except (pymsteams.TeamsWebhookException, adodbapi.DatabaseError) as error:
-        STACK_TRACE = traceback.format_exc()
-        log.error("Error: %s", error)
-        log.error("Stack trace: %s", STACK_TRACE)
-        if RETRY_COUNT:
-            log.info("Trying to connect again...")
-            RETRY_COUNT -= 1
-            continue
-        else:
-            STACK_TRACE = traceback.format_exc()
-            log.critical(
-                "Failed to connect. Exiting the program. Please check the logs for more information."
-            )
-            log.critical("Stack trace: %s", STACK_TRACE)
-            sys.exit(1)
+    log.critical("Data comparison failed: %s", error, exc_info=True)
 
-log.info("Connection to Power BI has been established!")
 
-# Define the webhook URL for Microsoft Teams
-teams_webhook_url = os.environ.get("TEAMS_WEBHOOK_URL")
-myTeamsMessage = pymsteams.connectorcard(teams_webhook_url)
-log.info("Connection to Teams has been established!")
-
-# Load supply.sql file and run the query
-time_start = datetime.now()
-log.info("Extracting data from EDW...")
-supply_sql_filepath = Path(script_args.sqlfile)
-with open(supply_sql_filepath, "r", encoding="utf-8") as file:
-    query_edw = file.read()
-    try:
-        df_edw = pd.read_sql(query_edw, conn_EDW)
-    except (pymsteams.TeamsWebhookException, adodbapi.DatabaseError) as error:
-        STACK_TRACE = traceback.format_exc()
-        # Send a message to Teams
-        myTeamsMessage.summary("Data comparison failed")
-        myTeamsMessage.text(f"Error: {error}")
-        myTeamsMessage.text(
-            f"""<font color='red'>Error: {error}</font><br>
-            There could be an outage in the EDW database.<br>
-            Please check the logs for more information.<br>
-            """
-        )
-        myTeamsMessage.send()
+def report_not_ready(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job: JobSpec,
+):
+    """Report that the data of a job was not ready before the timeout of its
+    readiness gate."""
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison skipped")
+    teams_message.text(
+        f"""<font color='red'>The data was not ready after
+        {get_formated_duration(timedelta(seconds=job.readiness.timeout))}.
+        </font><br>
+        The nightly load of the EDW or the refresh of the Power BI dataset
+        could be late.<br>
+        Please check the logs for more information.<br>
+        """
+    )
+    report_result(
+        coalescer,
+        run_window,
+        job.name,
+        False,
+        "Data not ready",
+        [teams_message.payload],
+    )
+    log.critical("The data of %s was not ready.", job.name)
 
-        log.critical("Data comparison failed: %s", error)
-        log.critical("Stack trace: %s", STACK_TRACE)
-        sys.exit(1)
 
-end_time = datetime.now()
-time_diff = end_time - time_start
+def finish_notifications(dispatcher: NotificationDispatcher):
+    """Give the dispatcher some time to deliver the pending notifications
+    and stop it."""
+    if dispatcher.drain(timeout=NOTIFICATION_DRAIN_SECONDS):
+        log.info("Notifications delivered to Microsoft Teams.")
+    else:
+        log.warning(
+            "Notifications are still pending, they will be delivered on the next run."
+        )
+    dispatcher.close()
 
-# Calculate the time taken to extract data from EDW
-formated_duration = get_formated_duration(time_diff)
 
-# Print the time taken to extract data from EDW
-log.info("Data from EDW has been extracted.")
-log.debug("It took: %s to extract data from EDW.", formated_duration)
+def report_duplicated_keys(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    key_columns: List[str],
+    frames: Dict[str, pd.DataFrame],
+    error: pd.errors.MergeError = None,
+):
+    """Report that the rows of the results cannot be joined one to one,
+    naming the keys found on more than one row of each source. Without the
+    frames, read in chunks, the error names the keys."""
+    lines = [] if error is None or frames else [str(error)]
+    for source, frame in frames.items():
+        duplicated = duplicated_keys(frame, key_columns)
+        if duplicated.empty:
+            continue
+        examples = "; ".join(
+            ", ".join(f"{column} = {value}" for column, value in key.items())
+            for key in duplicated.head(DUPLICATED_KEYS_SHOWN).to_dict(
+                "records"
+            )
+        )
+        lines.append(
+            f"{len(duplicated)} duplicated key(s) in {source}, e.g. {examples}"
+        )
+        log.critical(
+            "%s duplicated key(s) in %s: %s", len(duplicated), source, examples
+        )
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(
+        f"""<font color='red'>The rows are not unique on the key columns
+        {", ".join(key_columns)}.</font><br>
+        {"<br>".join(lines)}<br>
+        Please check the queries of the job.<br>
+        """
+    )
+    report_result(
+        coalescer,
+        run_window,
+        job_name,
+        False,
+        "Duplicated keys",
+        [teams_message.payload],
+    )
 
-# Extract data from Power BI
-cursor_data_BI = conn_bi.cursor()
 
-# Load the DAX query from file
-dax_query = Path(script_args.daxfile).read_text(encoding="utf-8")
+def report_unmerged_keys(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    error: ValueError,
+):
+    """Report that the rows of the queries of a merge job are not sorted on
+    their keys, or not unique."""
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(
+        f"""<font color='red'>The rows cannot be merged: {error}</font><br>
+        Both queries must sort their rows on the key columns.<br>
+        Please check the queries of the job.<br>
+        """
+    )
+    report_result(
+        coalescer,
+        run_window,
+        job_name,
+        False,
+        "Rows not sorted on their keys",
+        [teams_message.payload],
+    )
 
-# Pass the arguments to the DAX query
-now = datetime.now()
-plan_versions = f"NIGHTLY-{now.month}/{now.day}/{now.year}"
-log.debug("Plan_versions: %s", plan_versions)
-args = {"plan_versions": plan_versions}
-dax_query = pass_args_to_dax_query(dax_query, args)
 
-log.info("Extracting data from Power BI...")
-time_start = datetime.now()
+def report_invalid_query(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job: JobSpec,
+    error: ValueError,
+):
+    """Report that the columns of the DAX query of a job cannot be read."""
+    log.critical("The columns of %s cannot be read: %s", job.daxfile, error)
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(
+        f"""<font color='red'>The columns of the DAX query {job.daxfile.name}
+        cannot be read: {error}</font><br>
+        Please check the queries of the job.<br>
+        """
+    )
+    report_result(
+        coalescer,
+        run_window,
+        job.name,
+        False,
+        "Invalid DAX query",
+        [teams_message.payload],
+    )
 
-# Execute the DAX query
-try:
-    cursor_data_BI.execute(dax_query)
-    results_table = cursor_data_BI.fetchall()
-except Exception as error:  # pylint: disable=broad-except
-    STACK_TRACE = traceback.format_exc()
 
-    # Send a message to Teams
-    myTeamsMessage.summary("Data comparison failed")
-    myTeamsMessage.text(f"Error: {error}")
-    myTeamsMessage.text(
-        f"""<font color='red'>Error: {error}</font><br>
-        There could be an outage in the Power BI database.<br>
+def report_error(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    error: Exception,
+):
+    """Report that a job stopped on an unexpected error."""
+    log.critical("%s stopped on an error: %s", job_name, error, exc_info=True)
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(
+        f"""<font color='red'>The job stopped on an error: {error}</font><br>
         Please check the logs for more information.<br>
         """
     )
-    myTeamsMessage.send()
-
-    log.critical("Data comparison failed: %s", error)
-    log.critical("Stack trace: %s", STACK_TRACE)
-    sys.exit(1)
-
-# Get the column names from the cursor, remove the brackets and create a list
-column_names = [
-    column[0].replace("[", "").replace("]", "")
-    for column in cursor_data_BI.description
-]
+    report_result(
+        coalescer,
+        run_window,
+        job_name,
+        False,
+        f"Error: {error}",
+        [teams_message.payload],
+    )
 
-# Create a dataframe from the results
-data_table = list(results_table)
-df_pbi = pd.DataFrame(data_table, columns=column_names)
-cursor_data_BI.close()
-end_time = datetime.now()
-time_diff = end_time - time_start
-
-# Calculate the time taken to extract data from Power BI
-formated_duration = get_formated_duration(time_diff)
-log.info("Data from Power BI has been extracted!")
-log.debug("Time to extract data from Power BI: %s", formated_duration)
-
-# Get the first column name from the dataframe
-# Assuming the first column is the same in both dataframes
-first_column = (
-    df_pbi.columns[0] if df_pbi.columns[0] == df_edw.columns[0] else None
-)
 
-# If the first column is not the same, leave a log message and exit the program
-if first_column:
-    log.debug(
-        'First column: "%s". This is used to order rows in the final table that goes in the Microsoft Teams message.',  # pylint: disable=line-too-long
-        first_column,
+def report_schema_mismatch(
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    job_name: str,
+    error: ValueError,
+):
+    """Report that the results do not have the columns of the DAX query."""
+    log.critical("The results do not have the columns of the DAX query.")
+    log.critical("Error: %s", error)
+    teams_message = pymsteams.connectorcard(coalescer.webhook_url)
+    teams_message.summary("Data comparison failed")
+    teams_message.text(
+        f"""<font color='red'>The results do not have the columns of the DAX
+        query: {error}</font><br>
+        The queries or the Power BI dataset could have changed.<br>
+        Please check the queries of the job.<br>
+        """
     )
-else:
-    log.critical(
-        "The first column in the Power BI dataframe is not the same as in the EDW dataframe."
+    report_result(
+        coalescer,
+        run_window,
+        job_name,
+        False,
+        "Schema mismatch",
+        [teams_message.payload],
     )
-    log.critical("Exiting the program.")
-    sys.exit(1)
-
-# Apply ORDER BY the first column on both dataframes
-df_pbi = df_pbi.sort_values(by=first_column).reset_index(drop=True)
-df_edw = df_edw.sort_values(by=first_column).reset_index(drop=True)
-
-# Use the datacompy library to compare the dataframes
-compare = datacompy.Compare(
-    df_pbi,
-    df_edw,
-    on_index=True,
-    df1_name="PowerBI",
-    df2_name="EDW",
-    cast_column_names_lower=True,
-)
-compare.matches(ignore_extra_columns=True)
-result = compare.all_rows_overlap()
-
-# Generate a timestamp to use in the result file name
-timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
-
-# Create results/timestamp folder if it does not exist
-results_path = Path("results") / timestamp
-results_path.mkdir(parents=True, exist_ok=True)
-
-# Create the comparison result file
-result_file = results_path / "comparison_result.html"
-
-# Save the comparison result to a file
-HTML_FILE = str(result_file.resolve())
-compare_report = compare.report(html_file=HTML_FILE)
-log.debug("Comparison result has been saved to %s", HTML_FILE)
-
-# Save the dataframes to csv files
-edw_path = results_path / "edw_data.csv"
-bi_path = results_path / "bi_data.csv"
-df_edw.to_csv(edw_path, index=False)
-log.debug("EDW data has been saved to %s", edw_path.resolve())
-df_pbi.to_csv(bi_path, index=False)
-log.debug("Power BI data has been saved to %s", bi_path.resolve())
-
-# If the comparation its ok do nothing, if not send a notification to the channel in teams
-if compare.matches():
-    # Build the message
-    SUMMARY = "Data comparison completed successfully"
-    MESSAGE = """<p>The data comparison has been completed successfully!</p>
-    <p>There are no differences between the datasets.</p>
-    <hr>
-    """
-    SECTION_TITLE = "Current data in EDW and Power BI"
-
-    # this is the title of the notification in teams, to differentiate between
-    # the different notifications
-    notification_title = "✔ " + Path(script_args.daxfile).stem
-
-    # Create a markdown table from the dataframe, this is the table that will
-    # be sent to Teams
-    markdown_table = f"{df_edw.to_markdown(index=False)}"
-
-    # Create the args dictionary to pass to the function
-    message_args = {
-        "teams_webhook_url": teams_webhook_url,
-        "color": "00FF00",  # Green color in hex
-        "notification_title": notification_title,
-        "message": MESSAGE,
-        "section_title": SECTION_TITLE,
-        "section_text": markdown_table,
-    }
 
-    # Run the function to send the message to Teams
-    if send_ok_teams_message(message_args):
-        # Log the message
+
+def run_job(
+    job: JobSpec,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    now: datetime = None,
+    run_registry: RunRegistry = None,
+    force: bool = False,
+    dax_batcher: DaxBatcher = None,
+    sql_batcher: SqlBatcher = None,
+) -> bool:
+    """Extract the data of a job from the EDW and Power BI, compare it and
+    report the result to Microsoft Teams. A job with a readiness gate waits
+    for the data to be ready first. The run is locked in the run registry, a
+    duplicate invocation of a run completed or still running returns without
+    extracting the data again.
+    Args:
+        job (JobSpec): The job.
+        coalescer (NotificationCoalescer): Collects the results of the jobs
+        of the run window.
+        run_window (str): The run window of the job.
+        now (datetime): The time the job starts, used to format the
+        parameters of the DAX query. Defaults to now.
+        run_registry (RunRegistry): The registry of the runs. Defaults to the
+        one of `database/job_runs.db`.
+        force (bool): Run the job even if the same run is completed.
+        dax_batcher (DaxBatcher): Runs the DAX query in a single request with
+        the queries of the other jobs running at the same time.
+        sql_batcher (SqlBatcher): Runs the SQL query in a single batch with
+        the queries of the other jobs running at the same time.
+    Returns:
+        bool: True if the data was compared, by this run or a previous one,
+        False if the job failed."""
+    # The records of the run carry its id, so the runs of the scheduler can
+    # be told apart in the JSON logs
+    with log_context(run_id=new_run_id(), job=job.name):
+        try:
+            return _run_job(
+                job,
+                coalescer,
+                run_window,
+                now,
+                run_registry,
+                force,
+                dax_batcher,
+                sql_batcher,
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            # The other jobs of the window wait for a result of every job
+            report_error(coalescer, run_window, job.name, error)
+            raise
+
+
+def _run_job(
+    job: JobSpec,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    now: datetime = None,
+    run_registry: RunRegistry = None,
+    force: bool = False,
+    dax_batcher: DaxBatcher = None,
+    sql_batcher: SqlBatcher = None,
+) -> bool:
+    """Run a job, see `run_job`. Every outcome records a result of the job
+    in its run window, so the window is notified once its jobs end.
+    Returns:
+        bool: True if the data was compared, by this run or a previous one,
+        False if the job failed."""
+    now = now or datetime.now()
+    run_registry = run_registry or RunRegistry()
+    parameters = job.render_parameters(now)
+    log.info("Running %s...", job.name)
+
+    # Load the DAX query from file. Its columns define the schema of the
+    # job, both dataframes keep the compared columns only, converted once
+    # to compact dtypes when they are loaded
+    dax_query = job.daxfile.read_text(encoding="utf-8")
+    try:
+        job_schema = FrameSchema.from_dax(dax_query, job.measure_dtypes)
+    except ValueError as error:
+        report_invalid_query(coalescer, run_window, job, error)
+        return False
+    log.debug("Key columns: %s", job_schema.key_columns)
+
+    # Without a readiness gate the version of the data is not known, the
+    # run is identified by its parameters and a duplicate invocation
+    # returns before connecting
+    run_key = None
+    if job.readiness is None:
+        acquired, run = run_registry.acquire(
+            job.name, parameters, force=force
+        )
+        if not acquired:
+            return report_duplicate(coalescer, run_window, run)
+        run_key = run.run_key
+    elif not force:
+        # A gated job also returns before connecting and waiting for the
+        # data when a run with the same parameters is running or was
+        # completed in this window. The version of the data only tells
+        # whether an older completed run is stale.
+        run = run_registry.find(
+            job.name, parameters, since=window_start(run_window, now)
+        )
+        if run is not None:
+            return report_duplicate(coalescer, run_window, run)
+
+    outcome = None
+    try:
+        with log_stage(log, "connect"):
+            conn_edw = connect_edw()
+            conn_bi = connect_power_bi()
+        if conn_bi is None:
+            conn_edw.close()
+            report_outage(
+                coalescer,
+                run_window,
+                job.name,
+                "Power BI",
+                ConnectionError("Failed to connect to Power BI."),
+            )
+            return False
+        try:
+            if job.readiness:
+                with log_stage(log, "readiness"):
+                    data_version = job.readiness.wait(
+                        conn_edw, conn_bi, parameters
+                    )
+                if data_version is None:
+                    report_not_ready(coalescer, run_window, job)
+                    return False
+                acquired, run = run_registry.acquire(
+                    job.name, parameters, data_version, force=force
+                )
+                if not acquired:
+                    return report_duplicate(coalescer, run_window, run)
+                run_key = run.run_key
+
+            outcome = _compare_sources(
+                job,
+                job_schema,
+                dax_query,
+                parameters,
+                conn_edw,
+                conn_bi,
+                coalescer,
+                run_window,
+                dax_batcher,
+                sql_batcher,
+            )
+        finally:
+            # Close connections
+            conn_edw.close()
+            conn_bi.close()
+    finally:
+        # Record the outcome, a failed run is run again by the next
+        # invocation
+        if run_key is not None:
+            if outcome is None:
+                run_registry.fail(
+                    run_key, "The job failed, see the logs."
+                )
+            else:
+                run_registry.complete(run_key, *outcome)
+    return outcome is not None
+
+
+def window_start(run_window: str, now: datetime) -> float:
+    """Return the time a run window starts, the window being a date or a date
+    and time, e.g. "2024-05-23" or "2024-05-23 09:00". Any other window
+    starts on the day of `now`."""
+    try:
+        start = datetime.fromisoformat(run_window)
+    except ValueError:
+        start = datetime.combine(now.date(), datetime.min.time())
+    return start.timestamp()
+
+
+def report_duplicate(
+    coalescer: NotificationCoalescer, run_window: str, run: RunRecord
+) -> bool:
+    """Log the run a duplicate invocation found in the run registry. Unless
+    the job already reported in the window, the duplicate is recorded as
+    skipped, without cards, so the window is not left waiting for it.
+    Returns:
+        bool: True, the data is compared by the other run."""
+    if run.completed:
+        finished_at = datetime.fromtimestamp(run.finished_at).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
         log.info(
-            "Data comparison completed successfully! Message sent to Microsoft Teams."
+            "%s already completed at %s: %s. The results are in %s.",
+            run.job_name,
+            finished_at,
+            run.summary,
+            run.results_path,
         )
+        passed = run.passed is not False
+        summary = f"Skipped, already completed at {finished_at}: {run.summary}"
     else:
-        log.critical("Failed to send message to Microsoft Teams!")
-        log.critical("Please check the logs for more information.")
-        sys.exit(1)
-else:
-    # Build the message when there are differences
-    SUMMARY = "Data comparison completed with differences"
-    MESSAGE = """<p>The data comparison has been completed,
-    but there are differences between the datasets.</p>
-    <hr>
-    """
-    EDW_SECTION_TITLE = "Current data in EDW"
-    PBI_SECTION_TITLE = "Current data in Power BI"
-
-    # this is the title of the notification in teams, to differentiate between
-    # the different notifications
-    notification_title = "❌ " + Path(script_args.daxfile).stem
-
-    # Create a markdown table from the dataframes
-    edw_table_markdown = df_edw.to_markdown(index=False)
-    pbi_table_markdown = df_pbi.to_markdown(index=False)
-
-    # Create the args dictionary to pass to the function
-    message_args = {
-        "teams_webhook_url": teams_webhook_url,
-        "color": "FF0000",  # Red color in hex
-        "notification_title": notification_title,
-        "message": MESSAGE,
-        "compare_report": compare_report,
+        log.warning(
+            "%s is already running, started by %s.", run.job_name, run.owner
+        )
+        passed = True
+        summary = f"Skipped, already running, started by {run.owner}"
+    if not coalescer.has_result(run_window, run.job_name):
+        report_result(coalescer, run_window, run.job_name, passed, summary, [])
+    return True
+
+
+def extract_edw(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    query_edw: str,
+    conn_edw,
+    sql_batcher: SqlBatcher = None,
+) -> pd.DataFrame:
+    """Run the SQL query of a job on the EDW. A partitioned query is split
+    into slices read in parallel, each on its own connection, the other
+    queries run in a batch with the queries of the other jobs when a batcher
+    is given.
+    Args:
+        job (JobSpec): The job.
+        job_schema (FrameSchema): The schema of the results.
+        query_edw (str): The SQL query.
+        conn_edw: The connection to the EDW, used by queries that are not
+        partitioned.
+        sql_batcher (SqlBatcher): Batches the queries of the jobs.
+    Returns:
+        pd.DataFrame: The results of the query."""
+    connection_string = get_edw_odbc_connection_string(EDW_ARGS)
+    if job.partition is None and sql_batcher is not None:
+        column_names, results_table = sql_batcher.execute(conn_edw, query_edw)
+        return job_schema.from_rows(results_table, column_names)
+    if job.partition is None:
+        return extract_frame(
+            conn_edw,
+            query_edw,
+            job_schema,
+            job.extract_backend,
+            connection_string=connection_string,
+        )
+    with ConnectionPool(
+        lambda: get_edw_connection(EDW_ARGS),
+        job.partition.max_sessions,
+        governor=EDW_GOVERNOR,
+    ) as pool:
+        return extract_partitioned(
+            pool,
+            query_edw,
+            job_schema,
+            job.partition,
+            job.extract_backend,
+            connection_string=connection_string,
+        )
+
+
+def extract_power_bi_partitioned(
+    job: JobSpec, job_schema: FrameSchema, dax_query: str
+) -> pd.DataFrame:
+    """Run the slices of the DAX query of a job concurrently, each on its own
+    Power BI session.
+    Args:
+        job (JobSpec): The job, with a `dax_partition`.
+        job_schema (FrameSchema): The schema of the results.
+        dax_query (str): The DAX query, with its parameters already passed.
+    Returns:
+        pd.DataFrame: The results of the query."""
+    with ConnectionPool(
+        lambda: get_bi_connection(**PBI_ARGS),
+        job.dax_partition.max_sessions,
+        governor=PBI_GOVERNOR,
+    ) as pool:
+        return extract_dax_partitioned(
+            pool, dax_query, job_schema, job.dax_partition
+        )
+
+
+def fetch_power_bi(
+    conn_bi: adodbapi.Connection,
+    dax_query: str,
+    dax_batcher: DaxBatcher = None,
+) -> Tuple[List[str], list]:
+    """Run the DAX query of a job on Power BI. With a batcher the query runs
+    in a single request with the queries of the other jobs running at the
+    same time.
+    Args:
+        conn_bi (adodbapi.Connection): The connection to Power BI.
+        dax_query (str): The DAX query, with its parameters already passed.
+        dax_batcher (DaxBatcher): Batches the queries of the jobs.
+    Returns:
+        Tuple[List[str], list]: The column names, without brackets, and the
+        rows of the query."""
+    if dax_batcher is not None:
+        return dax_batcher.execute(conn_bi, dax_query)
+    cursor_data_bi = conn_bi.cursor()
+    try:
+        cursor_data_bi.execute(dax_query)
+        results_table = cursor_data_bi.fetchall()
+
+        # Get the column names from the cursor, remove the brackets and
+        # create a list
+        column_names = [
+            strip_brackets(column[0]) for column in cursor_data_bi.description
+        ]
+    finally:
+        cursor_data_bi.close()
+    return column_names, results_table
+
+
+def _extract_sources(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    query_edw: str,
+    dax_query: str,
+    conn_edw,
+    conn_bi: adodbapi.Connection,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    dax_batcher: DaxBatcher = None,
+    sql_batcher: SqlBatcher = None,
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Extract the data of a job from the EDW and Power BI, see `run_job`.
+    Returns:
+        Optional[Tuple[pd.DataFrame, pd.DataFrame]]: The EDW and Power BI
+        data. None if the extraction failed, the failure is reported."""
+    # Run the SQL query. The duration of every stage is logged when it ends
+    log.info("Extracting data from EDW...")
+    with log_stage(log, "extract_edw", backend=job.extract_backend):
+        try:
+            df_edw = extract_edw(
+                job, job_schema, query_edw, conn_edw, sql_batcher
+            )
+        except (
+            pymsteams.TeamsWebhookException,
+            adodbapi.DatabaseError,
+        ) as error:
+            report_outage(coalescer, run_window, job.name, "EDW", error)
+            return None
+        except ValueError as error:
+            report_schema_mismatch(coalescer, run_window, job.name, error)
+            return None
+    log.info("Data from EDW has been extracted.")
+
+    log.info("Extracting data from Power BI...")
+    with log_stage(log, "extract_power_bi"):
+        if job.dax_partition is not None:
+            # The slices of the query run concurrently on their own sessions
+            try:
+                df_pbi = extract_power_bi_partitioned(
+                    job, job_schema, dax_query
+                )
+            except ValueError as error:
+                report_schema_mismatch(
+                    coalescer, run_window, job.name, error
+                )
+                return None
+            except Exception as error:  # pylint: disable=broad-except
+                report_outage(
+                    coalescer, run_window, job.name, "Power BI", error
+                )
+                return None
+        else:
+            # Execute the DAX query
+            try:
+                column_names, results_table = fetch_power_bi(
+                    conn_bi, dax_query, dax_batcher
+                )
+            except Exception as error:  # pylint: disable=broad-except
+                report_outage(
+                    coalescer, run_window, job.name, "Power BI", error
+                )
+                return None
+
+            # Create a dataframe from the results
+            try:
+                df_pbi = job_schema.from_rows(results_table, column_names)
+            except ValueError as error:
+                report_schema_mismatch(
+                    coalescer, run_window, job.name, error
+                )
+                return None
+    log.info("Data from Power BI has been extracted!")
+    return df_edw, df_pbi
+
+
+def _compare_frames(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    df_pbi: pd.DataFrame,
+    df_edw: pd.DataFrame,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+) -> Optional[Tuple[ComparisonSummary, pd.DataFrame, pd.DataFrame]]:
+    """Compare the data of a job joined on the key columns of its schema.
+    Returns:
+        Optional[Tuple[ComparisonSummary, pd.DataFrame, pd.DataFrame]]: The
+        summary of the comparison, and the Power BI and EDW data ordered by
+        the first column. None if the first columns differ or the keys are
+        not unique, the failure is reported."""
+    # Get the first column name from the dataframe
+    # Assuming the first column is the same in both dataframes
+    first_column = (
+        df_pbi.columns[0] if df_pbi.columns[0] == df_edw.columns[0] else None
+    )
+
+    # If the first column is not the same, leave a log message and stop the job
+    if first_column:
+        log.debug(
+            'First column: "%s". This is used to order rows in the final table that goes in the Microsoft Teams message.',  # pylint: disable=line-too-long
+            first_column,
+        )
+    else:
+        report_schema_mismatch(
+            coalescer,
+            run_window,
+            job.name,
+            ValueError(
+                "The first column in the Power BI dataframe is not the same "
+                "as in the EDW dataframe."
+            ),
+        )
+        return None
+
+    # Apply ORDER BY the first column on both dataframes, unless the ORDER BY
+    # of the query already did
+    if not df_pbi[first_column].is_monotonic_increasing:
+        df_pbi = df_pbi.sort_values(by=first_column).reset_index(drop=True)
+    if not df_edw[first_column].is_monotonic_increasing:
+        df_edw = df_edw.sort_values(by=first_column).reset_index(drop=True)
+
+    # Compare the dataframes joined on the key columns, the group by columns
+    # of the DAX query. The values are compared over whole columns, numeric
+    # values within the tolerances are considered equal so floating-point
+    # noise does not raise a false alarm.
+    # Large results are compared on several processes, or one partition at a
+    # time from disk when they exceed the memory budget of the job. Wide
+    # results compare the digests of their columns first, only the columns
+    # and partitions with different digests are compared cell by cell.
+    key_columns = job_schema.key_columns
+    compare_kwargs = {
+        "tolerances": job.tolerances,
+        "abs_tol": job.abs_tol,
+        "rel_tol": job.rel_tol,
+        "df1_name": "PowerBI",
+        "df2_name": "EDW",
     }
+    with log_stage(log, "compare", rows=len(df_pbi)):
+        try:
+            if job.memory_budget:
+                comparison_summary = spill_compare(
+                    df_pbi,
+                    df_edw,
+                    key_columns,
+                    job.memory_budget,
+                    **compare_kwargs,
+                )
+            elif job.digest_partitions:
+                comparison_summary = digest_compare(
+                    df_pbi,
+                    df_edw,
+                    key_columns,
+                    partitions=job.digest_partitions,
+                    **compare_kwargs,
+                )
+            else:
+                comparison_summary = parallel_compare_with_tolerance(
+                    df_pbi,
+                    df_edw,
+                    join_columns=key_columns,
+                    max_workers=job.compare_workers,
+                    **compare_kwargs,
+                )
+        except pd.errors.MergeError as error:
+            log.critical("The rows cannot be joined: %s", error)
+            report_duplicated_keys(
+                coalescer,
+                run_window,
+                job.name,
+                key_columns,
+                {"Power BI": df_pbi, "EDW": df_edw},
+            )
+            return None
+    return comparison_summary, df_pbi, df_edw
+
+
+def _merge_sources(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    query_edw: str,
+    dax_query: str,
+    conn_edw,
+    conn_bi: adodbapi.Connection,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+) -> Optional[ComparisonSummary]:
+    """Compare the rows of a merge job as they are read from the cursors of
+    both queries, sorted on the key columns by their ORDER BY, see
+    `merge_compare`.
+    Returns:
+        Optional[ComparisonSummary]: The summary of the comparison. None if
+        a query failed or its rows are not sorted, the failure is
+        reported."""
+    cursor_edw = dbapi_connection(conn_edw).cursor()
+    cursor_bi = conn_bi.cursor()
+    try:
+        log.info("Running the queries on EDW and Power BI...")
+        try:
+            cursor_edw.execute(query_edw)
+        except (
+            pymsteams.TeamsWebhookException,
+            adodbapi.DatabaseError,
+        ) as error:
+            report_outage(coalescer, run_window, job.name, "EDW", error)
+            return None
+        try:
+            cursor_bi.execute(dax_query)
+        except Exception as error:  # pylint: disable=broad-except
+            report_outage(coalescer, run_window, job.name, "Power BI", error)
+            return None
+
+        # The rows are compared a chunk at a time as they are fetched
+        with log_stage(log, "merge_compare"):
+            try:
+                return merge_compare(
+                    iter_cursor_rows(cursor_bi),
+                    [
+                        strip_brackets(column[0])
+                        for column in cursor_bi.description
+                    ],
+                    iter_cursor_rows(cursor_edw),
+                    [column[0] for column in cursor_edw.description],
+                    job_schema.key_columns,
+                    tolerances=job.tolerances,
+                    abs_tol=job.abs_tol,
+                    rel_tol=job.rel_tol,
+                    df1_name="PowerBI",
+                    df2_name="EDW",
+                )
+            except ValueError as error:
+                log.critical("The rows cannot be merged: %s", error)
+                report_unmerged_keys(coalescer, run_window, job.name, error)
+                return None
+    finally:
+        cursor_bi.close()
+        cursor_edw.close()
+
+
+class _SourceError(Exception):
+    """A query of a chunked reader failed on its source."""
+
+    def __init__(self, source: str, error: Exception):
+        super().__init__(f"{source}: {error}")
+        self.source = source
+        self.error = error
+
+
+def read_chunks(
+    source: str, cursor_factory, query: str, job_schema: FrameSchema
+) -> Callable[[], Iterator[pd.DataFrame]]:
+    """Return a reader of the results of a query, `BLOOM_CHUNK_ROWS` at a
+    time. Every call runs the query again on a new cursor.
+    Args:
+        source (str): The name of the source, e.g. "EDW".
+        cursor_factory: Returns a new cursor of the source.
+        query (str): The query.
+        job_schema (FrameSchema): The schema of the results.
+    Returns:
+        Callable[[], Iterator[pd.DataFrame]]: The reader of the chunks."""
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        cursor = cursor_factory()
+        try:
+            try:
+                cursor.execute(query)
+                column_names = [
+                    strip_brackets(column[0]) for column in cursor.description
+                ]
+                rows = cursor.fetchmany(BLOOM_CHUNK_ROWS)
+            except Exception as error:  # pylint: disable=broad-except
+                raise _SourceError(source, error) from error
+
+            # Empty results still give the columns of the schema
+            yield job_schema.from_rows(rows, column_names)
+            while True:
+                try:
+                    rows = cursor.fetchmany(BLOOM_CHUNK_ROWS)
+                except Exception as error:  # pylint: disable=broad-except
+                    raise _SourceError(source, error) from error
+                if not rows:
+                    return
+                yield job_schema.from_rows(rows, column_names)
+        finally:
+            cursor.close()
+
+    return chunks
+
+
+def _bloom_sources(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    query_edw: str,
+    dax_query: str,
+    conn_edw,
+    conn_bi: adodbapi.Connection,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+) -> Optional[ComparisonSummary]:
+    """Compare the results of a Bloom filter job read in chunks, see
+    `bloom_compare`. The DAX query runs twice, once to fill the filter of
+    Power BI and once to split its rows, the SQL query once, so neither side
+    is held in memory as a whole.
+    Returns:
+        Optional[ComparisonSummary]: The summary of the comparison. None if
+        a query failed or the keys are not unique, the failure is
+        reported."""
+    key_columns = job_schema.key_columns
+    read_pbi = read_chunks("Power BI", conn_bi.cursor, dax_query, job_schema)
+    read_edw = read_chunks(
+        "EDW", dbapi_connection(conn_edw).cursor, query_edw, job_schema
+    )
+    log.info("Comparing the data of EDW and Power BI read in chunks...")
+    with log_stage(log, "bloom_compare"):
+        try:
+            return bloom_compare(
+                read_pbi,
+                read_edw,
+                key_columns,
+                memory_budget=job.memory_budget,
+                tolerances=job.tolerances,
+                abs_tol=job.abs_tol,
+                rel_tol=job.rel_tol,
+                df1_name="PowerBI",
+                df2_name="EDW",
+            )
+        except _SourceError as error:
+            report_outage(
+                coalescer, run_window, job.name, error.source, error.error
+            )
+        except pd.errors.MergeError as error:
+            log.critical("The rows cannot be joined: %s", error)
+            report_duplicated_keys(
+                coalescer, run_window, job.name, key_columns, {}, error
+            )
+        except ValueError as error:
+            report_schema_mismatch(coalescer, run_window, job.name, error)
+    return None
+
+
+def _compare_sources(
+    job: JobSpec,
+    job_schema: FrameSchema,
+    dax_query: str,
+    parameters: Dict[str, str],
+    conn_edw,
+    conn_bi: adodbapi.Connection,
+    coalescer: NotificationCoalescer,
+    run_window: str,
+    dax_batcher: DaxBatcher = None,
+    sql_batcher: SqlBatcher = None,
+) -> Optional[Tuple[bool, str, Path]]:
+    """Extract, compare and report the data of a job, see `run_job`.
+    Returns:
+        Optional[Tuple[bool, str, Path]]: Whether the data matched, the
+        summary of the result and the folder of the results. None if the job
+        failed."""
+    query_edw = job.sqlfile.read_text(encoding="utf-8")
+
+    # Pass the arguments to the DAX query
+    log.debug("DAX query parameters: %s", parameters)
+    dax_query = pass_args_to_dax_query(dax_query, parameters)
+
+    # A sample of the keys is compared first, the full results are only
+    # extracted and compared when the sample has discrepancies
+    sample_check = None
+    if job.sample is not None:
+        log.info(
+            "Comparing a sample of %.2f%% of the keys...",
+            job.sample.rate * 100,
+        )
+        sources = _extract_sources(
+            job,
+            job_schema,
+            job.sample.sql_query(query_edw),
+            job.sample.dax_query(dax_query),
+            conn_edw,
+            conn_bi,
+            coalescer,
+            run_window,
+        )
+        if sources is None:
+            return None
+        df_edw, df_pbi = sources
+        compared = _compare_frames(
+            job, job_schema, df_pbi, df_edw, coalescer, run_window
+        )
+        if compared is None:
+            return None
+        sample_check = SampleCheck(
+            compared[0], job.sample.confidence, job.sample.min_rows
+        )
+        log.info("%s.", sample_check.describe())
+        if sample_check.escalate:
+            sample_check = None
+            log.info(
+                "The sample has discrepancies or too few rows, comparing the "
+                "full data."
+            )
 
-    # Run the function to send the message to Teams
-    if send_fail_teams_message(message_args):
-        # Log the message
+    if sample_check is None and job.merge:
+        # The full data is not held in memory, only its comparison is kept
+        df_pbi = df_edw = None
+        comparison_summary = _merge_sources(
+            job,
+            job_schema,
+            query_edw,
+            dax_query,
+            conn_edw,
+            conn_bi,
+            coalescer,
+            run_window,
+        )
+        if comparison_summary is None:
+            return None
+    elif sample_check is None and job.bloom:
+        # Both sides are read in chunks, only the candidate rows are held
+        df_pbi = df_edw = None
+        comparison_summary = _bloom_sources(
+            job,
+            job_schema,
+            query_edw,
+            dax_query,
+            conn_edw,
+            conn_bi,
+            coalescer,
+            run_window,
+        )
+        if comparison_summary is None:
+            return None
+    elif sample_check is None:
+        sources = _extract_sources(
+            job,
+            job_schema,
+            query_edw,
+            dax_query,
+            conn_edw,
+            conn_bi,
+            coalescer,
+            run_window,
+            dax_batcher,
+            sql_batcher,
+        )
+        if sources is None:
+            return None
+        df_edw, df_pbi = sources
+        compared = _compare_frames(
+            job, job_schema, df_pbi, df_edw, coalescer, run_window
+        )
+        if compared is None:
+            return None
+        comparison_summary, df_pbi, df_edw = compared
+    else:
+        comparison_summary, df_pbi, df_edw = compared
+
+    # Generate a timestamp to use in the result file name
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+
+    # Create results/timestamp/job folder if it does not exist, the jobs run
+    # by the scheduler can finish in the same second
+    results_path = Path("results") / timestamp / job.name
+    results_path.mkdir(parents=True, exist_ok=True)
+
+    # Create the comparison result file
+    result_file = results_path / "comparison_result.html"
+
+    # The full report is streamed to a file and only a compact digest is sent
+    # to Teams
+    html_file = write_report(comparison_summary, result_file).resolve()
+    compare_report = build_digest(comparison_summary)
+    log.debug("Comparison result has been saved to %s", html_file)
+
+    # Save the dataframes to csv files, a merge or Bloom filter job has only
+    # read its rows
+    if df_edw is not None:
+        edw_path = results_path / "edw_data.csv"
+        bi_path = results_path / "bi_data.csv"
+        df_edw.to_csv(edw_path, index=False)
+        log.debug("EDW data has been saved to %s", edw_path.resolve())
+        df_pbi.to_csv(bi_path, index=False)
+        log.debug("Power BI data has been saved to %s", bi_path.resolve())
+
+    # If the comparation its ok do nothing, if not send a notification to the channel in teams
+    passed = comparison_summary.matches()
+    if passed:
+        # A matching sample stands for the full data, with its bound on the
+        # discrepancy rate
+        result_summary = (
+            "No differences"
+            if sample_check is None
+            else sample_check.describe()
+        )
+
+        # Build the message
+        summary = "Data comparison completed successfully"
+        message = """<p>The data comparison has been completed successfully!</p>
+        <p>There are no differences between the datasets.</p>
+        <hr>
+        """
+        section_title = "Current data in EDW and Power BI"
+        if sample_check is not None:
+            message += f"<p>{sample_check.describe()}.</p>\n"
+            section_title = "Sampled data in EDW and Power BI"
+
+        # this is the title of the notification in teams, to differentiate
+        # between the different notifications
+        notification_title = "✔ " + job.name
+
+        # Create a markdown table from the dataframe, this is the table that
+        # will be sent to Teams
+        if df_edw is not None:
+            markdown_table = f"{df_edw.to_markdown(index=False)}"
+        else:
+            markdown_table = (
+                f"{comparison_summary.intersect_rows} rows compared as they "
+                "were read."
+            )
+
+        # Create the args dictionary to pass to the function
+        message_args = {
+            "teams_webhook_url": coalescer.webhook_url,
+            "color": "00FF00",  # Green color in hex
+            "notification_title": notification_title,
+            "message": message,
+            "section_title": section_title,
+            "section_text": markdown_table,
+            "max_payload_bytes": TEAMS_MAX_PAYLOAD_BYTES,
+        }
+
+        # Store the message in the outbox, it is sent to Teams in the
+        # background
+        report_result(
+            coalescer,
+            run_window,
+            job.name,
+            True,
+            result_summary,
+            build_ok_payloads(message_args),
+        )
         log.info(
-            "Data comparison completed successfully! Message sent to Microsoft Teams."
+            "Data comparison completed successfully! Message queued for Microsoft Teams."
         )
     else:
-        log.critical("Failed to send message to Microsoft Teams!")
-        log.critical("Please check the logs for more information.")
+        result_summary = (
+            f"{comparison_summary.mismatch_count} values differ, "
+            f"{comparison_summary.df1_unique_count} rows only in PowerBI, "
+            f"{comparison_summary.df2_unique_count} rows only in EDW"
+        )
+
+        # Build the message when there are differences
+        summary = "Data comparison completed with differences"
+        message = """<p>The data comparison has been completed,
+        but there are differences between the datasets.</p>
+        <hr>
+        """
+
+        # this is the title of the notification in teams, to differentiate
+        # between the different notifications
+        notification_title = "❌ " + job.name
+
+        # Create the args dictionary to pass to the function
+        message_args = {
+            "teams_webhook_url": coalescer.webhook_url,
+            "color": "FF0000",  # Red color in hex
+            "notification_title": notification_title,
+            "message": message,
+            "compare_report": compare_report,
+            "max_payload_bytes": TEAMS_MAX_PAYLOAD_BYTES,
+        }
+
+        # Store the message in the outbox, it is sent to Teams in the
+        # background
+        report_result(
+            coalescer,
+            run_window,
+            job.name,
+            False,
+            result_summary,
+            build_fail_payloads(message_args),
+        )
+
+        # Log the message
+        log.warning(
+            "Data comparison completed with differences! Message queued for Microsoft Teams."
+        )
+        log.debug("Microsoft Teams summary: %s", repr(summary))
+        log.debug("Microsoft Teams message: %s", repr(message))
+
+    log.info("%s has been completed!", job.name)
+    return passed, result_summary, results_path
+
+
+def main():
+    """Run the job given by the script arguments."""
+    # Parse script arguments
+    try:
+        script_args = parse_arguments()
+        log.debug("Script arguments: %s", script_args)
+        log.debug("DAX file path: %s", script_args.daxfile)
+        log.debug("SQL file path: %s", script_args.sqlfile)
+    except argparse.ArgumentError as error:
+        log.error("Error: %s", error, exc_info=True)
+        log.critical("Failed to parse script arguments. Exiting the program.")
         sys.exit(1)
 
-    # Log the message
-    log.warning(
-        "Data comparison completed with differences! Message sent to Microsoft Teams."
+    script_start_time = datetime.now()
+    log.debug(
+        "Starting the process %s",
+        script_start_time.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+    job = JobSpec(
+        name=Path(script_args.daxfile).stem,
+        daxfile=script_args.daxfile,
+        sqlfile=script_args.sqlfile,
+        parameters=DEFAULT_PARAMETERS,
+        abs_tol=script_args.abs_tol,
+        rel_tol=script_args.rel_tol,
+        compare_workers=script_args.compare_workers,
+        extract_backend=script_args.extract_backend,
+        memory_budget=script_args.memory_budget,
     )
-    log.debug("Microsoft Teams summary: %s", repr(SUMMARY))
-    log.debug("Microsoft Teams message: %s", repr(MESSAGE))
 
+    # Deliver the notifications left by previous runs and the ones of this
+    # run in the background, without blocking the validation
+    dispatcher = NotificationDispatcher()
+    dispatcher.start()
 
-# Print to console
-log.info("The process has been completed!")
+    # The jobs of the same run window are notified together, in a summary
+    # card
+    run_window = script_args.run_window or script_start_time.strftime(
+        "%Y-%m-%d"
+    )
+    coalescer = NotificationCoalescer(
+        dispatcher, TEAMS_WEBHOOK_URL, expected_jobs=script_args.expected_jobs
+    )
 
-# Close connections
-conn_EDW.close()
-conn_bi.close()
+    completed = run_job(
+        job,
+        coalescer,
+        run_window,
+        now=script_start_time,
+        force=script_args.force,
+    )
 
-script_end_time = datetime.now()
-script_duration = get_formated_duration(script_end_time - script_start_time)
-log.debug(
-    "Ending the process at: %s Duration: %s",
-    end_time.strftime("%Y-%m-%d %H:%M:%S"),
-    script_duration,
-)
+    # The results are saved, wait a little for the notifications to be
+    # delivered
+    finish_notifications(dispatcher)
+
+    script_end_time = datetime.now()
+    script_duration = get_formated_duration(script_end_time - script_start_time)
+    log.debug(
+        "Ending the process at: %s Duration: %s",
+        script_end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        script_duration,
+    )
+    if not completed:
+        log.critical("Exiting the program.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
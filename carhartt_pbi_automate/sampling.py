@@ -0,0 +1,267 @@
+"""This module runs a quick check of a job on a deterministic sample of its
+keys before the full comparison. The same hash of an integer key column,
+`ABS(key) * 40503` modulo a number of buckets, selects the sampled keys in the
+WHERE clause of the SQL query and in a filter of the `SUMMARIZECOLUMNS` of the
+DAX query, so both sides return the same keys. The multiplier keeps the
+products of 32-bit keys below 2^53, where the DAX arithmetic is exact.
+
+The sample gives the discrepancy rate of its rows with a Wilson confidence
+interval. A sample without discrepancies bounds the rate of the full results,
+a sample with discrepancies, or with fewer rows than its minimum, e.g. when
+the data is not loaded yet, escalates to the full comparison."""
+
+import math
+import re
+from statistics import NormalDist
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from comparison_report import ComparisonSummary
+    from partitioned_extract import add_partition_filter
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import ComparisonSummary
+    from carhartt_pbi_automate.partitioned_extract import add_partition_filter
+
+
+# Odd multiplier spreading consecutive keys over the buckets
+HASH_MULTIPLIER = 40503
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_SAMPLE_BUCKETS = 10_000
+DEFAULT_CONFIDENCE = 0.95
+
+# Rows a sample needs to stand for the full results
+DEFAULT_MIN_SAMPLE_ROWS = 100
+
+_SUMMARIZECOLUMNS_PATTERN = re.compile(r"\bSUMMARIZECOLUMNS\s*\(", re.I)
+
+
+class SampleSpec:
+    """This class describes the sample of a job: the integer key column the
+    keys are hashed on, as written in each query, and the share of the
+    buckets of the hash that is sampled."""
+
+    def __init__(
+        self,
+        sql_column: str,
+        dax_column: str,
+        rate: float = DEFAULT_SAMPLE_RATE,
+        confidence: float = DEFAULT_CONFIDENCE,
+        buckets: int = DEFAULT_SAMPLE_BUCKETS,
+        min_rows: int = DEFAULT_MIN_SAMPLE_ROWS,
+    ):
+        """Initialize the sample.
+        Args:
+            sql_column (str): The key column in the SQL query, e.g.
+            "[SCP].[ProductKey]".
+            dax_column (str): The key column in the DAX query, e.g.
+            "'Products'[Product Key]".
+            rate (float): The share of the keys sampled, rounded to a number
+            of buckets.
+            confidence (float): The confidence of the interval of the
+            discrepancy rate.
+            buckets (int): Number of buckets of the hash.
+            min_rows (int): Rows the sample needs to stand for the full
+            results, a smaller sample escalates to the full comparison.
+        """
+        if not sql_column or not dax_column:
+            raise ValueError("sql_column and dax_column must not be empty.")
+        if not 0 < rate <= 1:
+            raise ValueError(f"rate must be between 0 and 1. Not {rate}")
+        if not 0 < confidence < 1:
+            raise ValueError(
+                f"confidence must be between 0 and 1. Not {confidence}"
+            )
+        if buckets < 1:
+            raise ValueError(f"buckets must be 1 or greater. Not {buckets}")
+        if min_rows < 1:
+            raise ValueError(f"min_rows must be 1 or greater. Not {min_rows}")
+        self.sql_column = sql_column
+        self.dax_column = dax_column
+        self.confidence = confidence
+        self.buckets = buckets
+        self.min_rows = min_rows
+        self.sampled_buckets = max(1, round(rate * buckets))
+
+    @property
+    def rate(self) -> float:
+        """Return the share of the buckets sampled."""
+        return self.sampled_buckets / self.buckets
+
+    def sql_predicate(self) -> str:
+        """Return the predicate selecting the sampled keys in SQL."""
+        return (
+            f"ABS(CAST({self.sql_column} AS BIGINT)) * {HASH_MULTIPLIER} "
+            f"% {self.buckets} < {self.sampled_buckets}"
+        )
+
+    def sql_query(self, query: str) -> str:
+        """Return the SQL query filtered on the sampled keys, the predicate
+        is added to the WHERE clause of its last statement."""
+        return add_partition_filter(query, self.sql_predicate())
+
+    def dax_filter(self) -> str:
+        """Return the filter table selecting the sampled keys in DAX."""
+        return (
+            f"FILTER(KEEPFILTERS(VALUES({self.dax_column})), "
+            f"MOD(ABS({self.dax_column}) * {HASH_MULTIPLIER}, "
+            f"{self.buckets}) < {self.sampled_buckets})"
+        )
+
+    def dax_query(self, dax_query: str) -> str:
+        """Return the DAX query filtered on the sampled keys, the filter is
+        added to the filter tables of its `SUMMARIZECOLUMNS`."""
+        return add_summarize_filter(dax_query, self.dax_filter())
+
+    def mask(self, keys) -> np.ndarray:
+        """Return whether every key is sampled, with the hash of the
+        queries.
+        Args:
+            keys: The integer keys.
+        Returns:
+            np.ndarray: A boolean array, True where the key is sampled."""
+        keys = np.abs(np.asarray(keys, dtype="int64"))
+        return keys * HASH_MULTIPLIER % self.buckets < self.sampled_buckets
+
+    def __repr__(self) -> str:
+        return f"SampleSpec({self.sql_column!r}, rate={self.rate})"
+
+
+class SampleCheck:
+    """This class holds the result of the comparison of a sample: the rows
+    sampled, the rows with a discrepancy, and the confidence interval of the
+    discrepancy rate of the full results."""
+
+    def __init__(
+        self,
+        summary: ComparisonSummary,
+        confidence: float = DEFAULT_CONFIDENCE,
+        min_rows: int = DEFAULT_MIN_SAMPLE_ROWS,
+    ):
+        """Initialize the check.
+        Args:
+            summary (ComparisonSummary): The comparison of the sample.
+            confidence (float): The confidence of the interval.
+            min_rows (int): Rows the sample needs to stand for the full
+            results.
+        """
+        self.summary = summary
+        self.confidence = confidence
+        self.min_rows = min_rows
+        unique_rows = summary.df1_unique_count + summary.df2_unique_count
+        self.sampled_rows = summary.intersect_rows + unique_rows
+        self.discrepant_rows = summary.mismatch_rows + unique_rows
+        self.interval = wilson_interval(
+            self.discrepant_rows, self.sampled_rows, confidence
+        )
+
+    @property
+    def too_small(self) -> bool:
+        """Return True if the sample has fewer rows than its minimum, e.g. no
+        rows because the data is not loaded yet."""
+        return self.sampled_rows < self.min_rows
+
+    @property
+    def escalate(self) -> bool:
+        """Return True if the sample has discrepancies or is too small, the
+        full results must then be compared."""
+        return self.discrepant_rows > 0 or self.too_small
+
+    def describe(self) -> str:
+        """Return a one-line description of the check."""
+        low, high = self.interval
+        if self.too_small:
+            return (
+                f"Only {self.sampled_rows} rows sampled, fewer than the "
+                f"{self.min_rows} needed to stand for the full data"
+            )
+        if not self.escalate:
+            return (
+                f"No differences in a sample of {self.sampled_rows} rows, "
+                f"discrepancy rate below {high:.2%} at "
+                f"{self.confidence:.0%} confidence"
+            )
+        return (
+            f"{self.discrepant_rows} of {self.sampled_rows} sampled rows "
+            f"differ, discrepancy rate between {low:.2%} and {high:.2%} at "
+            f"{self.confidence:.0%} confidence"
+        )
+
+
+def wilson_interval(
+    successes: int, trials: int, confidence: float = DEFAULT_CONFIDENCE
+) -> Tuple[float, float]:
+    """Return the Wilson score interval of a proportion.
+    Args:
+        successes (int): Number of trials counted, e.g. discrepant rows.
+        trials (int): Number of trials.
+        confidence (float): The confidence of the interval.
+    Returns:
+        Tuple[float, float]: The lower and upper bounds, (0, 1) without
+        trials."""
+    if not 0 <= successes <= trials:
+        raise ValueError(
+            "successes must be between 0 and the number of trials. "
+            f"Not {successes}"
+        )
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    proportion = successes / trials
+    denominator = 1 + z**2 / trials
+    centre = (proportion + z**2 / (2 * trials)) / denominator
+    margin = (
+        z
+        * math.sqrt(
+            proportion * (1 - proportion) / trials + z**2 / (4 * trials**2)
+        )
+        / denominator
+    )
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def add_summarize_filter(dax_query: str, filter_table: str) -> str:
+    """Add a filter table to the `SUMMARIZECOLUMNS` of a DAX query, before
+    its first name and expression pair.
+    Args:
+        dax_query (str): The DAX query, with one `SUMMARIZECOLUMNS`.
+        filter_table (str): The filter table.
+    Returns:
+        str: The query with the filter."""
+    matches = list(_SUMMARIZECOLUMNS_PATTERN.finditer(dax_query))
+    if len(matches) != 1:
+        raise ValueError(
+            "The DAX query must have one SUMMARIZECOLUMNS. "
+            f"Found {len(matches)}"
+        )
+    depth = 0
+    index = argument = matches[0].end()
+    while index < len(dax_query):
+        char = dax_query[index]
+        if char == "'":
+            # Table names may hold parentheses and commas
+            index = dax_query.find("'", index + 1)
+            if index < 0:
+                break
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == "," and depth == 0:
+            argument = index + 1
+        elif (
+            char == '"'
+            and depth == 0
+            and not dax_query[argument:index].strip()
+        ):
+            # The name of the first name and expression pair
+            return (
+                f"{dax_query[:index]}{filter_table},\n\t\t\t"
+                f"{dax_query[index:]}"
+            )
+        index += 1
+    raise ValueError("The SUMMARIZECOLUMNS of the DAX query has no measures.")
@@ -1,7 +1,8 @@
 """This module prepares and sends a message to a Microsoft Teams channel using
 the incoming webhook URL"""
 
-from typing import Dict
+import json
+from typing import Dict, List, Tuple
 
 import pymsteams
 
@@ -14,6 +15,19 @@ except ImportError:
 # Initialize logger
 log = get_logger(__name__, logfile=f"logs/{__name__}.log")
 
+# Maximum size in bytes of a serialized message card. Incoming webhooks reject
+# payloads larger than 28 KB, a margin is kept for the HTTP request itself.
+MAX_PAYLOAD_BYTES = 27 * 1024
+
+# Maximum number of cards a single message can be split into
+MAX_CARDS = 5
+
+# Bytes reserved in every card for the page number added to the title
+PAGE_SUFFIX_BYTES = 16
+
+# Separator between the elements of a JSON array, as serialized by `requests`
+JSON_SEPARATOR_BYTES = 2
+
 
 def send_ok_teams_message(args: Dict[str, str]) -> bool:
     """
@@ -26,34 +40,18 @@ def send_ok_teams_message(args: Dict[str, str]) -> bool:
             message (str): The message body
             section_title (str): The title of the section
             section_text (str): The text of the section
+            max_payload_bytes (int, optional): The maximum size of each card
+            max_cards (int, optional): The maximum number of cards to send
     Returns:
         response (requests.models.Response): The response from the webhook
         (True if successful, False if failed)
     """
-    # Create the connectorcard object
-    my_teams_message = pymsteams.connectorcard(args["teams_webhook_url"])
-
-    # Create the message
-    my_teams_message.color(args["color"])
-    my_teams_message.title(args["notification_title"])
-    my_teams_message.text(args["message"])
-
-    # create the section
-    my_message_section = pymsteams.cardsection()
-
-    # Section Title
-    my_message_section.title(args["section_title"])
-
-    # Section Text
-    my_message_section.text(args["section_text"])
-
-    # Add your section to the connector card object before sending
-    my_teams_message.addSection(my_message_section)
+    payloads = build_ok_payloads(args)
 
     # Log the contents of the message
-    log.info("OK message sent.")
+    log.info("OK message sent in %s card(s).", len(payloads))
 
-    return my_teams_message.send()
+    return send_payloads(args["teams_webhook_url"], payloads)
 
 
 def send_fail_teams_message(args: Dict[str, str]) -> bool:
@@ -66,31 +64,228 @@ def send_fail_teams_message(args: Dict[str, str]) -> bool:
             notification_title (str): The title of the message card
             message (str): The message body
             compare_report (str): The str containing the comparison report
+            max_payload_bytes (int, optional): The maximum size of each card
+            max_cards (int, optional): The maximum number of cards to send
     Returns:
         response (requests.models.Response): The response from the webhook
         (True if successful, False if failed)
     """
-    # Create the connectorcard object
-    my_teams_message = pymsteams.connectorcard(args["teams_webhook_url"])
+    payloads = build_fail_payloads(args)
+
+    # Log the contents of the message
+    log.info("Fail message sent in %s card(s).", len(payloads))
 
-    # Create the message
-    my_teams_message.color(args["color"])
-    my_teams_message.title(args["notification_title"])
-    my_teams_message.text(args["message"])
+    return send_payloads(args["teams_webhook_url"], payloads)
 
-    # create the sections
-    compare_report_section = pymsteams.cardsection()
 
-    # Section Titles
-    compare_report_section.title("Comparison Report")
+def build_ok_payloads(args: Dict[str, str]) -> List[Dict]:
+    """Build the card payloads of the OK message.
+    Args:
+        args (Dict): The same arguments as `send_ok_teams_message`.
+    Returns:
+        List[Dict]: The card payloads."""
+    return build_payloads(
+        header=build_header(args),
+        sections=[(args["section_title"], args["section_text"])],
+        max_payload_bytes=args.get("max_payload_bytes", MAX_PAYLOAD_BYTES),
+        max_cards=args.get("max_cards", MAX_CARDS),
+    )
+
 
-    # Section Texts, containing the table markdown content
-    compare_report_section.text("```\n" + args["compare_report"] + "\n```")
+def build_fail_payloads(args: Dict[str, str]) -> List[Dict]:
+    """Build the card payloads of the fail message.
+    Args:
+        args (Dict): The same arguments as `send_fail_teams_message`.
+    Returns:
+        List[Dict]: The card payloads."""
+    # Section Texts, containing the comparison report as a code block
+    return build_payloads(
+        header=build_header(args),
+        sections=[("Comparison Report", args["compare_report"])],
+        max_payload_bytes=args.get("max_payload_bytes", MAX_PAYLOAD_BYTES),
+        max_cards=args.get("max_cards", MAX_CARDS),
+        code_block=True,
+    )
 
-    # Add your section to the connector card object before sending
-    my_teams_message.addSection(compare_report_section)
 
-    # Log the contents of the message
-    log.info("Fail message sent.")
+def build_header(args: Dict[str, str]) -> Dict[str, str]:
+    """Return the color, title and text of a message card.
+    Args:
+        args (Dict): A dictionary containing the `color`,
+        `notification_title` and `message` keys.
+    Returns:
+        Dict[str, str]: The card payload without sections."""
+    # pymsteams translates "red" into the Teams red color, do the same here
+    color = args["color"]
+    if color.lower() == "red":
+        color = "E81123"
+    return {
+        "themeColor": color,
+        "title": args["notification_title"],
+        "text": args["message"],
+    }
+
+
+def build_payloads(
+    header: Dict[str, str],
+    sections: List[Tuple[str, str]],
+    max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+    max_cards: int = MAX_CARDS,
+    code_block: bool = False,
+) -> List[Dict]:
+    """Build the payloads of the cards needed to send the sections, each one
+    smaller than `max_payload_bytes` once serialized. Sections that do not fit
+    in one card are split on line boundaries and paginated across several
+    cards. Cards beyond `max_cards` are dropped and replaced by a note.
+    Args:
+        header (Dict[str, str]): The card payload without sections.
+        sections (List[Tuple[str, str]]): The (title, text) of each section.
+        max_payload_bytes (int): The maximum size of each card in bytes.
+        max_cards (int): The maximum number of cards.
+        code_block (bool): Whether the section texts are sent as code blocks.
+    Returns:
+        List[Dict]: The card payloads."""
+    if max_cards < 1:
+        raise ValueError(f"max_cards must be 1 or greater. Not {max_cards}")
+
+    # Space left for the sections in every card
+    budget = (
+        max_payload_bytes
+        - payload_size(dict(header, sections=[]))
+        - PAGE_SUFFIX_BYTES
+    )
+
+    cards = [[]]
+    used = 0
+    for title, text in sections:
+        # Size of the section without any text in it
+        overhead = (
+            payload_size(_section(title, "", code_block)) + JSON_SEPARATOR_BYTES
+        )
+        if overhead >= budget:
+            raise ValueError(
+                f"max_payload_bytes is too small to send the message. "
+                f"Not {max_payload_bytes}"
+            )
+        for chunk in split_text(text, budget - overhead):
+            section = _section(title, chunk, code_block)
+            size = payload_size(section) + JSON_SEPARATOR_BYTES
+            if cards[-1] and used + size > budget:
+                cards.append([])
+                used = 0
+            cards[-1].append(section)
+            used += size
+
+    if len(cards) > max_cards:
+        omitted = len(cards) - max_cards
+        cards = cards[:max_cards]
+        note = _section(
+            "Message truncated",
+            f"{omitted} more card(s) omitted. "
+            f"Please check the report file for the full content.",
+            False,
+        )
+        note_size = payload_size(note) + JSON_SEPARATOR_BYTES
+        last_card = cards[-1]
+        while last_card and (
+            sum(payload_size(s) + JSON_SEPARATOR_BYTES for s in last_card)
+            + note_size
+            > budget
+        ):
+            last_card.pop()
+        last_card.append(note)
+
+    payloads = []
+    for page, card_sections in enumerate(cards, start=1):
+        payload = dict(header, sections=card_sections)
+        if len(cards) > 1:
+            payload["title"] = f"{header['title']} ({page}/{len(cards)})"
+        payloads.append(payload)
+    return payloads
+
+
+def send_payloads(teams_webhook_url: str, payloads: List[Dict]) -> bool:
+    """Send the card payloads to the Teams channel, in order.
+    Args:
+        teams_webhook_url (str): The incoming webhook URL for the Teams channel
+        payloads (List[Dict]): The card payloads.
+    Returns:
+        bool: True if every card was sent. A card that fails is logged and
+        the next cards are still sent."""
+    sent = True
+    for page, payload in enumerate(payloads, start=1):
+        # Create the connectorcard object
+        my_teams_message = pymsteams.connectorcard(teams_webhook_url)
+        my_teams_message.payload = payload
+        # `send` returns True or raises an exception
+        try:
+            my_teams_message.send()
+        except pymsteams.TeamsWebhookException as error:
+            log.error(
+                "Card %s of %s was not sent: %s", page, len(payloads), error
+            )
+            sent = False
+    return sent
+
+
+def split_text(text: str, max_bytes: int) -> List[str]:
+    """Split a text in chunks whose serialized size is at most `max_bytes`.
+    The text is split on line boundaries, lines that are too long by
+    themselves are split further.
+    Args:
+        text (str): The text to split.
+        max_bytes (int): The maximum serialized size of each chunk.
+    Returns:
+        List[str]: The chunks, in order."""
+    if max_bytes < 1:
+        raise ValueError(f"max_bytes must be 1 or greater. Not {max_bytes}")
+
+    chunks = []
+    current = []
+    used = 0
+    for line in text.split("\n"):
+        for piece in _split_line(line, max_bytes):
+            # Every line after the first one needs a "\n", 2 bytes in JSON
+            size = text_size(piece) + (2 if current else 0)
+            if current and used + size > max_bytes:
+                chunks.append("\n".join(current))
+                current = []
+                used = 0
+                size = text_size(piece)
+            current.append(piece)
+            used += size
+    chunks.append("\n".join(current))
+    return chunks
+
+
+def payload_size(payload: Dict) -> int:
+    """Return the size in bytes of a payload serialized as JSON, the same way
+    `requests` serializes it before posting it to the webhook."""
+    return len(json.dumps(payload).encode("utf-8"))
+
+
+def text_size(text: str) -> int:
+    """Return the size in bytes of a string inside a JSON document."""
+    return len(json.dumps(text).encode("utf-8")) - 2
+
+
+def _split_line(line: str, max_bytes: int) -> List[str]:
+    """Split a single line in pieces whose serialized size is at most
+    `max_bytes`."""
+    pieces = []
+    while text_size(line) > max_bytes:
+        end = min(len(line), max_bytes)
+        while end > 1 and text_size(line[:end]) > max_bytes:
+            end = max(1, end * max_bytes // text_size(line[:end]) - 1)
+        pieces.append(line[:end])
+        line = line[end:]
+    pieces.append(line)
+    return pieces
+
 
-    return my_teams_message.send()
+def _section(title: str, text: str, code_block: bool) -> Dict[str, str]:
+    """Return the payload of a card section."""
+    section = pymsteams.cardsection()
+    section.title(title)
+    section.text("```\n" + text + "\n```" if code_block else text)
+    return section.dumpSection()
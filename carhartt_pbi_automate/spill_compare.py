@@ -0,0 +1,343 @@
+"""This module compares two results within a memory budget. The results are
+read chunk by chunk and held in memory while the comparison is estimated to
+fit in the budget, they are then compared with `compare_with_tolerance`.
+Otherwise both sides are partitioned by a hash of their key columns and
+spilled to Parquet files, and the partitions are compared one at a time. A
+partition still too large for the budget is partitioned again on other bits
+of the hash, the summaries of the partitions are merged into one summary."""
+
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from comparison_report import ComparisonSummary
+    from get_logger import get_logger
+    from tolerance_compare import compare_with_tolerance, normalise_frame
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import ComparisonSummary
+    from carhartt_pbi_automate.get_logger import get_logger
+    from carhartt_pbi_automate.tolerance_compare import (
+        compare_with_tolerance,
+        normalise_frame,
+    )
+
+
+# Initialize logger
+log = get_logger(__name__, logfile=f"logs/{__name__}.log")
+
+# Memory used by `compare_with_tolerance` relative to the size of the frames:
+# the normalised copies of both frames and their outer merge
+COMPARE_MEMORY_FACTOR = 3
+
+# Partitions written per spill, and times a partition can be split again
+DEFAULT_SPILL_PARTITIONS = 16
+MAX_SPILL_LEVELS = 4
+
+_BUDGET_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$", re.I)
+_BUDGET_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_memory_budget(text: Union[int, str]) -> int:
+    """Parse a memory budget, a number of bytes with an optional unit.
+    Args:
+        text (Union[int, str]): The budget, e.g. 1048576, "512MB" or "4 GB".
+    Returns:
+        int: The budget in bytes."""
+    if isinstance(text, int) and not isinstance(text, bool):
+        budget = text
+    else:
+        match = _BUDGET_PATTERN.match(str(text))
+        if match is None:
+            raise ValueError(
+                f"The memory budget must be bytes, KB, MB, GB or TB. "
+                f"Not {text}"
+            )
+        budget = int(float(match[1]) * _BUDGET_UNITS[match[2].upper()])
+    if budget < 1:
+        raise ValueError(f"The memory budget must be 1 or greater. Not {text}")
+    return budget
+
+
+def estimate_frame_bytes(frame: pd.DataFrame) -> int:
+    """Return the memory used by a dataframe, strings included."""
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+
+def spill_compare(
+    side1: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    side2: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    join_columns: List[str],
+    memory_budget: int,
+    partitions: int = DEFAULT_SPILL_PARTITIONS,
+    work_dir: Union[Path, str] = None,
+    **compare_kwargs,
+) -> ComparisonSummary:
+    """Compare two results joined on their key columns, spilling them to disk
+    when the comparison would not fit in the memory budget. The result is the
+    same as the result of `compare_with_tolerance`, except for the order of
+    the sampled rows.
+    Args:
+        side1 (Union[pd.DataFrame, Iterable[pd.DataFrame]]): The first result,
+        or its chunks.
+        side2 (Union[pd.DataFrame, Iterable[pd.DataFrame]]): The second
+        result, or its chunks.
+        join_columns (List[str]): The key columns used to join the rows.
+        memory_budget (int): Bytes the comparison may use.
+        partitions (int): Number of partitions of every spill.
+        work_dir (Union[Path, str]): Directory of the temporary Parquet
+        files. Defaults to the temporary directory of the system.
+        compare_kwargs: The other arguments of `compare_with_tolerance`.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    if memory_budget < 1:
+        raise ValueError(
+            f"memory_budget must be 1 or greater. Not {memory_budget}"
+        )
+    if partitions < 2:
+        raise ValueError(f"partitions must be 2 or greater. Not {partitions}")
+    chunks1 = _iter_chunks(side1)
+    chunks2 = _iter_chunks(side2)
+
+    # The chunks are kept in memory until the budget would be exceeded
+    buffered1: List[pd.DataFrame] = []
+    buffered2: List[pd.DataFrame] = []
+    used = 0
+    fits = True
+    for buffered, chunks in ((buffered1, chunks1), (buffered2, chunks2)):
+        for chunk in chunks:
+            buffered.append(chunk)
+            used += estimate_frame_bytes(chunk)
+            if used * COMPARE_MEMORY_FACTOR > memory_budget:
+                fits = False
+                break
+        if not fits:
+            break
+    if fits:
+        return compare_with_tolerance(
+            _concat(buffered1),
+            _concat(buffered2),
+            join_columns,
+            **compare_kwargs,
+        )
+
+    log.info(
+        "The comparison exceeds the memory budget of %s bytes, the results "
+        "are spilled to %s partitions.",
+        memory_budget,
+        partitions,
+    )
+    lower = compare_kwargs.get("cast_column_names_lower", True)
+    if lower:
+        join_columns = [column.lower() for column in join_columns]
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        directory = Path(directory)
+        sizes1 = spill_partitions(
+            _prepare(_drain(buffered1, chunks1), lower),
+            join_columns,
+            partitions,
+            directory / "df1",
+        )
+        sizes2 = spill_partitions(
+            _prepare(_drain(buffered2, chunks2), lower),
+            join_columns,
+            partitions,
+            directory / "df2",
+        )
+        summaries = _compare_spilled(
+            directory / "df1",
+            directory / "df2",
+            sizes1,
+            sizes2,
+            join_columns,
+            memory_budget,
+            partitions,
+            0,
+            compare_kwargs,
+        )
+    return ComparisonSummary.merge(summaries)
+
+
+def spill_partitions(
+    chunks: Iterable[pd.DataFrame],
+    join_columns: List[str],
+    partitions: int,
+    directory: Path,
+    level: int = 0,
+) -> np.ndarray:
+    """Write the rows of every chunk to the directory of the partition of
+    their keys, one Parquet file per chunk and partition.
+    Args:
+        chunks (Iterable[pd.DataFrame]): The normalised chunks, at least one.
+        join_columns (List[str]): The key columns.
+        partitions (int): Number of partitions.
+        directory (Path): The directory of the partitions.
+        level (int): The bits of the hash used, a partition spilled again
+        uses the next level.
+    Returns:
+        np.ndarray: The bytes the rows of every partition use in memory."""
+    directory.mkdir(parents=True, exist_ok=True)
+    sizes = np.zeros(partitions, dtype="int64")
+    template = None
+    for number, chunk in enumerate(chunks):
+        if template is None:
+            template = chunk.iloc[:0]
+            template.to_parquet(directory / "template.parquet", index=False)
+        partition = partition_keys(chunk, join_columns, partitions, level)
+        for index in np.unique(partition):
+            rows = chunk[partition == index]
+            path = _partition_dir(directory, index) / f"{number:06d}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            rows.to_parquet(path, index=False)
+            sizes[index] += estimate_frame_bytes(rows)
+    if template is None:
+        raise ValueError("There must be at least one chunk to spill.")
+    return sizes
+
+
+def partition_keys(
+    frame: pd.DataFrame, join_columns: List[str], partitions: int, level: int
+) -> np.ndarray:
+    """Return the partition of every row, from the bits of a hash of its keys
+    selected by the level."""
+    hashes = pd.util.hash_pandas_object(frame[join_columns], index=False)
+    shifted = hashes.to_numpy() // np.uint64(partitions**level)
+    return (shifted % np.uint64(partitions)).astype("int64")
+
+
+def read_partition(directory: Path, index: int) -> pd.DataFrame:
+    """Read the rows of a spilled partition.
+    Args:
+        directory (Path): The directory written by `spill_partitions`.
+        index (int): The partition.
+    Returns:
+        pd.DataFrame: The rows of the partition."""
+    return _concat(list(_iter_partition(directory, index)))
+
+
+def _compare_spilled(
+    directory1: Path,
+    directory2: Path,
+    sizes1: np.ndarray,
+    sizes2: np.ndarray,
+    join_columns: List[str],
+    memory_budget: int,
+    partitions: int,
+    level: int,
+    compare_kwargs: dict,
+) -> List[ComparisonSummary]:
+    """Compare the spilled partitions one at a time, spilling again the
+    partitions that do not fit in the budget."""
+    summaries = []
+    for index in range(partitions):
+        needed = (sizes1[index] + sizes2[index]) * COMPARE_MEMORY_FACTOR
+        if needed > memory_budget and level + 1 < MAX_SPILL_LEVELS:
+            split1 = _partition_dir(directory1, index) / "split"
+            split2 = _partition_dir(directory2, index) / "split"
+            summaries += _compare_spilled(
+                split1,
+                split2,
+                spill_partitions(
+                    _iter_partition(directory1, index),
+                    join_columns,
+                    partitions,
+                    split1,
+                    level + 1,
+                ),
+                spill_partitions(
+                    _iter_partition(directory2, index),
+                    join_columns,
+                    partitions,
+                    split2,
+                    level + 1,
+                ),
+                join_columns,
+                memory_budget,
+                partitions,
+                level + 1,
+                compare_kwargs,
+            )
+            continue
+        if needed > memory_budget:
+            log.warning(
+                "Partition %s needs about %s bytes after %s spills, more "
+                "than the memory budget of %s bytes.",
+                index,
+                needed,
+                level + 1,
+                memory_budget,
+            )
+        summaries.append(
+            compare_with_tolerance(
+                read_partition(directory1, index),
+                read_partition(directory2, index),
+                join_columns,
+                **compare_kwargs,
+            )
+        )
+        shutil.rmtree(_partition_dir(directory1, index), ignore_errors=True)
+        shutil.rmtree(_partition_dir(directory2, index), ignore_errors=True)
+    return summaries
+
+
+def _iter_partition(directory: Path, index: int) -> Iterator[pd.DataFrame]:
+    """Yield the chunks of a spilled partition, or an empty chunk with the
+    columns of the side when the partition has no rows."""
+    paths = sorted(_partition_dir(directory, index).glob("*.parquet"))
+    if not paths:
+        yield pd.read_parquet(directory / "template.parquet")
+    for path in paths:
+        yield pd.read_parquet(path)
+
+
+def _partition_dir(directory: Path, index: int) -> Path:
+    """Return the directory of a partition."""
+    return directory / f"{index:04d}"
+
+
+def _iter_chunks(
+    side: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+) -> Iterator[pd.DataFrame]:
+    """Yield the chunks of a side, a dataframe is a single chunk."""
+    if isinstance(side, pd.DataFrame):
+        yield side
+        return
+    empty = True
+    for chunk in side:
+        empty = False
+        yield chunk
+    if empty:
+        raise ValueError("A side of the comparison has no chunks.")
+
+
+def _drain(
+    buffered: List[pd.DataFrame], chunks: Iterator[pd.DataFrame]
+) -> Iterator[pd.DataFrame]:
+    """Yield the buffered chunks, releasing them, then the other chunks."""
+    while buffered:
+        yield buffered.pop(0)
+    yield from chunks
+
+
+def _prepare(
+    chunks: Iterable[pd.DataFrame], lower: bool
+) -> Iterator[pd.DataFrame]:
+    """Normalise the chunks, so the same key gets the same hash on both
+    sides whatever its original dtype."""
+    for chunk in chunks:
+        chunk = normalise_frame(chunk)
+        if lower:
+            chunk.columns = [str(column).lower() for column in chunk.columns]
+        yield chunk
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate the chunks of a side."""
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
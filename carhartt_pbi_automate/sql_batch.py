@@ -0,0 +1,123 @@
+"""This module runs the SQL queries of several validation jobs as a single
+batch on the EDW. Every query file declares and sets the same variables, e.g.
+`@VersionDateToValidate` from the `Dimensions.Days` table: the `DECLARE` and
+`SET` statements of the queries are hoisted to the top of the batch and
+deduplicated, so the lookups run once, followed by the `SELECT` of every
+query. The result sets are read back with `cursor.nextset()`.
+
+The jobs running at the same time submit their query to a `SqlBatcher`, see
+`query_batcher`."""
+
+import re
+from typing import Dict, List, Tuple
+
+try:
+    from arrow_extract import dbapi_connection
+    from query_batcher import DEFAULT_BATCH_WINDOW, QueryBatcher
+except ImportError:
+    from carhartt_pbi_automate.arrow_extract import dbapi_connection
+    from carhartt_pbi_automate.query_batcher import (
+        DEFAULT_BATCH_WINDOW,
+        QueryBatcher,
+    )
+
+
+# Without it every assignment returns a row count, read as a result set
+NOCOUNT = "SET NOCOUNT ON;"
+
+_DECLARE_PATTERN = re.compile(
+    r"\bDECLARE\s+(@\w+)\s+([^;]*?)\s*;", re.IGNORECASE
+)
+_SET_PATTERN = re.compile(
+    r"\bSET\s+(@\w+)\s*=\s*(.+?)\s*;", re.IGNORECASE | re.DOTALL
+)
+
+
+def batch_sql_queries(queries: List[str]) -> str:
+    """Combine SQL queries into a single batch, with the variables of the
+    queries declared and set once, at the top.
+    Args:
+        queries (List[str]): The SQL queries. Every query returns one result
+        set, and the queries setting the same variable set it to the same
+        value.
+    Returns:
+        str: The batch."""
+    declarations: Dict[str, Tuple[str, str]] = {}
+    assignments: Dict[str, Tuple[str, str]] = {}
+    statements = []
+    for index, query in enumerate(queries):
+        # The variable names are case insensitive
+        for name, sql_type in _DECLARE_PATTERN.findall(query):
+            sql_type = " ".join(sql_type.split()).upper()
+            declared = declarations.setdefault(name.lower(), (name, sql_type))
+            if declared[1] != sql_type:
+                raise ValueError(
+                    f"Query {index} declares {name} as {sql_type}, "
+                    f"not {declared[1]}."
+                )
+        for name, value in _SET_PATTERN.findall(query):
+            assigned = assignments.setdefault(name.lower(), (name, value))
+            if assigned[1].split() != value.split():
+                raise ValueError(
+                    f"Query {index} sets {name} to another value."
+                )
+        statement = _SET_PATTERN.sub("", _DECLARE_PATTERN.sub("", query))
+        statements.append(statement.strip().rstrip(";").strip())
+
+    header = [NOCOUNT]
+    header += [
+        f"DECLARE {name} {sql_type};"
+        for name, sql_type in declarations.values()
+    ]
+    header += [
+        f"SET {name} = {value};" for name, value in assignments.values()
+    ]
+    # A statement starting with WITH must follow a terminated statement
+    return "\n".join(header) + "\n\n" + ";\n\n".join(statements) + ";\n"
+
+
+def execute_sql_batch(
+    connection, queries: List[str]
+) -> List[Tuple[List[str], list]]:
+    """Run SQL queries as a single batch and split the result sets.
+    Args:
+        connection: A DB-API or SQLAlchemy connection to the EDW.
+        queries (List[str]): The SQL queries, see `batch_sql_queries`.
+    Returns:
+        List[Tuple[List[str], list]]: The column names and the rows of every
+        query."""
+    cursor = dbapi_connection(connection).cursor()
+    try:
+        cursor.execute(batch_sql_queries(queries))
+        results = []
+        for index in range(len(queries)):
+            if index and not cursor.nextset():
+                raise ValueError(
+                    f"The batch returned {index} result sets, "
+                    f"{len(queries)} were expected."
+                )
+            names = [column[0] for column in cursor.description]
+            results.append((names, cursor.fetchall()))
+    finally:
+        cursor.close()
+    return results
+
+
+class SqlBatcher(QueryBatcher):
+    """This class runs the SQL queries of the jobs running at the same time
+    as batches, see `QueryBatcher`."""
+
+    def __init__(
+        self,
+        expected_queries: int = 1,
+        window_seconds: float = DEFAULT_BATCH_WINDOW,
+    ):
+        """Initialize the batcher.
+        Args:
+            expected_queries (int): Number of queries that run the batch as
+            soon as they are submitted, usually the number of jobs running at
+            a time.
+            window_seconds (float): Seconds the first query of a batch waits
+            for the other queries.
+        """
+        super().__init__(execute_sql_batch, expected_queries, window_seconds)
@@ -0,0 +1,228 @@
+"""This module generates synthetic EDW and Power BI result pairs shaped like
+the results of `Supply - Inventory Demand Sales`, to benchmark and regression
+test the comparison and the reports at production sizes. The data is
+generated with NumPy in chunks and can be written straight to Parquet."""
+
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Key columns, named as they are once the brackets are removed from the
+# Power BI column names
+MONTH_COLUMN = "DatesYear/Period/Month"
+PRODUCT_COLUMN = "ProductsProduct Key"
+KEY_COLUMNS = (MONTH_COLUMN, PRODUCT_COLUMN)
+
+# The unit measures of `Supply - Inventory Demand Sales`
+SALES_MEASURES = (
+    "Constrained_Receipt_Plan_Units",
+    "Total_Receipt_Plan_Units",
+    "Planned_Production_Units",
+    "Work_In_Progress_Units",
+    "In_Transit_Units",
+    "Sales_Demand_Units",
+)
+
+# File names of the pair written by `write_parquet_pair`
+PBI_FILE = "pbi.parquet"
+EDW_FILE = "edw.parquet"
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+class SyntheticPair:
+    """This class holds a generated Power BI and EDW result pair, and the
+    differences injected between them."""
+
+    def __init__(
+        self,
+        pbi: pd.DataFrame,
+        edw: pd.DataFrame,
+        discrepancies: int,
+        missing_rows: int,
+    ):
+        """Initialize the pair.
+        Args:
+            pbi (pd.DataFrame): The Power BI results.
+            edw (pd.DataFrame): The EDW results.
+            discrepancies (int): Number of Power BI values changed.
+            missing_rows (int): Number of EDW rows missing in Power BI.
+        """
+        self.pbi = pbi
+        self.edw = edw
+        self.discrepancies = discrepancies
+        self.missing_rows = missing_rows
+
+
+def generate_pair(
+    rows: int,
+    months: int = 8,
+    discrepancy_rate: float = 0.0,
+    missing_rate: float = 0.0,
+    noise: float = 1e-12,
+    seed: int = 0,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> SyntheticPair:
+    """Generate a Power BI and EDW result pair in memory.
+    Args:
+        rows (int): Number of rows of the EDW results.
+        months (int): Number of distinct months, the rows are spread over
+        `ceil(rows / months)` products.
+        discrepancy_rate (float): Fraction of the Power BI values changed by
+        at least one unit.
+        missing_rate (float): Fraction of the EDW rows missing in Power BI.
+        noise (float): Relative floating-point noise added to every Power BI
+        value, small enough to be absorbed by the comparison tolerances.
+        seed (int): Seed of the random generator.
+        chunk_rows (int): Number of rows generated at a time.
+    Returns:
+        SyntheticPair: The generated pair."""
+    pbi_chunks, edw_chunks = [], []
+    discrepancies = missing_rows = 0
+    for pbi, edw, changed in iter_chunks(
+        rows, months, discrepancy_rate, missing_rate, noise, seed, chunk_rows
+    ):
+        pbi_chunks.append(pbi)
+        edw_chunks.append(edw)
+        discrepancies += changed
+        missing_rows += len(edw) - len(pbi)
+    return SyntheticPair(
+        _concat(pbi_chunks),
+        _concat(edw_chunks),
+        discrepancies,
+        missing_rows,
+    )
+
+
+def write_parquet_pair(
+    directory: Union[Path, str],
+    rows: int,
+    months: int = 8,
+    discrepancy_rate: float = 0.0,
+    missing_rate: float = 0.0,
+    noise: float = 1e-12,
+    seed: int = 0,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Tuple[Path, Path]:
+    """Generate a Power BI and EDW result pair and write it to two Parquet
+    files, one row group per chunk, without holding the whole pair in memory.
+    The same arguments generate the same data as `generate_pair`.
+    Args:
+        directory (Union[Path, str]): The directory of the Parquet files.
+        The other arguments are the ones of `generate_pair`.
+    Returns:
+        Tuple[Path, Path]: The paths of the Power BI and EDW files."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    pbi_path = directory / PBI_FILE
+    edw_path = directory / EDW_FILE
+    schema = _schema()
+    with pq.ParquetWriter(pbi_path, schema) as pbi_writer, pq.ParquetWriter(
+        edw_path, schema
+    ) as edw_writer:
+        for pbi, edw, _ in iter_chunks(
+            rows,
+            months,
+            discrepancy_rate,
+            missing_rate,
+            noise,
+            seed,
+            chunk_rows,
+        ):
+            pbi_writer.write_table(_to_table(pbi, schema))
+            edw_writer.write_table(_to_table(edw, schema))
+    return pbi_path, edw_path
+
+
+def iter_chunks(
+    rows: int,
+    months: int = 8,
+    discrepancy_rate: float = 0.0,
+    missing_rate: float = 0.0,
+    noise: float = 1e-12,
+    seed: int = 0,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, int]]:
+    """Generate a Power BI and EDW result pair chunk by chunk. The rows are
+    ordered by month and product, like the results of the queries.
+    Args:
+        The arguments are the ones of `generate_pair`.
+    Returns:
+        Iterator[Tuple[pd.DataFrame, pd.DataFrame, int]]: The Power BI and
+        EDW rows of every chunk, and the number of Power BI values changed."""
+    if rows < 1:
+        raise ValueError(f"rows must be 1 or greater. Not {rows}")
+    if months < 1:
+        raise ValueError(f"months must be 1 or greater. Not {months}")
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be 1 or greater. Not {chunk_rows}")
+    for name, rate in (
+        ("discrepancy_rate", discrepancy_rate),
+        ("missing_rate", missing_rate),
+    ):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"{name} must be between 0 and 1. Not {rate}")
+
+    products = -(-rows // months)
+    categories = pd.period_range("2024-01", periods=months, freq="M")
+    categories = categories.strftime("%Y/%m")
+
+    for start in range(0, rows, chunk_rows):
+        stop = min(rows, start + chunk_rows)
+        # Every chunk has its own generator, so the data does not depend on
+        # how the chunks are consumed
+        rng = np.random.default_rng([seed, start])
+        index = np.arange(start, stop)
+
+        edw = pd.DataFrame(
+            {
+                MONTH_COLUMN: pd.Categorical.from_codes(
+                    index // products, categories
+                ),
+                PRODUCT_COLUMN: (index % products + 1).astype("int64"),
+            }
+        )
+        values = np.round(
+            rng.lognormal(8.0, 1.5, (len(index), len(SALES_MEASURES)))
+        )
+        changed = rng.random(values.shape) < discrepancy_rate
+        deltas = rng.integers(1, 100, values.shape) * rng.choice(
+            [-1.0, 1.0], values.shape
+        )
+        pbi_values = values * (1 + rng.uniform(-noise, noise, values.shape))
+        pbi_values = np.where(changed, values + deltas, pbi_values)
+        present = rng.random(len(index)) >= missing_rate
+
+        pbi = edw.copy()
+        for position, measure in enumerate(SALES_MEASURES):
+            edw[measure] = values[:, position]
+            pbi[measure] = pbi_values[:, position]
+        pbi = pbi[present].reset_index(drop=True)
+        yield pbi, edw, int(changed[present].sum())
+
+
+def _schema() -> pa.Schema:
+    """Return the Arrow schema of the generated results."""
+    return pa.schema(
+        [
+            pa.field(MONTH_COLUMN, pa.dictionary(pa.int32(), pa.string())),
+            pa.field(PRODUCT_COLUMN, pa.int64()),
+        ]
+        + [pa.field(measure, pa.float64()) for measure in SALES_MEASURES]
+    )
+
+
+def _to_table(frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Convert a chunk to an Arrow table with the given schema."""
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def _concat(frames: list) -> pd.DataFrame:
+    """Concatenate the chunks, keeping the month column categorical."""
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
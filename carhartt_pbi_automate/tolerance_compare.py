@@ -0,0 +1,228 @@
+"""This module compares two dataframes joined on their key columns, allowing
+per-column absolute and relative tolerances on the numeric columns. The values
+are normalised and compared with NumPy over whole columns."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from comparison_report import (
+        ComparisonSummary,
+        DEFAULT_SAMPLE_SIZE,
+        summarise_values,
+    )
+except ImportError:
+    from carhartt_pbi_automate.comparison_report import (
+        ComparisonSummary,
+        DEFAULT_SAMPLE_SIZE,
+        summarise_values,
+    )
+
+
+# Default tolerances, they absorb the floating-point noise of summing the same
+# values in a different order in the EDW and in Power BI.
+DEFAULT_ABS_TOL = 1e-6
+DEFAULT_REL_TOL = 1e-9
+
+# Types reported by pandas.api.types.infer_dtype that are converted to float64
+NUMERIC_INFERRED_TYPES = (
+    "decimal",
+    "floating",
+    "integer",
+    "mixed-integer-float",
+)
+
+
+def normalise_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Normalise the dtypes of a dataframe so the values of both sides of a
+    comparison are comparable: numeric columns, including the object columns
+    holding `Decimal` values returned by the database drivers, are converted
+    to float64, and the leading and trailing spaces of the strings are
+    removed.
+    Args:
+        frame (pd.DataFrame): The dataframe to normalise.
+    Returns:
+        pd.DataFrame: A new dataframe with the normalised columns."""
+    columns = {}
+    for name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(column.cat.categories.dtype)
+        if pd.api.types.is_bool_dtype(column):
+            columns[name] = column
+        elif pd.api.types.is_numeric_dtype(column):
+            columns[name] = column.astype("float64")
+        elif column.dtype == object:
+            inferred = pd.api.types.infer_dtype(column, skipna=True)
+            if inferred in NUMERIC_INFERRED_TYPES:
+                columns[name] = pd.to_numeric(column).astype("float64")
+            elif inferred == "string":
+                columns[name] = column.str.strip()
+            else:
+                columns[name] = column
+        elif pd.api.types.is_string_dtype(column):
+            columns[name] = column.str.strip()
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def compare_with_tolerance(
+    df1: pd.DataFrame,
+    df2: pd.DataFrame,
+    join_columns: List[str],
+    tolerances: Dict[str, Tuple[float, float]] = None,
+    abs_tol: float = DEFAULT_ABS_TOL,
+    rel_tol: float = DEFAULT_REL_TOL,
+    df1_name: str = "PowerBI",
+    df2_name: str = "EDW",
+    cast_column_names_lower: bool = True,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ComparisonSummary:
+    """Compare two dataframes joined on their key columns. Two numeric values
+    match when `abs(value1 - value2) <= abs_tol + rel_tol * abs(value2)`, the
+    same rule used by datacompy, with the tolerances of their column.
+    Args:
+        df1 (pd.DataFrame): The first dataframe.
+        df2 (pd.DataFrame): The second dataframe.
+        join_columns (List[str]): The key columns used to join the rows.
+        tolerances (Dict[str, Tuple[float, float]]): The (absolute, relative)
+        tolerances of each column. Columns not listed use the defaults.
+        abs_tol (float): The default absolute tolerance.
+        rel_tol (float): The default relative tolerance.
+        df1_name (str): The name of the first dataframe.
+        df2_name (str): The name of the second dataframe.
+        cast_column_names_lower (bool): Whether to compare the column names
+        in lower case.
+        sample_size (int): The maximum number of rows kept per sample.
+    Returns:
+        ComparisonSummary: The summary of the comparison."""
+    tolerances = dict(tolerances or {})
+    df1 = normalise_frame(df1)
+    df2 = normalise_frame(df2)
+    if cast_column_names_lower:
+        df1.columns = [str(column).lower() for column in df1.columns]
+        df2.columns = [str(column).lower() for column in df2.columns]
+        join_columns = [column.lower() for column in join_columns]
+        tolerances = {
+            column.lower(): value for column, value in tolerances.items()
+        }
+
+    for column in join_columns:
+        if column not in df1.columns or column not in df2.columns:
+            raise ValueError(f"Join column {column} not found in both frames.")
+
+    columns = [
+        column
+        for column in df1.columns
+        if column in df2.columns and column not in join_columns
+    ]
+
+    merged = df1.merge(
+        df2,
+        how="outer",
+        on=join_columns,
+        suffixes=("_df1", "_df2"),
+        indicator=True,
+        validate="one_to_one",
+    )
+    # Columns that are not in both frames keep their original name
+    df1_only = [c for c in df1.columns if c not in df2.columns]
+    df2_only = [c for c in df2.columns if c not in df1.columns]
+    indicator = merged.pop("_merge").to_numpy()
+    both = merged[indicator == "both"]
+    df1_unique = merged.loc[
+        indicator == "left_only",
+        join_columns + [f"{c}_df1" for c in columns] + df1_only,
+    ]
+    df1_unique.columns = join_columns + columns + df1_only
+    df2_unique = merged.loc[
+        indicator == "right_only",
+        join_columns + [f"{c}_df2" for c in columns] + df2_only,
+    ]
+    df2_unique.columns = join_columns + columns + df2_only
+
+    df1_values = {}
+    df2_values = {}
+    match_masks = {}
+    for column in columns:
+        column_abs_tol, column_rel_tol = tolerances.get(
+            column, (abs_tol, rel_tol)
+        )
+        values1 = both[f"{column}_df1"].to_numpy()
+        values2 = both[f"{column}_df2"].to_numpy()
+        df1_values[column] = values1
+        df2_values[column] = values2
+        match_masks[column] = values_match(
+            values1, values2, column_abs_tol, column_rel_tol
+        )
+
+    return summarise_values(
+        both[join_columns].reset_index(drop=True),
+        df1_values,
+        df2_values,
+        match_masks,
+        df1_name=df1_name,
+        df2_name=df2_name,
+        df1_rows=len(df1),
+        df2_rows=len(df2),
+        df1_unique=df1_unique.reset_index(drop=True),
+        df2_unique=df2_unique.reset_index(drop=True),
+        sample_size=sample_size,
+    )
+
+
+def duplicated_keys(
+    frame: pd.DataFrame, join_columns: List[str]
+) -> pd.DataFrame:
+    """Return the keys found on more than one row of a dataframe, the rows
+    cannot be joined one to one on them. The keys are normalised like the
+    keys joined by `compare_with_tolerance`.
+    Args:
+        frame (pd.DataFrame): The dataframe.
+        join_columns (List[str]): The key columns.
+    Returns:
+        pd.DataFrame: One row per duplicated key."""
+    keys = normalise_frame(frame[join_columns])
+    duplicated = keys[keys.duplicated(keep=False)]
+    return duplicated.drop_duplicates().reset_index(drop=True)
+
+
+def values_match(
+    values1: np.ndarray,
+    values2: np.ndarray,
+    abs_tol: float = DEFAULT_ABS_TOL,
+    rel_tol: float = DEFAULT_REL_TOL,
+) -> np.ndarray:
+    """Compare two arrays element by element. Numeric values are compared
+    with the tolerances, and two missing values are considered equal.
+    Args:
+        values1 (np.ndarray): The first array.
+        values2 (np.ndarray): The second array, the relative tolerance is
+        relative to its values.
+        abs_tol (float): The absolute tolerance.
+        rel_tol (float): The relative tolerance.
+    Returns:
+        np.ndarray: A boolean array, True where the values match."""
+    if _is_numeric(values1) and _is_numeric(values2):
+        array1 = np.asarray(values1, dtype="float64")
+        array2 = np.asarray(values2, dtype="float64")
+        with np.errstate(invalid="ignore"):
+            close = np.abs(array1 - array2) <= abs_tol + rel_tol * np.abs(
+                array2
+            )
+        # Infinite values only match when they are equal
+        return (
+            close | (array1 == array2) | (np.isnan(array1) & np.isnan(array2))
+        )
+
+    both_missing = pd.isna(values1) & pd.isna(values2)
+    equal = np.asarray(values1 == values2, dtype=bool)
+    return equal | both_missing
+
+
+def _is_numeric(values: np.ndarray) -> bool:
+    """Return True if the array holds numbers, booleans excluded."""
+    dtype = np.asarray(values).dtype
+    return dtype.kind in "iuf"
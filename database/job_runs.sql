@@ -0,0 +1,22 @@
+BEGIN;
+CREATE TABLE IF NOT EXISTS job_run ( /*
+Registry of the runs of the validation jobs. A run is identified by the job,
+the parameters of its queries and the version of the data it compares. The
+row is the lock of the run while it is running, and holds its outcome once it
+is completed, so a duplicate invocation returns the outcome instead of
+running again.
+*/
+    run_key       TEXT PRIMARY KEY, -- Hash of the job name, the parameters and the data version.
+    job_name      TEXT NOT NULL, -- Name of the validation job.
+    parameters    TEXT NOT NULL, -- The parameters of the DAX query serialized as JSON.
+    data_version  TEXT, -- The versions returned by the readiness probes, e.g. 'edw=20240523;power_bi=NIGHTLY-5/23/2024'.
+    status        TEXT NOT NULL, -- 'running', 'completed' or 'failed'.
+    owner         TEXT NOT NULL, -- Host and process id of the process running the job.
+    started_at    REAL NOT NULL, -- Time when the run started (as returned by time.time()).
+    expires_at    REAL NOT NULL, -- Time when the lock of a running run expires, e.g. after a crash (as returned by time.time()).
+    finished_at   REAL, -- Time when the run finished (as returned by time.time()).
+    passed        INTEGER, -- 1 if the data matched, 0 if there were differences.
+    summary       TEXT, -- One line describing the result, or the error of a failed run.
+    results_path  TEXT -- The folder of the report and the extracted data.
+);
+COMMIT;
@@ -0,0 +1,33 @@
+BEGIN;
+CREATE TABLE IF NOT EXISTS notification_outbox ( /*
+Cards waiting to be delivered to a Microsoft Teams incoming webhook. A card is
+stored here before it is sent, so a run can finish as soon as its results are
+durable and the notifications are delivered in the background.
+*/
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE, -- Identifies the card, enqueuing the same key twice has no effect.
+    webhook_url     TEXT NOT NULL, -- The incoming webhook URL the card is posted to.
+    payload         TEXT NOT NULL, -- The card payload serialized as JSON.
+    status          TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'sent' or 'failed' once every attempt is used.
+    attempts        INTEGER NOT NULL DEFAULT 0, -- Number of delivery attempts.
+    next_attempt_at REAL NOT NULL, -- Time of the next delivery attempt (as returned by time.time()).
+    created_at      REAL NOT NULL, -- Time when the card was enqueued (as returned by time.time()).
+    sent_at         REAL, -- Time when the card was delivered (as returned by time.time()).
+    last_error      TEXT -- The error of the last failed attempt.
+);
+CREATE TABLE IF NOT EXISTS job_result ( /*
+Results of the validation jobs of a run window. Once every job of the window
+has reported, one summary card is sent for the whole window, plus the cards of
+the failing jobs.
+*/
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_window  TEXT NOT NULL, -- Groups the jobs notified together, e.g. the date of the nightly run.
+    job_name    TEXT NOT NULL, -- Name of the validation job.
+    passed      INTEGER NOT NULL, -- 1 if the data matched, 0 if there were differences or errors.
+    summary     TEXT, -- One line describing the result, shown in the summary card.
+    payloads    TEXT, -- The cards of the job serialized as a JSON list.
+    recorded_at REAL NOT NULL, -- Time when the result was recorded (as returned by time.time()).
+    flushed     INTEGER NOT NULL DEFAULT 0, -- 1 once the cards of the window were added to the outbox.
+    UNIQUE (run_window, job_name)
+);
+COMMIT;
@@ -0,0 +1,33 @@
+-- Product grain version of 'Supply - Inventory Demand Sales.sql', used by the
+-- pipeline benchmark so the number of compared rows grows with the data.
+DECLARE @VersionDateToValidate INT;
+SET @VersionDateToValidate =
+(
+    SELECT [DateKey]
+    FROM [CarharttDw].[Dimensions].[Days]
+    WHERE [CurrentDayOffset] = 0
+);
+
+SELECT TRIM([DT].[YearPeriodMonth]) AS "DatesYear/Period/Month",
+       [SCP].[ProductKey] AS "ProductsProduct Key",
+       SUM([SCP].[ConstrainedReceiptPlanUnits]) 'Constrained_Receipt_Plan_Units',
+       SUM([SCP].[CurrentTotalReceiptPlanUnits]) 'Total_Receipt_Plan_Units',
+       SUM([SCP].[PlannedProductionUnits]) 'Planned_Production_Units',
+       SUM([SCP].[WorkInProgressUnits]) 'Work_In_Progress_Units',
+       SUM([SCP].[InTransitUnits]) 'In_Transit_Units',
+       SUM([SCP].[SalesForecastUnits]) 'Sales_Demand_Units'
+FROM [CarharttDw].[planning].[SizedWeeklyCombinedPlans] SCP
+    INNER JOIN [CarharttDw].[Dimensions].[Days] DT
+        ON [DT].[DateKey] = [SCP].[FiscalWeekDateKey]
+    INNER JOIN [CarharttDw].[Dimensions].[Products] P
+        ON [P].[ProductKey] = [SCP].[ProductKey]
+WHERE [SCP].[PlanType] = 'NIGHTLY'
+      AND [SCP].[VersionDateKey] = @VersionDateToValidate
+      AND [DT].[CurrentMonthOffset] BETWEEN -1 AND 6
+      AND [SCP].[InventorySegment] <> 'ALL'
+      AND [P].[Licensed] <> 'Y'
+      AND [P].[Licensed] IS NOT NULL
+GROUP BY [DT].[YearPeriodMonth],
+         [SCP].[ProductKey]
+ORDER BY [DT].[YearPeriodMonth],
+         [SCP].[ProductKey];
@@ -0,0 +1,13 @@
+DECLARE @VersionDateToValidate INT;
+SET @VersionDateToValidate =
+(
+    SELECT [DateKey]
+    FROM [CarharttDw].[Dimensions].[Days]
+    WHERE [CurrentDayOffset] = 0
+);
+
+----Returns the version of the nightly plans once they are loaded, NULL before---
+SELECT MAX([SCP].[VersionDateKey]) AS "VersionDateKey"
+FROM [CarharttDw].[planning].[SizedWeeklyCombinedPlans] SCP
+WHERE [SCP].[PlanType] = 'NIGHTLY'
+      AND [SCP].[VersionDateKey] = @VersionDateToValidate;
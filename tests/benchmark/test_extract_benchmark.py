@@ -0,0 +1,30 @@
+"""Benchmarks of the extraction of the EDW data, with `pd.read_sql` and as an
+Arrow table, on a 100k rows EDW stand-in."""
+
+import pytest
+
+from carhartt_pbi_automate.arrow_extract import extract_frame
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("backend", ["pandas", "arrow"])
+@pytest.mark.performance
+def test_extract_frame(
+    benchmark, plans_warehouse, plans_schema_query, backend
+):
+    """Benchmark extracting the plan rows with every backend."""
+    query, schema = plans_schema_query
+
+    frame = benchmark.pedantic(
+        extract_frame,
+        args=(plans_warehouse, query, schema, backend),
+        rounds=3,
+        iterations=1,
+    )
+
+    assert len(frame) == 100_000
+
+
+if __name__ == "__main__":
+    pytest.main()
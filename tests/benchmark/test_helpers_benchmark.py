@@ -0,0 +1,40 @@
+"""Benchmarks of the helpers used on every run."""
+
+import datetime
+
+import pytest
+
+from carhartt_pbi_automate.dax import pass_args_to_dax_query
+from carhartt_pbi_automate.get_formated_duration import get_formated_duration
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.performance
+def test_pass_args_to_dax_query(benchmark, project_root):
+    """Benchmark passing the arguments to a job DAX query."""
+    dax_query = (
+        project_root / "queries" / "Supply - Inventory Demand Sales.msdax"
+    ).read_text(encoding="utf-8")
+
+    result = benchmark(
+        pass_args_to_dax_query,
+        dax_query,
+        {"plan_versions": "NIGHTLY-5/15/2024"},
+    )
+
+    assert "@plan_versions" not in result
+
+
+@pytest.mark.performance
+def test_get_formated_duration(benchmark):
+    """Benchmark formatting a duration."""
+    result = benchmark(
+        get_formated_duration, datetime.timedelta(hours=1, seconds=5)
+    )
+
+    assert result
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,40 @@
+"""Benchmarks of the SQLite logging handler and the Database class."""
+
+import pytest
+
+from carhartt_pbi_automate.sqlite_handler import SqliteHandler
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.performance
+def test_sqlite_handler_emit(benchmark, logging_database, log_record):
+    """Benchmark storing a log record in the logging database."""
+    handler = SqliteHandler(logging_database)
+
+    benchmark(handler.emit, log_record)
+
+    assert logging_database.select("log_record", ["message"])
+
+
+@pytest.mark.performance
+def test_database_insert(benchmark, populated_database):
+    """Benchmark inserting a row, each insert opens its own connection."""
+    benchmark(populated_database.insert, "test_table", ["name"], ["benchmark"])
+
+
+@pytest.mark.performance
+def test_database_select(benchmark, populated_database):
+    """Benchmark selecting the rows of a table."""
+    rows = benchmark(
+        populated_database.select,
+        "test_table",
+        ["id", "name"],
+        where="id > 500",
+    )
+
+    assert len(rows) == 500
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,53 @@
+"""Benchmarks of the dataframe construction and the compare/report stage,
+on a 100k rows synthetic pair."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.comparison_report import build_digest, write_report
+from carhartt_pbi_automate.dax import strip_brackets
+from carhartt_pbi_automate.frame_schema import FrameSchema
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS, SALES_MEASURES
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.performance
+def test_dataframe_from_cursor_rows(benchmark, cursor_rows):
+    """Benchmark building the Power BI dataframe from the cursor rows, the
+    way run_supply.py does."""
+    description, rows = cursor_rows
+    schema = FrameSchema(
+        list(KEY_COLUMNS), dict.fromkeys(SALES_MEASURES, "float64")
+    )
+
+    def _build() -> pd.DataFrame:
+        column_names = [strip_brackets(column[0]) for column in description]
+        return schema.from_rows(rows, column_names)
+
+    frame = benchmark(_build)
+
+    assert len(frame) == len(rows)
+
+
+@pytest.mark.performance
+def test_compare_and_report(benchmark, tmp_path, comparison_frames):
+    """Benchmark comparing the frames, writing the report and building the
+    digest sent to Teams."""
+    df_pbi, df_edw = comparison_frames
+
+    def _compare_and_report() -> str:
+        summary = compare_with_tolerance(
+            df_pbi, df_edw, join_columns=list(KEY_COLUMNS)
+        )
+        write_report(summary, tmp_path / "comparison_result.html")
+        return build_digest(summary)
+
+    digest = benchmark.pedantic(_compare_and_report, rounds=5, iterations=1)
+
+    assert digest
+
+
+if __name__ == "__main__":
+    pytest.main()
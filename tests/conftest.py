@@ -1,9 +1,60 @@
-"""This is a conftest.py file that contains fixtures for the unit tests."""
+"""This is a conftest.py file that contains fixtures for the unit tests.
 
+Save a baseline of the benchmark suite with:
+    pytest tests/benchmark --benchmark-autosave
+
+Compare against the last saved baseline with:
+    pytest tests/benchmark --benchmark-compare
+
+When comparing, from any invocation path, a benchmark whose median is slower
+than the baseline by more than `PBI_BENCHMARK_MAX_REGRESSION` percent (10 by
+default) fails the run. An explicit `--benchmark-compare-fail` takes
+precedence."""
+
+import os
 from pathlib import Path
 
 import pytest
 
+# Maximum slowdown, in percent, accepted against the benchmark baseline
+DEFAULT_MAX_REGRESSION = "10"
+
+
+def benchmark_max_regression() -> int:
+    """Return the maximum slowdown of the benchmarks, in percent, from the
+    `PBI_BENCHMARK_MAX_REGRESSION` environment variable.
+    Returns:
+        int: The threshold, a whole percentage 0 or greater."""
+    value = os.environ.get(
+        "PBI_BENCHMARK_MAX_REGRESSION", DEFAULT_MAX_REGRESSION
+    )
+    try:
+        threshold = int(value)
+    except ValueError:
+        threshold = -1
+    if threshold < 0:
+        raise pytest.UsageError(
+            "PBI_BENCHMARK_MAX_REGRESSION must be a whole percentage, 0 or "
+            f"greater. Not {value!r}"
+        )
+    return threshold
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Fail the benchmarks slower than the baseline by more than the
+    configured threshold."""
+    try:
+        from pytest_benchmark.utils import parse_compare_fail
+    except ImportError:
+        return
+    if config.getoption("benchmark_compare", None) and not config.getoption(
+        "benchmark_compare_fail", None
+    ):
+        config.option.benchmark_compare_fail = [
+            parse_compare_fail(f"median:{benchmark_max_regression()}%")
+        ]
+
 
 # Global fixtures
 @pytest.fixture(scope="function")
@@ -21,4 +72,23 @@ pytest_plugins = [
     "tests.fixtures.database",
     "tests.fixtures.dax",
     "tests.fixtures.get_formated_duration",
+    "tests.fixtures.comparison_report",
+    "tests.fixtures.send_teams_message",
+    "tests.fixtures.notification_dispatcher",
+    "tests.fixtures.notification_coalescer",
+    "tests.fixtures.tolerance_compare",
+    "tests.fixtures.fake_backends",
+    "tests.fixtures.synthetic_data",
+    "tests.fixtures.benchmark",
+    "tests.fixtures.frame_schema",
+    "tests.fixtures.job_manifest",
+    "tests.fixtures.job_scheduler",
+    "tests.fixtures.readiness",
+    "tests.fixtures.run_registry",
+    "tests.fixtures.arrow_extract",
+    "tests.fixtures.partitioned_extract",
+    "tests.fixtures.dax_partition",
+    "tests.fixtures.dax_batch",
+    "tests.fixtures.sql_batch",
+    "tests.fixtures.merge_compare",
 ]
@@ -0,0 +1,65 @@
+"""Fixtures for the arrow_extract module."""
+
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+
+import pytest
+
+from carhartt_pbi_automate.frame_schema import FrameSchema
+
+
+@pytest.fixture(scope="function")
+def sparse_connection():
+    """Return a SQLite connection to a table whose measure is NULL in the
+    first rows, and whose keys have trailing blanks."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        "CREATE TABLE plans (ProductKey TEXT, Units REAL, Plans INTEGER)"
+    )
+    connection.executemany(
+        "INSERT INTO plans VALUES (?, ?, ?)",
+        [
+            (f"P{index % 3} ", None if index < 4 else index / 2, index)
+            for index in range(10)
+        ],
+    )
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="function")
+def plans_schema() -> FrameSchema:
+    """Return the schema of the rows of the `plans` table."""
+    return FrameSchema(["ProductKey"], {"Units": "float64", "Plans": "Int64"})
+
+
+class FakeBatchReader:
+    """Stand-in for the reader returned by arrow-odbc."""
+
+    def __init__(self, table):
+        self.schema = table.schema
+        self.batches = table.to_batches(max_chunksize=3)
+
+    def __iter__(self):
+        return iter(self.batches)
+
+
+@pytest.fixture(scope="function")
+def fake_arrow_odbc(sparse_connection):
+    """Return a stand-in for the arrow_odbc module answering every query with
+    the rows of the `plans` table, and the calls it received."""
+    calls = []
+    frame = pd.read_sql("SELECT * FROM plans", sparse_connection)
+
+    class FakeArrowOdbc:  # pylint: disable=too-few-public-methods
+        """The functions of arrow_odbc used by the extraction."""
+
+        @staticmethod
+        def read_arrow_batches_from_odbc(query, connection_string, batch_size):
+            """Record the call and return a reader of the rows."""
+            calls.append((query, connection_string, batch_size))
+            return FakeBatchReader(pa.Table.from_pandas(frame))
+
+    return FakeArrowOdbc, calls
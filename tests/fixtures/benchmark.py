@@ -0,0 +1,122 @@
+"""Fixtures for the benchmark suite."""
+
+import logging
+
+import pytest
+
+from carhartt_pbi_automate.database import Database
+from carhartt_pbi_automate.fake_backends import (
+    PLAN_MEASURES,
+    FakeBiConnection,
+    build_warehouse,
+)
+from carhartt_pbi_automate.frame_schema import FrameSchema
+from carhartt_pbi_automate.synthetic_data import SyntheticPair, generate_pair
+
+
+@pytest.fixture(scope="function")
+def logging_database(tmp_path, project_root) -> Database:
+    """Return an empty logging database."""
+    return Database(
+        tmp_path / "logging.db", project_root / "database" / "logging.sql"
+    )
+
+
+@pytest.fixture(scope="function")
+def log_record() -> logging.LogRecord:
+    """Return a log record with arguments."""
+    return logging.LogRecord(
+        name="benchmark",
+        level=logging.INFO,
+        pathname=__file__,
+        lineno=1,
+        msg="Data from %s has been extracted in %s.",
+        args=("EDW", "00:42"),
+        exc_info=None,
+    )
+
+
+@pytest.fixture(scope="function")
+def populated_database(tmp_path) -> Database:
+    """Return a database with a 1000 rows table."""
+    script = tmp_path / "benchmark.sql"
+    script.write_text(
+        "CREATE TABLE test_table (id INTEGER PRIMARY KEY, name TEXT);",
+        encoding="utf-8",
+    )
+    database = Database(tmp_path / "benchmark.db", script)
+    database.open()
+    database.conn.executemany(
+        "INSERT INTO test_table (name) VALUES (?)",
+        [(f"name {index}",) for index in range(1000)],
+    )
+    database.conn.commit()
+    database.close()
+    return database
+
+
+@pytest.fixture(scope="module")
+def benchmark_pair() -> SyntheticPair:
+    """Return a 100k rows pair with a few discrepancies."""
+    return generate_pair(100_000, discrepancy_rate=0.001, seed=3)
+
+
+@pytest.fixture(scope="function")
+def bi_cursor(benchmark_pair):  # pylint: disable=W0621
+    """Return a Power BI stand-in cursor that has run a query returning the
+    rows of the Power BI side of the pair."""
+    frame = benchmark_pair.pbi.astype({"DatesYear/Period/Month": str})
+    cursor = FakeBiConnection(frame).cursor()
+    cursor.execute("""
+        DEFINE
+            VAR __DS0Core =
+                SUMMARIZECOLUMNS(
+                    'Dates'[Year/Period/Month],
+                    'Products'[Product Key],
+                    "Constrained_Receipt_Plan_Units", 'Inventory Plans'[A],
+                    "Total_Receipt_Plan_Units", 'Inventory Plans'[B],
+                    "Planned_Production_Units", 'Inventory Plans'[C],
+                    "Work_In_Progress_Units", 'Inventory Plans'[D],
+                    "In_Transit_Units", 'Inventory Plans'[E],
+                    "Sales_Demand_Units", 'Inventory Plans'[F]
+                )
+        EVALUATE
+            __DS0Core
+        """)
+    yield cursor
+    cursor.close()
+
+
+@pytest.fixture(scope="function")
+def cursor_rows(bi_cursor):  # pylint: disable=W0621
+    """Return the description and the rows fetched from the cursor."""
+    return bi_cursor.description, bi_cursor.fetchall()
+
+
+@pytest.fixture(scope="function")
+def comparison_frames(benchmark_pair):  # pylint: disable=W0621
+    """Return the Power BI and EDW frames of the pair."""
+    return benchmark_pair.pbi, benchmark_pair.edw
+
+
+@pytest.fixture(scope="module")
+def plans_warehouse():
+    """Return an EDW stand-in with 100k plan rows."""
+    connection = build_warehouse(100_000, seed=3)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="function")
+def plans_schema_query():
+    """Return a query reading the plan rows without aggregating them, and
+    its schema."""
+    query = (
+        "SELECT ProductKey, FiscalWeekDateKey, "
+        f"{', '.join(PLAN_MEASURES)} FROM SizedWeeklyCombinedPlans"
+    )
+    schema = FrameSchema(
+        ["ProductKey", "FiscalWeekDateKey"],
+        dict.fromkeys(PLAN_MEASURES, "float64"),
+    )
+    return query, schema
@@ -0,0 +1,39 @@
+"""Fixtures for the comparison_report module."""
+
+import datacompy
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="function")
+def pbi_frame() -> pd.DataFrame:
+    """Return a dataframe shaped like the Power BI results."""
+    return pd.DataFrame(
+        {
+            "YearPeriodMonth": ["2024/01", "2024/02", "2024/03", "2024/04"],
+            "SalesDemandUnits": [10.0, 20.0, 30.0, 40.0],
+            "PlannedProductionUnits": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+
+
+@pytest.fixture(scope="function")
+def edw_frame(pbi_frame) -> pd.DataFrame:  # pylint: disable=W0621
+    """Return a dataframe shaped like the EDW results, with two differences
+    in the `SalesDemandUnits` column and one row missing."""
+    frame = pbi_frame.copy()
+    frame.loc[1, "SalesDemandUnits"] = 25.0
+    frame.loc[2, "SalesDemandUnits"] = 31.0
+    return frame.drop(index=3)
+
+
+@pytest.fixture(scope="function")
+def compare(pbi_frame, edw_frame) -> datacompy.Compare:  # pylint: disable=W0621
+    """Return a datacompy comparison of the Power BI and EDW frames."""
+    return datacompy.Compare(
+        pbi_frame,
+        edw_frame,
+        join_columns=["YearPeriodMonth"],
+        df1_name="PowerBI",
+        df2_name="EDW",
+    )
@@ -0,0 +1,59 @@
+"""Fixtures for the dax_batch module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.dax import parse_dax_columns, pass_args_to_dax_query
+from carhartt_pbi_automate.fake_backends import FakeBiConnection
+
+QUERY_NAMES = (
+    "Supply - Inventory Demand Sales",
+    "Supply - Inventory Demand BOP",
+)
+
+
+@pytest.fixture(scope="function")
+def batch_queries(warehouse, project_root):
+    """Return the DAX query, with its parameters passed, and the results of
+    the Sales and BOP jobs."""
+    queries = project_root / "queries"
+    batch = {}
+    for name in QUERY_NAMES:
+        dax_query = (queries / f"{name}.msdax").read_text(encoding="utf-8")
+        sql_query = (queries / f"{name}.sql").read_text(encoding="utf-8")
+        batch[name] = (
+            pass_args_to_dax_query(dax_query, {"plan_versions": "x"}),
+            pd.read_sql(sql_query, warehouse),
+        )
+    return batch
+
+
+@pytest.fixture(scope="function")
+def batch_connection(batch_queries):
+    """Return a Power BI stand-in answering every statement with the results
+    of the job it evaluates, and the list of the requests it received."""
+    results = {
+        tuple(parse_dax_columns(query)): frame
+        for query, frame in batch_queries.values()
+    }
+    requests = []
+
+    class RecordingBiConnection(FakeBiConnection):
+        """Records the queries run on its cursors."""
+
+        def cursor(self):
+            """Return a cursor recording the queries it runs."""
+            cursor = super().cursor()
+            execute = cursor.execute
+
+            def _execute(query: str):
+                requests.append(query)
+                execute(query)
+
+            cursor.execute = _execute
+            return cursor
+
+    connection = RecordingBiConnection(
+        lambda statement: results[tuple(parse_dax_columns(statement))]
+    )
+    return connection, requests
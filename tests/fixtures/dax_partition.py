@@ -0,0 +1,22 @@
+"""Fixtures for the dax_partition module."""
+
+import pytest
+
+from carhartt_pbi_automate.dax import pass_args_to_dax_query
+from carhartt_pbi_automate.frame_schema import FrameSchema
+
+QUERY_NAME = "Supply - Inventory Demand Sales"
+
+
+@pytest.fixture(scope="function")
+def sales_queries(project_root):
+    """Return the SQL query, the DAX query with its parameters passed and the
+    schema of the Sales job."""
+    queries = project_root / "queries"
+    sql_query = (queries / f"{QUERY_NAME}.sql").read_text(encoding="utf-8")
+    dax_query = (queries / f"{QUERY_NAME}.msdax").read_text(encoding="utf-8")
+    return (
+        sql_query,
+        pass_args_to_dax_query(dax_query, {"plan_versions": "x"}),
+        FrameSchema.from_dax(dax_query),
+    )
@@ -0,0 +1,15 @@
+"""Fixtures for the fake_backends module."""
+
+from datetime import date
+
+import pytest
+
+from carhartt_pbi_automate.fake_backends import build_warehouse
+
+
+@pytest.fixture(scope="function")
+def warehouse():
+    """Return an EDW stand-in with 2000 plan rows, built on a fixed date."""
+    connection = build_warehouse(2000, seed=1, today=date(2024, 5, 15))
+    yield connection
+    connection.close()
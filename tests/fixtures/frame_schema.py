@@ -0,0 +1,41 @@
+"""Fixtures for the frame_schema module."""
+
+from decimal import Decimal
+
+import pytest
+
+from carhartt_pbi_automate.frame_schema import FrameSchema
+
+
+@pytest.fixture(scope="function")
+def sales_schema(project_root) -> FrameSchema:
+    """Return the schema of the `Supply - Inventory Demand Sales` job."""
+    dax_query = (
+        project_root / "queries" / "Supply - Inventory Demand Sales.msdax"
+    ).read_text(encoding="utf-8")
+    return FrameSchema.from_dax(
+        dax_query, measure_dtypes={"Sales_Demand_Units": "Int64"}
+    )
+
+
+@pytest.fixture(scope="function")
+def decimal_rows():
+    """Return the column names and the rows fetched by a database driver,
+    with Decimal measures and a column that is not compared."""
+    column_names = [
+        "DatesYear/Period/Month",
+        "Constrained_Receipt_Plan_Units",
+        "Total_Receipt_Plan_Units",
+        "Planned_Production_Units",
+        "Work_In_Progress_Units",
+        "In_Transit_Units",
+        "Sales_Demand_Units",
+        "Not_Compared",
+    ]
+    rows = [
+        (f"2024/{month:02d} ",)
+        + tuple(Decimal(f"{month}.5") for _ in range(5))
+        + (Decimal(month), "x" * 20)
+        for month in range(1, 13)
+    ] * 100
+    return column_names, rows
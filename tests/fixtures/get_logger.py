@@ -5,7 +5,11 @@ import logging
 
 import pytest
 
-from carhartt_pbi_automate.get_logger import get_logger, touch_file
+from carhartt_pbi_automate.get_logger import (
+    close_logger,
+    get_logger,
+    touch_file,
+)
 
 
 @pytest.fixture(scope="function")
@@ -15,6 +19,7 @@ def logger():
     yield logger_instance
     # teardown
     # ensure all logging resources are released
+    close_logger("test_logger")
     logging.shutdown()
     Path("test_logger.log").unlink(missing_ok=True)
 
@@ -28,6 +33,7 @@ def logger_no_console_output():
     yield logger_no_console_output_instance
     # teardown
     # ensure all logging resources are released
+    close_logger("test_logger_no_console_output")
     logging.shutdown()
     Path("test_logger_no_console_output.log").unlink(missing_ok=True)
 
@@ -40,4 +46,33 @@ def _touch_file(project_root):
     touch_file_instance = touch_file(logfile, columns)
     yield touch_file_instance
     # teardown
-    Path(logfile).unlink(missing_ok=True)
\ No newline at end of file
+    Path(logfile).unlink(missing_ok=True)
+
+
+@pytest.fixture(scope="function")
+def json_logger(tmp_path):
+    """Return a logger writing JSON lines, without console output."""
+    json_logger_instance = get_logger(
+        "test_json_logger",
+        tmp_path / "test_json_logger.log",
+        console_output=False,
+        structured=True,
+    )
+    yield json_logger_instance
+    # teardown
+    close_logger("test_json_logger")
+
+
+@pytest.fixture(scope="function")
+def shared_file_loggers(tmp_path):
+    """Return two loggers writing to the same file."""
+    logfile = tmp_path / "shared.log"
+    names = ["test_shared_logger_a", "test_shared_logger_b"]
+    loggers = [
+        get_logger(name, logfile, console_output=False, structured=False)
+        for name in names
+    ]
+    yield loggers
+    # teardown
+    for name in names:
+        close_logger(name)
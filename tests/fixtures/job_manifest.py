@@ -0,0 +1,81 @@
+"""Fixtures for the job_manifest module."""
+
+import pytest
+
+
+@pytest.fixture(scope="function")
+def manifest_file(tmp_path):
+    """Return a manifest with three jobs sharing the default schedule."""
+    path = tmp_path / "jobs.toml"
+    path.write_text(
+        """
+[scheduler]
+max_concurrent = 2
+poll_seconds = 5
+
+[defaults]
+schedule = "30 6 * * 1-5"
+abs_tol = 0.01
+
+[defaults.parameters]
+plan_versions = "NIGHTLY-{now.month}/{now.day}/{now.year}"
+
+[[jobs]]
+name = "Sales"
+daxfile = "queries/sales.msdax"
+sqlfile = "queries/sales.sql"
+priority = 10
+compare_workers = 4
+extract_backend = "arrow"
+memory_budget = "2GB"
+
+[jobs.tolerances]
+In_Transit_Units = { abs = 0.5 }
+Sales_Demand_Units = { rel = 0.001 }
+
+[jobs.measure_dtypes]
+Sales_Demand_Units = "Int64"
+
+[jobs.readiness]
+edw_probe = "queries/readiness.sql"
+timeout = 600
+
+[jobs.partition]
+column = "[DT].[CurrentMonthOffset]"
+start = -1
+stop = 6
+max_sessions = 2
+
+[jobs.dax_partition]
+slices = 8
+
+[jobs.sample]
+sql_column = "[SCP].[ProductKey]"
+dax_column = "'Products'[Product Key]"
+rate = 0.05
+min_rows = 500
+
+[[jobs]]
+name = "BOP"
+daxfile = "queries/bop.msdax"
+sqlfile = "queries/bop.sql"
+schedule = "0 22 * * *"
+enabled = false
+digest_partitions = 64
+
+[[jobs]]
+name = "Orders"
+daxfile = "queries/orders.msdax"
+sqlfile = "queries/orders.sql"
+merge = true
+
+[[jobs]]
+name = "Inventory"
+daxfile = "queries/inventory.msdax"
+sqlfile = "queries/inventory.sql"
+memory_budget = "1GB"
+bloom = true
+""",
+        encoding="utf-8",
+    )
+    return path
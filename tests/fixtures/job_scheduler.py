@@ -0,0 +1,49 @@
+"""Fixtures for the job_scheduler module."""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from carhartt_pbi_automate.job_manifest import JobSpec
+
+
+class FakeClock:
+    """A clock moved forward by the tests."""
+
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def clock():
+    """Return a clock starting on Monday 2024-05-20 at 08:59."""
+    return FakeClock(datetime(2024, 5, 20, 8, 59))
+
+
+@pytest.fixture(scope="function")
+def scheduled_jobs():
+    """Return three jobs, two of them due every day at 09:00."""
+    return [
+        JobSpec("BOP", "bop.msdax", "bop.sql", "0 9 * * *", priority=5),
+        JobSpec("Sales", "sales.msdax", "sales.sql", "0 9 * * *", priority=10),
+        JobSpec("Weekly", "weekly.msdax", "weekly.sql", "0 9 * * 0"),
+    ]
+
+
+@pytest.fixture(scope="function")
+def job_runs():
+    """Return a recorder of the runs of the jobs, and an event blocking the
+    runs until it is set."""
+    runs = []
+    release = threading.Event()
+    release.set()
+
+    def _run_job(job, due_at, batch_size):
+        runs.append((job.name, due_at, batch_size))
+        release.wait(5)
+
+    return runs, release, _run_job
@@ -0,0 +1,20 @@
+"""Fixtures for the merge_compare module."""
+
+import pytest
+
+from carhartt_pbi_automate.synthetic_data import write_parquet_pair
+
+
+@pytest.fixture(scope="function")
+def sorted_parquet_pair(tmp_path):
+    """Return the Power BI and EDW Parquet files of a pair sorted on its key
+    columns, with discrepancies and rows missing in Power BI."""
+    return write_parquet_pair(
+        tmp_path,
+        3000,
+        months=6,
+        discrepancy_rate=0.01,
+        missing_rate=0.02,
+        seed=11,
+        chunk_rows=700,
+    )
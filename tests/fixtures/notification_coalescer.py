@@ -0,0 +1,26 @@
+"""Fixtures for the notification_coalescer module."""
+
+import pytest
+
+from carhartt_pbi_automate.notification_coalescer import NotificationCoalescer
+
+
+@pytest.fixture(scope="function")
+def coalescer(dispatcher, outbox_database, stub_webhook):
+    """Return a coalescer expecting three jobs per run window."""
+    return NotificationCoalescer(
+        dispatcher,
+        stub_webhook.url,
+        expected_jobs=3,
+        database=outbox_database,
+    )
+
+
+@pytest.fixture(scope="function")
+def job_card():
+    """Return a factory of job cards."""
+
+    def _job_card(title: str) -> dict:
+        return {"title": title, "text": f"Result of {title}", "sections": []}
+
+    return _job_card
@@ -0,0 +1,30 @@
+"""Fixtures for the notification_dispatcher module."""
+
+import pytest
+
+from carhartt_pbi_automate.database import Database
+from carhartt_pbi_automate.notification_dispatcher import (
+    OUTBOX_SQL_SCRIPT,
+    NotificationDispatcher,
+)
+
+
+@pytest.fixture(scope="function")
+def outbox_database(tmp_path) -> Database:
+    """Return an empty outbox database."""
+    return Database(tmp_path / "notification_outbox.db", OUTBOX_SQL_SCRIPT)
+
+
+@pytest.fixture(scope="function")
+def dispatcher(outbox_database):  # pylint: disable=W0621
+    """Return a dispatcher that retries quickly."""
+    _dispatcher = NotificationDispatcher(
+        outbox_database,
+        max_attempts=3,
+        base_delay=0.01,
+        max_delay=0.05,
+        poll_interval=0.01,
+        http_timeout=5,
+    )
+    yield _dispatcher
+    _dispatcher.close()
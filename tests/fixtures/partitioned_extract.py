@@ -0,0 +1,32 @@
+"""Fixtures for the partitioned_extract module."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+from carhartt_pbi_automate.fake_backends import (
+    FakeEdwConnection,
+    build_warehouse,
+)
+
+
+@pytest.fixture(scope="function")
+def warehouse_file(tmp_path):
+    """Return the file of an EDW stand-in with 2000 plan rows, built on a
+    fixed date, and a function opening a new connection to it."""
+    database = tmp_path / "edw.db"
+    build_warehouse(2000, database, seed=1, today=date(2024, 5, 15)).close()
+    connections = []
+
+    def connect() -> FakeEdwConnection:
+        """Open a connection to the stand-in, usable from any thread."""
+        connection = sqlite3.connect(
+            database, factory=FakeEdwConnection, check_same_thread=False
+        )
+        connections.append(connection)
+        return connection
+
+    yield database, connect
+    for connection in connections:
+        connection.close()
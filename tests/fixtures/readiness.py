@@ -0,0 +1,46 @@
+"""Fixtures for the readiness module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.fake_backends import FakeBiConnection
+from carhartt_pbi_automate.readiness import ReadinessGate
+
+# The plan version of the warehouse fixture, built on 2024-05-15
+PLAN_VERSION = "NIGHTLY-5/15/2024"
+
+
+@pytest.fixture(scope="function")
+def refreshed_dataset():
+    """Return a Power BI stand-in whose dataset has the plan version of the
+    warehouse fixture."""
+
+    def _plan_versions(query: str) -> pd.DataFrame:
+        names = [PLAN_VERSION] if f'"{PLAN_VERSION}"' in query else []
+        return pd.DataFrame({"Plan Name": names}, dtype=object)
+
+    return FakeBiConnection(_plan_versions)
+
+
+@pytest.fixture(scope="function")
+def sleeps():
+    """Return a fake clock: the list of the sleeps, a sleep function adding
+    to it and a clock returning the time slept."""
+    slept = []
+    return slept, slept.append, lambda: sum(slept)
+
+
+@pytest.fixture(scope="function")
+def readiness_gate(project_root, sleeps):  # pylint: disable=W0621
+    """Return the readiness gate of the project, with a fake clock."""
+    _, sleep, clock = sleeps
+    probes = project_root / "queries" / "readiness"
+    return ReadinessGate(
+        probes / "EDW nightly plans.sql",
+        probes / "Power BI nightly plan.msdax",
+        timeout=600,
+        base_delay=60,
+        max_delay=240,
+        sleep=sleep,
+        clock=clock,
+    )
@@ -0,0 +1,27 @@
+"""Fixtures for the run_registry module."""
+
+import pytest
+
+from carhartt_pbi_automate.database import Database
+from carhartt_pbi_automate.run_registry import (
+    JOB_RUNS_SQL_SCRIPT,
+    RunRegistry,
+)
+
+
+@pytest.fixture(scope="function")
+def job_runs_database(tmp_path) -> Database:
+    """Return an empty database of the job runs."""
+    return Database(tmp_path / "job_runs.db", JOB_RUNS_SQL_SCRIPT)
+
+
+@pytest.fixture(scope="function")
+def run_registry(job_runs_database):  # pylint: disable=W0621
+    """Return an empty registry."""
+    return RunRegistry(job_runs_database)
+
+
+@pytest.fixture(scope="function")
+def run_parameters():
+    """Return the parameters of a nightly run."""
+    return {"plan_versions": "NIGHTLY-5/23/2024"}
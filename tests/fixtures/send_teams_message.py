@@ -0,0 +1,20 @@
+"""Fixtures for the send_teams_message module."""
+
+import pytest
+
+from carhartt_pbi_automate.fake_backends import WebhookSink
+
+
+@pytest.fixture(scope="function")
+def stub_webhook():
+    """Run a local HTTP server standing in for the Teams webhook. Yields the
+    server, its `url` and its recorded `requests`. Set its `status_code` to
+    simulate webhook failures."""
+    with WebhookSink() as sink:
+        yield sink
+
+
+@pytest.fixture(scope="function")
+def long_report() -> str:
+    """Return a comparison report too large for a single card."""
+    return "\n".join(f"row {index:05}: {'x' * 60}" for index in range(2000))
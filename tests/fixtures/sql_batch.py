@@ -0,0 +1,18 @@
+"""Fixtures for the sql_batch module."""
+
+import pytest
+
+
+@pytest.fixture(scope="function")
+def sql_queries(project_root):
+    """Return the SQL queries of the Sales and BOP jobs, and of the EDW
+    readiness probe, that all declare and set `@VersionDateToValidate`."""
+    queries = project_root / "queries"
+    return [
+        path.read_text(encoding="utf-8")
+        for path in (
+            queries / "Supply - Inventory Demand Sales.sql",
+            queries / "Supply - Inventory Demand BOP.sql",
+            queries / "readiness" / "EDW nightly plans.sql",
+        )
+    ]
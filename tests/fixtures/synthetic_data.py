@@ -0,0 +1,19 @@
+"""Fixtures for the synthetic_data module."""
+
+import pytest
+
+from carhartt_pbi_automate.synthetic_data import SyntheticPair, generate_pair
+
+
+@pytest.fixture(scope="function")
+def synthetic_pair() -> SyntheticPair:
+    """Return a small pair with discrepancies and rows missing in Power BI,
+    generated in several chunks."""
+    return generate_pair(
+        1000,
+        months=8,
+        discrepancy_rate=0.01,
+        missing_rate=0.02,
+        seed=7,
+        chunk_rows=300,
+    )
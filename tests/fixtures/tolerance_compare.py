@@ -0,0 +1,36 @@
+"""Fixtures for the tolerance_compare module."""
+
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="function")
+def edw_decimal_frame() -> pd.DataFrame:
+    """Return a dataframe as returned by the EDW driver: untrimmed keys and
+    Decimal measures in object columns."""
+    return pd.DataFrame(
+        {
+            "DatesYear/Period/Month": ["2024/01 ", "2024/02", "2024/03"],
+            "Sales_Demand_Units": [
+                Decimal("100.10"),
+                Decimal("200.00"),
+                Decimal("300.00"),
+            ],
+            "In_Transit_Units": [Decimal("1"), Decimal("2"), Decimal("3")],
+        }
+    )
+
+
+@pytest.fixture(scope="function")
+def pbi_float_frame() -> pd.DataFrame:
+    """Return a dataframe as returned by Power BI: float measures with
+    floating-point noise, and a real difference in `In_Transit_Units`."""
+    return pd.DataFrame(
+        {
+            "DatesYear/Period/Month": ["2024/01", "2024/02", "2024/03"],
+            "Sales_Demand_Units": [100.1 + 1e-9, 200.0, 300.0 - 1e-9],
+            "In_Transit_Units": [1.0, 2.0, 4.0],
+        }
+    )
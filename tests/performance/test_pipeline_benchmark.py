@@ -0,0 +1,40 @@
+"""This module contains performance tests of the validation pipeline, run
+against the local stand-ins of the EDW, Power BI and Microsoft Teams.
+
+The 10 million rows run takes several minutes, set the environment variable
+`PBI_BENCHMARK_LARGE=1` to include it. `PBI_BENCHMARK_MIN_ROWS_PER_SECOND`
+sets the slowest throughput accepted for every stage."""
+
+import os
+
+import pytest
+
+from carhartt_pbi_automate.pipeline_benchmark import STAGES, run_benchmark
+
+MIN_ROWS_PER_SECOND = float(
+    os.environ.get("PBI_BENCHMARK_MIN_ROWS_PER_SECOND", 1000)
+)
+
+LARGE_BENCHMARK = pytest.mark.skipif(
+    os.environ.get("PBI_BENCHMARK_LARGE") != "1",
+    reason="Set PBI_BENCHMARK_LARGE=1 to run the 10 million rows benchmark.",
+)
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "rows",
+    [1_000, 100_000, pytest.param(10_000_000, marks=LARGE_BENCHMARK)],
+)
+def test_pipeline_throughput(tmp_path, rows):
+    """Test every stage of the pipeline keeps the minimum throughput."""
+    timings = run_benchmark(rows, tmp_path)
+
+    assert [timing["stage"] for timing in timings] == list(STAGES)
+    assert (tmp_path / "comparison_result.html").exists()
+    for timing in timings:
+        assert timing["rows_per_second"] >= MIN_ROWS_PER_SECOND, timing
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,89 @@
+"""This module contains performance tests of the comparison and the reports
+on synthetic data at production sizes.
+
+The 10 million rows run takes several minutes, set the environment variable
+`PBI_BENCHMARK_LARGE=1` to include it. `PBI_BENCHMARK_MIN_ROWS_PER_SECOND`
+sets the slowest throughput accepted."""
+
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.comparison_report import build_digest, write_report
+from carhartt_pbi_automate.parallel_compare import (
+    parallel_compare_with_tolerance,
+)
+from carhartt_pbi_automate.synthetic_data import (
+    KEY_COLUMNS,
+    write_parquet_pair,
+)
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+MIN_ROWS_PER_SECOND = float(
+    os.environ.get("PBI_BENCHMARK_MIN_ROWS_PER_SECOND", 1000)
+)
+
+LARGE_BENCHMARK = pytest.mark.skipif(
+    os.environ.get("PBI_BENCHMARK_LARGE") != "1",
+    reason="Set PBI_BENCHMARK_LARGE=1 to run the 10 million rows benchmark.",
+)
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "rows",
+    [100_000, 1_000_000, pytest.param(10_000_000, marks=LARGE_BENCHMARK)],
+)
+def test_compare_and_report_throughput(tmp_path, rows):
+    """Test the comparison and the report of a Parquet pair keep the minimum
+    throughput."""
+    pbi_path, edw_path = write_parquet_pair(
+        tmp_path, rows, months=12, discrepancy_rate=0.0001, seed=rows
+    )
+    df_pbi = pd.read_parquet(pbi_path)
+    df_edw = pd.read_parquet(edw_path)
+
+    start = time.perf_counter()
+    summary = compare_with_tolerance(
+        df_pbi, df_edw, join_columns=list(KEY_COLUMNS)
+    )
+    write_report(summary, tmp_path / "comparison_result.html")
+    build_digest(summary)
+    seconds = time.perf_counter() - start
+
+    assert summary.intersect_rows == rows
+    assert summary.mismatch_count > 0
+    assert rows / seconds >= MIN_ROWS_PER_SECOND
+
+
+@pytest.mark.performance
+@pytest.mark.parametrize(
+    "rows", [1_000_000, pytest.param(10_000_000, marks=LARGE_BENCHMARK)]
+)
+def test_parallel_compare_throughput(tmp_path, rows):
+    """Test the comparison on every core finds the same differences and keeps
+    the minimum throughput."""
+    pbi_path, edw_path = write_parquet_pair(
+        tmp_path, rows, months=12, discrepancy_rate=0.0001, seed=rows
+    )
+    df_pbi = pd.read_parquet(pbi_path)
+    df_edw = pd.read_parquet(edw_path)
+
+    start = time.perf_counter()
+    summary = parallel_compare_with_tolerance(
+        df_pbi, df_edw, join_columns=list(KEY_COLUMNS), min_rows=0
+    )
+    seconds = time.perf_counter() - start
+
+    serial = compare_with_tolerance(
+        df_pbi, df_edw, join_columns=list(KEY_COLUMNS)
+    )
+    assert summary.mismatch_count == serial.mismatch_count
+    assert summary.intersect_rows == rows
+    assert rows / seconds >= MIN_ROWS_PER_SECOND
+
+
+if __name__ == "__main__":
+    pytest.main()
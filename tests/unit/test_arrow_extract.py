@@ -0,0 +1,111 @@
+"""This module contains unit tests for the arrow_extract module."""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from carhartt_pbi_automate import arrow_extract
+from carhartt_pbi_automate.arrow_extract import extract_frame, read_arrow
+from carhartt_pbi_automate.frame_schema import FrameSchema
+
+
+@pytest.mark.parametrize(
+    "query_name",
+    ["Supply - Inventory Demand Sales", "Supply - Inventory Demand BOP"],
+)
+@pytest.mark.unit
+def test_arrow_matches_pandas(warehouse, project_root, query_name):
+    """Test both backends extract the same dataframe from the EDW
+    stand-in."""
+    queries = project_root / "queries"
+    sql_query = (queries / f"{query_name}.sql").read_text(encoding="utf-8")
+    schema = FrameSchema.from_dax(
+        (queries / f"{query_name}.msdax").read_text(encoding="utf-8")
+    )
+
+    expected = extract_frame(warehouse, sql_query, schema, "pandas")
+    actual = extract_frame(warehouse, sql_query, schema, "arrow", batch_size=3)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.unit
+def test_read_arrow_batches(sparse_connection, plans_schema):
+    """Test the batches are unified when a column is NULL in the first
+    one."""
+    table = read_arrow(sparse_connection, "SELECT * FROM plans", batch_size=2)
+
+    assert table.num_rows == 10
+    assert table.column_names == ["ProductKey", "Units", "Plans"]
+    assert table.schema.field("Units").type == pa.float64()
+    assert len(table.to_batches()) == 5
+
+    frame = plans_schema.from_arrow(table)
+    assert list(frame["ProductKey"].cat.categories) == ["P0", "P1", "P2"]
+    assert frame["Units"].isna().sum() == 4
+    assert frame["Plans"].dtype == "Int64"
+
+
+@pytest.mark.unit
+def test_read_arrow_empty(sparse_connection):
+    """Test a query returning no rows gives an empty table."""
+    table = read_arrow(sparse_connection, "SELECT * FROM plans WHERE 0")
+
+    assert table.num_rows == 0
+    assert table.column_names == ["ProductKey", "Units", "Plans"]
+
+
+@pytest.mark.unit
+def test_read_arrow_odbc(monkeypatch, fake_arrow_odbc, plans_schema):
+    """Test the arrow backend reads with arrow-odbc when it is installed."""
+    module, calls = fake_arrow_odbc
+    monkeypatch.setattr(arrow_extract, "arrow_odbc", module)
+
+    frame = extract_frame(
+        None,
+        "SELECT * FROM plans",
+        plans_schema,
+        "arrow",
+        connection_string="Driver={SQLite};",
+        batch_size=3,
+    )
+
+    assert calls == [("SELECT * FROM plans", "Driver={SQLite};", 3)]
+    assert len(frame) == 10
+
+
+@pytest.mark.unit
+def test_read_arrow_without_arrow_odbc(
+    monkeypatch, sparse_connection, plans_schema
+):
+    """Test the cursor is read when arrow-odbc is not installed, and a
+    connection string cannot be read."""
+    monkeypatch.setattr(arrow_extract, "arrow_odbc", None)
+
+    frame = extract_frame(
+        sparse_connection,
+        "SELECT * FROM plans",
+        plans_schema,
+        "arrow",
+        connection_string="Driver={SQLite};",
+    )
+    assert len(frame) == 10
+
+    with pytest.raises(ImportError):
+        read_arrow("Driver={SQLite};", "SELECT * FROM plans")
+
+
+@pytest.mark.unit
+def test_invalid_arguments(sparse_connection, plans_schema):
+    """Test an unknown backend or batch size raises a ValueError."""
+    with pytest.raises(ValueError):
+        extract_frame(
+            sparse_connection, "SELECT * FROM plans", plans_schema, "odbc"
+        )
+    with pytest.raises(ValueError):
+        read_arrow(sparse_connection, "SELECT * FROM plans", batch_size=0)
+
+
+if __name__ == "__main__":
+    pytest.main()
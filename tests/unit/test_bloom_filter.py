@@ -0,0 +1,130 @@
+"""This module contains unit tests for the bloom_filter module."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.bloom_filter import (
+    BloomFilter,
+    bloom_compare,
+    key_hashes,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+
+@pytest.mark.unit
+def test_bloom_filter_membership():
+    """Test the added keys are always found, and the other keys rarely."""
+    rng = np.random.default_rng(3)
+    hashes = rng.integers(0, 2**63, 20_000, dtype="uint64")
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+
+    bloom.add(hashes[:10_000])
+
+    assert bloom.might_contain(hashes[:10_000]).all()
+    assert bloom.might_contain(hashes[10_000:]).mean() < 0.02
+    assert bloom.count == 10_000
+    # About 9.6 bits per key at a 1% error rate
+    assert bloom.nbytes < 10_000 * 10 / 8 * 1.05
+
+
+@pytest.mark.unit
+def test_key_hashes_normalise_the_keys():
+    """Test the same keys get the same hashes whatever their dtype, and
+    the hashes do not depend on the column names."""
+    frame1 = pd.DataFrame({"Month": ["2024/01 ", "2024/02"], "Key": [1, 2]})
+    frame2 = pd.DataFrame({"month": ["2024/01", "2024/02"], "key": [1.0, 2.0]})
+
+    hashes1 = key_hashes(frame1, ["Month", "Key"])
+    hashes2 = key_hashes(frame2, ["month", "key"])
+
+    assert hashes1.dtype == np.uint64
+    np.testing.assert_array_equal(hashes1, hashes2)
+
+
+@pytest.mark.unit
+def test_bloom_compare_matches_compare_with_tolerance(synthetic_pair):
+    """Test the summary is the summary of the whole frames, with rows only
+    in Power BI and rows only in the EDW."""
+    extra = synthetic_pair.edw.head(3).copy()
+    extra["ProductsProduct Key"] += 10_000
+    pbi = pd.concat([synthetic_pair.pbi, extra], ignore_index=True)
+    expected = compare_with_tolerance(
+        pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+    )
+
+    summary = bloom_compare(
+        lambda: (
+            pbi.iloc[start : start + 300] for start in range(0, 1100, 300)
+        ),
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        capacity=1000,
+    )
+
+    assert summary.df1_rows == expected.df1_rows
+    assert summary.df2_rows == expected.df2_rows
+    assert summary.intersect_rows == expected.intersect_rows
+    assert summary.df1_unique_count == expected.df1_unique_count == 3
+    assert summary.df2_unique_count == expected.df2_unique_count
+    pd.testing.assert_frame_equal(summary.column_stats, expected.column_stats)
+    assert sorted(summary.df1_unique_sample["productsproduct key"]) == sorted(
+        extra["ProductsProduct Key"].astype("float64")
+    )
+    assert len(summary.df2_unique_sample) == min(
+        summary.sample_size, expected.df2_unique_count
+    )
+
+
+@pytest.mark.unit
+def test_bloom_compare_with_memory_budget(synthetic_pair, tmp_path):
+    """Test the candidates are compared within the memory budget."""
+    summary = bloom_compare(
+        synthetic_pair.pbi,
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        memory_budget=50_000,
+    )
+
+    assert summary.mismatch_count == synthetic_pair.discrepancies
+    assert summary.df2_unique_count == synthetic_pair.missing_rows
+
+
+@pytest.mark.unit
+def test_bloom_compare_duplicated_one_sided_keys(synthetic_pair):
+    """Test the duplicated keys of the one-sided rows raise a MergeError,
+    like the duplicated keys of the candidates, when the side is read in
+    chunks."""
+    pbi = synthetic_pair.pbi
+    edw = synthetic_pair.edw
+    keys = pd.MultiIndex.from_frame(pbi[list(KEY_COLUMNS)])
+    missing = ~pd.MultiIndex.from_frame(edw[list(KEY_COLUMNS)]).isin(keys)
+    one_sided = edw[missing].head(1)
+    duplicated = pd.concat([edw, one_sided], ignore_index=True)
+    chunks = [duplicated.iloc[:500], duplicated.iloc[500:]]
+    assert len(one_sided) == 1
+
+    with pytest.raises(pd.errors.MergeError):
+        compare_with_tolerance(pbi, duplicated, list(KEY_COLUMNS))
+    with pytest.raises(pd.errors.MergeError, match="EDW"):
+        bloom_compare(pbi, lambda: iter(chunks), list(KEY_COLUMNS))
+    with pytest.raises(pd.errors.MergeError):
+        bloom_compare(pbi, pd.concat([edw, edw.head(1)]), list(KEY_COLUMNS))
+
+
+@pytest.mark.unit
+def test_invalid_arguments(synthetic_pair):
+    """Test invalid filters, missing keys and empty sides raise."""
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=0)
+    with pytest.raises(ValueError):
+        BloomFilter(error_rate=1.0)
+    with pytest.raises(ValueError):
+        bloom_compare(synthetic_pair.pbi, synthetic_pair.edw, ["Missing"])
+    with pytest.raises(ValueError):
+        bloom_compare(lambda: [], synthetic_pair.edw, list(KEY_COLUMNS))
+
+
+if __name__ == "__main__":
+    pytest.main()
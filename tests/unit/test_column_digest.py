@@ -0,0 +1,172 @@
+"""This module contains unit tests for the column_digest module."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate import column_digest
+from carhartt_pbi_automate.column_digest import (
+    KEYS_DIGEST,
+    column_digests,
+    digest_compare,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS
+from carhartt_pbi_automate.tolerance_compare import (
+    compare_with_tolerance,
+    normalise_frame,
+)
+
+
+@pytest.fixture(scope="function")
+def wide_frame() -> pd.DataFrame:
+    """Return a wide result, one key column and 20 measures."""
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame(
+        rng.integers(0, 1000, (2000, 20)).astype("float64"),
+        columns=[f"Measure_{number}" for number in range(20)],
+    )
+    frame.insert(0, "Key", np.arange(2000))
+    return frame
+
+
+@pytest.mark.unit
+def test_column_digests_ignore_the_row_order(wide_frame):
+    """Test the digests do not depend on the order of the rows, and a
+    changed value only changes the digest of its column and partition."""
+    frame = normalise_frame(wide_frame)
+    shuffled = frame.sample(frac=1, random_state=2)
+    changed = frame.copy()
+    changed.loc[10, "Measure_3"] += 1
+
+    digests = column_digests(frame, ["Key"], partitions=16)
+    differs = digests != column_digests(changed, ["Key"], partitions=16)
+
+    assert digests.shape == (16, 21)
+    assert digests[KEYS_DIGEST].dtype == np.uint64
+    pd.testing.assert_frame_equal(
+        digests, column_digests(shuffled, ["Key"], partitions=16)
+    )
+    assert differs.to_numpy().sum() == 1
+    assert differs["Measure_3"].sum() == 1
+
+
+@pytest.mark.unit
+def test_column_digests_swapped_values(wide_frame):
+    """Test values swapped between two keys change the digest."""
+    frame = normalise_frame(wide_frame)
+    swapped = frame.copy()
+    swapped.loc[[0, 1], "Measure_0"] = frame.loc[[1, 0], "Measure_0"].values
+    assert frame.at[0, "Measure_0"] != frame.at[1, "Measure_0"]
+
+    digests = column_digests(frame, ["Key"], partitions=1)
+
+    assert (digests != column_digests(swapped, ["Key"], partitions=1)).any(
+        axis=None
+    )
+
+
+@pytest.mark.unit
+def test_column_digests_round_to_the_step():
+    """Test values within the step, negative zeros included, have the same
+    digest."""
+    frame1 = pd.DataFrame({"Key": [1, 2, 3], "Units": [1.0, 0.0, -2.5]})
+    frame2 = pd.DataFrame(
+        {"Key": [1, 2, 3], "Units": [1.0 + 1e-9, -1e-9, -2.5]}
+    )
+
+    digests1 = column_digests(frame1, ["Key"], 4, steps={"Units": 1e-6})
+    digests2 = column_digests(frame2, ["Key"], 4, steps={"Units": 1e-6})
+
+    pd.testing.assert_frame_equal(digests1, digests2)
+    assert (
+        column_digests(frame1, ["Key"], 4)
+        != column_digests(frame2, ["Key"], 4)
+    )["Units"].any()
+    with pytest.raises(ValueError):
+        column_digests(frame1, ["Key"], partitions=0)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("partitions", [1, 16, 256])
+def test_digest_compare_matches_compare_with_tolerance(
+    synthetic_pair, partitions
+):
+    """Test the summary is the summary of the cell by cell comparison."""
+    expected = compare_with_tolerance(
+        synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+    )
+
+    summary = digest_compare(
+        synthetic_pair.pbi,
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        partitions=partitions,
+    )
+
+    assert summary.df1_rows == expected.df1_rows
+    assert summary.df2_rows == expected.df2_rows
+    assert summary.intersect_rows == expected.intersect_rows
+    assert summary.mismatch_rows == expected.mismatch_rows
+    assert summary.df1_unique_count == expected.df1_unique_count
+    assert summary.df2_unique_count == expected.df2_unique_count
+    pd.testing.assert_frame_equal(summary.column_stats, expected.column_stats)
+
+
+@pytest.mark.unit
+def test_digest_compare_only_compares_the_differences(wide_frame, monkeypatch):
+    """Test only the differing columns and partitions are compared cell by
+    cell."""
+    edw = wide_frame.copy()
+    edw.loc[10, "Measure_3"] += 1
+    # Noise within the default tolerance is not a difference
+    edw["Measure_7"] += 1e-9
+    compared = []
+
+    def spy(df1, df2, join_columns, **kwargs):
+        compared.append(list(df1.columns))
+        return compare_with_tolerance(df1, df2, join_columns, **kwargs)
+
+    monkeypatch.setattr(column_digest, "compare_with_tolerance", spy)
+    summary = digest_compare(wide_frame, edw, ["Key"], partitions=64)
+
+    assert compared == [["key", "measure_3"]]
+    assert summary.intersect_rows == 2000
+    assert summary.mismatch_count == 1
+    assert summary.mismatched_columns == ["measure_3"]
+    assert summary.mismatch_sample.at[0, "key"] == 10
+
+
+@pytest.mark.unit
+def test_digest_compare_relative_tolerance(wide_frame):
+    """Test a column with only a relative tolerance is compared in every
+    partition, within its tolerance."""
+    edw = wide_frame.copy()
+    edw["Measure_0"] *= 1.0001
+
+    summary = digest_compare(
+        wide_frame,
+        edw,
+        ["Key"],
+        tolerances={"Measure_0": (0.0, 0.001)},
+    )
+
+    assert summary.matches()
+    assert summary.intersect_rows == 2000
+
+
+@pytest.mark.unit
+def test_digest_compare_duplicated_keys(wide_frame):
+    """Test duplicated keys raise a MergeError like
+    `compare_with_tolerance`, even when both sides have the same rows."""
+    duplicated = pd.concat([wide_frame, wide_frame.head(3)])
+
+    with pytest.raises(pd.errors.MergeError):
+        compare_with_tolerance(duplicated, duplicated.copy(), ["Key"])
+    with pytest.raises(pd.errors.MergeError):
+        digest_compare(duplicated, duplicated.copy(), ["Key"])
+    with pytest.raises(pd.errors.MergeError):
+        digest_compare(wide_frame, duplicated, ["Key"])
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,99 @@
+"""This module contains unit tests for the comparison_report module."""
+
+import pytest
+
+from carhartt_pbi_automate.comparison_report import (
+    ComparisonSummary,
+    build_digest,
+    summarise_compare,
+    write_report,
+)
+
+
+@pytest.mark.unit
+def test_summarise_compare(compare):
+    """Test the summarise_compare function."""
+    summary = summarise_compare(compare)
+
+    assert summary.key_columns == ["yearperiodmonth"]
+    assert summary.df1_rows == 4
+    assert summary.df2_rows == 3
+    assert summary.intersect_rows == 3
+    assert summary.df1_unique_count == 1
+    assert summary.df2_unique_count == 0
+    assert summary.mismatched_columns == ["salesdemandunits"]
+    assert summary.column_stats.at["salesdemandunits", "max_diff"] == 5.0
+    assert summary.mismatch_count == 2
+    assert summary.mismatch_rows == 2
+    assert not summary.matches()
+
+
+@pytest.mark.unit
+def test_summarise_compare_caps_sample_size(compare):
+    """Test the mismatch sample is capped at sample_size rows per column."""
+    summary = summarise_compare(compare, sample_size=1)
+
+    assert len(summary.mismatch_sample) == 1
+    assert len(summary.df1_unique_sample) == 1
+    # The statistics still count every mismatch
+    assert summary.mismatch_count == 2
+
+
+@pytest.mark.unit
+def test_summary_merge(compare):
+    """Test the ComparisonSummary.merge class method."""
+    summary = summarise_compare(compare, sample_size=3)
+    merged = ComparisonSummary.merge([summary, summary])
+
+    assert merged.df1_rows == 8
+    assert merged.intersect_rows == 6
+    assert merged.mismatch_count == 4
+    assert merged.mismatch_rows == 4
+    assert merged.column_stats.at["salesdemandunits", "max_diff"] == 5.0
+    # The merged sample keeps the sample size of the partial summaries
+    assert len(merged.mismatch_sample) == 3
+
+
+@pytest.mark.unit
+def test_summary_merge_empty():
+    """Test merging no summaries raises a ValueError."""
+    with pytest.raises(ValueError):
+        ComparisonSummary.merge([])
+
+
+@pytest.mark.parametrize("suffix", [".html", ".txt"])
+@pytest.mark.unit
+def test_write_report(compare, tmp_path, suffix):
+    """Test the write_report function writes every section to the file."""
+    summary = summarise_compare(compare)
+    report_file = write_report(summary, tmp_path / f"report{suffix}")
+
+    content = report_file.read_text(encoding="utf-8")
+    assert "Column Statistics" in content
+    assert "Sample Mismatches for Column salesdemandunits (2 of 2)" in content
+    assert "Sample Rows Only in PowerBI (1 of 1)" in content
+    assert content.startswith("<html>") == (suffix == ".html")
+
+
+@pytest.mark.unit
+def test_build_digest(compare):
+    """Test the build_digest function."""
+    summary = summarise_compare(compare)
+    digest = build_digest(summary)
+
+    assert "Rows only in PowerBI: 1" in digest
+    assert "salesdemandunits" in digest
+
+
+@pytest.mark.unit
+def test_build_digest_respects_max_chars(compare):
+    """Test the digest is truncated to max_chars."""
+    summary = summarise_compare(compare)
+    digest = build_digest(summary, max_chars=80)
+
+    assert len(digest) <= 80
+    assert "more lines omitted" in digest
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -5,6 +5,7 @@ import pytest
 from carhartt_pbi_automate.connector import (
     get_bi_connection,
     get_edw_connection,
+    get_edw_odbc_connection_string,
 )
 
 
@@ -37,6 +38,23 @@ def test_get_edw_connection(
     assert result == mock_engine.connect.return_value
 
 
+@pytest.mark.unit
+def test_get_edw_odbc_connection_string():
+    """Tests the get_edw_odbc_connection_string function."""
+    args = {
+        "server": "server",
+        "database": "database",
+        "driver": "ODBC Driver 17 for SQL Server",
+    }
+
+    result = get_edw_odbc_connection_string(args)
+
+    assert result == (
+        "Driver={ODBC Driver 17 for SQL Server};Server=server;"
+        "Database=database;Trusted_Connection=yes;"
+    )
+
+
 @pytest.mark.unit
 def test_get_bi_connection(
     mock_connection_mock_connect,
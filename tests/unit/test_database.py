@@ -224,9 +224,13 @@ def test_update(db_path, get_script):  # pylint: disable=W0621
 
     # Act
     db.insert(table_name, columns, values)
-    db.update(table_name, columns, new_values, where)
+    updated = db.update(table_name, columns, new_values, where)
 
     # Assert
+    # Assert the number of rows updated is returned
+    assert updated == 1
+    assert db.update(table_name, columns, new_values, "id = 2") == 0
+
     # Assert the row was updated
     db.open()
     db.cursor.execute(sql_query)
@@ -2,7 +2,11 @@
 
 import pytest
 
-from carhartt_pbi_automate.dax import pass_args_to_dax_query
+from carhartt_pbi_automate.dax import (
+    parse_dax_columns,
+    pass_args_to_dax_query,
+    strip_brackets,
+)
 
 
 @pytest.mark.unit
@@ -46,5 +50,51 @@ def test_pass_args_to_dax_query(
     assert actual == expected
 
 
+@pytest.mark.unit
+def test_parse_dax_columns(project_root):
+    """Test the column names returned by Power BI are derived from the DAX."""
+    query = (
+        project_root / "queries" / "Supply - Inventory Demand BOP.msdax"
+    ).read_text(encoding="utf-8")
+
+    assert parse_dax_columns(query) == [
+        "Dates[Year/Period/Month]",
+        "[BOP_Inventory_Units]",
+        "[EOP_Inventory_Units]",
+        "[Forward_Weeks_Of_Coverage_Units]",
+        "[Safety_Stock_Units]",
+    ]
+
+
+@pytest.mark.unit
+def test_parse_dax_columns_windowed(project_root):
+    """Test the columns of a query copied from Power BI, evaluating the TOPN
+    of `__DS0PrimaryWindowed`, are the columns of the variable it wraps."""
+    query = (project_root / "queries" / "supply.dax").read_text(
+        encoding="utf-8"
+    )
+
+    assert parse_dax_columns(query) == [
+        "Dates[Year/Period/Month]",
+        "Dates[Current Month Offset]",
+        "[SalesDemandUnits]",
+        "[ConstrainedReceiptPlanUnits]",
+        "[TotalReceiptPlanUnits]",
+        "[ForwardWeeksOfCoverage]",
+        "[PlannedProductionUnits]",
+        "[WorkInProgressUnits]",
+        "[InTransitUnits]",
+    ]
+
+
+@pytest.mark.unit
+def test_strip_brackets():
+    """Test the Power BI column names are converted to dataframe names."""
+    assert (
+        strip_brackets("Dates[Year/Period/Month]") == "DatesYear/Period/Month"
+    )
+    assert strip_brackets("[Sales_Demand_Units]") == "Sales_Demand_Units"
+
+
 if __name__ == "__main__":
     pytest.main()
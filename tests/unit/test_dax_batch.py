@@ -0,0 +1,115 @@
+"""This module contains unit tests for the dax_batch module."""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.dax import parse_dax_columns, strip_brackets
+from carhartt_pbi_automate.dax_batch import (
+    DaxBatcher,
+    batch_dax_queries,
+    execute_batch,
+)
+
+
+@pytest.mark.unit
+def test_batch_dax_queries(batch_queries):
+    """Test the queries are combined in one DEFINE block, with their
+    variables renamed, and one EVALUATE statement per query."""
+    queries = [query for query, _ in batch_queries.values()]
+
+    batch = batch_dax_queries(queries)
+
+    assert batch.count("DEFINE") == 1
+    assert batch.count("EVALUATE") == 2
+    assert "VAR __DS0Core_0 =" in batch
+    assert "__DS0FilterTable3_1," in batch
+    assert "__DS0Core =" not in batch
+    assert batch.rstrip().endswith(
+        "EVALUATE __DS0Core_0\n\nEVALUATE __DS0Core_1"
+    )
+
+    with pytest.raises(ValueError):
+        batch_dax_queries(["EVALUATE {1}\nEVALUATE {2}"])
+
+
+@pytest.mark.unit
+def test_execute_batch(batch_connection, batch_queries):
+    """Test a single request returns the result set of every query."""
+    connection, requests = batch_connection
+
+    results = execute_batch(
+        connection, [query for query, _ in batch_queries.values()]
+    )
+
+    assert len(requests) == 1
+    for (names, rows), (query, frame) in zip(results, batch_queries.values()):
+        assert names == [
+            strip_brackets(column) for column in parse_dax_columns(query)
+        ]
+        pd.testing.assert_frame_equal(pd.DataFrame(rows, columns=names), frame)
+
+
+@pytest.mark.unit
+def test_dax_batcher(batch_connection, batch_queries):
+    """Test the queries of the jobs running at the same time are sent in one
+    request, and every job gets the results of its own query."""
+    connection, requests = batch_connection
+    batcher = DaxBatcher(expected_queries=2, window_seconds=5)
+    results = {}
+
+    def _run(name: str):
+        results[name] = batcher.execute(connection, batch_queries[name][0])
+
+    threads = [
+        threading.Thread(target=_run, args=(name,)) for name in batch_queries
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 1
+    for name, (_, frame) in batch_queries.items():
+        names, rows = results[name]
+        pd.testing.assert_frame_equal(pd.DataFrame(rows, columns=names), frame)
+
+
+@pytest.mark.unit
+def test_dax_batcher_failing_query(batch_connection, batch_queries):
+    """Test a failing query fails its own job only: the batch is run again
+    one query at a time."""
+    connection, requests = batch_connection
+    batcher = DaxBatcher(expected_queries=2, window_seconds=5)
+    sales_query = batch_queries["Supply - Inventory Demand Sales"][0]
+    outcomes = {}
+
+    def _run(name: str, query: str):
+        try:
+            outcomes[name] = len(batcher.execute(connection, query)[1])
+        except ValueError as error:
+            outcomes[name] = error
+
+    threads = [
+        threading.Thread(target=_run, args=("Sales", sales_query)),
+        threading.Thread(
+            target=_run, args=("Broken", "EVALUATE {@missing_parameter}")
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 3
+    assert outcomes["Sales"] > 0
+    assert isinstance(outcomes["Broken"], ValueError)
+
+    # A single job does not wait for the window
+    batcher = DaxBatcher(expected_queries=1, window_seconds=60)
+    assert batcher.execute(connection, sales_query)[1]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,101 @@
+"""This module contains unit tests for the dax_partition module."""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.dax_partition import (
+    DEFAULT_DAX_PARTITION_COLUMN,
+    DaxPartitionSpec,
+    extract_dax_partitioned,
+    split_treatas,
+    treatas_values,
+)
+from carhartt_pbi_automate.fake_backends import FakeBiConnection
+from carhartt_pbi_automate.frame_schema import FrameSchema
+from carhartt_pbi_automate.partitioned_extract import (
+    ConnectionPool,
+    add_partition_filter,
+)
+
+
+@pytest.mark.unit
+def test_split_treatas(sales_queries):
+    """Test the month offsets of the filter are divided between the
+    queries, the rest of the query is unchanged."""
+    _, dax_query, _ = sales_queries
+
+    queries = split_treatas(dax_query, DEFAULT_DAX_PARTITION_COLUMN, 4)
+
+    assert [
+        treatas_values(query, DEFAULT_DAX_PARTITION_COLUMN)
+        for query in queries
+    ] == [["-1", "0", "1"], ["2", "3"], ["4", "5"], ["6", "BLANK()"]]
+    assert treatas_values(queries[0], "'Plan Versions'[Plan Version]") == [
+        '"NIGHTLY"'
+    ]
+    assert queries[1].endswith(dax_query[-200:])
+
+    with pytest.raises(ValueError):
+        split_treatas(dax_query, "'Dates'[Fiscal Week]", 4)
+    with pytest.raises(ValueError):
+        DaxPartitionSpec(slices=0)
+
+
+@pytest.mark.unit
+def test_split_treatas_strings():
+    """Test the commas of the strings and functions are not separators."""
+    dax_query = 'TREATAS({"A, B", "C", DATE(2024, 5, 1)}, \'Products\'[Name])'
+
+    queries = split_treatas(dax_query, "'Products'[Name]", 2)
+
+    assert queries == [
+        'TREATAS({"A, B", "C"}, \'Products\'[Name])',
+        "TREATAS({DATE(2024, 5, 1)}, 'Products'[Name])",
+    ]
+
+
+@pytest.mark.unit
+def test_extract_dax_partitioned(warehouse_file, sales_queries):
+    """Test the slices run concurrently, within the sessions of the pool,
+    and their rows are merged into the results of the whole query."""
+    _, connect = warehouse_file
+    sql_query, dax_query, schema = sales_queries
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def _results(query: str) -> pd.DataFrame:
+        """Answer a slice with the rows of its month offsets."""
+        offsets = [
+            value
+            for value in treatas_values(query, DEFAULT_DAX_PARTITION_COLUMN)
+            if value != "BLANK()"
+        ]
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        predicate = f"[DT].[CurrentMonthOffset] IN ({', '.join(offsets)})"
+        return pd.read_sql(
+            add_partition_filter(sql_query, predicate), connect()
+        )
+
+    expected = schema.apply(pd.read_sql(sql_query, connect()))
+    partition = DaxPartitionSpec(slices=8, max_sessions=3)
+    with ConnectionPool(lambda: FakeBiConnection(_results), 3) as pool:
+        actual = extract_dax_partitioned(pool, dax_query, schema, partition)
+
+    assert 1 < running[1] <= 3
+    first_column = schema.key_columns[0]
+    pd.testing.assert_frame_equal(
+        actual.sort_values(first_column).reset_index(drop=True),
+        expected.sort_values(first_column).reset_index(drop=True),
+    )
+
+
+if __name__ == "__main__":
+    pytest.main()
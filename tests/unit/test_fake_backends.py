@@ -0,0 +1,99 @@
+"""This module contains unit tests for the fake_backends module."""
+
+import pandas as pd
+import pytest
+import requests
+
+from carhartt_pbi_automate.dax import pass_args_to_dax_query
+from carhartt_pbi_automate.fake_backends import (
+    FakeBiConnection,
+    WebhookSink,
+    translate_tsql,
+)
+
+
+@pytest.mark.unit
+def test_translate_tsql():
+    """Test the database, schema and variables are translated."""
+    query = """
+    DECLARE @VersionDateToValidate INT;
+    SET @VersionDateToValidate =
+    (
+        SELECT [DateKey] FROM [CarharttDw].[Dimensions].[Days]
+    );
+    SELECT [DT].[DateKey] FROM [planning].[Plans] DT
+    WHERE [DT].[VersionDateKey] = @VersionDateToValidate;
+    """
+    translated = translate_tsql(query)
+
+    assert "DECLARE" not in translated
+    assert "CarharttDw" not in translated
+    assert "[planning]" not in translated
+    assert "[DT].[DateKey]" in translated
+    assert "= ((\n        SELECT [DateKey] FROM [Days]\n    ))" in translated
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "query_name, columns",
+    [
+        ("Supply - Inventory Demand Sales", 7),
+        ("Supply - Inventory Demand BOP", 5),
+        ("supply", 4),
+    ],
+)
+def test_warehouse_runs_the_queries(
+    warehouse, project_root, query_name, columns
+):  # pylint: disable=W0621
+    """Test the SQL files of the jobs run against the EDW stand-in."""
+    query = (project_root / "queries" / f"{query_name}.sql").read_text(
+        encoding="utf-8"
+    )
+    frame = pd.read_sql(query, warehouse)
+
+    assert len(frame.columns) == columns
+    assert not frame.empty
+    assert frame.iloc[:, 0].is_monotonic_increasing
+
+
+@pytest.mark.unit
+def test_fake_bi_connection(warehouse, project_root):  # pylint: disable=W0621
+    """Test a DAX query is answered with the results of its SQL query."""
+    queries = project_root / "queries"
+    sql_query = (queries / "Supply - Inventory Demand Sales.sql").read_text(
+        encoding="utf-8"
+    )
+    dax_query = (queries / "Supply - Inventory Demand Sales.msdax").read_text(
+        encoding="utf-8"
+    )
+    connection = FakeBiConnection(lambda _: pd.read_sql(sql_query, warehouse))
+    cursor = connection.cursor()
+
+    # The parameters must be passed before the query runs
+    with pytest.raises(ValueError):
+        cursor.execute(dax_query)
+
+    cursor.execute(pass_args_to_dax_query(dax_query, {"plan_versions": "x"}))
+    column_names = [
+        column[0].replace("[", "").replace("]", "")
+        for column in cursor.description
+    ]
+    df_pbi = pd.DataFrame(cursor.fetchall(), columns=column_names)
+    df_edw = pd.read_sql(sql_query, warehouse)
+
+    pd.testing.assert_frame_equal(df_pbi, df_edw)
+    assert cursor.fetchone() is None
+
+
+@pytest.mark.unit
+def test_webhook_sink():
+    """Test the sink records the posted cards and answers with its status."""
+    with WebhookSink(status_code=429) as sink:
+        response = requests.post(sink.url, json={"title": "Test"}, timeout=5)
+
+    assert response.status_code == 429
+    assert sink.requests == [{"size": 17, "payload": {"title": "Test"}}]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,103 @@
+"""This module contains unit tests for the frame_schema module."""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from carhartt_pbi_automate.frame_schema import FrameSchema
+
+
+@pytest.mark.unit
+def test_from_dax(sales_schema):
+    """Test the keys and measures are taken from the DAX query."""
+    assert sales_schema.key_columns == ["DatesYear/Period/Month"]
+    assert sales_schema.measures["In_Transit_Units"] == "float64"
+    assert sales_schema.measures["Sales_Demand_Units"] == "Int64"
+    assert len(sales_schema.columns) == 7
+
+
+@pytest.mark.unit
+def test_from_rows(sales_schema, decimal_rows):
+    """Test the rows are loaded with compact dtypes and projected."""
+    column_names, rows = decimal_rows
+    frame = sales_schema.from_rows(rows, column_names)
+
+    assert list(frame.columns) == sales_schema.columns
+    assert isinstance(
+        frame["DatesYear/Period/Month"].dtype, pd.CategoricalDtype
+    )
+    assert frame["DatesYear/Period/Month"].iloc[0] == "2024/01"
+    assert frame["In_Transit_Units"].dtype == "float64"
+    assert frame["Sales_Demand_Units"].dtype == "Int64"
+    assert frame["Sales_Demand_Units"].iloc[0] == 1
+
+    # The object dataframe takes several times the memory
+    loaded = frame.memory_usage(deep=True).sum()
+    default = pd.DataFrame(rows, columns=column_names).memory_usage(deep=True)
+    assert default.sum() > 5 * loaded
+
+
+@pytest.mark.unit
+def test_apply(sales_schema, decimal_rows):
+    """Test converting a dataframe gives the same result as the rows."""
+    column_names, rows = decimal_rows
+    frame = pd.DataFrame(rows, columns=column_names)
+
+    pd.testing.assert_frame_equal(
+        sales_schema.apply(frame), sales_schema.from_rows(rows, column_names)
+    )
+
+
+@pytest.mark.unit
+def test_from_arrow(sales_schema, decimal_rows):
+    """Test converting an Arrow table gives the same result as the rows."""
+    column_names, rows = decimal_rows
+    # Arrow keeps the categories in the order they appear
+    rows = rows[::-1]
+    table = pa.table(
+        [pa.array(column) for column in zip(*rows)], names=column_names
+    )
+
+    pd.testing.assert_frame_equal(
+        sales_schema.from_arrow(table),
+        sales_schema.from_rows(rows, column_names),
+    )
+
+
+@pytest.mark.unit
+def test_missing_columns(sales_schema, decimal_rows):
+    """Test a missing key raises a ValueError and a missing measure is left
+    out."""
+    column_names, rows = decimal_rows
+    frame = pd.DataFrame(rows, columns=column_names)
+
+    with pytest.raises(ValueError):
+        sales_schema.apply(frame.drop(columns="DatesYear/Period/Month"))
+    assert (
+        "In_Transit_Units"
+        not in sales_schema.apply(
+            frame.drop(columns="In_Transit_Units")
+        ).columns
+    )
+
+
+@pytest.mark.unit
+def test_empty_rows(sales_schema, decimal_rows):
+    """Test no rows give an empty dataframe with the schema columns."""
+    column_names, _ = decimal_rows
+
+    frame = sales_schema.from_rows([], column_names)
+
+    assert frame.empty
+    assert list(frame.columns) == sales_schema.columns
+
+
+@pytest.mark.unit
+def test_invalid_dtype():
+    """Test an unsupported measure dtype raises a ValueError."""
+    with pytest.raises(ValueError):
+        FrameSchema(["key"], {"measure": "object"})
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,9 +1,22 @@
 """This module contains unit tests for the get_formated_duration module."""
 
+import json
 import logging
+import sys
+import threading
 
 import pytest
 
+from carhartt_pbi_automate import get_logger as get_logger_module
+from carhartt_pbi_automate.get_logger import (
+    JsonFormatter,
+    flush_logs,
+    get_handlers,
+    get_logger,
+    log_context,
+    log_stage,
+)
+
 
 @pytest.mark.unit
 def test_get_logger(
@@ -22,15 +35,15 @@ def test_get_logger(
     expected = logging.DEBUG
     assert actual == expected
 
-    # test with a logger file handler
-    for handler in logger.handlers:
-        if type(logging.FileHandler) == type(handler):  # pylint: disable=C0123
+    # test with a logger file handler, behind the queue handler
+    for handler in get_handlers(logger):
+        if isinstance(handler, logging.FileHandler):
             actual = handler.baseFilename
             expected = project_root / "test_logger.log"
             assert actual == str(expected)
 
     # test with a logger console handler
-    for handler in logger.handlers:
+    for handler in get_handlers(logger):
         # Check if the handler is a console handler. I'm using type() instead
         # of isinstance() because I want to check the exact class and avoid
         # logging.FileHandler subclass objects from triggering the test.
@@ -44,7 +57,7 @@ def test_get_logger_no_console_output(
 ):
     """Test the get_logger function with no console output."""
     # test with a logger console handler
-    for handler in logger_no_console_output.handlers:
+    for handler in get_handlers(logger_no_console_output):
         # Check if the handler is a console handler. I'm using type() instead
         # of isinstance() because I want to check the exact class and avoid
         # logging.FileHandler subclass objects from triggering the test.
@@ -62,3 +75,133 @@ def test_touch_file(_touch_file):
     with open(_touch_file, "r", encoding="utf-8") as file:
         actual = file.readline().strip()
         assert actual == expected
+
+
+def read_json_lines(json_logger: logging.Logger):
+    """Return the records written by a JSON logger."""
+    flush_logs()
+    for handler in get_handlers(json_logger):
+        with open(handler.baseFilename, "r", encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+
+@pytest.mark.unit
+def test_json_logger(json_logger: logging.Logger, tmp_path):
+    """Test that a structured logger writes one JSON object per line."""
+    json_logger.info("Extracted %s rows", 42)
+
+    records = read_json_lines(json_logger)
+
+    assert (tmp_path / "test_json_logger.jsonl").exists()
+    assert not (tmp_path / "test_json_logger.log").exists()
+    assert len(records) == 1
+    assert records[0]["message"] == "Extracted 42 rows"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["logger"] == "test_json_logger"
+
+
+@pytest.mark.unit
+def test_json_logger_context(json_logger: logging.Logger):
+    """Test that the records carry the run id, stage and duration."""
+    with log_context(run_id="run-1", job="Supply"):
+        with log_stage(json_logger, "extract_edw"):
+            json_logger.info("Extracting data from EDW...")
+    json_logger.info("Outside of the run")
+
+    inside, stage_end, outside = read_json_lines(json_logger)
+
+    assert inside["run_id"] == "run-1"
+    assert inside["job"] == "Supply"
+    assert inside["stage"] == "extract_edw"
+    assert stage_end["stage"] == "extract_edw"
+    assert stage_end["duration"] >= 0
+    assert "run_id" not in outside
+
+
+@pytest.mark.unit
+def test_json_formatter_lazy_fields():
+    """Test that callable fields and stack traces are formatted with the
+    record."""
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "value"
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord(
+            "test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info()
+        )
+    record.detail = expensive
+    assert not calls
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert calls == [1]
+    assert entry["detail"] == "value"
+    assert "ValueError: boom" in entry["exc_info"]
+
+
+@pytest.mark.unit
+def test_json_formatter_without_orjson(monkeypatch):
+    """Test that the json module is used when orjson is not installed."""
+    monkeypatch.setattr(get_logger_module, "orjson", None)
+    record = logging.makeLogRecord({"msg": "café", "rows": 3})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "café"
+    assert entry["rows"] == 3
+
+
+@pytest.mark.unit
+def test_get_logger_configures_once(logger: logging.Logger):
+    """Test that a logger is configured by the first call with its name."""
+    handlers = list(logger.handlers)
+
+    again = get_logger("test_logger")
+
+    assert again is logger
+    assert logger.handlers == handlers
+    assert len(logger.handlers) == 1
+
+
+@pytest.mark.unit
+def test_shared_file_handler(shared_file_loggers, tmp_path):
+    """Test that the loggers of the same file share its handler, and write
+    every record once."""
+    first, second = shared_file_loggers
+    first.info("first")
+    second.info("second")
+    flush_logs()
+
+    assert get_handlers(first) == get_handlers(second)
+    lines = (tmp_path / "shared.log").read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "asctime|name|levelname|message"
+    assert [line.rsplit("|", 1)[1] for line in lines[1:]] == [
+        "first",
+        "second",
+    ]
+
+
+@pytest.mark.unit
+def test_records_written_in_background(shared_file_loggers, monkeypatch):
+    """Test that the records are written by the background thread."""
+    first, _ = shared_file_loggers
+    (file_handler,) = get_handlers(first)
+    threads = []
+    emit = file_handler.emit
+
+    def record_thread(record):
+        threads.append(threading.current_thread())
+        emit(record)
+
+    monkeypatch.setattr(file_handler, "emit", record_thread)
+
+    first.info("Extracted %s rows", 42)
+    flush_logs()
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
@@ -0,0 +1,195 @@
+"""This module contains unit tests for the job_manifest module."""
+
+from datetime import datetime
+
+import pytest
+
+from carhartt_pbi_automate.job_manifest import (
+    DEFAULT_MANIFEST,
+    JobManifest,
+    JobSpec,
+    load_manifest,
+    parse_manifest,
+)
+from carhartt_pbi_automate.partitioned_extract import PartitionSpec
+
+
+@pytest.mark.unit
+def test_load_manifest(manifest_file):
+    """Test the jobs and the settings of the scheduler are loaded."""
+    manifest = load_manifest(manifest_file)
+
+    assert manifest.max_concurrent == 2
+    assert manifest.poll_seconds == 5
+    assert [job.name for job in manifest.jobs] == [
+        "Sales",
+        "BOP",
+        "Orders",
+        "Inventory",
+    ]
+
+    sales = manifest.get("Sales")
+    assert sales.daxfile == manifest_file.parent / "queries" / "sales.msdax"
+    assert sales.schedule == "30 6 * * 1-5"
+    assert sales.priority == 10
+    assert sales.compare_workers == 4
+    assert sales.extract_backend == "arrow"
+    assert sales.memory_budget == 2 * 1024**3
+    assert sales.digest_partitions is None
+    assert not sales.bloom
+    assert not sales.merge
+    assert sales.measure_dtypes == {"Sales_Demand_Units": "Int64"}
+    assert sales.readiness.edw_probe == (
+        manifest_file.parent / "queries" / "readiness.sql"
+    )
+    assert sales.readiness.power_bi_probe is None
+    assert sales.readiness.timeout == 600
+    assert sales.partition.column == "[DT].[CurrentMonthOffset]"
+    assert sales.partition.ranges() == [(-1, 0), (1, 2), (3, 4), (5, 6)]
+    assert sales.partition.max_sessions == 2
+    assert sales.dax_partition.column == "'Dates'[Current Month Offset]"
+    assert sales.dax_partition.slices == 8
+    assert sales.sample.sql_column == "[SCP].[ProductKey]"
+    assert sales.sample.rate == 0.05
+    assert sales.sample.min_rows == 500
+    # Columns without one of the tolerances use the default of the job
+    assert sales.tolerances == {
+        "In_Transit_Units": (0.5, 1e-9),
+        "Sales_Demand_Units": (0.01, 0.001),
+    }
+
+    bop = manifest.get("BOP")
+    assert bop.schedule == "0 22 * * *"
+    assert not bop.enabled
+    assert bop.abs_tol == 0.01
+    assert bop.readiness is None
+    assert bop.partition is None
+    assert bop.dax_partition is None
+    assert bop.memory_budget is None
+    assert bop.digest_partitions == 64
+    assert not bop.bloom
+    assert bop.sample is None
+    assert manifest.get("Orders").merge
+
+    inventory = manifest.get("Inventory")
+    assert inventory.bloom
+    assert inventory.memory_budget == 1024**3
+    with pytest.raises(KeyError):
+        manifest.get("Missing")
+
+
+@pytest.mark.unit
+def test_render_parameters(manifest_file):
+    """Test the parameters are formatted with the time the job starts."""
+    job = load_manifest(manifest_file).get("Sales")
+
+    parameters = job.render_parameters(datetime(2024, 5, 23, 9))
+
+    assert parameters == {"plan_versions": "NIGHTLY-5/23/2024"}
+
+
+@pytest.mark.unit
+def test_project_manifest():
+    """Test the manifest of the project lists existing query files."""
+    manifest = load_manifest(DEFAULT_MANIFEST)
+
+    assert manifest.jobs
+    for job in manifest.jobs:
+        assert job.daxfile.is_file()
+        assert job.sqlfile.is_file()
+        if job.readiness:
+            assert job.readiness.edw_probe.is_file()
+            assert job.readiness.power_bi_probe.is_file()
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {},
+        {"jobs": [{"name": "Sales", "daxfile": "sales.msdax"}]},
+        {
+            "jobs": [
+                {
+                    "name": "Sales",
+                    "daxfile": "sales.msdax",
+                    "sqlfile": "sales.sql",
+                    "schedul": "0 9 * * *",
+                }
+            ]
+        },
+        {
+            "jobs": [
+                {"name": "Sales", "daxfile": "a.msdax", "sqlfile": "a.sql"},
+                {"name": "Sales", "daxfile": "b.msdax", "sqlfile": "b.sql"},
+            ]
+        },
+        {
+            "jobs": [
+                {
+                    "name": "Sales",
+                    "daxfile": "sales.msdax",
+                    "sqlfile": "sales.sql",
+                    "partition": {"column": "[DT].[CurrentMonthOffset]"},
+                }
+            ]
+        },
+        {
+            "jobs": [
+                {
+                    "name": "Sales",
+                    "daxfile": "sales.msdax",
+                    "sqlfile": "sales.sql",
+                    "sample": {"sql_column": "[SCP].[ProductKey]"},
+                }
+            ]
+        },
+    ],
+)
+@pytest.mark.unit
+def test_parse_manifest_raises_exception(document, tmp_path):
+    """Test an invalid manifest raises a ValueError."""
+    with pytest.raises(ValueError):
+        parse_manifest(document, tmp_path)
+
+
+@pytest.mark.unit
+def test_invalid_settings():
+    """Test invalid settings raise a ValueError."""
+    with pytest.raises(ValueError):
+        JobSpec("Sales", "sales.msdax", "sales.sql", compare_workers=0)
+    with pytest.raises(ValueError):
+        JobSpec("Sales", "sales.msdax", "sales.sql", extract_backend="odbc")
+    with pytest.raises(ValueError):
+        JobSpec("Sales", "sales.msdax", "sales.sql", memory_budget="lots")
+    with pytest.raises(ValueError):
+        JobSpec("Sales", "sales.msdax", "sales.sql", digest_partitions=0)
+    with pytest.raises(ValueError):
+        JobSpec(
+            "Sales",
+            "sales.msdax",
+            "sales.sql",
+            digest_partitions=64,
+            bloom=True,
+        )
+    with pytest.raises(ValueError):
+        JobSpec(
+            "Sales",
+            "sales.msdax",
+            "sales.sql",
+            merge=True,
+            partition=PartitionSpec("[DT].[CurrentMonthOffset]", -1, 6),
+        )
+    with pytest.raises(ValueError):
+        JobSpec(
+            "Sales",
+            "sales.msdax",
+            "sales.sql",
+            bloom=True,
+            partition=PartitionSpec("[DT].[CurrentMonthOffset]", -1, 6),
+        )
+    with pytest.raises(ValueError):
+        JobManifest([], max_concurrent=0)
+
+
+if __name__ == "__main__":
+    pytest.main()
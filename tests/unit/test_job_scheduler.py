@@ -0,0 +1,160 @@
+"""This module contains unit tests for the job_scheduler module."""
+
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+
+import pytest
+
+from carhartt_pbi_automate.job_scheduler import CronSchedule, JobScheduler
+
+
+@pytest.mark.parametrize(
+    ["expression", "moment", "expected"],
+    [
+        ("0 9 * * *", datetime(2024, 5, 20, 9, 0), True),
+        ("0 9 * * *", datetime(2024, 5, 20, 9, 1), False),
+        ("*/15 * * * *", datetime(2024, 5, 20, 13, 45), True),
+        ("0 9-17/4 * * *", datetime(2024, 5, 20, 13, 0), True),
+        ("0 9-17/4 * * *", datetime(2024, 5, 20, 15, 0), False),
+        # Monday to Friday, 2024-05-25 is a Saturday
+        ("0 9 * * 1-5", datetime(2024, 5, 24, 9, 0), True),
+        ("0 9 * * 1-5", datetime(2024, 5, 25, 9, 0), False),
+        # 0 and 7 are Sunday
+        ("0 9 * * 7", datetime(2024, 5, 26, 9, 0), True),
+        ("0 9 * * 0", datetime(2024, 5, 26, 9, 0), True),
+        # Both days restricted, either of them matches
+        ("0 9 1 * 1", datetime(2024, 5, 20, 9, 0), True),
+        ("0 9 1 * 1", datetime(2024, 6, 1, 9, 0), True),
+        ("0 9 1 * 1", datetime(2024, 6, 2, 9, 0), False),
+        ("0 9 1,15 1 *", datetime(2024, 1, 15, 9, 0), True),
+        ("0 9 1,15 1 *", datetime(2024, 2, 15, 9, 0), False),
+    ],
+)
+@pytest.mark.unit
+def test_cron_schedule_matches(expression, moment, expected):
+    """Test the minutes a cron expression is due."""
+    assert CronSchedule(expression).matches(moment) is expected
+
+
+@pytest.mark.parametrize(
+    ["expression", "moment", "expected"],
+    [
+        (
+            "0 9 * * *",
+            datetime(2024, 5, 20, 8, 59, 30),
+            datetime(2024, 5, 20, 9),
+        ),
+        ("0 9 * * *", datetime(2024, 5, 20, 9, 0), datetime(2024, 5, 21, 9)),
+        ("0 9 * * 1-5", datetime(2024, 5, 24, 10), datetime(2024, 5, 27, 9)),
+        ("30 6 29 2 *", datetime(2024, 3, 1), datetime(2028, 2, 29, 6, 30)),
+    ],
+)
+@pytest.mark.unit
+def test_cron_schedule_next_after(expression, moment, expected):
+    """Test the next time a cron expression is due."""
+    assert CronSchedule(expression).next_after(moment) == expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["0 9 * *", "60 9 * * *", "0 9 * * 8", "0 9 * * mon", "*/0 * * * *"],
+)
+@pytest.mark.unit
+def test_cron_schedule_raises_exception(expression):
+    """Test an invalid cron expression raises a ValueError."""
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.mark.unit
+def test_cron_schedule_never_due():
+    """Test a schedule that is never due raises a ValueError."""
+    with pytest.raises(ValueError):
+        CronSchedule("0 9 31 2 *").next_after(datetime(2024, 1, 1))
+
+
+@pytest.mark.unit
+def test_run_pending(scheduled_jobs, clock, job_runs):
+    """Test the due jobs run once, by priority, in a batch."""
+    runs, _, run_job = job_runs
+    scheduler = JobScheduler(scheduled_jobs, run_job, clock=clock)
+
+    assert not scheduler.run_pending()
+
+    clock.now = datetime(2024, 5, 20, 9, 0, 20)
+    wait(scheduler.run_pending())
+    # Checking again in the same minute does not run the jobs twice
+    assert not scheduler.run_pending()
+    scheduler.close()
+
+    due_at = datetime(2024, 5, 20, 9)
+    assert runs == [("Sales", due_at, 2), ("BOP", due_at, 2)]
+
+
+@pytest.mark.unit
+def test_missed_runs(scheduled_jobs, clock, job_runs):
+    """Test a job due several times since the previous check runs once."""
+    runs, _, run_job = job_runs
+    scheduler = JobScheduler(scheduled_jobs[:1], run_job, clock=clock)
+
+    clock.now += timedelta(days=3)
+    wait(scheduler.run_pending())
+    scheduler.close()
+
+    assert runs == [("BOP", datetime(2024, 5, 22, 9), 1)]
+
+
+@pytest.mark.unit
+def test_running_job_is_not_started_twice(scheduled_jobs, clock, job_runs):
+    """Test a job still running when it is due again is skipped."""
+    runs, release, run_job = job_runs
+    release.clear()
+    scheduler = JobScheduler(
+        scheduled_jobs, run_job, max_concurrent=2, clock=clock
+    )
+
+    futures = scheduler.run_now(scheduled_jobs[:1])
+    assert scheduler.running_jobs() == ["BOP"]
+    assert not scheduler.run_now(scheduled_jobs[:1])
+
+    release.set()
+    wait(futures)
+    scheduler.close()
+
+    assert len(runs) == 1
+    assert not scheduler.running_jobs()
+
+
+@pytest.mark.unit
+def test_failing_job(scheduled_jobs, clock):
+    """Test a failing job does not stop the other jobs."""
+    runs = []
+
+    def _run_job(job, due_at, batch_size):
+        runs.append(job.name)
+        raise RuntimeError("EDW outage")
+
+    scheduler = JobScheduler(scheduled_jobs, _run_job, clock=clock)
+    wait(scheduler.run_now())
+    scheduler.close()
+
+    assert runs == ["Sales", "BOP", "Weekly"]
+    assert not scheduler.running_jobs()
+
+
+@pytest.mark.unit
+def test_disabled_jobs(scheduled_jobs, clock, job_runs):
+    """Test the disabled jobs are not scheduled."""
+    runs, _, run_job = job_runs
+    scheduled_jobs[1].enabled = False
+    scheduler = JobScheduler(scheduled_jobs, run_job, clock=clock)
+
+    clock.now = datetime(2024, 5, 20, 9)
+    wait(scheduler.run_pending())
+    scheduler.close()
+
+    assert runs == [("BOP", datetime(2024, 5, 20, 9), 1)]
+
+
+if __name__ == "__main__":
+    pytest.main()
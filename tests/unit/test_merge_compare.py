@@ -0,0 +1,140 @@
+"""This module contains unit tests for the merge_compare module."""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.merge_compare import (
+    BINARY_COLLATION,
+    iter_cursor_rows,
+    iter_parquet_rows,
+    merge_compare,
+    merge_join,
+    parquet_names,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+
+@pytest.mark.unit
+def test_merge_compare_matches_compare_with_tolerance(sorted_parquet_pair):
+    """Test the streamed comparison of sorted files is the comparison of the
+    whole frames."""
+    pbi_path, edw_path = sorted_parquet_pair
+    expected = compare_with_tolerance(
+        pd.read_parquet(pbi_path), pd.read_parquet(edw_path), list(KEY_COLUMNS)
+    )
+
+    summary = merge_compare(
+        iter_parquet_rows(pbi_path, fetch_rows=250),
+        parquet_names(pbi_path),
+        iter_parquet_rows(edw_path, fetch_rows=400),
+        parquet_names(edw_path),
+        list(KEY_COLUMNS),
+        chunk_rows=500,
+    )
+
+    assert summary.df1_rows == expected.df1_rows
+    assert summary.df2_rows == expected.df2_rows
+    assert summary.intersect_rows == expected.intersect_rows
+    assert summary.df1_unique_count == expected.df1_unique_count == 0
+    assert summary.df2_unique_count == expected.df2_unique_count > 0
+    assert summary.mismatch_count == expected.mismatch_count > 0
+    pd.testing.assert_frame_equal(summary.column_stats, expected.column_stats)
+    assert len(summary.df2_unique_sample) == summary.sample_size
+
+
+@pytest.mark.unit
+def test_merge_join_pairs_and_one_sided_keys():
+    """Test the rows are paired in key order, with the keys only on one
+    side, and the strings compared without their spaces."""
+    rows1 = [("a ", 1, 1.0), ("b", 1, 2.0), ("b", 3, 3.0)]
+    rows2 = [(1, "a", 1.0), (2, "b", 5.0), (3, "b", 3.0), (1, "c", 4.0)]
+
+    pairs = list(merge_join(rows1, rows2, [0, 1], [1, 0]))
+
+    assert pairs == [
+        (("a ", 1, 1.0), (1, "a", 1.0)),
+        (("b", 1, 2.0), None),
+        (None, (2, "b", 5.0)),
+        (("b", 3, 3.0), (3, "b", 3.0)),
+        (None, (1, "c", 4.0)),
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "rows, message",
+    [
+        ([(2, 1.0), (1, 2.0)], "not sorted"),
+        ([(1, 1.0), (1, 2.0)], "duplicated"),
+        ([(1, 1.0), ("2", 2.0)], "cannot be compared"),
+    ],
+)
+def test_merge_join_checks_the_order(rows, message):
+    """Test the keys of every side are checked as they are read."""
+    with pytest.raises(ValueError, match=message):
+        list(merge_join(rows, [(1, 1.0)], [0], [0]))
+
+
+@pytest.mark.unit
+def test_merge_join_sorts_text_by_code_point():
+    """Test text keys sorted case-insensitively, like the default collation
+    of SQL Server, stop the join, and keys sorted by code point, like a
+    binary collation, are paired."""
+    rows = [("a", 1.0), ("B", 2.0)]
+
+    with pytest.raises(ValueError, match=BINARY_COLLATION):
+        list(merge_join(rows, rows, [0], [0]))
+    assert list(merge_join(rows[::-1], rows[::-1], [0], [0])) == [
+        (("B", 2.0), ("B", 2.0)),
+        (("a", 1.0), ("a", 1.0)),
+    ]
+
+
+@pytest.mark.unit
+def test_merge_compare_reads_cursors():
+    """Test the rows of two cursors sorted by their queries are compared,
+    fetched a few at a time, with the missing values sorted first."""
+    connection = sqlite3.connect(":memory:")
+    connection.executescript("""
+        CREATE TABLE pbi (Month TEXT, Units REAL);
+        CREATE TABLE edw (MONTH TEXT, UNITS REAL);
+        INSERT INTO pbi VALUES (NULL, 1), ('2024/01', 10), ('2024/02', 20),
+            ('2024/03', 31);
+        INSERT INTO edw VALUES (NULL, 1), ('2024/01', 10), ('2024/03', 30),
+            ('2024/04', 40);
+        """)
+    cursor1 = connection.execute("SELECT * FROM pbi ORDER BY Month")
+    cursor2 = connection.execute("SELECT * FROM edw ORDER BY MONTH")
+
+    summary = merge_compare(
+        iter_cursor_rows(cursor1, fetch_rows=2),
+        [column[0] for column in cursor1.description],
+        iter_cursor_rows(cursor2, fetch_rows=2),
+        [column[0] for column in cursor2.description],
+        ["Month"],
+        chunk_rows=2,
+    )
+
+    assert summary.intersect_rows == 3
+    assert summary.mismatch_count == 1
+    assert summary.mismatch_sample["month"].tolist() == ["2024/03"]
+    assert summary.df1_unique_sample["month"].tolist() == ["2024/02"]
+    assert summary.df2_unique_sample["month"].tolist() == ["2024/04"]
+
+
+@pytest.mark.unit
+def test_merge_compare_empty_sides():
+    """Test two empty sides match."""
+    summary = merge_compare(
+        [], ["key", "value"], [], ["key", "value"], ["key"]
+    )
+
+    assert summary.matches()
+    assert summary.intersect_rows == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -5,6 +5,7 @@ from unittest.mock import Mock
 
 import pytest
 
+from carhartt_pbi_automate.get_logger import flush_logs
 from carhartt_pbi_automate.my_logger import MyLogger
 
 
@@ -50,6 +51,7 @@ def test_my_logger_file(_initial_database_script, _log_file, _database):
     assert logger.file_handler is not None
     assert logger.stream_handler is None
     assert logger.database is None
+    logger.close()
 
 
 @pytest.mark.unit
@@ -148,3 +150,34 @@ def test_close(
         logger.file_handler.close.assert_called_once()
     if log_to_console:
         logger.stream_handler.close.assert_called_once()
+
+
+@pytest.mark.unit
+def test_close_shared_file(_initial_database_script, _log_file, _database):
+    """Test closing a logger keeps the file of another logger writing to it
+    open, and the last logger closes it."""
+    first, second = [
+        MyLogger(
+            name=name,
+            log_file=_log_file,
+            level=logging.DEBUG,
+            log_to_console=False,
+            log_to_file=True,
+            log_to_database=False,
+            initial_database_script=_initial_database_script,
+            database=_database,
+        )
+        for name in ("test_logger", "test_logger_2")
+    ]
+    assert first.file_handler is second.file_handler
+
+    first.close()
+    second.info("Still open")
+    flush_logs()
+
+    assert second.file_handler.stream is not None
+    assert "test_logger_2 - INFO - Still open" in _log_file.read_text(
+        encoding="utf-8"
+    )
+    second.close()
+    assert second.file_handler.stream is None
@@ -0,0 +1,125 @@
+"""This module contains unit tests for the notification_coalescer module."""
+
+import pytest
+
+from carhartt_pbi_automate.notification_coalescer import NotificationCoalescer
+
+
+@pytest.mark.unit
+def test_notification_coalescer_invalid_arguments(dispatcher):
+    """Test the NotificationCoalescer class with invalid arguments."""
+    with pytest.raises(ValueError):
+        NotificationCoalescer(dispatcher, "http://webhook", expected_jobs=0)
+
+    with pytest.raises(TypeError):
+        NotificationCoalescer(dispatcher, "http://webhook", database=1)
+
+
+@pytest.mark.unit
+def test_flush_sends_summary_and_failing_jobs(
+    coalescer, dispatcher, stub_webhook, job_card
+):
+    """Test a window with several jobs sends one summary card plus the cards
+    of the failing jobs only."""
+    window = "2024-05-23"
+    coalescer.add_result(
+        window, "BOP", True, "No differences", [job_card("BOP")]
+    )
+    coalescer.add_result(
+        window, "Sales", True, "No differences", [job_card("Sales")]
+    )
+    assert not coalescer.ready(window)
+
+    coalescer.add_result(
+        window, "Supply", False, "2 values differ", [job_card("Supply")]
+    )
+    assert coalescer.ready(window)
+
+    assert coalescer.flush(window) == 2
+    dispatcher.deliver_due()
+
+    titles = [request["payload"]["title"] for request in stub_webhook.requests]
+    assert titles == [f"Validation summary {window}", "Supply"]
+    summary_text = stub_webhook.requests[0]["payload"]["sections"][0]["text"]
+    assert "| Sales | ✔ | No differences |" in summary_text
+    assert "| Supply | ❌ | 2 values differ |" in summary_text
+
+    # The window is only flushed once
+    assert coalescer.flush(window) == 0
+
+
+@pytest.mark.unit
+def test_flush_keeps_results_recorded_meanwhile(
+    coalescer, dispatcher, stub_webhook, job_card, monkeypatch
+):
+    """Test a result recorded while the window is flushed is not marked
+    flushed, and is queued by the next flush."""
+    window = "2024-05-23"
+    coalescer.add_result(window, "BOP", False, "Fail", [job_card("BOP")])
+    enqueue = dispatcher.enqueue
+
+    def enqueue_and_rerun(*args):
+        # A job run again records its result before the flush ends
+        enqueue(*args)
+        coalescer.add_result(window, "BOP", True, "OK", [job_card("BOP 2")])
+
+    monkeypatch.setattr(dispatcher, "enqueue", enqueue_and_rerun)
+    assert coalescer.flush(window) == 1
+    monkeypatch.setattr(dispatcher, "enqueue", enqueue)
+
+    assert coalescer.flush(window) == 1
+    dispatcher.deliver_due()
+    titles = [request["payload"]["title"] for request in stub_webhook.requests]
+    assert titles == ["BOP", "BOP 2"]
+
+
+@pytest.mark.unit
+def test_flush_after_a_job_ended_early(
+    dispatcher, outbox_database, stub_webhook, job_card
+):
+    """Test a window of two jobs is flushed when one of them ends early, e.g.
+    as a duplicate of a completed run, and records a result without cards."""
+    coalescer = NotificationCoalescer(
+        dispatcher,
+        stub_webhook.url,
+        expected_jobs=2,
+        database=outbox_database,
+    )
+    window = "2024-05-23"
+    coalescer.add_result(window, "Sales", False, "Fail", [job_card("Sales")])
+    assert not coalescer.has_result(window, "BOP")
+    assert not coalescer.ready(window)
+
+    coalescer.add_result(window, "BOP", True, "Skipped, already completed", [])
+
+    assert coalescer.has_result(window, "BOP")
+    assert coalescer.ready(window)
+    assert coalescer.flush(window) == 2
+    dispatcher.deliver_due()
+    titles = [request["payload"]["title"] for request in stub_webhook.requests]
+    assert titles == [f"Validation summary {window}", "Sales"]
+    summary_text = stub_webhook.requests[0]["payload"]["sections"][0]["text"]
+    assert "| BOP | ✔ | Skipped, already completed |" in summary_text
+
+
+@pytest.mark.unit
+def test_flush_single_job(coalescer, dispatcher, stub_webhook, job_card):
+    """Test a window with a single job sends the cards of that job."""
+    coalescer.add_result("2024-05-23", "BOP", True, "OK", [job_card("BOP")])
+
+    assert coalescer.flush("2024-05-23") == 1
+    dispatcher.deliver_due()
+    assert stub_webhook.requests[0]["payload"]["title"] == "BOP"
+
+
+@pytest.mark.unit
+def test_flush_stale(coalescer, job_card):
+    """Test the windows whose jobs never all reported are flushed."""
+    coalescer.add_result(
+        "2024-05-22", "BOP", False, "Error", [job_card("BOP")]
+    )
+    coalescer.add_result("2024-05-23", "BOP", True, "OK", [job_card("BOP")])
+
+    assert coalescer.flush_stale("2024-05-23") == 1
+    assert not coalescer.ready("2024-05-23")
+    assert coalescer.flush_stale("2024-05-23") == 0
@@ -0,0 +1,91 @@
+"""This module contains unit tests for the notification_dispatcher module."""
+
+import time
+
+import pytest
+
+from carhartt_pbi_automate.notification_dispatcher import (
+    OUTBOX_TABLE,
+    NotificationDispatcher,
+)
+
+
+@pytest.mark.unit
+def test_notification_dispatcher_invalid_database():
+    """Test the NotificationDispatcher class with an invalid database."""
+    with pytest.raises(TypeError):
+        NotificationDispatcher(database=1)
+
+
+@pytest.mark.unit
+def test_enqueue_is_idempotent(dispatcher):
+    """Test a card with the same idempotency key is stored once."""
+    payload = {"title": "Test Notification"}
+
+    assert dispatcher.enqueue("http://webhook", payload, "job|1")
+    assert not dispatcher.enqueue("http://webhook", payload, "job|1")
+
+    # Without a key the card is identified by its URL and payload
+    assert dispatcher.enqueue("http://webhook", payload)
+    assert not dispatcher.enqueue("http://webhook", payload)
+
+    assert dispatcher.pending_count() == 2
+
+
+@pytest.mark.unit
+def test_deliver_due(dispatcher, stub_webhook):
+    """Test the pending cards are posted to the webhook."""
+    dispatcher.enqueue(stub_webhook.url, {"title": "first"})
+    dispatcher.enqueue(stub_webhook.url, {"title": "second"})
+
+    assert dispatcher.deliver_due() == 2
+    assert dispatcher.pending_count() == 0
+    titles = [request["payload"]["title"] for request in stub_webhook.requests]
+    assert titles == ["first", "second"]
+
+    # Delivered cards are not sent again
+    assert dispatcher.deliver_due() == 0
+    assert len(stub_webhook.requests) == 2
+
+
+@pytest.mark.unit
+def test_deliver_due_retries_with_backoff(dispatcher, stub_webhook):
+    """Test a failed delivery is retried later, and marked as failed once
+    every attempt is used."""
+    stub_webhook.status_code = 500
+    dispatcher.enqueue(stub_webhook.url, {"title": "retried"})
+    now = time.time()
+
+    assert dispatcher.deliver_due(now) == 0
+    # The next attempt is scheduled in the future
+    assert dispatcher.deliver_due(now) == 0
+    assert len(stub_webhook.requests) == 1
+
+    dispatcher.deliver_due(now + 60)
+    dispatcher.deliver_due(now + 120)
+    assert len(stub_webhook.requests) == 3
+
+    rows = dispatcher.database.select(OUTBOX_TABLE, ["status", "attempts"])
+    assert (rows[0]["status"], rows[0]["attempts"]) == ("failed", 3)
+    assert dispatcher.pending_count() == 0
+
+
+@pytest.mark.unit
+def test_background_delivery(dispatcher, stub_webhook):
+    """Test the cards are delivered by the background thread."""
+    dispatcher.start()
+    dispatcher.enqueue(stub_webhook.url, {"title": "background"})
+
+    assert dispatcher.drain(timeout=5)
+    assert len(stub_webhook.requests) == 1
+
+    dispatcher.stop(timeout=5)
+    assert dispatcher._thread is None  # pylint: disable=W0212
+
+
+@pytest.mark.unit
+def test_drain_timeout(dispatcher):
+    """Test drain returns False when the cards are not delivered in time."""
+    dispatcher.enqueue("http://127.0.0.1:9/unreachable", {"title": "late"})
+
+    assert not dispatcher.drain(timeout=0.05)
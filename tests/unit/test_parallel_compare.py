@@ -0,0 +1,89 @@
+"""This module contains unit tests for the parallel_compare module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.parallel_compare import (
+    parallel_compare_with_tolerance,
+    partition_keys,
+    read_partition,
+    write_partitions,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS
+from carhartt_pbi_automate.tolerance_compare import (
+    compare_with_tolerance,
+    normalise_frame,
+)
+
+
+@pytest.mark.unit
+def test_parallel_compare_matches_serial_compare(synthetic_pair, tmp_path):
+    """Test the merged summary of the partitions is the summary of the
+    whole frames."""
+    serial = compare_with_tolerance(
+        synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+    )
+    parallel = parallel_compare_with_tolerance(
+        synthetic_pair.pbi,
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        max_workers=2,
+        partitions=5,
+        min_rows=0,
+        work_dir=tmp_path,
+    )
+
+    assert parallel.df1_rows == serial.df1_rows
+    assert parallel.df2_rows == serial.df2_rows
+    assert parallel.intersect_rows == serial.intersect_rows
+    assert parallel.df2_unique_count == serial.df2_unique_count
+    assert parallel.mismatch_count == synthetic_pair.discrepancies
+    pd.testing.assert_frame_equal(
+        parallel.column_stats.sort_index(), serial.column_stats.sort_index()
+    )
+    # The temporary Arrow files are removed
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.unit
+def test_partition_keys_ignores_key_dtypes():
+    """Test the same keys get the same partition once normalised, whatever
+    their original dtypes."""
+    keys = pd.DataFrame({"month": ["2024/01", "2024/02"], "product": [1.0, 2]})
+    other = pd.DataFrame(
+        {"month": pd.Categorical(["2024/01 ", "2024/02"]), "product": [1, 2]}
+    )
+
+    assert (
+        partition_keys(normalise_frame(keys), ["month", "product"], 7)
+        == partition_keys(normalise_frame(other), ["month", "product"], 7)
+    ).all()
+
+
+@pytest.mark.unit
+def test_write_and_read_partitions(synthetic_pair, tmp_path):
+    """Test every row is written in the partition of its keys."""
+    frame = synthetic_pair.edw.astype({KEY_COLUMNS[0]: str})
+    path = tmp_path / "frame.arrow"
+    bounds = write_partitions(frame, list(KEY_COLUMNS), 3, path)
+
+    assert bounds[0] == 0 and bounds[-1] == len(frame)
+    parts = [read_partition(path, bounds[i : i + 2]) for i in range(3)]
+    for index, part in enumerate(parts):
+        assert (partition_keys(part, list(KEY_COLUMNS), 3) == index).all()
+    restored = pd.concat(parts).sort_values(list(KEY_COLUMNS))
+    pd.testing.assert_frame_equal(restored.reset_index(drop=True), frame)
+
+
+@pytest.mark.unit
+def test_parallel_compare_small_frames(synthetic_pair):
+    """Test small frames are compared in the current process."""
+    summary = parallel_compare_with_tolerance(
+        synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+    )
+
+    assert summary.mismatch_count == synthetic_pair.discrepancies
+
+
+if __name__ == "__main__":
+    pytest.main()
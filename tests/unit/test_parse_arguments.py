@@ -5,7 +5,12 @@ import argparse
 
 import pytest
 
-from carhartt_pbi_automate.parse_arguments import parse_arguments
+from carhartt_pbi_automate.parse_arguments import (
+    DEFAULT_DAX_FILE,
+    DEFAULT_SQL_FILE,
+    parse_arguments,
+)
+from carhartt_pbi_automate.spill_compare import parse_memory_budget
 
 
 @patch("argparse.ArgumentParser.add_argument")
@@ -23,17 +28,24 @@ def test_parse_arguments(mock_parse_args, mock_add_argument):
     mock_add_argument.assert_any_call(
         "--daxfile",
         type=str,
-        default=r"C:\Users\rescobar\OneDrive - Carhartt Inc\Documents\git\powerbi-automate\queries\supply.dax",
+        default=str(DEFAULT_DAX_FILE),
         help="File path to DAX query",
     )
 
     mock_add_argument.assert_any_call(
         "--sqlfile",
         type=str,
-        default=r"C:\Users\rescobar\OneDrive - Carhartt Inc\Documents\git\powerbi-automate\queries\supply.sql",
+        default=str(DEFAULT_SQL_FILE),
         help="File path to SQL query",
     )
 
+    mock_add_argument.assert_any_call(
+        "--memory-budget",
+        type=parse_memory_budget,
+        default=None,
+        help="Memory the comparison may use, e.g. 4GB. Larger results are spilled to disk",
+    )
+
 
 @pytest.mark.parametrize(
     ["daxfile_arg", "sqlfile_arg"],
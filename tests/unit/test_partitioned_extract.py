@@ -0,0 +1,184 @@
+"""This module contains unit tests for the partitioned_extract module."""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.arrow_extract import extract_frame
+from carhartt_pbi_automate import partitioned_extract
+from carhartt_pbi_automate.frame_schema import FrameSchema
+from carhartt_pbi_automate.partitioned_extract import (
+    ConnectionPool,
+    PartitionSpec,
+    add_partition_filter,
+    extract_partitioned,
+)
+
+QUERY_NAME = "Supply - Inventory Demand Sales"
+
+
+@pytest.mark.unit
+def test_partition_ranges():
+    """Test the range of the column is divided into consecutive slices."""
+    assert PartitionSpec("Month", -1, 6).ranges() == [
+        (-1, 0),
+        (1, 2),
+        (3, 4),
+        (5, 6),
+    ]
+    assert PartitionSpec("Week", 1, 10, slices=3).ranges() == [
+        (1, 4),
+        (5, 7),
+        (8, 10),
+    ]
+    assert PartitionSpec("Month", 0, 1, slices=4).ranges() == [(0, 0), (1, 1)]
+
+    with pytest.raises(ValueError):
+        PartitionSpec("Month", 6, -1)
+    with pytest.raises(ValueError):
+        PartitionSpec("Month", -1, 6, slices=0)
+
+
+@pytest.mark.unit
+def test_add_partition_filter():
+    """Test the predicate is added to the WHERE clause of the outer query,
+    not to the subqueries, comments or strings."""
+    query = (
+        "DECLARE @Key INT;\n"
+        "SET @Key = (SELECT [DateKey] FROM [Days] WHERE [Offset] = 0);\n"
+        "-- the WHERE clause below\n"
+        "SELECT [Month], SUM([Units]) FROM [Plans]\n"
+        "WHERE [Type] = 'WHERE' AND [Key] IN (SELECT 1 WHERE 1 = 1)\n"
+        "GROUP BY [Month]"
+    )
+
+    actual = add_partition_filter(query, "[Month] BETWEEN 1 AND 2")
+
+    assert actual == query.replace(
+        "WHERE [Type]", "WHERE ([Month] BETWEEN 1 AND 2) AND [Type]"
+    )
+    with pytest.raises(ValueError):
+        add_partition_filter("SELECT * FROM [Plans]", "[Month] = 1")
+
+
+@pytest.mark.parametrize("backend", ["pandas", "arrow"])
+@pytest.mark.unit
+def test_partitioned_matches_single_read(
+    warehouse_file, project_root, backend
+):
+    """Test the slices read in parallel give the results of the query read
+    on one connection."""
+    _, connect = warehouse_file
+    queries = project_root / "queries"
+    sql_query = (queries / f"{QUERY_NAME}.sql").read_text(encoding="utf-8")
+    schema = FrameSchema.from_dax(
+        (queries / f"{QUERY_NAME}.msdax").read_text(encoding="utf-8")
+    )
+    partition = PartitionSpec("[DT].[CurrentMonthOffset]", -1, 6)
+
+    expected = extract_frame(connect(), sql_query, schema, backend)
+    with ConnectionPool(connect, max_sessions=3) as pool:
+        actual = extract_partitioned(
+            pool, sql_query, schema, partition, backend
+        )
+        assert 1 <= pool.opened <= 3
+
+    assert len(expected) == 8
+    first_column = schema.key_columns[0]
+    pd.testing.assert_frame_equal(
+        actual.sort_values(first_column).reset_index(drop=True),
+        expected.sort_values(first_column).reset_index(drop=True),
+    )
+
+
+@pytest.mark.unit
+def test_partition_splitting_groups(warehouse_file, project_root):
+    """Test a partition column that splits the groups of the query is an
+    error, instead of results with duplicated keys."""
+    _, connect = warehouse_file
+    queries = project_root / "queries"
+    sql_query = (queries / f"{QUERY_NAME}.sql").read_text(encoding="utf-8")
+    schema = FrameSchema.from_dax(
+        (queries / f"{QUERY_NAME}.msdax").read_text(encoding="utf-8")
+    )
+    partition = PartitionSpec("[SCP].[ProductKey]", 1, 100, slices=2)
+
+    with ConnectionPool(connect, max_sessions=2) as pool:
+        with pytest.raises(ValueError):
+            extract_partitioned(pool, sql_query, schema, partition, "arrow")
+
+
+@pytest.mark.unit
+def test_connection_pool_governor():
+    """Test the connections lent at a time are capped by the pool and by the
+    governor shared between pools, and reused."""
+    governor = threading.BoundedSemaphore(3)
+    lock = threading.Lock()
+    lent = [0, 0]
+
+    def borrow(pool):
+        with pool.connection():
+            with lock:
+                lent[0] += 1
+                lent[1] = max(lent)
+            time.sleep(0.02)
+            with lock:
+                lent[0] -= 1
+
+    pools = [ConnectionPool(object, 2, governor) for _ in range(2)]
+    threads = [
+        threading.Thread(target=borrow, args=(pools[index % 2],))
+        for index in range(12)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert lent[1] == 3
+    assert all(pool.opened <= 2 for pool in pools)
+
+
+@pytest.mark.unit
+def test_arrow_odbc_slices_open_no_pool_connection(
+    warehouse_file, project_root, monkeypatch
+):
+    """Test the slices read by arrow-odbc on their own session only take a
+    session of the pool, without opening a connection of the pool."""
+    _, connect = warehouse_file
+    queries = project_root / "queries"
+    sql_query = (queries / f"{QUERY_NAME}.sql").read_text(encoding="utf-8")
+    schema = FrameSchema.from_dax(
+        (queries / f"{QUERY_NAME}.msdax").read_text(encoding="utf-8")
+    )
+    expected = extract_frame(connect(), sql_query, schema, "arrow")
+    read = partitioned_extract.read_arrow
+    sessions = []
+
+    def read_arrow(connection, query, batch_size):
+        # The connection string stands for the ODBC session of arrow-odbc
+        assert connection == "DSN=EDW"
+        sessions.append(pool._sessions._value)  # pylint: disable=W0212
+        return read(connect(), query, batch_size)
+
+    monkeypatch.setattr(partitioned_extract, "arrow_odbc", object())
+    monkeypatch.setattr(partitioned_extract, "read_arrow", read_arrow)
+    with ConnectionPool(connect, max_sessions=2) as pool:
+        actual = extract_partitioned(
+            pool,
+            sql_query,
+            schema,
+            PartitionSpec("[DT].[CurrentMonthOffset]", -1, 6),
+            "arrow",
+            connection_string="DSN=EDW",
+        )
+        assert pool.opened == 0
+
+    assert all(free < 2 for free in sessions)
+    assert len(actual) == len(expected)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,80 @@
+"""This module contains unit tests for the readiness module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.fake_backends import FakeBiConnection
+from carhartt_pbi_automate.readiness import ReadinessGate
+from tests.fixtures.readiness import PLAN_VERSION
+
+PARAMETERS = {"plan_versions": PLAN_VERSION}
+
+
+@pytest.mark.unit
+def test_probe(readiness_gate, warehouse, refreshed_dataset):
+    """Test the probes return the versions of the data loaded."""
+    versions = readiness_gate.probe(warehouse, refreshed_dataset, PARAMETERS)
+
+    assert versions == {"edw": "20240515", "power_bi": PLAN_VERSION}
+
+
+@pytest.mark.unit
+def test_probe_not_ready(readiness_gate, warehouse, refreshed_dataset):
+    """Test the probes return None until the data is loaded."""
+    warehouse.execute(
+        "DELETE FROM SizedWeeklyCombinedPlans WHERE VersionDateKey = 20240515"
+    )
+
+    versions = readiness_gate.probe(
+        warehouse, refreshed_dataset, {"plan_versions": "NIGHTLY-5/16/2024"}
+    )
+
+    assert versions == {"edw": None, "power_bi": None}
+
+
+@pytest.mark.unit
+def test_wait(readiness_gate, warehouse, sleeps):
+    """Test the gate waits with backoff until both sides are ready."""
+    slept, _, _ = sleeps
+    refreshed_after = 3
+
+    def _plan_versions(_: str) -> pd.DataFrame:
+        ready = len(slept) >= refreshed_after
+        return pd.DataFrame(
+            {"Plan Name": [PLAN_VERSION] if ready else []}, dtype=object
+        )
+
+    data_version = readiness_gate.wait(
+        warehouse, FakeBiConnection(_plan_versions), PARAMETERS
+    )
+
+    assert data_version == f"edw=20240515;power_bi={PLAN_VERSION}"
+    assert len(slept) == refreshed_after
+    # The delay doubles after every check, with jitter
+    assert 30 <= slept[0] <= 60
+    assert 60 <= slept[1] <= 120
+    assert 120 <= slept[2] <= 240
+
+
+@pytest.mark.unit
+def test_wait_timeout(readiness_gate, warehouse, sleeps):
+    """Test the gate gives up when the data is not ready in time."""
+    slept, _, _ = sleeps
+    failing = FakeBiConnection(lambda _: 1 / 0)
+
+    assert readiness_gate.wait(warehouse, failing, PARAMETERS) is None
+    assert sum(slept) == pytest.approx(readiness_gate.timeout)
+
+
+@pytest.mark.unit
+def test_invalid_gate():
+    """Test a gate without probes or with invalid delays raises a
+    ValueError."""
+    with pytest.raises(ValueError):
+        ReadinessGate()
+    with pytest.raises(ValueError):
+        ReadinessGate("probe.sql", base_delay=10, max_delay=5)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,142 @@
+"""This module contains unit tests for the run_registry module."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from carhartt_pbi_automate.database import Database
+from carhartt_pbi_automate.run_registry import (
+    JOB_RUNS_SQL_SCRIPT,
+    RunRegistry,
+    make_run_key,
+)
+
+DATA_VERSION = "edw=20240523;power_bi=NIGHTLY-5/23/2024"
+
+
+@pytest.mark.unit
+def test_make_run_key(run_parameters):
+    """Test the key depends on the job, the parameters and the version."""
+    key = make_run_key("Sales", run_parameters, DATA_VERSION)
+
+    assert key == make_run_key("Sales", dict(run_parameters), DATA_VERSION)
+    assert key != make_run_key("BOP", run_parameters, DATA_VERSION)
+    assert key != make_run_key("Sales", {}, DATA_VERSION)
+    assert key != make_run_key("Sales", run_parameters)
+
+
+@pytest.mark.unit
+def test_acquire(run_registry, run_parameters):
+    """Test a run is locked once and its outcome returned afterwards."""
+    acquired, record = run_registry.acquire(
+        "Sales", run_parameters, DATA_VERSION
+    )
+    assert acquired
+    assert record.status == "running"
+    assert record.parameters == run_parameters
+
+    # A duplicate invocation while the run is running
+    acquired, duplicate = run_registry.acquire(
+        "Sales", run_parameters, DATA_VERSION
+    )
+    assert not acquired
+    assert duplicate.status == "running"
+
+    run_registry.complete(
+        record.run_key, False, "3 values differ", "results/2024"
+    )
+
+    # A duplicate invocation once the run is completed
+    acquired, duplicate = run_registry.acquire(
+        "Sales", run_parameters, DATA_VERSION
+    )
+    assert not acquired
+    assert duplicate.completed
+    assert duplicate.passed is False
+    assert duplicate.summary == "3 values differ"
+    assert duplicate.results_path == "results/2024"
+
+    # Unless it is forced
+    acquired, forced = run_registry.acquire(
+        "Sales", run_parameters, DATA_VERSION, force=True
+    )
+    assert acquired
+    assert forced.status == "running"
+
+
+@pytest.mark.unit
+def test_find(run_registry, run_parameters):
+    """Test the running and recently completed runs are found whatever their
+    data version, and the failed or older runs are not."""
+    started = time.time()
+    assert run_registry.find("Sales", run_parameters, since=started) is None
+
+    _, record = run_registry.acquire("Sales", run_parameters, DATA_VERSION)
+    found = run_registry.find("Sales", run_parameters)
+    assert found.run_key == record.run_key
+    assert run_registry.find("BOP", run_parameters) is None
+    assert run_registry.find("Sales", {"plan_versions": "x'y"}) is None
+
+    run_registry.complete(record.run_key, True, "No differences")
+    assert run_registry.find("Sales", run_parameters) is None
+    assert run_registry.find("Sales", run_parameters, since=started).completed
+    assert run_registry.find(
+        "Sales", run_parameters, since=time.time() + 1
+    ) is (None)
+
+    _, failed = run_registry.acquire("BOP", run_parameters, DATA_VERSION)
+    run_registry.fail(failed.run_key, "EDW outage")
+    assert run_registry.find("BOP", run_parameters, since=started) is None
+
+
+@pytest.mark.unit
+def test_failed_run_is_run_again(run_registry, run_parameters):
+    """Test a failed run can be locked again."""
+    _, record = run_registry.acquire("Sales", run_parameters)
+    run_registry.fail(record.run_key, "EDW outage")
+
+    assert run_registry.get(record.run_key).summary == "EDW outage"
+    acquired, record = run_registry.acquire("Sales", run_parameters)
+    assert acquired
+    assert record.summary is None
+
+
+@pytest.mark.unit
+def test_expired_lock(job_runs_database, run_parameters):
+    """Test a run whose lock expired, e.g. after a crash, is run again."""
+    crashed = RunRegistry(job_runs_database, lease_seconds=-1)
+    crashed.acquire("Sales", run_parameters)
+
+    acquired, _ = RunRegistry(job_runs_database).acquire(
+        "Sales", run_parameters
+    )
+
+    assert acquired
+
+
+@pytest.mark.unit
+def test_concurrent_acquire(job_runs_database, run_parameters):
+    """Test only one of several concurrent invocations, each with its own
+    connection like separate processes, locks the run."""
+    registries = [
+        RunRegistry(Database(job_runs_database.db_file, JOB_RUNS_SQL_SCRIPT))
+        for _ in range(8)
+    ]
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(
+                lambda registry: registry.acquire("Sales", run_parameters)[0],
+                registries,
+            )
+        )
+
+    assert results.count(True) == 1
+    # A duplicate invocation returns in milliseconds
+    assert time.time() - start < 5
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,167 @@
+"""This module contains unit tests for the sampling module."""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from carhartt_pbi_automate.dax import parse_dax_columns
+from carhartt_pbi_automate.sampling import (
+    SampleCheck,
+    SampleSpec,
+    add_summarize_filter,
+    wilson_interval,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS, PRODUCT_COLUMN
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+BENCHMARK_QUERY = "queries/benchmark/Supply - Inventory Demand Sales by Product"
+
+
+@pytest.mark.unit
+def test_mask_matches_the_sql_predicate():
+    """Test the keys sampled in Python are the keys the SQL predicate
+    selects, negative keys included."""
+    spec = SampleSpec("k", "'Products'[Product Key]", rate=0.1, buckets=100)
+    keys = list(range(-500, 2000))
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (k INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?)", [(k,) for k in keys])
+
+    selected = connection.execute(
+        f"SELECT k FROM t WHERE {spec.sql_predicate()} ORDER BY k"
+    ).fetchall()
+
+    expected = np.array(keys)[spec.mask(keys)]
+    np.testing.assert_array_equal([row[0] for row in selected], expected)
+
+
+@pytest.mark.unit
+def test_mask_samples_the_rate():
+    """Test consecutive keys are sampled at the rate of the spec."""
+    spec = SampleSpec("k", "k", rate=0.05)
+
+    assert spec.rate == 0.05
+    assert spec.mask(np.arange(1, 100_001)).mean() == pytest.approx(
+        0.05, abs=0.005
+    )
+
+
+@pytest.mark.unit
+def test_sample_queries(project_root):
+    """Test the sampled queries filter the key column, and the DAX query
+    still returns the same columns."""
+    spec = SampleSpec("[SCP].[ProductKey]", "'Products'[Product Key]")
+    sql = (project_root / f"{BENCHMARK_QUERY}.sql").read_text()
+    dax = (project_root / f"{BENCHMARK_QUERY}.msdax").read_text()
+
+    sampled_sql = spec.sql_query(sql)
+    sampled_dax = spec.dax_query(dax)
+
+    assert spec.sql_predicate() in sampled_sql
+    assert spec.dax_filter() in sampled_dax
+    assert parse_dax_columns(sampled_dax) == parse_dax_columns(dax)
+
+
+@pytest.mark.unit
+def test_add_summarize_filter():
+    """Test the filter is added before the first measure, and queries
+    without measures are refused."""
+    query = (
+        "EVALUATE SUMMARIZECOLUMNS('Dates'[Month], 'Odd, (name)'[Key], "
+        '"Units", [Units])'
+    )
+
+    filtered = add_summarize_filter(query, "FILTER(x, y)")
+
+    assert filtered.index("FILTER(x, y)") < filtered.index('"Units"')
+    assert filtered.index("'Odd, (name)'[Key]") < filtered.index("FILTER")
+    with pytest.raises(ValueError):
+        add_summarize_filter("EVALUATE 'Dates'", "FILTER(x, y)")
+    with pytest.raises(ValueError):
+        add_summarize_filter(
+            "EVALUATE SUMMARIZECOLUMNS('Dates'[Month])", "FILTER(x, y)"
+        )
+
+
+@pytest.mark.unit
+def test_wilson_interval():
+    """Test the Wilson interval against known values."""
+    assert wilson_interval(0, 100)[0] == 0
+    assert wilson_interval(0, 100)[1] == pytest.approx(0.037, abs=1e-3)
+    low, high = wilson_interval(10, 100)
+    assert low == pytest.approx(0.0552, abs=1e-4)
+    assert high == pytest.approx(0.1744, abs=1e-4)
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    with pytest.raises(ValueError):
+        wilson_interval(5, 4)
+
+
+@pytest.mark.unit
+def test_sample_check(synthetic_pair):
+    """Test a sample with discrepancies escalates, and a clean sample
+    bounds the discrepancy rate."""
+    spec = SampleSpec("k", "k", rate=0.2)
+    pbi = synthetic_pair.pbi[spec.mask(synthetic_pair.pbi[PRODUCT_COLUMN])]
+    edw = synthetic_pair.edw[spec.mask(synthetic_pair.edw[PRODUCT_COLUMN])]
+
+    summary = compare_with_tolerance(pbi, edw, list(KEY_COLUMNS))
+    check = SampleCheck(summary)
+
+    assert check.escalate
+    assert check.sampled_rows == len(pbi) + summary.df2_unique_count
+    assert check.discrepant_rows == (
+        summary.mismatch_rows
+        + summary.df1_unique_count
+        + summary.df2_unique_count
+    )
+    assert 0 < summary.mismatch_rows <= summary.mismatch_count
+
+    clean = SampleCheck(compare_with_tolerance(pbi, pbi, list(KEY_COLUMNS)))
+    assert not clean.escalate
+    assert clean.interval[0] == 0
+    assert f"sample of {len(pbi)} rows" in clean.describe()
+
+
+@pytest.mark.unit
+def test_sample_check_too_small(synthetic_pair):
+    """Test an empty sample, e.g. before the data is loaded, or a sample
+    smaller than its minimum escalates instead of passing."""
+    empty = synthetic_pair.pbi.iloc[:0]
+    summary = compare_with_tolerance(empty, empty, list(KEY_COLUMNS))
+
+    check = SampleCheck(summary)
+
+    assert summary.matches()
+    assert check.sampled_rows == 0
+    assert check.too_small
+    assert check.escalate
+    assert check.describe().startswith("Only 0 rows sampled")
+
+    few = synthetic_pair.pbi.head(10)
+    summary = compare_with_tolerance(few, few, list(KEY_COLUMNS))
+    assert SampleCheck(summary).escalate
+    assert not SampleCheck(summary, min_rows=10).escalate
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"sql_column": ""},
+        {"rate": 0},
+        {"rate": 1.5},
+        {"confidence": 1},
+        {"buckets": 0},
+        {"min_rows": 0},
+    ],
+)
+def test_sample_spec_invalid(kwargs):
+    """Test invalid samples raise a ValueError."""
+    arguments = {"sql_column": "k", "dax_column": "k", **kwargs}
+    with pytest.raises(ValueError):
+        SampleSpec(**arguments)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -2,11 +2,16 @@
 
 from unittest.mock import patch
 
+import pymsteams
 import pytest
 
 from carhartt_pbi_automate.send_teams_message import (
+    build_header,
+    build_payloads,
     send_ok_teams_message,
     send_fail_teams_message,
+    split_text,
+    text_size,
 )
 
 
@@ -43,9 +48,131 @@ def test_send_fail_teams_message(mock_connectorcard):
         "section_text": "This is a test section.",
         "compare_report": "This is a test comparison report.",
     }
-    # Mock the send method of the connectorcard object
-    mock_connectorcard.return_value.send.return_value = False
+    # Mock the send method of the connectorcard object, it raises an
+    # exception when the webhook rejects the card
+    mock_connectorcard.return_value.send.side_effect = (
+        pymsteams.TeamsWebhookException("400")
+    )
 
     # Call the send_fail_teams_message function
     response = send_fail_teams_message(args)
     assert response is False
+
+
+@patch("carhartt_pbi_automate.send_teams_message.pymsteams.connectorcard")
+@pytest.mark.unit
+def test_send_payloads_after_a_failed_card(mock_connectorcard, long_report):
+    """Test a card rejected by the webhook does not stop the next cards, and
+    the message is reported as not sent."""
+    args = {
+        "teams_webhook_url": "https://outlook.office.com/webhook/...",
+        "color": "red",
+        "notification_title": "Test Notification",
+        "message": "This is a test message.",
+        "compare_report": long_report,
+        "max_payload_bytes": 20_000,
+        "max_cards": 3,
+    }
+    mock_connectorcard.return_value.send.side_effect = [
+        pymsteams.TeamsWebhookException("400"),
+        True,
+        True,
+    ]
+
+    assert send_fail_teams_message(args) is False
+    assert mock_connectorcard.return_value.send.call_count == 3
+
+
+@pytest.mark.unit
+def test_send_fail_teams_message_splits_large_report(stub_webhook, long_report):
+    """Test a large report is paginated across several cards, each one within
+    the byte budget."""
+    max_payload_bytes = 20_000
+    args = {
+        "teams_webhook_url": stub_webhook.url,
+        "color": "red",
+        "notification_title": "Test Notification",
+        "message": "This is a test message.",
+        "compare_report": long_report,
+        "max_payload_bytes": max_payload_bytes,
+        "max_cards": 10,
+    }
+
+    assert send_fail_teams_message(args) is True
+
+    requests = stub_webhook.requests
+    assert len(requests) > 1
+    assert all(request["size"] <= max_payload_bytes for request in requests)
+    assert requests[0]["payload"]["title"] == (
+        f"Test Notification (1/{len(requests)})"
+    )
+
+    # Every line of the report was sent exactly once, in order
+    texts = [
+        section["text"].removeprefix("```\n").removesuffix("\n```")
+        for request in requests
+        for section in request["payload"]["sections"]
+    ]
+    assert "\n".join(texts) == long_report
+
+
+@pytest.mark.unit
+def test_send_ok_teams_message_truncates_to_max_cards(
+    stub_webhook, long_report
+):
+    """Test the message is truncated when it needs more than max_cards."""
+    args = {
+        "teams_webhook_url": stub_webhook.url,
+        "color": "00FF00",
+        "notification_title": "Test Notification",
+        "message": "This is a test message.",
+        "section_title": "Test Section",
+        "section_text": long_report,
+        "max_payload_bytes": 10_000,
+        "max_cards": 2,
+    }
+
+    assert send_ok_teams_message(args) is True
+
+    requests = stub_webhook.requests
+    assert len(requests) == 2
+    assert all(request["size"] <= 10_000 for request in requests)
+    last_section = requests[-1]["payload"]["sections"][-1]
+    assert last_section["title"] == "Message truncated"
+
+
+@pytest.mark.unit
+def test_build_payloads_single_card():
+    """Test a small message is sent in one card without a page number."""
+    header = build_header(
+        {"color": "red", "notification_title": "Title", "message": "Text"}
+    )
+    payloads = build_payloads(header, [("Section", "short text")])
+
+    assert len(payloads) == 1
+    assert payloads[0]["title"] == "Title"
+    assert payloads[0]["themeColor"] == "E81123"
+    assert payloads[0]["sections"][0]["text"] == "short text"
+
+
+@pytest.mark.unit
+def test_build_payloads_budget_too_small():
+    """Test a budget smaller than the card header raises a ValueError."""
+    header = build_header(
+        {"color": "red", "notification_title": "Title", "message": "Text"}
+    )
+    with pytest.raises(ValueError):
+        build_payloads(header, [("Section", "text")], max_payload_bytes=50)
+
+
+@pytest.mark.unit
+def test_split_text():
+    """Test the split_text function."""
+    text = "\n".join(["a" * 10] * 10)
+    chunks = split_text(text, 25)
+
+    assert "\n".join(chunks) == text
+    assert all(text_size(chunk) <= 25 for chunk in chunks)
+
+    # A line longer than the budget is split as well
+    assert split_text("b" * 30, 10) == ["b" * 10] * 3
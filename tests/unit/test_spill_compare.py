@@ -0,0 +1,161 @@
+"""This module contains unit tests for the spill_compare module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.spill_compare import (
+    estimate_frame_bytes,
+    parse_memory_budget,
+    partition_keys,
+    read_partition,
+    spill_compare,
+    spill_partitions,
+)
+from carhartt_pbi_automate.synthetic_data import KEY_COLUMNS, iter_chunks
+from carhartt_pbi_automate.tolerance_compare import (
+    compare_with_tolerance,
+    normalise_frame,
+)
+
+
+def _assert_same_summary(summary, expected):
+    """Assert two summaries have the same counts and statistics."""
+    assert summary.df1_rows == expected.df1_rows
+    assert summary.df2_rows == expected.df2_rows
+    assert summary.intersect_rows == expected.intersect_rows
+    assert summary.df1_unique_count == expected.df1_unique_count
+    assert summary.df2_unique_count == expected.df2_unique_count
+    pd.testing.assert_frame_equal(summary.column_stats, expected.column_stats)
+
+
+@pytest.mark.unit
+def test_spill_compare_within_budget(synthetic_pair, tmp_path):
+    """Test results fitting in the budget are compared in memory."""
+    summary = spill_compare(
+        synthetic_pair.pbi,
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        memory_budget=parse_memory_budget("1GB"),
+        work_dir=tmp_path,
+    )
+
+    _assert_same_summary(
+        summary,
+        compare_with_tolerance(
+            synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+        ),
+    )
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("memory_budget", [200_000, 20_000])
+def test_spill_compare_over_budget(synthetic_pair, tmp_path, memory_budget):
+    """Test results exceeding the budget are spilled and compared one
+    partition at a time, the small budget splitting the partitions again."""
+    summary = spill_compare(
+        synthetic_pair.pbi,
+        synthetic_pair.edw,
+        list(KEY_COLUMNS),
+        memory_budget=memory_budget,
+        partitions=4,
+        work_dir=tmp_path,
+    )
+
+    _assert_same_summary(
+        summary,
+        compare_with_tolerance(
+            synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+        ),
+    )
+    assert summary.mismatch_count == synthetic_pair.discrepancies
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.unit
+def test_spill_compare_chunks(synthetic_pair):
+    """Test the chunks of the results are compared like the whole results,
+    without concatenating them."""
+    chunks = list(
+        iter_chunks(
+            1000,
+            months=8,
+            discrepancy_rate=0.01,
+            missing_rate=0.02,
+            seed=7,
+            chunk_rows=300,
+        )
+    )
+
+    summary = spill_compare(
+        (pbi for pbi, _, _ in chunks),
+        (edw for _, edw, _ in chunks),
+        list(KEY_COLUMNS),
+        memory_budget=100_000,
+    )
+
+    _assert_same_summary(
+        summary,
+        compare_with_tolerance(
+            synthetic_pair.pbi, synthetic_pair.edw, list(KEY_COLUMNS)
+        ),
+    )
+
+
+@pytest.mark.unit
+def test_spill_partitions(synthetic_pair, tmp_path):
+    """Test every row is written to the partition of its keys, and the
+    partitions are read back with their columns even when empty."""
+    frame = normalise_frame(synthetic_pair.edw)
+    chunks = [frame.iloc[:400], frame.iloc[400:]]
+
+    sizes = spill_partitions(chunks, list(KEY_COLUMNS), 3, tmp_path)
+
+    partition = partition_keys(frame, list(KEY_COLUMNS), 3, 0)
+    for index in range(3):
+        rows = read_partition(tmp_path, index)
+        assert len(rows) == (partition == index).sum()
+        assert sizes[index] >= estimate_frame_bytes(rows) > 0
+    assert read_partition(tmp_path, 5).columns.equals(frame.columns)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (1024, 1024),
+        ("2048", 2048),
+        ("512MB", 512 * 1024**2),
+        ("4 gb", 4 * 1024**3),
+        ("1.5K", 1536),
+    ],
+)
+def test_parse_memory_budget(text, expected):
+    """Test the budget is read in bytes, with an optional unit."""
+    assert parse_memory_budget(text) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("text", ["", "4 PB", "-1", 0, "0MB"])
+def test_parse_memory_budget_invalid(text):
+    """Test an invalid budget raises an error."""
+    with pytest.raises(ValueError):
+        parse_memory_budget(text)
+
+
+@pytest.mark.unit
+def test_spill_compare_invalid_arguments(synthetic_pair):
+    """Test an invalid budget, partition count or empty side raises."""
+    join_columns = list(KEY_COLUMNS)
+    with pytest.raises(ValueError):
+        spill_compare(synthetic_pair.pbi, synthetic_pair.edw, join_columns, 0)
+    with pytest.raises(ValueError):
+        spill_compare(
+            synthetic_pair.pbi, synthetic_pair.edw, join_columns, 1, 1
+        )
+    with pytest.raises(ValueError):
+        spill_compare(iter([]), synthetic_pair.edw, join_columns, 1024**3)
+
+
+if __name__ == "__main__":
+    pytest.main()
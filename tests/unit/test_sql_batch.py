@@ -0,0 +1,95 @@
+"""This module contains unit tests for the sql_batch module."""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.sql_batch import (
+    SqlBatcher,
+    batch_sql_queries,
+    execute_sql_batch,
+)
+
+
+@pytest.mark.unit
+def test_batch_sql_queries(sql_queries):
+    """Test the variables are declared and set once, before the statements
+    of the queries."""
+    batch = batch_sql_queries(sql_queries)
+
+    assert batch.startswith("SET NOCOUNT ON;\nDECLARE @VersionDateToValidate")
+    assert batch.count("DECLARE") == 1
+    assert batch.count("SET @VersionDateToValidate") == 1
+    assert batch.index("SET @VersionDateToValidate") < batch.index("WITH")
+    assert batch.count("GROUP BY") == sum(
+        query.count("GROUP BY") for query in sql_queries
+    )
+
+
+@pytest.mark.parametrize(
+    "queries",
+    [
+        ["DECLARE @Key INT; SELECT @Key", "DECLARE @Key DATE; SELECT @Key"],
+        [
+            "DECLARE @Key INT; SET @Key = 1; SELECT @Key",
+            "DECLARE @key INT; SET @key = 2; SELECT @key",
+        ],
+    ],
+)
+@pytest.mark.unit
+def test_batch_sql_queries_conflict(queries):
+    """Test variables declared or set differently cannot be hoisted."""
+    with pytest.raises(ValueError):
+        batch_sql_queries(queries)
+
+
+@pytest.mark.unit
+def test_execute_sql_batch(warehouse, sql_queries):
+    """Test a single batch returns the result set of every query."""
+    results = execute_sql_batch(warehouse, sql_queries)
+
+    assert len(results) == len(sql_queries)
+    for (names, rows), query in zip(results, sql_queries):
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(rows, columns=names), pd.read_sql(query, warehouse)
+        )
+
+
+@pytest.mark.unit
+def test_sql_batcher(warehouse, sql_queries):
+    """Test the queries of the jobs running at the same time run in one
+    batch, and every job gets the results of its own query."""
+    batcher = SqlBatcher(expected_queries=len(sql_queries), window_seconds=5)
+    batches = []
+    run_batch = batcher.run_batch
+
+    def _record_batch(connection, queries):
+        batches.append(queries)
+        return run_batch(connection, queries)
+
+    batcher.run_batch = _record_batch
+    results = {}
+
+    def _run(index: int):
+        results[index] = batcher.execute(warehouse, sql_queries[index])
+
+    threads = [
+        threading.Thread(target=_run, args=(index,))
+        for index in range(len(sql_queries))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(batches) == 1
+    for index, query in enumerate(sql_queries):
+        names, rows = results[index]
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(rows, columns=names), pd.read_sql(query, warehouse)
+        )
+
+
+if __name__ == "__main__":
+    pytest.main()
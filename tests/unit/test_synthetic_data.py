@@ -0,0 +1,74 @@
+"""This module contains unit tests for the synthetic_data module."""
+
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.synthetic_data import (
+    KEY_COLUMNS,
+    MONTH_COLUMN,
+    SALES_MEASURES,
+    generate_pair,
+    write_parquet_pair,
+)
+from carhartt_pbi_automate.tolerance_compare import compare_with_tolerance
+
+
+@pytest.mark.unit
+def test_generate_pair_shape(synthetic_pair):
+    """Test the rows, keys and columns of the generated pair."""
+    edw = synthetic_pair.edw
+
+    assert list(edw.columns) == list(KEY_COLUMNS) + list(SALES_MEASURES)
+    assert len(edw) == 1000
+    assert edw[MONTH_COLUMN].nunique() == 8
+    assert not edw.duplicated(list(KEY_COLUMNS)).any()
+    assert len(synthetic_pair.pbi) == 1000 - synthetic_pair.missing_rows
+    assert synthetic_pair.missing_rows > 0
+    assert synthetic_pair.discrepancies > 0
+
+
+@pytest.mark.unit
+def test_generate_pair_discrepancies(synthetic_pair):
+    """Test the comparison finds exactly the injected differences, and the
+    noise is absorbed by the default tolerances."""
+    summary = compare_with_tolerance(
+        synthetic_pair.pbi, synthetic_pair.edw, join_columns=list(KEY_COLUMNS)
+    )
+
+    assert summary.mismatch_count == synthetic_pair.discrepancies
+    assert summary.df2_unique_count == synthetic_pair.missing_rows
+    assert summary.df1_unique_count == 0
+
+
+@pytest.mark.unit
+def test_write_parquet_pair(tmp_path, synthetic_pair):
+    """Test the Parquet files hold the same data as the pair in memory."""
+    pbi_path, edw_path = write_parquet_pair(
+        tmp_path,
+        1000,
+        months=8,
+        discrepancy_rate=0.01,
+        missing_rate=0.02,
+        seed=7,
+        chunk_rows=300,
+    )
+
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(pbi_path), synthetic_pair.pbi
+    )
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(edw_path), synthetic_pair.edw
+    )
+
+
+@pytest.mark.unit
+def test_generate_pair_invalid_arguments():
+    """Test the invalid arguments raise a ValueError."""
+    with pytest.raises(ValueError):
+        generate_pair(0)
+    with pytest.raises(ValueError):
+        generate_pair(10, discrepancy_rate=1.5)
+
+
+if __name__ == "__main__":
+    pytest.main()
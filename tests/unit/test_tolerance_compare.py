@@ -0,0 +1,147 @@
+"""This module contains unit tests for the tolerance_compare module."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carhartt_pbi_automate.tolerance_compare import (
+    compare_with_tolerance,
+    duplicated_keys,
+    normalise_frame,
+    values_match,
+)
+
+
+@pytest.mark.unit
+def test_normalise_frame(edw_decimal_frame):
+    """Test Decimal columns become float64 and strings are trimmed."""
+    frame = normalise_frame(edw_decimal_frame)
+
+    assert frame["Sales_Demand_Units"].dtype == np.float64
+    assert frame["In_Transit_Units"].dtype == np.float64
+    assert frame["DatesYear/Period/Month"].tolist() == [
+        "2024/01",
+        "2024/02",
+        "2024/03",
+    ]
+    # The original dataframe is not modified
+    assert edw_decimal_frame["DatesYear/Period/Month"][0] == "2024/01 "
+
+
+@pytest.mark.unit
+def test_compare_with_tolerance(pbi_float_frame, edw_decimal_frame):
+    """Test floating-point noise is ignored and real differences are found."""
+    summary = compare_with_tolerance(
+        pbi_float_frame,
+        edw_decimal_frame,
+        join_columns=["DatesYear/Period/Month"],
+    )
+
+    assert summary.intersect_rows == 3
+    assert summary.mismatched_columns == ["in_transit_units"]
+    assert summary.mismatch_count == 1
+    assert summary.mismatch_sample["datesyear/period/month"].tolist() == [
+        "2024/03"
+    ]
+
+
+@pytest.mark.unit
+def test_compare_with_tolerance_per_column(pbi_float_frame, edw_decimal_frame):
+    """Test a column tolerance overrides the default tolerances."""
+    summary = compare_with_tolerance(
+        pbi_float_frame,
+        edw_decimal_frame,
+        join_columns=["DatesYear/Period/Month"],
+        tolerances={"In_Transit_Units": (1.0, 0.0)},
+    )
+
+    assert summary.matches()
+
+
+@pytest.mark.unit
+def test_compare_with_tolerance_unique_rows(
+    pbi_float_frame, edw_decimal_frame
+):
+    """Test the rows found on one side only are counted."""
+    summary = compare_with_tolerance(
+        pbi_float_frame.iloc[:2],
+        edw_decimal_frame.iloc[1:],
+        join_columns=["DatesYear/Period/Month"],
+    )
+
+    assert summary.df1_unique_count == 1
+    assert summary.df2_unique_count == 1
+    assert summary.df2_unique_sample["in_transit_units"].tolist() == [3.0]
+
+
+@pytest.mark.unit
+def test_compare_with_tolerance_missing_join_column(pbi_float_frame):
+    """Test a join column missing in a frame raises a ValueError."""
+    with pytest.raises(ValueError):
+        compare_with_tolerance(
+            pbi_float_frame, pbi_float_frame, join_columns=["missing"]
+        )
+
+
+@pytest.mark.unit
+def test_compare_with_tolerance_several_key_columns():
+    """Test rows are joined on every key column, a key column alone repeats
+    across the rows."""
+    pbi = pd.DataFrame(
+        {"Month": ["2024/01", "2024/01", "2024/02"], "Product": [1, 2, 1]}
+    )
+    pbi["Units"] = [1.0, 2.0, 3.0]
+    edw = pbi.copy()
+    edw.loc[2, "Units"] = 4.0
+
+    summary = compare_with_tolerance(pbi, edw, ["Month", "Product"])
+
+    assert summary.intersect_rows == 3
+    assert summary.mismatch_count == 1
+    with pytest.raises(pd.errors.MergeError):
+        compare_with_tolerance(pbi, edw, ["Month"])
+
+
+@pytest.mark.unit
+def test_duplicated_keys():
+    """Test the keys on more than one row are returned once, after the
+    strings are trimmed."""
+    frame = pd.DataFrame(
+        {"Month": ["2024/01", "2024/01 ", "2024/02"], "Units": [1, 2, 3]}
+    )
+
+    duplicated = duplicated_keys(frame, ["Month"])
+
+    assert duplicated["Month"].tolist() == ["2024/01"]
+    assert duplicated_keys(frame, ["Month", "Units"]).empty
+
+
+@pytest.mark.unit
+def test_values_match():
+    """Test the values_match function."""
+    actual = values_match(
+        np.array([1.0, 1.0, np.nan, np.inf, 100.0]),
+        np.array([1.05, 1.2, np.nan, np.inf, 101.0]),
+        abs_tol=0.1,
+        rel_tol=0.0,
+    )
+    assert actual.tolist() == [True, False, True, True, False]
+
+    # The relative tolerance is relative to the second array
+    actual = values_match(np.array([100.0]), np.array([101.0]), 0.0, 0.01)
+    assert actual.tolist() == [True]
+
+    # Non numeric values are compared for equality
+    actual = values_match(
+        np.array(["a", None, "c"], dtype=object),
+        np.array(["a", None, "d"], dtype=object),
+    )
+    assert actual.tolist() == [True, True, False]
+
+
+@pytest.mark.unit
+def test_normalise_frame_categorical():
+    """Test categorical keys are compared as their underlying values."""
+    frame = pd.DataFrame({"key": pd.Categorical([" a", "b"])})
+
+    assert normalise_frame(frame)["key"].tolist() == ["a", "b"]